@@ -47,12 +47,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'quiz.metrics.MetricsMiddleware',  # Outermost: times everything below it
+    'quiz.compression.CompressionMiddleware',  # gzip / br above COMPRESSION_MIN_BYTES
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'quiz.replicas.ReplicaPinMiddleware',  # Read-your-writes for the optional read replica
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -139,3 +142,85 @@ REST_FRAMEWORK = {
 }
 # settings.py
 AUTH_USER_MODEL = 'quiz.CustomUser'
+
+# --- METRICS (quiz/metrics.py) ---
+# /metrics needs "Authorization: Bearer <METRICS_TOKEN>"; with no token it is only served when DEBUG is on.
+# Server-Timing headers expose per-request SQL/view timings to clients, so they are opt-in.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', 'false').lower() == 'true'
+# Sampled cProfile dumps: profile this fraction of requests, keep the dump only if slower than SLOW_MS.
+METRICS_PROFILE_SAMPLE_RATE = float(os.getenv('METRICS_PROFILE_SAMPLE_RATE', '0'))
+METRICS_PROFILE_SLOW_MS = int(os.getenv('METRICS_PROFILE_SLOW_MS', '1000'))
+METRICS_PROFILE_DIR = os.getenv('METRICS_PROFILE_DIR', str(BASE_DIR / 'profiles'))
+
+# --- COHORT PERCENTILES (quiz/cohort.py, `manage.py refresh_cohort`) ---
+# Columnar snapshot in the shared storage (SHARED_STORAGE_BACKEND), refreshed by the worker every N seconds
+# (0 = only by hand); each web process checks it for a newer version at most every COHORT_CHECK_SECONDS.
+COHORT_SNAPSHOT_NAME = os.getenv('COHORT_SNAPSHOT_NAME', 'cohort/snapshot.npz')
+COHORT_REFRESH_SECONDS = int(os.getenv('COHORT_REFRESH_SECONDS', '3600'))
+COHORT_CHECK_SECONDS = int(os.getenv('COHORT_CHECK_SECONDS', '30'))
+
+# --- LEADERBOARDS (quiz/leaderboard.py) ---
+# Redis sorted sets when set (needs `pip install redis`); otherwise per-process sorted lists that
+# flush to / reload from the LeaderboardEntry table every LEADERBOARD_SYNC_SECONDS.
+LEADERBOARD_REDIS_URL = os.getenv('LEADERBOARD_REDIS_URL')
+LEADERBOARD_SYNC_SECONDS = int(os.getenv('LEADERBOARD_SYNC_SECONDS', '30'))
+
+# --- ANSWER LOG RETENTION (quiz/archive.py, `manage.py archive_logs`) ---
+# Practice logs older than this are folded into AnswerRollup and moved to compressed AnswerArchive blocks.
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '180'))
+
+# --- SQLITE CONCURRENCY (quiz/sqlite_mode.py) ---
+# Only used when running on SQLite: WAL + these pragmas on every connection, and answer / library
+# writes queued through one writer thread per process (SQLITE_WRITE_QUEUE).
+SQLITE_CONCURRENT = os.getenv('SQLITE_CONCURRENT', 'true').lower() == 'true'
+SQLITE_WRITE_QUEUE = os.getenv('SQLITE_WRITE_QUEUE', 'true').lower() == 'true'
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_MMAP_MB = int(os.getenv('SQLITE_MMAP_MB', '256'))
+SQLITE_CACHE_MB = int(os.getenv('SQLITE_CACHE_MB', '64'))
+
+# --- READ REPLICA (quiz/replicas.py) ---
+# Optional: the analytics views read from this copy; a user's own writes pin them to the primary
+# for REPLICA_PIN_SECONDS (replication lag budget). In tests the replica mirrors 'default'. Without a
+# replica, DATABASE_REPLICA_MIRROR=true adds one as a second connection to the primary, so test runs
+# (any runner) and local setups exercise the routing.
+DATABASE_REPLICA_URL = os.getenv('DATABASE_REPLICA_URL')
+if DATABASE_REPLICA_URL:
+    DATABASES['replica'] = dj_database_url.parse(DATABASE_REPLICA_URL, conn_max_age=600)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+elif os.getenv('DATABASE_REPLICA_MIRROR', 'false').lower() == 'true':
+    DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+DATABASE_ROUTERS = ['quiz.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '15'))
+
+# --- RESPONSE COMPRESSION (quiz/compression.py) ---
+# br (preferred on equal q-values) or gzip. Compressed bodies are reused from a per-process
+# LRU of COMPRESSION_CACHE_MB (0 = off) when the same body is served again.
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', '1024'))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5'))
+COMPRESSION_CACHE_MB = int(os.getenv('COMPRESSION_CACHE_MB', '32'))
+
+# --- MEDIA CACHE (quiz/media.py, `manage.py cache_media`) ---
+# Question / option / concept images are downloaded once into the shared storage (SHARED_STORAGE_BACKEND)
+# and served from MEDIA_CACHE_URL with immutable cache headers. WebP variants need `pip install Pillow`.
+MEDIA_CACHE_URL = os.getenv('MEDIA_CACHE_URL', '/media/')
+MEDIA_FETCH_TIMEOUT = int(os.getenv('MEDIA_FETCH_TIMEOUT', '20'))
+MEDIA_MAX_BYTES = int(os.getenv('MEDIA_MAX_BYTES', str(10 * 1024 * 1024)))
+MEDIA_VARIANT_WIDTHS = [int(w) for w in os.getenv('MEDIA_VARIANT_WIDTHS', '320,640,1280').split(',') if w.strip()]
+MEDIA_WEBP_QUALITY = int(os.getenv('MEDIA_WEBP_QUALITY', '80'))
+MEDIA_MAP_SECONDS = int(os.getenv('MEDIA_MAP_SECONDS', '60'))
+
+# --- EXPORTS (quiz/exports.py) ---
+# Rows fetched per cursor round trip while streaming a library / notes / history download.
+EXPORT_CHUNK_ROWS = int(os.getenv('EXPORT_CHUNK_ROWS', '2000'))
+
+# --- ADMIN CHANGELISTS (quiz/admin_perf.py, `manage.py bench_admin`) ---
+# Unfiltered changelists of tables over this many rows show the planner's estimate instead of COUNT(*).
+ADMIN_ESTIMATE_OVER = int(os.getenv('ADMIN_ESTIMATE_OVER', '100000'))
+
+# --- SHARED FILES (quiz/blobs.py) ---
+# Files both Procfile processes read and write (cached images, bulk-import uploads waiting for the worker,
+# the cohort snapshot).
+# Default: rows of the StoredFile table. Any Django storage class shared by every process works instead.
+SHARED_STORAGE_BACKEND = os.getenv('SHARED_STORAGE_BACKEND', 'quiz.blobs.DatabaseStorage')
@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.urls import path
 from quiz import views
+from quiz.media import media_file
+from quiz.metrics import metrics_view
 from quiz.views import (
     QuestionList, ConceptDetailView, KeywordAnalysisAPI, KeywordTrendAPI, GameModeView, signup_api, login_api, save_user_answer, user_note_api, user_dashboard_api, user_library_api,remove_bookmark_api  # ← added here
 )
@@ -17,6 +19,8 @@ urlpatterns = [
     
     # URL for fetching Wiki Concepts
     path('api/concept/<str:term>/', ConceptDetailView.as_view()), 
+    # Batch version: /api/concepts/?terms=a,b,c
+    path('api/concepts/', views.ConceptBatchView.as_view(), name='concept-batch'),
     
     # URL for the Keywords
     path('api/analysis/keywords/', KeywordAnalysisAPI.as_view()),
@@ -35,9 +39,22 @@ urlpatterns = [
 
     path('api/user/library/', user_library_api),
     path('api/user/library/remove/', remove_bookmark_api),
+    # ?q=&limit=&offset=  ranked search over notes + bookmarked questions (quiz/search.py)
+    path('api/user/library/search/', views.library_search_api, name='library-search'),
+    path('api/user/export/<str:kind>.<str:fmt>', views.user_export_api, name='user-export'),
+    path('api/user/review/', views.review_queue_api, name='review_queue'),
+    # ?board=accuracy|mock&exam=&week=&limit=  (top-k + my rank) / just my rank
+    path('api/leaderboard/', views.leaderboard_api, name='leaderboard'),
+    path('api/leaderboard/me/', views.leaderboard_me_api, name='leaderboard-me'),
     
     path('api/user/history/', views.UserHistoryAPI.as_view(), name='user-history'),
     path('api/exam/mock/', views.MockExamGeneratorAPI.as_view(), name='mock-exam'),
     path('api/exam/analysis/<str:session_id>/', views.ExamAnalysisAPI.as_view(), name='exam-analysis'),
     path('api/payment/success/', views.verify_payment_api, name='payment_success'),
+
+    # Locally cached images (quiz/media.py); content-addressed, so cached as immutable
+    path('media/<path:path>', media_file, name='media'),
+
+    # Prometheus scrape endpoint (per-route latency, SQL, spans)
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -0,0 +1,159 @@
+# quiz/adaptive.py
+# Weakness-targeted mock papers (`/api/exam/mock/?mode=adaptive`).
+#   - QuestionBank: (id, subject, pattern, blueprint group) of every question as numpy
+#     arrays, cached per process for BANK_TTL seconds and dropped when a Question is saved / deleted
+#   - user_profile(): ONE aggregate query over the user's logs -> per-question attempts,
+#     correct count and last attempt, mapped onto bank positions
+#   - score_questions() / select_paper(): pure numpy over the whole bank, no DB
+#     (benchmarked in quiz/benchmarks.py: 100 questions from a 50k bank)
+import math
+import threading
+import time
+
+import numpy as np
+from django.db.models import Count, Max, Q
+
+from .metrics import timed
+from .models import Question, UserAnswerLog
+
+# Same "Hostile Mix" as the random generator: 30% Zero-G, 30% Elimination, 20% Assertion, 20% One-liner
+BLUEPRINT = [('zero_g', 0.3), ('elim', 0.3), ('assertion', 0.2), ('one_liner', 0.2)]
+BANK_TTL = 300
+PRIOR_ACCURACY = 0.5   # Unattempted subjects/patterns count as 50% accurate...
+PRIOR_WEIGHT = 5.0     # ...worth this many answers
+SUBJECT_WEIGHT = 1.0
+PATTERN_WEIGHT = 0.6
+EXPOSURE_PENALTY = 1.5 # Score removed from a question answered just now
+EXPOSURE_DAYS = 30.0   # ...decaying with this time constant
+WRONG_BONUS = 0.4      # Seen-and-missed questions are worth retrying once exposure fades
+NOISE = 0.15           # Gumbel jitter so two papers for the same user differ
+
+def blueprint_group(pattern):
+    for index, (prefix, _) in enumerate(BLUEPRINT):
+        if pattern.startswith(prefix):
+            return index
+    return -1  # e.g. fifty_fifty: only used to top up short groups
+
+def blueprint_counts(total):
+    counts = [int(math.floor(total * share)) for _, share in BLUEPRINT]
+    for i in range(total - sum(counts)):
+        counts[i % len(counts)] += 1
+    return counts
+
+# --- 1. QUESTION BANK (cached arrays) ---
+class QuestionBank:
+    def __init__(self, ids, subjects, patterns):
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids, kind='stable')  # Sorted ids -> searchsorted lookups
+        self.ids = ids[order]
+        self.subject_names, subject_codes = np.unique(np.asarray(subjects, dtype=str), return_inverse=True)
+        self.pattern_names, pattern_codes = np.unique(np.asarray(patterns, dtype=str), return_inverse=True)
+        self.subject = subject_codes.astype(np.int64)[order]
+        self.pattern = pattern_codes.astype(np.int64)[order]
+        pattern_group = np.array([blueprint_group(p) for p in self.pattern_names], dtype=np.int64)
+        self.group = pattern_group[self.pattern]
+        self.group_index = [np.flatnonzero(self.group == g) for g in range(len(BLUEPRINT))]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def positions(self, question_ids):
+        """Bank positions of `question_ids`; ids no longer in the bank are dropped."""
+        question_ids = np.asarray(question_ids, dtype=np.int64)
+        if not len(self.ids):
+            return np.zeros(len(question_ids), dtype=np.int64), np.zeros(len(question_ids), dtype=bool)
+        pos = np.minimum(np.searchsorted(self.ids, question_ids), len(self.ids) - 1)
+        return pos, self.ids[pos] == question_ids
+
+_bank = {'bank': None, 'loaded_at': 0.0}
+_bank_lock = threading.Lock()
+
+def get_bank(max_age=BANK_TTL):
+    with _bank_lock:
+        if _bank['bank'] is None or time.monotonic() - _bank['loaded_at'] > max_age:
+            rows = list(Question.objects.order_by().values_list('id', 'subject', 'pattern'))
+            ids, subjects, patterns = zip(*rows) if rows else ((), (), ())
+            _bank['bank'] = QuestionBank(ids, subjects, patterns)
+            _bank['loaded_at'] = time.monotonic()
+        return _bank['bank']
+
+def invalidate_bank(**kwargs):
+    """post_save / post_delete receiver for Question (connected in QuizConfig.ready).
+
+    Only this process's copy: other processes pick up the change within BANK_TTL.
+    """
+    with _bank_lock:
+        _bank['bank'] = None
+
+# --- 2. USER HISTORY (one query) ---
+def user_profile(user, bank):
+    rows = list(
+        UserAnswerLog.objects.filter(user=user).order_by().values('question_id')
+        .annotate(attempts=Count('id'), correct=Count('id', filter=Q(is_correct=True)), last=Max('attempted_at'))
+        .values_list('question_id', 'attempts', 'correct', 'last')
+    )
+    if not rows:
+        return empty_profile()
+    qids, attempts, correct, last = zip(*rows)
+    pos, found = bank.positions(qids)
+    return {
+        'pos': pos[found],
+        'attempts': np.asarray(attempts, dtype=np.float64)[found],
+        'correct': np.asarray(correct, dtype=np.float64)[found],
+        'last': np.array([t.timestamp() for t in last], dtype=np.float64)[found],
+    }
+
+def empty_profile():
+    return {'pos': np.zeros(0, dtype=np.int64), 'attempts': np.zeros(0), 'correct': np.zeros(0), 'last': np.zeros(0)}
+
+# --- 3. SCORING + SELECTION (pure numpy) ---
+def _weakness(codes, n_codes, attempts, correct):
+    total = np.bincount(codes, weights=attempts, minlength=n_codes)
+    right = np.bincount(codes, weights=correct, minlength=n_codes)
+    return 1.0 - (right + PRIOR_ACCURACY * PRIOR_WEIGHT) / (total + PRIOR_WEIGHT)
+
+def score_questions(bank, profile, now, rng):
+    pos = profile['pos']
+    weak_subject = _weakness(bank.subject[pos], len(bank.subject_names), profile['attempts'], profile['correct'])
+    weak_pattern = _weakness(bank.pattern[pos], len(bank.pattern_names), profile['attempts'], profile['correct'])
+    scores = SUBJECT_WEIGHT * weak_subject[bank.subject] + PATTERN_WEIGHT * weak_pattern[bank.pattern]
+
+    # Recently seen questions sink; old misses float back up.
+    days_since = np.maximum(now - profile['last'], 0.0) / 86400.0
+    exposure = EXPOSURE_PENALTY * np.exp(-days_since / EXPOSURE_DAYS)
+    missed = profile['correct'] < profile['attempts']
+    scores[pos] += np.where(missed, WRONG_BONUS, 0.0) - exposure
+    return scores + NOISE * rng.gumbel(size=len(scores))
+
+def _top(candidates, scores, k):
+    if k <= 0 or not len(candidates):
+        return candidates[:0]
+    if k >= len(candidates):
+        return candidates[np.argsort(-scores[candidates])]
+    best = np.argpartition(-scores[candidates], k - 1)[:k]
+    return candidates[best[np.argsort(-scores[candidates[best]])]]
+
+@timed('adaptive_select')
+def select_paper(bank, profile, total=20, now=None, rng=None):
+    """Bank positions of a blueprint-respecting paper, weakest areas first."""
+    rng = rng or np.random.default_rng()
+    now = time.time() if now is None else now
+    scores = score_questions(bank, profile, now, rng)
+
+    picked = [_top(idx, scores, k) for idx, k in zip(bank.group_index, blueprint_counts(total))]
+    chosen = np.concatenate(picked) if picked else np.zeros(0, dtype=np.int64)
+    short = total - len(chosen)
+    if short > 0:
+        # A group ran dry: top up from the best remaining questions of any pattern.
+        remaining = np.ones(len(bank), dtype=bool)
+        remaining[chosen] = False
+        chosen = np.concatenate([chosen, _top(np.flatnonzero(remaining), scores, short)])
+    return chosen
+
+def generate_adaptive_paper(user, total=20):
+    """Question ids for `user`, in shuffled order."""
+    bank = get_bank()
+    chosen = select_paper(bank, user_profile(user, bank), total=total)
+    ids = bank.ids[chosen]
+    np.random.default_rng().shuffle(ids)
+    return ids.tolist()
@@ -1,4 +1,5 @@
 import os
+import uuid
 from django.contrib import admin
 from django import forms 
 from django.forms.models import BaseInlineFormSet
@@ -6,44 +7,50 @@ from django.contrib import messages
 from django.contrib.auth.admin import UserAdmin
 from dotenv import load_dotenv
 import google.generativeai as genai
-from groq import Groq
 from import_export.admin import ImportExportModelAdmin
+from django.shortcuts import redirect, render
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
+from .admin_perf import EstimatedCountPaginator, KeysetChangeList, search_questions
 from .admin_resource import QuestionResource
+from .blobs import shared_storage
+from .dedup import near_duplicates_of
+from .jobs import enqueue
+from .tagging import TaggingEngine
 
 # Import models
 from .models import (
     Question, Option, KnowledgeConcept, KeywordAnalysis, 
-    TopicMedia, CustomUser, UserAnswerLog
+    TopicMedia, CustomUser, UserAnswerLog, TaggingJob, Job
 )
 
 # --- CONFIG ---
 load_dotenv()
 api_key = os.getenv('GROQ_API_KEY')  # Changed from GOOGLE_API_KEY
-if api_key:
-    client = Groq(api_key=api_key)  # This is the new Groq client
 
 # --- ACTIONS ---
+# Heavy work runs in `manage.py run_worker`; the actions only enqueue a Job.
 @admin.action(description='✨ Auto-Generate Tags')
 def generate_tags(modeladmin, request, queryset):
     if not api_key:
         messages.error(request, "API Key missing.")
         return
-    count = 0
-    for question in queryset:
-        try:
-            prompt = f"Read the UPSC-style question: '{question.text}'. Generate 5 relevant comma-separated tags, inferring context like historical dynasties, periods, or topics (e.g., for a temple question, include 'Chola Dynasty' if relevant). Output ONLY the tags, no explanations."
-            response = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=50
-            )
-            if response.choices[0].message.content:
-                question.tags = response.choices[0].message.content.strip()
-                question.save()
-                count += 1
-        except Exception as e:
-            messages.error(request, f"Error QID {question.id}: {e}")
-    messages.success(request, f"Tagged {count} questions!")
+    # Cached + concurrent engine (quiz/tagging.py); progress is kept on the TaggingJob row.
+    tagging_job = TaggingEngine.create_job(queryset.order_by('id').values_list('id', flat=True))
+    job = enqueue('generate_tags', {'tagging_job_id': tagging_job.pk},
+                  message=f"{tagging_job.total} questions queued for tagging")
+    messages.success(request, f"Queued tagging of {tagging_job.total} questions as Job #{job.pk}. "
+                              f"Track it under Jobs.")
+
+@admin.action(description='🔎 Re-run Keyword Analysis (background)')
+def analyze_keywords_action(modeladmin, request, queryset):
+    job = enqueue('analyze_keywords', message="Keyword analysis queued")
+    messages.success(request, f"Queued keyword analysis as Job #{job.pk}.")
+
+class BulkImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV or XLSX with the same columns as the normal import")
+    chunk_size = forms.IntegerField(initial=500, min_value=50, max_value=5000)
 
 # --- SMART OPTION DEFAULTS (A, B, C, D) ---
 class OptionFormSet(BaseInlineFormSet):
@@ -67,6 +74,7 @@ class OptionInline(admin.TabularInline):
 class QuestionAdmin(ImportExportModelAdmin):
     resource_class = QuestionResource
     inlines = [OptionInline]
+    change_list_template = 'admin/quiz/question/change_list.html'  # import-export wraps this; adds "Bulk import (background)"
     
     # 1. CLEANER LIST (Removed list_editable)
     list_display = ('text_preview', 'subject', 'exam_name', 'year', 'pattern', 'tags', 'image_status')
@@ -74,8 +82,8 @@ class QuestionAdmin(ImportExportModelAdmin):
     # Removed list_editable as requested
     
     list_filter = ('exam_name', 'year', 'subject', 'pattern')
-    search_fields = ('text', 'tags')
-    actions = [generate_tags]
+    search_fields = ('text', 'tags')  # Served by the full-text index when there is one (get_search_results)
+    actions = [generate_tags, analyze_keywords_action]
     
     save_on_top = True
 
@@ -87,7 +95,11 @@ class QuestionAdmin(ImportExportModelAdmin):
             'fields': (('subject', 'year', 'exam_name'), ('pattern', 'tags')),
             'classes': ('collapse',), 
         }),
+        ('Possible Duplicates', {
+            'fields': ('near_duplicates',),
+        }),
     )
+    readonly_fields = ('near_duplicates',)
 
     def text_preview(self, obj):
         return obj.text[:60] + "..." if len(obj.text) > 60 else obj.text
@@ -97,6 +109,67 @@ class QuestionAdmin(ImportExportModelAdmin):
         return "📷 Yes" if obj.question_image_url else "-"
     image_status.short_description = "Image"
 
+    def get_search_results(self, request, queryset, search_term):
+        matched = search_questions(queryset, search_term)
+        if matched is None:
+            return super().get_search_results(request, queryset, search_term)
+        return matched, False
+
+    # --- NEAR-DUPLICATES (MinHash/LSH index, quiz/dedup.py) ---
+    def _duplicate_links(self, matches):
+        return format_html_join(
+            ", ", '<a href="{}">Q{}</a> ({}%)',
+            ((reverse('admin:quiz_question_change', args=[qid]), qid, round(score * 100)) for qid, score in matches),
+        )
+
+    def near_duplicates(self, obj):
+        if not obj or not obj.pk:
+            return "-"
+        matches = near_duplicates_of(obj)
+        return self._duplicate_links(matches) if matches else "None found"
+    near_duplicates.short_description = "Near duplicates"
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)  # options saved -> index is current
+        matches = near_duplicates_of(form.instance)
+        if matches:
+            messages.warning(request, format_html("This question looks like a near duplicate of {}.",
+                                                  self._duplicate_links(matches)))
+
+    def add_success_message(self, result, request):
+        super().add_success_message(result, request)
+        flagged = [(row.instance, row.instance.near_duplicates) for row in result.rows
+                   if row.instance is not None and getattr(row.instance, 'near_duplicates', None)]
+        for instance, matches in flagged[:20]:
+            messages.warning(request, format_html("Imported Q{} looks like a near duplicate of {}.",
+                                                  instance.pk, self._duplicate_links(matches)))
+        if len(flagged) > 20:
+            messages.warning(request, f"... and {len(flagged) - 20} more near duplicates "
+                                      f"(see `manage.py find_duplicates`).")
+
+    # --- BACKGROUND BULK IMPORT ---
+    def get_urls(self):
+        custom = [
+            path('bulk-import/', self.admin_site.admin_view(self.bulk_import_view), name='quiz_question_bulk_import'),
+        ]
+        return custom + super().get_urls()
+
+    def bulk_import_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:quiz_question_changelist')
+        form = BulkImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            # Shared storage (quiz/blobs.py): the worker process cannot read this process's disk
+            name = shared_storage().save(f"job_uploads/{uuid.uuid4().hex}_{os.path.basename(upload.name)}", upload)
+            job = enqueue('import_questions', {'upload': name, 'chunk_size': form.cleaned_data['chunk_size']},
+                          message=f"Importing {upload.name}")
+            messages.success(request, f"Queued import of {upload.name} as Job #{job.pk}.")
+            return redirect(reverse('admin:quiz_job_change', args=[job.pk]))
+        context = {**self.admin_site.each_context(request), 'opts': self.model._meta,
+                   'form': form, 'title': 'Bulk import (background)'}
+        return render(request, 'admin/quiz/question/bulk_import.html', context)
+
 @admin.register(KnowledgeConcept)
 class KnowledgeConceptAdmin(admin.ModelAdmin):
     list_display = ('term', 'definition')
@@ -106,11 +179,21 @@ class KnowledgeConceptAdmin(admin.ModelAdmin):
 class KeywordAnalysisAdmin(admin.ModelAdmin):
     list_display = ('keyword', 'year', 'is_true_usage')
     list_filter = ('keyword', 'is_true_usage', 'year')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 @admin.register(UserAnswerLog)
 class UserAnswerLogAdmin(admin.ModelAdmin):
     list_display = ('user', 'question', 'is_correct', 'attempted_at')
     list_filter = ('is_correct', 'attempted_at')
+    list_select_related = ('user', 'question')  # Both __str__s, otherwise two queries per row
+    # Newest first by id with "Older" / "Newer" links (quiz/admin_perf.py); no OFFSET, no COUNT(*)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    sortable_by = ()
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
 
 @admin.register(TopicMedia)
 class TopicMediaAdmin(admin.ModelAdmin):
@@ -125,3 +208,34 @@ class CustomUserAdmin(UserAdmin):
     fieldsets = UserAdmin.fieldsets + (
         ('Subscription Status', {'fields': ('is_premium',)}),
     )
+
+@admin.register(TaggingJob)
+class TaggingJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'progress', 'tagged', 'cached', 'skipped', 'failed', 'model_name', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('question_ids', 'errors')
+
+    def progress(self, obj):
+        return f"{obj.next_index}/{obj.total}"
+    progress.short_description = "Progress"
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'progress_bar', 'message', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('kind', 'payload', 'status', 'attempts', 'progress_done', 'progress_total', 'message',
+                       'result', 'error', 'locked_by', 'locked_at', 'created_at', 'finished_at')
+    actions = ['retry_jobs']
+
+    def progress_bar(self, obj):
+        return format_html(
+            '<div style="width:120px;background:#eee;border-radius:3px">'
+            '<div style="width:{}%;background:#79aec8;color:#fff;font-size:11px;padding:1px 4px;border-radius:3px">{}%</div></div>',
+            obj.percent, obj.percent,
+        )
+    progress_bar.short_description = "Progress"
+
+    @admin.action(description='Retry selected jobs')
+    def retry_jobs(self, request, queryset):
+        count = queryset.exclude(status='running').update(status='queued', attempts=0, error='', run_after=timezone.now())
+        messages.success(request, f"Requeued {count} job(s).")
@@ -0,0 +1,134 @@
+# quiz/admin_perf.py
+# Changelist performance for the big tables (UserAnswerLog, KeywordAnalysis, Question).
+#   - EstimatedCountPaginator: an unfiltered changelist over ADMIN_ESTIMATE_OVER rows shows the
+#     planner's row estimate (Postgres pg_class.reltuples, SQLite sqlite_stat1 from the last
+#     ANALYZE) instead of running COUNT(*) on every page; filtered / searched lists count exactly
+#   - KeysetChangeList: newest-first pages keyed on the primary key (?cursor=<pk> lists the rows
+#     below it) instead of OFFSET pages, so the 5000th page costs what the first one does
+#   - search_questions(): QuestionAdmin's search through the FTS5 table / GIN index of migration
+#     0016 (every word a prefix, a bare number also matches the id); None without the index
+#   - `manage.py bench_admin` times the changelists with and without all of this
+from django.conf import settings
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.functional import cached_property
+
+from .search import terms
+
+CURSOR_VAR = 'cursor'
+QUESTION_FTS_TABLE = 'quiz_question_fts'
+QUESTION_GIN_INDEX = 'quiz_question_search_gin'
+QUESTION_TSVECTOR = "to_tsvector('simple', text || ' ' || coalesce(tags, ''))"  # Must match the index expression
+
+_question_backends = {}  # alias -> 'fts5' | 'tsvector' | None
+
+# --- 1. ESTIMATED COUNTS ---
+def estimated_rows(model, using='default'):
+    """The planner's row count for the model's table, or None when the database has none."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None  # -1: never vacuumed / analyzed
+        if connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if not cursor.fetchone():
+                return None  # Never ANALYZEd
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s", [table])
+            # First number of each index's stat is its row count; partial indexes hold fewer
+            counts = [int(stat.split()[0]) for stat, in cursor.fetchall() if stat]
+            return max(counts) if counts else None
+    return None
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:  # Unfiltered: the whole table
+            estimate = estimated_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate >= settings.ADMIN_ESTIMATE_OVER:
+                return estimate
+        return super().count
+
+# --- 2. KEYSET PAGES ---
+class KeysetChangeList(ChangeList):
+    """Newest first by primary key; "Older" / "Newer" links carry the key instead of a page number."""
+    def get_filters_params(self, params=None):
+        params = super().get_filters_params(params)
+        params.pop(CURSOR_VAR, None)
+        return params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # A new filter, search or sort starts again from the newest rows
+        return super().get_query_string(new_params, [*(remove or []), CURSOR_VAR])
+
+    def get_ordering(self, request, queryset):
+        return ['-pk']
+
+    def get_results(self, request):
+        try:
+            cursor = int(request.GET.get(CURSOR_VAR) or 0)
+        except ValueError:
+            raise IncorrectLookupParameters
+        per_page = self.list_per_page
+        rows = list((self.queryset.filter(pk__lt=cursor) if cursor else self.queryset)[:per_page + 1])
+        older = rows[per_page - 1].pk if len(rows) > per_page else None
+        newer = None
+        if cursor:
+            # The page above starts per_page rows up: the key just past them, or the newest page
+            above = list(self.queryset.filter(pk__gte=cursor).order_by('pk')
+                         .values_list('pk', flat=True)[per_page:per_page + 1])
+            newer = self.get_query_string({CURSOR_VAR: above[0]}) if above else self.get_query_string()
+
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, per_page)
+        self.result_count = self.paginator.count
+        self.result_list = rows[:per_page]
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = False  # The stock page-number links don't apply
+        self.cursor = cursor
+        self.older_url = self.get_query_string({CURSOR_VAR: older}) if older else None
+        self.newer_url = newer
+        self.newest_url = self.get_query_string() if cursor else None
+
+# --- 3. QUESTION SEARCH ---
+def question_search_backend(connection):
+    """'fts5' / 'tsvector' when migration 0016 could build the question index, else None."""
+    if connection.alias not in _question_backends:
+        found = None
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [QUESTION_FTS_TABLE])
+                found = 'fts5' if cursor.fetchone() else None
+            elif connection.vendor == 'postgresql':
+                cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = %s", [QUESTION_GIN_INDEX])
+                found = 'tsvector' if cursor.fetchone() else None
+        _question_backends[connection.alias] = found
+    return _question_backends[connection.alias]
+
+def search_questions(queryset, search_term):
+    """queryset narrowed to questions whose text / tags have every word (as a prefix); None without an index."""
+    words = terms(search_term)
+    if not words:
+        return None
+    kind = question_search_backend(connections[queryset.db])
+    if kind == 'fts5':
+        matches = RawSQL(f"SELECT rowid FROM {QUESTION_FTS_TABLE} WHERE {QUESTION_FTS_TABLE} MATCH %s",
+                         [' '.join(f'"{w}"*' for w in words)])
+    elif kind == 'tsvector':
+        matches = RawSQL(f"SELECT id FROM quiz_question WHERE {QUESTION_TSVECTOR} @@ to_tsquery('simple', %s)",
+                         [' & '.join(f'{w}:*' for w in words)])
+    else:
+        return None
+    condition = Q(id__in=matches)
+    if search_term.strip().isdigit():
+        condition |= Q(id=int(search_term.strip()))
+    return queryset.filter(condition)
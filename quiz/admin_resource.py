@@ -1,6 +1,8 @@
 # quiz/admin_resource.py
 from import_export import resources, fields
-from .models import Question, Option
+from .concepts import annotate_questions
+from .dedup import index_questions, near_duplicates_of
+from .models import Question, Option, clean_drive_url, retag_questions
 
 class QuestionResource(resources.ModelResource):
     # --- 1. OPTION A ---
@@ -57,10 +59,14 @@ class QuestionResource(resources.ModelResource):
         if 'exam_name' not in row or not row['exam_name']:
             row['exam_name'] = 'UPSC CSE'
 
-    def after_save_instance(self, instance, using_transactions, dry_run):
-        if dry_run: return 
+    def do_instance_save(self, instance, is_create):
+        # Tagging, dedup and concept links run once in after_save_instance, against the new options
+        instance.save(reindex=False)
+
+    def after_save_instance(self, instance, row, **kwargs):
+        # import-export 4.x signature (the 3.x one got `using_transactions, dry_run` and no row)
+        if kwargs.get('dry_run'): return 
 
-        row = instance.dataset_row
         correct_lbl = str(row.get('correct_option', '')).strip().upper()
 
         # Map options - We use .get() so if column is missing, it just stays None (Safe)
@@ -73,20 +79,29 @@ class QuestionResource(resources.ModelResource):
 
         instance.options.all().delete()
 
+        # Build all options first and insert them in one go - Option.save() would
+        # re-save the question (and re-tag keywords) once per option.
+        new_options = []
         for label, txt_key, expl_key, img_key, vid_key, mnem_key in options_map:
             text_val = row.get(txt_key)
             
             if text_val is not None:
                 text_str = str(text_val).strip()
                 if text_str: 
-                    Option.objects.create(
+                    new_options.append(Option(
                         question=instance,
                         option_label=label,
                         text_content=text_str,
                         is_correct=(label == correct_lbl),
                         # If these columns are deleted in Excel, .get() returns None, which is fine
                         explanation_text=row.get(expl_key),
-                        image_url=row.get(img_key),
+                        image_url=clean_drive_url(row.get(img_key)),
                         video_url=row.get(vid_key),
                         mnemonic_text=row.get(mnem_key)
-                    )
+                    ))
+        Option.objects.bulk_create(new_options)
+        retag_questions([(instance, new_options)])
+        index_questions([(instance, new_options)])
+        annotate_questions([(instance, new_options)])
+        # Read by QuestionAdmin after the import to warn about near duplicates.
+        instance.near_duplicates = near_duplicates_of(instance, new_options)
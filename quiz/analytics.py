@@ -0,0 +1,189 @@
+# quiz/analytics.py
+# Pure-Python analytics used by the dashboard & exam analysis views.
+# Kept free of request/ORM code so they can be benchmarked on synthetic logs.
+from .metrics import timed
+
+# --- 1. SESSION STATS (Exam Analysis) ---
+def confidence_bucket(score):
+    """Snap confidence to nearest bucket (0, 25, 50, 75, 100)"""
+    if score >= 88: return 100
+    elif score >= 63: return 75
+    elif score >= 38: return 50
+    elif score >= 13: return 25
+    return 0
+
+@timed('session_stats')
+def calculate_session_stats(logs):
+    unique_qs = {}
+    for log in logs:
+        qid = log.question.id
+        if qid not in unique_qs:
+            unique_qs[qid] = { 'total_time': 0, 'latest_log': log, 'timestamp': log.attempted_at }
+        unique_qs[qid]['total_time'] += log.time_taken_seconds
+        if log.attempted_at >= unique_qs[qid]['timestamp']:
+            unique_qs[qid]['latest_log'] = log
+            unique_qs[qid]['timestamp'] = log.attempted_at
+    # Buckets: 0, 25, 50, 75, 100
+    conf_matrix = {
+        0:   {'correct': 0, 'wrong': 0},
+        25:  {'correct': 0, 'wrong': 0},
+        50:  {'correct': 0, 'wrong': 0},
+        75:  {'correct': 0, 'wrong': 0},
+        100: {'correct': 0, 'wrong': 0}
+    }
+
+    # Metrics
+    correct = 0; wrong = 0; skipped = 0; silly_mistakes = 0
+    quadrants = {"q1_sniper": [], "q2_optimal": [], "q3_rush": [], "q4_trap": []}
+    full_logs_out = []; heatmap_stats = {}
+
+    for qid, data in unique_qs.items():
+        log = data['latest_log']
+        t_time = data['total_time']
+
+        if log.is_correct: correct += 1
+        elif log.is_skipped: skipped += 1
+        else: wrong += 1
+
+        if not log.is_correct and not log.is_skipped:
+            if t_time < 15 or log.confidence_score > 80: silly_mistakes += 1
+
+        # Quadrants
+        q_info = {"id": log.question.id, "text": log.question.text, "time": t_time, "is_correct": log.is_correct}
+        if log.is_correct:
+            if t_time < 40: quadrants['q1_sniper'].append(q_info)
+            else: quadrants['q2_optimal'].append(q_info)
+        elif not log.is_skipped:
+            if t_time < 20: quadrants['q3_rush'].append(q_info)
+            elif t_time > 60: quadrants['q4_trap'].append(q_info)
+
+        # Heatmap
+        subj = log.question.subject
+        if subj not in heatmap_stats: heatmap_stats[subj] = {'total': 0, 'correct': 0}
+        heatmap_stats[subj]['total'] += 1
+        if log.is_correct: heatmap_stats[subj]['correct'] += 1
+
+        # Full Logs
+        full_logs_out.append({
+            "question_id": log.question.id,
+            "time_taken": t_time,
+            "is_correct": log.is_correct,
+            "is_skipped": log.is_skipped,
+            "selected_option_id": log.selected_option_id
+        })
+        if not log.is_skipped:
+            bucket = confidence_bucket(log.confidence_score)
+            if log.is_correct:
+                conf_matrix[bucket]['correct'] += 1
+            else:
+                conf_matrix[bucket]['wrong'] += 1
+
+    actual_score = (correct * 2) - (wrong * 0.66)
+    lost_marks = silly_mistakes * 2.66
+    potential_score = actual_score + lost_marks
+    total_qs = len(unique_qs)
+    accuracy = (correct / total_qs * 100) if total_qs > 0 else 0
+
+    heatmap_list = []
+    for subj, stats in heatmap_stats.items():
+        acc = (stats['correct'] / stats['total']) * 100 if stats['total'] > 0 else 0
+        heatmap_list.append({'subject': subj, 'accuracy': round(acc, 1), 'total': stats['total']})
+    heatmap_list.sort(key=lambda x: x['accuracy'])
+
+    return {
+        "score_card": {
+            "actual_score": round(actual_score, 2),
+            "potential_score": round(potential_score, 2),
+            "lost_marks": round(lost_marks, 2),
+            "accuracy": round(accuracy, 1)
+        },
+        "quadrants": quadrants,
+        "heatmap": heatmap_list,
+        "full_logs": full_logs_out,
+        "total_qs": total_qs,
+        "confidence_matrix": conf_matrix
+    }
+
+# --- 2. RECENT BEHAVIOR (Dashboard Deep Metrics + Coach Inputs) ---
+@timed('coach_behavior')
+def summarize_recent_behavior(recent_logs):
+    """Single pass over the recent logs, collecting everything the coach needs."""
+    total_recent = 0
+    skip_count = 0
+    sniper_total = 0; sniper_correct = 0
+    rushed_count = 0; rushed_correct = 0
+    high_conf_errors = 0; low_conf_correct = 0
+    wrong_count = 0; wrong_time = 0
+
+    for log in recent_logs:
+        total_recent += 1
+        if log.is_skipped: skip_count += 1
+        # B. Sniper Efficiency
+        if log.eliminated_options:
+            sniper_total += 1
+            if log.is_correct: sniper_correct += 1
+        # C. Rush Accuracy
+        if log.time_taken_seconds < 15 and not log.is_skipped:
+            rushed_count += 1
+            if log.is_correct: rushed_correct += 1
+        # Recent high confidence errors (Dunning-Kruger check)
+        if log.confidence_score > 80 and not log.is_correct: high_conf_errors += 1
+        # Recent low confidence correct (Imposter check)
+        if log.confidence_score < 40 and log.is_correct: low_conf_correct += 1
+        # Avg Time on WRONG answers (Overthinker check)
+        if not log.is_correct and not log.is_skipped:
+            wrong_count += 1
+            wrong_time += log.time_taken_seconds
+
+    return {
+        'total_recent': total_recent,
+        'skip_rate': (skip_count / total_recent) * 100 if total_recent > 0 else 0,
+        'sniper_total': sniper_total,
+        'sniper_efficiency': (sniper_correct / sniper_total * 100) if sniper_total > 0 else 0,
+        'rushed_count': rushed_count,
+        'rush_accuracy': (rushed_correct / rushed_count * 100) if rushed_count > 0 else 100.0,
+        'high_conf_errors': high_conf_errors,
+        'low_conf_correct': low_conf_correct,
+        'avg_time_wrong': wrong_time / wrong_count if wrong_count else 0,
+    }
+
+# --- 3. THE AI COACH LOGIC (FULL MATRIX VERSION) 🤖 ---
+def coach_waterfall(behavior, score_logic, score_precision, score_reasoning):
+    """Returns (title, message) - first matching diagnosis wins."""
+    # DIMENSION 1: MINDSET CHECK
+    if behavior['high_conf_errors'] > 4:
+        return ("Reality Check 🛑",
+                "You are marking answers as 'Sure' but getting them wrong. You have dangerous misconceptions. Stop guessing.")
+
+    elif behavior['low_conf_correct'] > 5:
+        return ("The Imposter 🎭",
+                "Trust your gut! You marked 'Low Confidence' on many questions you actually got right.")
+
+    elif behavior['skip_rate'] > 35:
+        return ("Risk Averse 🛡️",
+                "You are skipping too much (>35%). In UPSC, you need calculated risks. Attempt 5 '50-50' questions today.")
+
+    # DIMENSION 2: STRATEGY CHECK
+    elif score_logic > 80 and score_precision < 40:
+        return ("The Gamer 🎮",
+                "Tactical genius, but factually weak. You fail when Elimination tricks don't work (Zero-G). Read textbooks.")
+
+    elif score_precision > 70 and score_reasoning < 40:
+        return ("Superficial Reader 📖",
+                "You know facts but fail 'Assertion-Reasoning'. Ask 'Why?' not just 'What?' when reading.")
+
+    # DIMENSION 3: TIME CHECK
+    elif behavior['rushed_count'] > 5 and behavior['rush_accuracy'] < 50:
+        return ("The Speedster ⚡",
+                f"Slow Down! You have {int(behavior['rush_accuracy'])}% accuracy when answering under 15s. You are losing easy marks.")
+
+    elif behavior['avg_time_wrong'] > 120:
+        return ("The Overthinker ⏳",
+                "Time Trap! You spend over 2 mins on wrong answers. If you don't know it in 60s, move on.")
+
+    # DIMENSION 4: PROCESS CHECK
+    elif behavior['sniper_total'] > 5 and behavior['sniper_efficiency'] < 40:
+        return ("The 50-50 Loser 📉",
+                "The 'Final Mile' Problem: You successfully eliminate trash options, but choke on the final choice.")
+
+    return ("On Track 🎯", "Your performance is balanced. Keep practicing consistently.")
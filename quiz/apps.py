@@ -2,4 +2,29 @@ from django.apps import AppConfig
 
 
 class QuizConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
     name = 'quiz'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save, pre_delete
+        from .adaptive import invalidate_bank
+        from .concepts import concept_changed
+        from .media import register_instance_media
+        from .models import (KnowledgeConcept, Option, Question, UserAnswerLog, UserQuestionNote,
+                             remove_question_trends)
+        from .search import answer_logged, note_deleted, note_saved, question_saved
+        from .sqlite_mode import configure_connection
+        post_save.connect(concept_changed, sender=KnowledgeConcept, dispatch_uid='concept_cache_save')
+        post_delete.connect(concept_changed, sender=KnowledgeConcept, dispatch_uid='concept_cache_delete')
+        post_save.connect(invalidate_bank, sender=Question, dispatch_uid='adaptive_bank_save')
+        post_delete.connect(invalidate_bank, sender=Question, dispatch_uid='adaptive_bank_delete')
+        pre_delete.connect(remove_question_trends, sender=Question, dispatch_uid='question_trends_delete')
+        connection_created.connect(configure_connection, dispatch_uid='sqlite_pragmas')
+        for model in (Question, Option, KnowledgeConcept):
+            post_save.connect(register_instance_media, sender=model, dispatch_uid=f'media_{model.__name__.lower()}')
+        # Library search entries (quiz/search.py)
+        post_save.connect(note_saved, sender=UserQuestionNote, dispatch_uid='library_search_note_save')
+        post_delete.connect(note_deleted, sender=UserQuestionNote, dispatch_uid='library_search_note_delete')
+        post_save.connect(answer_logged, sender=UserAnswerLog, dispatch_uid='library_search_bookmark')
+        post_save.connect(question_saved, sender=Question, dispatch_uid='library_search_question_text')
@@ -0,0 +1,199 @@
+# quiz/archive.py
+# Tiered retention for UserAnswerLog (`manage.py archive_logs`).
+#   - hot: UserAnswerLog keeps exam-mode logs (session analysis), library bookmarks and
+#     everything younger than ARCHIVE_AFTER_DAYS
+#   - archived: older practice logs are, in ONE short transaction per (user, chunk):
+#       1. folded into AnswerRollup counters per (user, local day, subject, pattern)
+#       2. written as one compressed column block (AnswerArchive, np.savez_compressed)
+#       3. deleted from UserAnswerLog
+#   - reads: user_rollup() adds the counters to the all-time dashboard metrics;
+#     iter_archive_arrays() / iter_archived_logs() give the rows back for full-history
+#     rebuilds (srs backfill, calibration, cohort snapshot) and exports
+import io
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .metrics import timed
+from .models import AnswerArchive, AnswerRollup, UserAnswerLog
+
+FLAG_CORRECT, FLAG_SKIPPED, FLAG_BOOKMARKED, FLAG_CLEARED = 1, 2, 4, 8
+ROLLUP_FIELDS = ['answered', 'correct', 'skipped', 'skipped_seconds', 'guesses', 'guesses_correct',
+                 'confident_errors', 'doubts']
+LOG_FIELDS = ('id', 'question_id', 'selected_option_id', 'attempted_at', 'time_taken_seconds', 'confidence_score',
+              'is_correct', 'is_skipped', 'is_bookmarked', 'is_cleared_from_library', 'eliminated_options',
+              'session_id', 'question__subject', 'question__pattern')
+
+def archivable(older_than_days=None):
+    days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff = timezone.now() - timedelta(days=days)
+    return (UserAnswerLog.objects.filter(source_mode='practice', attempted_at__lt=cutoff)
+            .exclude(is_bookmarked=True, is_cleared_from_library=False))
+
+# --- 1. ROLLUPS ---
+def _rollup_deltas(row):
+    """Counters one log adds; the conditions mirror user_dashboard_api's filters."""
+    correct, skipped, confidence = row['is_correct'], row['is_skipped'], row['confidence_score']
+    return [1, int(correct), int(skipped), row['time_taken_seconds'] if skipped else 0,
+            int(confidence < 50 and not skipped), int(confidence < 50 and not skipped and correct),
+            int(confidence > 70 and not correct), int(row['is_bookmarked'] and correct)]
+
+def _fold_into_rollups(user_id, rows):
+    deltas = {}
+    for row in rows:
+        key = (timezone.localdate(row['attempted_at']), row['question__subject'], row['question__pattern'])
+        counters = deltas.setdefault(key, [0] * len(ROLLUP_FIELDS))
+        for i, value in enumerate(_rollup_deltas(row)):
+            counters[i] += value
+
+    existing = {(r.day, r.subject, r.pattern): r for r in
+                AnswerRollup.objects.filter(user_id=user_id, day__in={day for day, _, _ in deltas})}
+    to_update, to_create = [], []
+    for (day, subject, pattern), counters in deltas.items():
+        rollup = existing.get((day, subject, pattern))
+        if rollup is None:
+            to_create.append(AnswerRollup(user_id=user_id, day=day, subject=subject, pattern=pattern,
+                                          **dict(zip(ROLLUP_FIELDS, counters))))
+            continue
+        for field, value in zip(ROLLUP_FIELDS, counters):
+            setattr(rollup, field, getattr(rollup, field) + value)
+        to_update.append(rollup)
+    AnswerRollup.objects.bulk_update(to_update, ROLLUP_FIELDS, batch_size=500)
+    AnswerRollup.objects.bulk_create(to_create, batch_size=500)
+
+class RollupSummary:
+    """A user's archived counters, grouped by (subject, pattern) + the set of active days."""
+    def __init__(self, rows, days):
+        self.rows, self.days = rows, days
+
+    def totals(self, patterns=None, subject=None):
+        out = dict.fromkeys(ROLLUP_FIELDS, 0)
+        for row in self.rows:
+            if (patterns is None or row['pattern'] in patterns) and (subject is None or row['subject'] == subject):
+                for field in ROLLUP_FIELDS:
+                    out[field] += row[field] or 0
+        return out
+
+    @property
+    def subjects(self):
+        return {row['subject'] for row in self.rows}
+
+def user_rollup(user_id):
+    """Two small queries over AnswerRollup."""
+    rollups = AnswerRollup.objects.filter(user_id=user_id).order_by()
+    rows = list(rollups.values('subject', 'pattern').annotate(**{f: Sum(f) for f in ROLLUP_FIELDS}))
+    days = set(rollups.values_list('day', flat=True).distinct()) if rows else set()
+    return RollupSummary(rows, days)
+
+def daily_rollups(user_id):
+    """[{'day', 'pattern', 'answered', 'correct'}] for per-day history graphs."""
+    return list(AnswerRollup.objects.filter(user_id=user_id).order_by()
+                .values('day', 'pattern').annotate(answered=Sum('answered'), correct=Sum('correct')))
+
+# --- 2. BLOCKS (compressed columns) ---
+def encode_block(rows):
+    extras = {}
+    for row in rows:
+        extra = {}
+        if row['eliminated_options']:
+            extra['eliminated_options'] = row['eliminated_options']
+        if row['session_id']:
+            extra['session_id'] = row['session_id']
+        if extra:
+            extras[str(row['id'])] = extra
+    buffer = io.BytesIO()
+    np.savez_compressed(
+        buffer,
+        id=np.array([r['id'] for r in rows], dtype=np.int64),
+        question=np.array([r['question_id'] for r in rows], dtype=np.int64),
+        option=np.array([r['selected_option_id'] or -1 for r in rows], dtype=np.int64),
+        attempted_at=np.array([r['attempted_at'].timestamp() for r in rows], dtype=np.float64),
+        time_taken=np.array([r['time_taken_seconds'] for r in rows], dtype=np.uint32),
+        confidence=np.array([r['confidence_score'] for r in rows], dtype=np.int16),
+        flags=np.array([FLAG_CORRECT * r['is_correct'] | FLAG_SKIPPED * r['is_skipped']
+                        | FLAG_BOOKMARKED * r['is_bookmarked'] | FLAG_CLEARED * r['is_cleared_from_library']
+                        for r in rows], dtype=np.uint8),
+        extras=np.array(json.dumps(extras)),
+    )
+    return buffer.getvalue()
+
+def decode_block(data):
+    with np.load(io.BytesIO(bytes(data))) as block:
+        arrays = {name: block[name] for name in block.files}
+    arrays['extras'] = json.loads(str(arrays['extras']))
+    return arrays
+
+def iter_archive_arrays(user_ids=None):
+    """(user_id, columns) per archived block."""
+    archives = AnswerArchive.objects.order_by('user_id', 'first_at')
+    if user_ids:
+        archives = archives.filter(user_id__in=user_ids)
+    for user_id, data in archives.values_list('user_id', 'data').iterator(chunk_size=100):
+        yield user_id, decode_block(data)
+
+def iter_archived_logs(user_id):
+    """The archived rows as UserAnswerLog-shaped dicts, oldest block first."""
+    for _, block in iter_archive_arrays([user_id]):
+        for i, log_id in enumerate(block['id'].tolist()):
+            flags = int(block['flags'][i])
+            extra = block['extras'].get(str(log_id), {})
+            yield {
+                'id': log_id, 'question_id': int(block['question'][i]),
+                'selected_option_id': int(block['option'][i]) if block['option'][i] >= 0 else None,
+                'is_correct': bool(flags & FLAG_CORRECT), 'is_skipped': bool(flags & FLAG_SKIPPED),
+                'is_bookmarked': bool(flags & FLAG_BOOKMARKED), 'is_cleared_from_library': bool(flags & FLAG_CLEARED),
+                'time_taken_seconds': int(block['time_taken'][i]), 'confidence_score': int(block['confidence'][i]),
+                'eliminated_options': extra.get('eliminated_options', []), 'source_mode': 'practice',
+                'session_id': extra.get('session_id'),
+                'attempted_at': datetime.fromtimestamp(float(block['attempted_at'][i]), tz=dt_timezone.utc),
+                'archived': True,
+            }
+
+# --- 3. ARCHIVING ---
+def _archive_chunk(user_id, ids):
+    with transaction.atomic():
+        # Re-read inside the transaction (age was checked when the ids were picked): a row
+        # bookmarked meanwhile is no longer archivable
+        chunk = archivable(0).filter(id__in=ids)
+        if connection.features.has_select_for_update:
+            chunk = chunk.select_for_update(of=('self',) if connection.features.has_select_for_update_of else ())
+        rows = list(chunk.order_by('id').values(*LOG_FIELDS))
+        if not rows:
+            return 0, 0
+        _fold_into_rollups(user_id, rows)
+        data = encode_block(rows)
+        AnswerArchive.objects.create(user_id=user_id, first_at=min(r['attempted_at'] for r in rows),
+                                     last_at=max(r['attempted_at'] for r in rows), count=len(rows), data=data)
+        UserAnswerLog.objects.filter(id__in=[r['id'] for r in rows]).delete()
+        return len(rows), len(data)
+
+@timed('archive_logs')
+def archive_logs(older_than_days=None, chunk_size=2000, user_ids=None, progress=None):
+    """Archives every archivable log, user by user, `chunk_size` logs per transaction."""
+    candidates = archivable(older_than_days)
+    if user_ids:
+        candidates = candidates.filter(user_id__in=user_ids)
+    users = list(candidates.order_by('user_id').values_list('user_id', flat=True).distinct())
+    result = {'users': 0, 'logs': 0, 'blocks': 0, 'bytes': 0}
+    for user_id in users:
+        last_id = 0
+        while True:
+            ids = list(candidates.filter(user_id=user_id, id__gt=last_id).order_by('id')
+                       .values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            archived, size = _archive_chunk(user_id, ids)
+            last_id = ids[-1]
+            if archived:
+                result['logs'] += archived
+                result['blocks'] += 1
+                result['bytes'] += size
+        result['users'] += 1
+        if progress:
+            progress(result, len(users))
+    return result
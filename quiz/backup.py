@@ -0,0 +1,325 @@
+# quiz/backup.py
+# Streaming backup/restore (gzip NDJSON) used by the `backup` / `restore` /
+# `bench_restore` commands. Unlike dumpdata/loaddata nothing is held in memory:
+# rows are read in primary-key chunks and restored with bulk_create in large
+# transactions.
+#
+# File layout (one JSON document per line):
+#   {"format": "quiz-backup", "version": 1, "incremental": false, ...}   <- header
+#   {"model": "quiz.question", "fields": ["id", "exam_name", ...]}        <- table header
+#   [1, "UPSC CSE", ...]                                                  <- rows
+#   ...
+#   {"delete": "quiz.useranswerlog", "ids": [...]}                       <- incremental only
+#   {"end": true, "counts": {...}, "watermarks": {...}, "deleted": {...}} <- trailer
+import base64
+import datetime
+import gzip
+import json
+from contextlib import contextmanager
+from itertools import islice
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.utils import timezone
+
+FORMAT = 'quiz-backup'
+VERSION = 2  # 2: incremental files carry "delete" records
+DEFAULT_APPS = ('quiz', 'authtoken')
+
+# How each table is cut for incremental backups. Anything not listed here is
+# small reference data (questions, concepts, users...) and is always dumped in full.
+#   'pk'        -> append-only table, new rows have a higher id
+#   <field>     -> rows whose timestamp moved past the previous snapshot
+# NOTE: in-place flag updates on old answer logs (library "clear") and deletions
+# are not captured by incremental files - take a full backup periodically. The one
+# exception is archiving (quiz/archive.py): archive_logs deletes answer logs it has
+# written into new AnswerArchive blocks, so an incremental lists the log ids inside
+# the blocks added since the previous snapshot and restore deletes them - otherwise
+# full + incremental would bring back every archived answer twice (live + archived).
+INCREMENTAL_KEYS = {
+    'quiz.useranswerlog': 'pk',
+    'quiz.userquestionnote': 'updated_at',
+    'quiz.answerarchive': 'pk',  # Blocks are only ever added
+}
+
+# --- 1. MODEL SELECTION & ORDER ---
+def backup_models(app_labels=DEFAULT_APPS):
+    """All concrete models (incl. auto-created M2M tables) of the apps, parents before children."""
+    selected = []
+    for label in app_labels:
+        for model in apps.get_app_config(label).get_models(include_auto_created=True):
+            if model._meta.proxy or not model._meta.managed:
+                continue
+            selected.append(model)
+    return sort_by_dependencies(selected)
+
+def sort_by_dependencies(models):
+    remaining = list(models)
+    ordered = []
+    while remaining:
+        progressed = False
+        for model in list(remaining):
+            deps = {
+                field.related_model for field in model._meta.concrete_fields
+                if field.is_relation and field.related_model is not model
+            }
+            if not deps.intersection(remaining):
+                ordered.append(model)
+                remaining.remove(model)
+                progressed = True
+        if not progressed:  # cycle - keep the rest in declaration order
+            ordered.extend(remaining)
+            break
+    return ordered
+
+def model_key(model):
+    return model._meta.label_lower
+
+# --- 2. BACKUP ---
+class BackupEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # Full microsecond precision (DjangoJSONEncoder cuts datetimes to milliseconds).
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        if isinstance(o, (bytes, memoryview)):
+            return base64.b64encode(bytes(o)).decode('ascii')
+        return super().default(o)
+
+def iter_rows(model, using='default', chunk_size=5000, since=None, incremental_key=None):
+    """Yields tuples of attribute values in pk order, one keyset-paginated chunk at a time."""
+    attnames = [field.attname for field in model._meta.concrete_fields]
+    qs = model._default_manager.using(using).order_by('pk')
+    if since is not None and incremental_key:
+        lookup = 'pk__gt' if incremental_key == 'pk' else f'{incremental_key}__gt'
+        qs = qs.filter(**{lookup: since})
+
+    last_pk = None
+    pk_index = attnames.index(model._meta.pk.attname)
+    while True:
+        chunk_qs = qs if last_pk is None else qs.filter(pk__gt=last_pk)
+        chunk = list(chunk_qs.values_list(*attnames)[:chunk_size])
+        if not chunk:
+            return
+        yield from chunk
+        last_pk = chunk[-1][pk_index]
+
+def watermark_for(model, key, using='default'):
+    qs = model._default_manager.using(using)
+    field = 'pk' if key == 'pk' else key
+    value = qs.order_by(f'-{field}').values_list(field, flat=True).first()
+    return value
+
+def archived_log_ids(since, until, using='default'):
+    """Ids of the answer logs moved into AnswerArchive blocks with since < pk <= until."""
+    from .archive import decode_block
+    from .models import AnswerArchive
+    if until is None:
+        return  # Nothing archived yet
+    blocks = AnswerArchive.objects.using(using).filter(pk__lte=until).order_by('pk')
+    if since is not None:
+        blocks = blocks.filter(pk__gt=since)
+    for data in blocks.values_list('data', flat=True).iterator(chunk_size=100):
+        yield from decode_block(data)['id'].tolist()
+
+# Incremental files: model whose new rows mean deletions -> (deleted model, ids(since, until, using))
+INCREMENTAL_DELETES = {
+    'quiz.answerarchive': ('quiz.useranswerlog', archived_log_ids),
+}
+
+def write_backup(path, models, using='default', chunk_size=5000, since_watermarks=None, compresslevel=6, log=None):
+    """Streams `models` to a gzip NDJSON file. Returns the trailer dict."""
+    incremental = since_watermarks is not None
+    counts, watermarks, deleted = {}, {}, {}
+    encoder = BackupEncoder(separators=(',', ':'))
+
+    with gzip.open(path, 'wt', encoding='utf-8', compresslevel=compresslevel) as fh:
+        fh.write(encoder.encode({
+            'format': FORMAT, 'version': VERSION, 'incremental': incremental,
+            'created_at': timezone.now(), 'since': since_watermarks or {},
+        }) + '\n')
+
+        for model in models:
+            key = model_key(model)
+            inc_key = INCREMENTAL_KEYS.get(key)
+            # Take the watermark BEFORE reading so rows written meanwhile land in the next snapshot.
+            if inc_key:
+                watermarks[key] = watermark_for(model, inc_key, using)
+            since = (since_watermarks or {}).get(key) if inc_key else None
+
+            fh.write(encoder.encode({'model': key, 'fields': [f.attname for f in model._meta.concrete_fields]}) + '\n')
+            count = 0
+            for row in iter_rows(model, using, chunk_size, since=since, incremental_key=inc_key if incremental else None):
+                fh.write(encoder.encode(row) + '\n')
+                count += 1
+            counts[key] = count
+            if log:
+                log(f"  {key}: {count} rows")
+
+        for key, (target, deleted_ids) in INCREMENTAL_DELETES.items():
+            if not incremental or key not in watermarks:
+                continue
+            ids = deleted_ids(since_watermarks.get(key), watermarks[key], using)
+            deleted[target] = 0
+            while True:
+                chunk = list(islice(ids, chunk_size))
+                if not chunk:
+                    break
+                fh.write(encoder.encode({'delete': target, 'ids': chunk}) + '\n')
+                deleted[target] += len(chunk)
+            if log:
+                log(f"  {target}: {deleted[target]} rows to delete (archived)")
+
+        trailer = {'end': True, 'counts': counts, 'watermarks': watermarks, 'deleted': deleted}
+        fh.write(encoder.encode(trailer) + '\n')
+
+    with open(path + '.manifest.json', 'w') as manifest:
+        manifest.write(BackupEncoder(indent=2).encode({'incremental': incremental, **trailer}))
+    return json.loads(encoder.encode(trailer))
+
+def read_manifest(path):
+    with open(path + '.manifest.json') as fh:
+        return json.load(fh)
+
+# --- 3. RESTORE ---
+@contextmanager
+def raw_timestamps(models):
+    """Stops auto_now/auto_now_add from overwriting restored timestamps during bulk_create."""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+class Restorer:
+    """
+    Reads a backup stream and bulk_creates rows batch by batch, committing every
+    `txn_rows` rows. Incremental files (or upsert=True) update rows that already exist.
+    """
+    def __init__(self, using='default', batch_size=5000, txn_rows=200000, upsert=False, log=None):
+        self.using = using
+        self.batch_size = batch_size
+        self.txn_rows = txn_rows
+        self.upsert = upsert
+        self.log = log
+        self.counts = {}
+        self.deleted = {}
+        self.restored_models = []
+        self._txn = None
+        self._rows_in_txn = 0
+
+    def _begin(self):
+        self._txn = transaction.atomic(using=self.using)
+        self._txn.__enter__()
+        self._rows_in_txn = 0
+
+    def _commit(self):
+        if self._txn is not None:
+            self._txn.__exit__(None, None, None)
+            self._txn = None
+
+    def _rollback(self, exc):
+        if self._txn is not None:
+            self._txn.__exit__(type(exc), exc, exc.__traceback__)
+            self._txn = None
+
+    def _flush_batch(self, model, batch):
+        if not batch:
+            return
+        kwargs = {'batch_size': self.batch_size}
+        if self.upsert:
+            pk_name = model._meta.pk.name
+            kwargs.update(
+                update_conflicts=True, unique_fields=[pk_name],
+                update_fields=[f.name for f in model._meta.concrete_fields if not f.primary_key],
+            )
+            if not kwargs['update_fields']:  # pk-only table: nothing to update, just skip duplicates
+                kwargs = {'batch_size': self.batch_size, 'ignore_conflicts': True}
+        model._default_manager.using(self.using).bulk_create(batch, **kwargs)
+        self.counts[model_key(model)] = self.counts.get(model_key(model), 0) + len(batch)
+        self._rows_in_txn += len(batch)
+        if self._rows_in_txn >= self.txn_rows:
+            self._commit()
+            self._begin()
+
+    def _builder(self, model, fields):
+        by_attname = {f.attname: f for f in model._meta.concrete_fields}
+        binary = {i for i, name in enumerate(fields)
+                  if name in by_attname and by_attname[name].get_internal_type() == 'BinaryField'}
+        if list(fields) == list(by_attname) and not binary:
+            return lambda row: model(*row)  # positional init is the fast path
+        # Schema drifted since the backup: match by name, drop unknown columns.
+        known = [(i, name) for i, name in enumerate(fields) if name in by_attname]
+
+        def build(row):
+            values = {name: (base64.b64decode(row[i]) if i in binary and row[i] is not None else row[i])
+                      for i, name in known}
+            return model(**values)
+        return build
+
+    def restore(self, lines):
+        header = json.loads(next(lines))
+        if header.get('format') != FORMAT:
+            raise ValueError("Not a quiz backup file")
+        if header.get('incremental'):
+            self.upsert = True
+
+        self._begin()
+        try:
+            with raw_timestamps(apps.get_models(include_auto_created=True)):
+                self._restore_rows(lines)
+            self._reset_sequences()
+        except Exception as exc:
+            self._rollback(exc)
+            raise
+        self._commit()
+        return self.counts
+
+    def _restore_rows(self, lines):
+        model, build, batch = None, None, []
+        for line in lines:
+            record = json.loads(line)
+            if isinstance(record, list):
+                batch.append(build(record))
+                if len(batch) >= self.batch_size:
+                    self._flush_batch(model, batch)
+                    batch = []
+                continue
+            # Table header, delete record or trailer: finish the previous table first.
+            self._flush_batch(model, batch)
+            batch = []
+            if record.get('end'):
+                return
+            if 'delete' in record:
+                target = apps.get_model(record['delete'])
+                target._default_manager.using(self.using).filter(pk__in=record['ids']).delete()
+                self.deleted[record['delete']] = self.deleted.get(record['delete'], 0) + len(record['ids'])
+                if self.log:
+                    self.log(f"  deleted {len(record['ids'])} {record['delete']} rows")
+                continue
+            model = apps.get_model(record['model'])
+            build = self._builder(model, record['fields'])
+            self.restored_models.append(model)
+            if self.log:
+                self.log(f"  restoring {record['model']}")
+        self._flush_batch(model, batch)
+
+    def _reset_sequences(self):
+        # Postgres keeps its own id sequences; bump them past the restored ids.
+        connection = connections[self.using]
+        statements = connection.ops.sequence_reset_sql(no_style(), self.restored_models)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+def open_backup_lines(path):
+    fh = gzip.open(path, 'rt', encoding='utf-8')
+    return fh, iter(fh)
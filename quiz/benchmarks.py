@@ -0,0 +1,161 @@
+# quiz/benchmarks.py
+# Microbenchmarks for the pure-Python hot functions.
+# Each entry builds a FIXED synthetic input of the requested size (seeded RNG,
+# no database) and returns a zero-arg callable. Run them with:
+#     python manage.py bench_hotpaths --sizes 10 100 1000
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from .models import Question, Option, UserAnswerLog, clean_drive_url, extract_manual_tags
+from .serializers import OptionSerializer
+from .analytics import calculate_session_stats, summarize_recent_behavior, coach_waterfall
+
+BENCHMARKS = {}
+SEED = 1234
+WORDS = ['Only', 'All', 'None', 'Always', 'Never', 'Generally', 'Some', 'Can be',
+         'Constitution', 'Parliament', 'monsoon', 'river', 'dynasty', 'temple', 'tariff']
+
+def benchmark(name):
+    """Registers `builder(size) -> callable` under `name`."""
+    def decorator(builder):
+        BENCHMARKS[name] = builder
+        return builder
+    return decorator
+
+# --- SYNTHETIC INPUTS ---
+def synthetic_text(rng, n_words, tag_every=6):
+    words = []
+    for i in range(n_words):
+        word = rng.choice(WORDS)
+        if tag_every and i % tag_every == 0:
+            word = "{{%s:%s}}" % (rng.choice('TF'), word)
+        words.append(word)
+    return " ".join(words)
+
+def synthetic_questions(rng, count):
+    subjects = [code for code, _ in Question.SUBJECT_CHOICES]
+    patterns = [code for code, _ in Question.PATTERN_CHOICES]
+    return [
+        Question(id=i + 1, exam_name="UPSC CSE", year=2013 + i % 12,
+                 subject=rng.choice(subjects), pattern=rng.choice(patterns),
+                 text=synthetic_text(rng, 40))
+        for i in range(count)
+    ]
+
+def synthetic_logs(rng, count, n_questions=None):
+    questions = synthetic_questions(rng, n_questions or max(1, count // 2))
+    start = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+    logs = []
+    for i in range(count):
+        is_skipped = rng.random() < 0.15
+        log = UserAnswerLog(
+            id=i + 1, question=rng.choice(questions), selected_option_id=None if is_skipped else i + 1,
+            is_correct=(not is_skipped) and rng.random() < 0.55, is_skipped=is_skipped,
+            time_taken_seconds=rng.randint(3, 180), confidence_score=rng.choice([0, 25, 50, 75, 100]),
+            eliminated_options=[1, 2] if rng.random() < 0.3 else [],
+            source_mode='exam', session_id='bench',
+        )
+        log.attempted_at = start + timedelta(seconds=i * 30)
+        logs.append(log)
+    return logs
+
+# --- REGISTERED BENCHMARKS ---
+@benchmark('clean_drive_url')
+def bench_clean_drive_url(size):
+    rng = random.Random(SEED)
+    urls = []
+    for i in range(size):
+        if i % 3 == 0:
+            urls.append(f"https://drive.google.com/file/d/{rng.getrandbits(64):x}_{i}/view?usp=sharing")
+        elif i % 3 == 1:
+            urls.append(f"https://example.com/images/{i}.png")
+        else:
+            urls.append(None)
+    return lambda: [clean_drive_url(url) for url in urls]
+
+@benchmark('process_manual_tags')
+def bench_process_manual_tags(size):
+    # Parsing half only - the KeywordAnalysis inserts are measured by the DB, not here.
+    text = synthetic_text(random.Random(SEED), size)
+    return lambda: extract_manual_tags(text)
+
+@benchmark('Question.clean_text')
+def bench_clean_text(size):
+    questions = synthetic_questions(random.Random(SEED), size)
+    return lambda: [q.clean_text for q in questions]
+
+@benchmark('OptionSerializer.get_text_content')
+def bench_option_text_content(size):
+    rng = random.Random(SEED)
+    options = [Option(id=i + 1, option_label='ABCD'[i % 4], text_content=synthetic_text(rng, 12, tag_every=4))
+               for i in range(size)]
+    serializer = OptionSerializer()
+    return lambda: [serializer.get_text_content(opt) for opt in options]
+
+@benchmark('ExamAnalysisAPI._calculate_session_stats')
+def bench_session_stats(size):
+    logs = synthetic_logs(random.Random(SEED), size)
+    return lambda: calculate_session_stats(logs)
+
+@benchmark('user_dashboard_api.coach_waterfall')
+def bench_coach_waterfall(size):
+    logs = synthetic_logs(random.Random(SEED), size)
+
+    def run():
+        behavior = summarize_recent_behavior(logs)
+        return coach_waterfall(behavior, 85.0, 35.0, 50.0)
+    return run
+
+@benchmark('MockExamGeneratorAPI.adaptive_select')
+def bench_adaptive_select(size):
+    # `size` = bank size; 100-question paper for a user with ~2k answered questions.
+    import numpy as np
+    from .adaptive import QuestionBank, select_paper
+    rng = random.Random(SEED)
+    subjects = [code for code, _ in Question.SUBJECT_CHOICES]
+    patterns = [code for code, _ in Question.PATTERN_CHOICES]
+    bank = QuestionBank(range(1, size + 1), [rng.choice(subjects) for _ in range(size)],
+                        [rng.choice(patterns) for _ in range(size)])
+    seen = np.array(sorted(rng.sample(range(size), min(size, 2000))), dtype=np.int64)
+    attempts = np.array([rng.randint(1, 4) for _ in seen], dtype=np.float64)
+    profile = {'pos': seen, 'attempts': attempts,
+               'correct': np.array([rng.randint(0, int(a)) for a in attempts], dtype=np.float64),
+               'last': np.array([1.7e9 - rng.randint(0, 90 * 86400) for _ in seen], dtype=np.float64)}
+    np_rng = np.random.default_rng(SEED)
+    return lambda: select_paper(bank, profile, total=100, now=1.7e9, rng=np_rng)
+
+@benchmark('user_dashboard_api.cohort_percentiles')
+def bench_cohort_percentiles(size):
+    # `size` = users in the cohort; one dashboard's worth of lookups (accuracy, 4 radar axes, mock).
+    import numpy as np
+    from .cohort import RADAR_GROUPS, CohortSnapshot
+    np_rng = np.random.default_rng(SEED)
+    columns = {name: np.sort(np_rng.uniform(0, 100, size)) for name in ['accuracy', *RADAR_GROUPS]}
+    columns['mock_score'] = np.sort(np_rng.uniform(-60, 200, size))
+    user_values = {'mock_score': (np.arange(1, size + 1, dtype=np.int64), np_rng.uniform(-60, 200, size))}
+    snapshot = CohortSnapshot(columns, user_values, {})
+    user_id = size // 2 + 1
+
+    def run():
+        mock = snapshot.user_value('mock_score', user_id)
+        return ([snapshot.percentile(name, 61.5) for name in ['accuracy', *RADAR_GROUPS]],
+                snapshot.percentile('mock_score', mock))
+    return run
+
+@benchmark('leaderboard.rank_and_update')
+def bench_leaderboard(size):
+    # `size` = ranked users on one board; one answer (score move) + one "my rank" lookup.
+    from .leaderboard import SortedBoard
+    rng = random.Random(SEED)
+    board = SortedBoard()
+    for member in range(1, size + 1):
+        board.set(member, rng.uniform(0, 100))
+    members = [rng.randint(1, size) for _ in range(1000)]
+    state = {'i': 0}
+
+    def run():
+        state['i'] = (state['i'] + 1) % len(members)
+        member = members[state['i']]
+        board.set(member, rng.uniform(0, 100))
+        return board.rank(member)
+    return run
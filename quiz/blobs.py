@@ -0,0 +1,74 @@
+# quiz/blobs.py
+# Files that the web and the worker process (Procfile) must both see: cached images (quiz/media.py),
+# bulk-import uploads (admin -> 'import_questions' job) and the cohort snapshot (quiz/cohort.py).
+#   - shared_storage(): the Django storage class named by SHARED_STORAGE_BACKEND; the default,
+#     DatabaseStorage, keeps each file as one StoredFile row, so it needs nothing beyond the database
+#   - any other storage class (e.g. an S3 bucket) works as long as every process points at the same one
+#   - saving over an existing name replaces the file (no "_abc123" suffixes): the names used here are
+#     content-addressed or meant to be overwritten
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.utils.encoding import filepath_to_uri
+from django.utils.module_loading import import_string
+
+from .models import StoredFile
+
+def shared_storage():
+    return import_string(settings.SHARED_STORAGE_BACKEND)()
+
+class DatabaseStorage(Storage):
+    """Storage backend over the StoredFile table (whole files are read and written in one query)."""
+
+    def __init__(self, base_url=None):
+        self.base_url = base_url
+
+    def _open(self, name, mode='rb'):
+        data = StoredFile.objects.filter(name=name).values_list('data', flat=True).first()
+        if data is None:
+            raise FileNotFoundError(name)
+        return ContentFile(bytes(data), name=name)
+
+    def _save(self, name, content):
+        data = b''.join(content.chunks())
+        StoredFile.objects.update_or_create(name=name, defaults={'data': data, 'size': len(data)})
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def exists(self, name):
+        return StoredFile.objects.filter(name=name).exists()
+
+    def delete(self, name):
+        StoredFile.objects.filter(name=name).delete()
+
+    def size(self, name):
+        size = StoredFile.objects.filter(name=name).values_list('size', flat=True).first()
+        if size is None:
+            raise FileNotFoundError(name)
+        return size
+
+    def get_modified_time(self, name):
+        updated = StoredFile.objects.filter(name=name).values_list('updated_at', flat=True).first()
+        if updated is None:
+            raise FileNotFoundError(name)
+        return updated
+
+    def listdir(self, path):
+        prefix = f"{path.rstrip('/')}/" if path else ''
+        dirs, files = set(), []
+        for name in StoredFile.objects.filter(name__startswith=prefix).values_list('name', flat=True):
+            head, sep, tail = name[len(prefix):].partition('/')
+            if sep:
+                dirs.add(head)
+            else:
+                files.append(head)
+        return sorted(dirs), files
+
+    def url(self, name):
+        if self.base_url is None:
+            raise ValueError("This file is not accessible via a URL.")
+        return urljoin(self.base_url, filepath_to_uri(name))
@@ -0,0 +1,273 @@
+# quiz/bulk_import.py
+# Bulk Excel/CSV question import. Same columns as QuestionResource, but each
+# chunk of rows is written with a handful of bulk queries instead of
+# Option.save() -> Question.save() -> re-tag cascades per option:
+#   1 SELECT (existing by text) + bulk_create/bulk_update questions
+#   1 DELETE + 1 bulk_create options
+#   1 DELETE + 1 bulk_create KeywordAnalysis (tagging deferred to one pass per chunk)
+#   near-duplicate check of NEW texts against the MinHash/LSH index (quiz/dedup.py)
+import csv
+import io
+import os
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .adaptive import invalidate_bank
+from .concepts import annotate_questions
+from .dedup import find_similar_many, index_questions, signature
+from .media import register_urls, schedule_fetch
+from .models import Question, Option, clean_drive_url, retag_questions
+from .search import questions_saved
+
+DEFAULT_CHUNK_SIZE = 500
+OPTION_COLUMNS = [
+    ('A', 'opt_a_text', 'opt_a_expl', 'opt_a_img', 'opt_a_vid', 'opt_a_mnem'),
+    ('B', 'opt_b_text', 'opt_b_expl', 'opt_b_img', 'opt_b_vid', 'opt_b_mnem'),
+    ('C', 'opt_c_text', 'opt_c_expl', 'opt_c_img', 'opt_c_vid', 'opt_c_mnem'),
+    ('D', 'opt_d_text', 'opt_d_expl', 'opt_d_img', 'opt_d_vid', 'opt_d_mnem'),
+]
+QUESTION_UPDATE_FIELDS = ['exam_name', 'year', 'subject', 'tags', 'pattern', 'question_image_url']
+VALID_SUBJECTS = {code for code, _ in Question.SUBJECT_CHOICES}
+VALID_PATTERNS = {code for code, _ in Question.PATTERN_CHOICES}
+
+class RowError(Exception):
+    pass
+
+# --- 1. READERS (streaming, one dict per row) ---
+def read_rows(path, fh=None):
+    """Rows of a local file, or of an open binary file `fh` named `path` (e.g. from the shared storage)."""
+    ext = os.path.splitext(path)[1].lower()
+    reader = _read_csv if ext == '.csv' else _read_xlsx if ext == '.xlsx' else _read_tablib
+    return reader(path, fh) if fh is not None else _read_local(reader, path)
+
+def _read_local(reader, path):
+    with open(path, 'rb') as fh:
+        yield from reader(path, fh)
+
+def _read_csv(path, fh):
+    yield from csv.DictReader(io.TextIOWrapper(fh, encoding='utf-8-sig', newline=''))
+
+def _read_xlsx(path, fh):
+    try:
+        import openpyxl
+    except ImportError:
+        raise RowError("Reading .xlsx needs openpyxl (pip install openpyxl) - or save the sheet as CSV")
+    workbook = openpyxl.load_workbook(fh, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(col).strip() if col is not None else '' for col in next(rows)]
+        for values in rows:
+            yield dict(zip(header, values))
+    finally:
+        workbook.close()
+
+def _read_tablib(path, fh):
+    # .xls / .json / .yaml etc: tablib loads the whole sheet, fine for the rarer formats.
+    import tablib
+    dataset = tablib.Dataset().load(fh.read(), format=os.path.splitext(path)[1].lstrip('.'))
+    yield from dataset.dict
+
+# --- 2. ROW PARSING ---
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+def parse_row(row):
+    """Returns (question fields, [option dicts]) or raises RowError."""
+    text = _clean(row.get('text'))
+    if not text:
+        raise RowError("Missing question text")
+
+    # Same defaults as QuestionResource.before_import_row
+    year = _clean(row.get('year')) or 2025
+    try:
+        year = int(float(year))
+    except ValueError:
+        raise RowError(f"Invalid year '{year}'")
+
+    subject = _clean(row.get('subject'))
+    if subject not in VALID_SUBJECTS:
+        raise RowError(f"Invalid subject '{subject}'")
+    pattern = _clean(row.get('pattern')) or 'one_liner'
+    if pattern not in VALID_PATTERNS:
+        raise RowError(f"Invalid pattern '{pattern}'")
+
+    fields = {
+        'text': text,
+        'exam_name': _clean(row.get('exam_name')) or 'UPSC CSE',
+        'year': year,
+        'subject': subject,
+        'tags': _clean(row.get('tags')),
+        'pattern': pattern,
+        'question_image_url': clean_drive_url(_clean(row.get('question_image_url'))),
+    }
+    if fields['tags'] and len(fields['tags']) > 255:
+        raise RowError("tags longer than 255 characters")
+    if len(fields['exam_name']) > 50:
+        raise RowError("exam_name longer than 50 characters")
+
+    correct_lbl = (_clean(row.get('correct_option')) or '').upper()
+    options = []
+    for label, txt_key, expl_key, img_key, vid_key, mnem_key in OPTION_COLUMNS:
+        text_str = _clean(row.get(txt_key))
+        if not text_str:
+            continue
+        if len(text_str) > 500:
+            raise RowError(f"Option {label} longer than 500 characters")
+        options.append({
+            'option_label': label,
+            'text_content': text_str,
+            'is_correct': label == correct_lbl,
+            'explanation_text': _clean(row.get(expl_key)),
+            'image_url': clean_drive_url(_clean(row.get(img_key))),
+            'video_url': _clean(row.get(vid_key)),
+            'mnemonic_text': _clean(row.get(mnem_key)),
+        })
+    return fields, options
+
+# --- 3. THE IMPORTER ---
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.errors = []          # [(row_number, message)]
+        self.duplicates = []      # [(row_number, existing question id, similarity)]
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'rows': self.rows, 'created': self.created, 'updated': self.updated,
+            'errors': len(self.errors), 'near_duplicates': len(self.duplicates), 'seconds': round(self.elapsed, 2),
+            'rows_per_sec': round(self.rows_per_sec, 1),
+        }
+
+class BulkQuestionImporter:
+    """
+    Upserts questions (matched on exact `text`, like QuestionResource.import_id_fields)
+    and replaces their options, one chunk at a time. Bad rows are reported, not fatal.
+    New texts that are near duplicates of indexed questions are reported, or skipped
+    with skip_near_duplicates=True.
+    """
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False, progress=None, skip_near_duplicates=False):
+        self.chunk_size = chunk_size
+        self.dry_run = dry_run
+        self.skip_near_duplicates = skip_near_duplicates
+        self.progress = progress  # callable(report) after every chunk
+        self.report = ImportReport()
+
+    def run(self, rows):
+        chunk = []
+        for row_number, row in enumerate(rows, start=2):  # row 1 is the header
+            if not any(_clean(v) for v in row.values()):
+                continue  # blank spreadsheet line
+            self.report.rows += 1
+            try:
+                chunk.append((row_number, *parse_row(row)))
+            except RowError as e:
+                self.report.errors.append((row_number, str(e)))
+            if len(chunk) >= self.chunk_size:
+                self._import_chunk(chunk)
+                chunk = []
+        if chunk:
+            self._import_chunk(chunk)
+        self.report.elapsed = time.perf_counter() - self.report.started
+        return self.report
+
+    def _import_chunk(self, chunk):
+        # Duplicate texts inside one chunk: last row wins (same as row-by-row import).
+        by_text = {}
+        for row_number, fields, options in chunk:
+            by_text[fields['text']] = (row_number, fields, options)
+        entries = self._check_near_duplicates(list(by_text.values()))
+
+        try:
+            with transaction.atomic():
+                self._write(entries)
+                if self.dry_run:
+                    transaction.set_rollback(True)
+        except Exception:
+            # Something the validator missed (DB constraint, encoding...): isolate the bad rows.
+            for entry in entries:
+                try:
+                    with transaction.atomic():
+                        self._write([entry])
+                        if self.dry_run:
+                            transaction.set_rollback(True)
+                except Exception as e:
+                    self.report.errors.append((entry[0], f"{type(e).__name__}: {e}"))
+        self.report.elapsed = time.perf_counter() - self.report.started
+        if self.progress:
+            self.progress(self.report)
+
+    def _check_near_duplicates(self, entries):
+        # Exact texts are updates, not duplicates: only rows that would create a question are checked.
+        existing = set(Question.objects.filter(text__in=[f['text'] for _, f, _ in entries]).values_list('text', flat=True))
+        sigs = {
+            row_number: signature(fields['text'], [opt['text_content'] for opt in options])
+            for row_number, fields, options in entries if fields['text'] not in existing
+        }
+        matches = find_similar_many(sigs)
+        for row_number in sorted(matches):
+            qid, score = matches[row_number][0]
+            self.report.duplicates.append((row_number, qid, round(score, 2)))
+        if self.skip_near_duplicates:
+            return [entry for entry in entries if entry[0] not in matches]
+        return entries
+
+    def _write(self, entries):
+        texts = [fields['text'] for _, fields, _ in entries]
+        existing = {q.text: q for q in Question.objects.filter(text__in=texts)}
+
+        to_create, to_update, now = [], [], timezone.now()
+        for _, fields, _ in entries:
+            question = existing.get(fields['text'])
+            if question is None:
+                to_create.append(Question(**fields))
+            else:
+                for name in QUESTION_UPDATE_FIELDS:
+                    setattr(question, name, fields[name])
+                question.updated_at = now  # bulk_update skips auto_now
+                to_update.append(question)
+
+        Question.objects.bulk_create(to_create, batch_size=500)
+        if to_create and to_create[0].pk is None:
+            # Backend can't return ids from bulk inserts - look them up by text.
+            ids = dict(Question.objects.filter(text__in=[q.text for q in to_create]).values_list('text', 'id'))
+            for question in to_create:
+                question.pk = ids[question.text]
+        if to_update:
+            Question.objects.bulk_update(to_update, QUESTION_UPDATE_FIELDS + ['updated_at'], batch_size=500)
+
+        questions = {q.text: q for q in to_create + to_update}
+        Option.objects.filter(question__in=to_update).delete()
+        new_options, per_question = [], []
+        for _, fields, options in entries:
+            question = questions[fields['text']]
+            opts = [Option(question=question, **opt) for opt in options]
+            new_options.extend(opts)
+            per_question.append((question, opts))
+        Option.objects.bulk_create(new_options, batch_size=500)
+
+        # Deferred keyword tagging, duplicate index and concept links: one pass for the whole chunk.
+        retag_questions(per_question)
+        index_questions(per_question)
+        annotate_questions(per_question)
+        # Bulk writes skip post_save, so its receivers' work is done here: image URLs for the media
+        # cache, the library search text of updated questions and the adaptive question bank.
+        if register_urls([q.question_image_url for q in questions.values()] + [o.image_url for o in new_options]):
+            transaction.on_commit(schedule_fetch)
+        questions_saved(to_update)
+        transaction.on_commit(invalidate_bank)
+
+        self.report.created += len(to_create)
+        self.report.updated += len(to_update)
@@ -0,0 +1,192 @@
+# quiz/calibration.py
+# Per-question difficulty / discrimination from the answer logs (`manage.py calibrate_questions`).
+#   - model: 2PL IRT, P(correct) = sigmoid(a_q * (theta_u - b_q)), every non-skipped answer
+#     is one observation
+#   - fit(): joint MAP estimate by alternating Newton steps; each step is a handful of
+#     np.bincount reductions over the response arrays, so it is linear in the answers
+#   - load_responses(): ONE keyset-chunked pass over UserAnswerLog above a watermark
+#   - incremental refits read only logs above the newest CalibrationRun.last_log_id and use the
+#     stored estimates as the prior (mean = value, precision = the stored *_info), i.e. a
+#     Laplace approximation of the answers already absorbed
+import time
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .archive import FLAG_CORRECT, FLAG_SKIPPED, iter_archive_arrays
+from .metrics import timed
+from .models import CalibrationRun, QuestionStats, UserAbility, UserAnswerLog
+
+MIN_ATTEMPTS = 5          # QuestionSerializer shows no difficulty below this
+ABILITY_PRIOR = 1.0       # Prior precisions of a fresh user / question (mean 0, log a = 0)
+DIFFICULTY_PRIOR = 0.1
+DISCRIMINATION_PRIOR = 4.0
+MAX_STEP = 1.0            # Newton steps are clipped to this many logits
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-3          # Stop when no parameter moves more than this...
+LL_TOLERANCE = 1e-6       # ...or the mean log-likelihood per answer stops improving
+CHUNK_SIZE = 50000
+
+# --- 1. DATA (one streaming pass) ---
+def load_responses(after_id=0, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Arrays (user, question, correct) of non-skipped answers with id > after_id (live and archived),
+    plus the last live log id read.
+    """
+    users, questions, correct = [], [], []
+    last_id, rows = after_id, 0
+    total = UserAnswerLog.objects.filter(id__gt=after_id).count()
+    while True:
+        chunk = list(UserAnswerLog.objects.filter(id__gt=last_id).order_by('id')
+                     .values_list('id', 'user_id', 'question_id', 'is_correct', 'is_skipped')[:chunk_size])
+        if not chunk:
+            break
+        ids, u, q, c, s = (np.asarray(col) for col in zip(*chunk))
+        answered = ~s.astype(bool)
+        users.append(u[answered].astype(np.int64))
+        questions.append(q[answered].astype(np.int64))
+        correct.append(c[answered].astype(np.float64))
+        last_id = int(ids[-1])
+        rows += len(chunk)
+        if progress:
+            progress(rows, total)
+    # Archived practice logs above the watermark (all of them in a full fit)
+    for user_id, block in iter_archive_arrays():
+        use = (block['id'] > after_id) & ~(block['flags'] & FLAG_SKIPPED).astype(bool)
+        if use.any():
+            users.append(np.full(int(use.sum()), user_id, dtype=np.int64))
+            questions.append(block['question'][use])
+            correct.append((block['flags'][use] & FLAG_CORRECT).astype(np.float64))
+    if not users:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0), last_id
+    return np.concatenate(users), np.concatenate(questions), np.concatenate(correct), last_id
+
+# --- 2. FIT (pure numpy) ---
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+def _log_likelihood(y, p):
+    if not len(y):
+        return None
+    p = np.clip(p, 1e-12, 1 - 1e-12)
+    return float(np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+def _newton(value, mean, prior, grad, hess):
+    step = np.clip((grad - prior * (value - mean)) / (hess + prior), -MAX_STEP, MAX_STEP)
+    return value + step, np.abs(step).max(initial=0.0)
+
+@timed('irt_fit')
+def fit(user, question, y, theta, theta_prior, b, b_prior, log_a, log_a_prior,
+        max_iterations=MAX_ITERATIONS, tol=TOLERANCE):
+    """
+    `user` / `question`: dense indexes into the parameter arrays; the initial values double as
+    the prior means. Returns (theta, b, log_a, theta_info, b_info, log_a_info, iterations, mean log-likelihood).
+    """
+    theta_mean, b_mean, log_a_mean = theta.copy(), b.copy(), log_a.copy()
+    n_users, n_questions = len(theta), len(b)
+
+    def state():
+        a = np.exp(log_a)[question]
+        z = a * (theta[user] - b[question])
+        p = _sigmoid(z)
+        return a, z, y - p, p * (1.0 - p)
+
+    iterations, ll = 0, None
+    for iterations in range(1, max_iterations + 1):
+        a, z, r, w = state()
+        previous, ll = ll, _log_likelihood(y, y - r)
+        if previous is not None and ll - previous < LL_TOLERANCE:
+            break  # What is left is drift along the ability-scale / discrimination ridge
+        theta, d_theta = _newton(theta, theta_mean, theta_prior, np.bincount(user, a * r, n_users),
+                                 np.bincount(user, a * a * w, n_users))
+        a, z, r, w = state()
+        b, d_b = _newton(b, b_mean, b_prior, np.bincount(question, -a * r, n_questions),
+                         np.bincount(question, a * a * w, n_questions))
+        a, z, r, w = state()
+        # d z / d log(a) = z
+        log_a, d_a = _newton(log_a, log_a_mean, log_a_prior, np.bincount(question, r * z, n_questions),
+                             np.bincount(question, w * z * z, n_questions))
+        if max(d_theta, d_b, d_a) < tol:
+            break
+
+    a, z, r, w = state()
+    ll = _log_likelihood(y, y - r)
+    theta_info = np.bincount(user, a * a * w, n_users) + theta_prior
+    b_info = np.bincount(question, a * a * w, n_questions) + b_prior
+    log_a_info = np.bincount(question, w * z * z, n_questions) + log_a_prior
+    return theta, b, log_a, theta_info, b_info, log_a_info, iterations, ll
+
+# --- 3. RUNS ---
+def watermark():
+    run = CalibrationRun.objects.order_by('-id').first()
+    return run.last_log_id if run else 0
+
+def calibrate(full=False, chunk_size=CHUNK_SIZE, progress=None):
+    """Full refit over every log, or an incremental one from the watermark. Returns the CalibrationRun."""
+    started = time.perf_counter()
+    after_id = 0 if full else watermark()
+    if after_id == 0:
+        full = True
+    users, questions, y, last_id = load_responses(after_id, chunk_size=chunk_size, progress=progress)
+
+    user_ids, user_idx = np.unique(users, return_inverse=True)
+    question_ids, question_idx = np.unique(questions, return_inverse=True)
+    theta, theta_prior = np.zeros(len(user_ids)), np.full(len(user_ids), ABILITY_PRIOR)
+    b, b_prior = np.zeros(len(question_ids)), np.full(len(question_ids), DIFFICULTY_PRIOR)
+    log_a, log_a_prior = np.zeros(len(question_ids)), np.full(len(question_ids), DISCRIMINATION_PRIOR)
+
+    old_users, old_questions = {}, {}
+    if not full and len(y):
+        # Only the users / questions in the new answers move; everything else keeps its estimate.
+        old_users = UserAbility.objects.in_bulk(user_ids.tolist())
+        old_questions = QuestionStats.objects.in_bulk(question_ids.tolist())
+        for i, uid in enumerate(user_ids.tolist()):
+            if uid in old_users:
+                theta[i], theta_prior[i] = old_users[uid].ability, max(old_users[uid].ability_info, ABILITY_PRIOR)
+        for i, qid in enumerate(question_ids.tolist()):
+            if qid in old_questions:
+                stats = old_questions[qid]
+                b[i], b_prior[i] = stats.difficulty, max(stats.difficulty_info, DIFFICULTY_PRIOR)
+                log_a[i] = np.log(stats.discrimination)
+                log_a_prior[i] = max(stats.discrimination_info, DISCRIMINATION_PRIOR)
+
+    theta, b, log_a, theta_info, b_info, log_a_info, iterations, ll = fit(
+        user_idx, question_idx, y, theta, theta_prior, b, b_prior, log_a, log_a_prior)
+
+    answers = np.bincount(user_idx, minlength=len(user_ids))
+    attempts = np.bincount(question_idx, minlength=len(question_ids))
+    corrects = np.bincount(question_idx, weights=y, minlength=len(question_ids)).astype(np.int64)
+
+    user_rows = [UserAbility(user_id=uid, ability=float(t), ability_info=float(ti),
+                             answers=int(n) + (old_users[uid].answers if uid in old_users else 0))
+                 for uid, t, ti, n in zip(user_ids.tolist(), theta, theta_info, answers)]
+    question_rows = [
+        QuestionStats(question_id=qid, difficulty=float(bq), difficulty_info=float(bi),
+                      discrimination=float(np.exp(la)), discrimination_info=float(lai),
+                      attempts=int(n) + (old_questions[qid].attempts if qid in old_questions else 0),
+                      correct_count=int(c) + (old_questions[qid].correct_count if qid in old_questions else 0))
+        for qid, bq, bi, la, lai, n, c in zip(question_ids.tolist(), b, b_info, log_a, log_a_info, attempts, corrects)
+    ]
+    with transaction.atomic():
+        if full:
+            UserAbility.objects.all().delete()
+            QuestionStats.objects.all().delete()
+        _upsert(UserAbility, user_rows, old_users, ['ability', 'ability_info', 'answers'])
+        _upsert(QuestionStats, question_rows, old_questions,
+                ['difficulty', 'difficulty_info', 'discrimination', 'discrimination_info', 'attempts',
+                 'correct_count', 'fitted_at'])
+        run = CalibrationRun.objects.create(
+            mode='full' if full else 'incremental', last_log_id=last_id, answers=len(y),
+            questions=len(question_ids), users=len(user_ids), iterations=iterations, log_likelihood=ll,
+            seconds=time.perf_counter() - started)
+    return run
+
+def _upsert(model, rows, existing, fields):
+    if 'fitted_at' in fields:
+        now = timezone.now()
+        for row in rows:
+            row.fitted_at = now  # bulk_update skips auto_now
+    model.objects.bulk_update([r for r in rows if r.pk in existing], fields, batch_size=500)
+    model.objects.bulk_create([r for r in rows if r.pk not in existing], batch_size=1000)
@@ -0,0 +1,282 @@
+# quiz/cohort.py
+# "Where do I stand?" percentiles against every user, without touching other users' logs
+# per request.
+#   - build_snapshot(): ONE streaming pass over UserAnswerLog (keyset chunks, no joins:
+#     question -> radar group comes from an array indexed by question id) accumulating
+#     per-user counters with np.bincount; mock scores are scored per exam session like
+#     calculate_session_stats (latest answer per question)
+#   - the result is columnar: for each metric, the sorted values of every qualifying user,
+#     saved as COHORT_SNAPSHOT_NAME (.npz) in the shared storage (quiz/blobs.py) by
+#     `manage.py refresh_cohort` / the `refresh_cohort` job (which runs in the worker, is seeded
+#     when run_worker starts and re-queues itself every COHORT_REFRESH_SECONDS, also after its
+#     last failed attempt), and loaded lazily by each web process
+#     (reloaded when the stored file changes; checked at most every COHORT_CHECK_SECONDS)
+#   - percentile(): two np.searchsorted calls on the sorted column, O(log n)
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import BytesIO
+
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .blobs import shared_storage
+from .jobs import enqueue
+from .metrics import timed
+from .models import AnswerRollup, Job, Question, UserAnswerLog
+
+# Radar axes of the dashboard (pattern codes per axis)
+RADAR_GROUPS = {
+    'logic': ['elim_classical', 'elim_haphazard'],
+    'precision': ['zero_g_statement', 'zero_g_column_2', 'zero_g_column_3'],
+    'reasoning': ['assertion_2', 'assertion_3'],
+    'recall': ['one_liner', 'fifty_fifty'],
+}
+AXIS_OF = {pattern: i for i, patterns in enumerate(RADAR_GROUPS.values()) for pattern in patterns}
+MIN_ANSWERS = 20          # Users with fewer answers are left out of the accuracy cohort...
+MIN_GROUP_ANSWERS = 5     # ...and of a radar axis cohort
+MIN_MOCK_QUESTIONS = 10   # Exam sessions shorter than this are not counted as mocks
+CHUNK_SIZE = 50000
+
+# --- 1. BUILD (streaming pass) ---
+def _question_groups():
+    """int8 array indexed by question id: radar axis index, or -1."""
+    top = Question.objects.aggregate(top=Max('id'))['top'] or 0
+    groups = np.full(top + 1, -1, dtype=np.int8)
+    for qid, pattern in Question.objects.order_by().values_list('id', 'pattern').iterator(chunk_size=CHUNK_SIZE):
+        groups[qid] = AXIS_OF.get(pattern, -1)
+    return groups
+
+def session_scores(user, session, question, when, correct, skipped):
+    """
+    Exam sessions scored like calculate_session_stats (latest answer per question), sessions with
+    fewer than MIN_MOCK_QUESTIONS dropped: arrays (user, session, score, question answered last).
+    """
+    empty = np.zeros(0, dtype=np.int64)
+    if not len(user):
+        return empty, empty, np.zeros(0), empty
+    by_time = np.lexsort((when, session, user))
+    session_end = np.r_[(user[by_time][1:] != user[by_time][:-1]) | (session[by_time][1:] != session[by_time][:-1]),
+                        True]
+    last_question = question[by_time][session_end]
+
+    order = np.lexsort((when, question, session, user))
+    user, session, question = user[order], session[order], question[order]
+    correct, skipped = correct[order], skipped[order]
+    # Latest answer per (user, session, question)
+    last = np.ones(len(user), dtype=bool)
+    last[:-1] = (user[1:] != user[:-1]) | (session[1:] != session[:-1]) | (question[1:] != question[:-1])
+    user, session, correct, skipped = user[last], session[last], correct[last], skipped[last]
+
+    starts = np.flatnonzero(np.r_[True, (user[1:] != user[:-1]) | (session[1:] != session[:-1])])
+    n_questions = np.diff(np.r_[starts, len(user)])
+    n_correct = np.add.reduceat(correct.astype(np.int64), starts)
+    n_wrong = np.add.reduceat((~correct & ~skipped).astype(np.int64), starts)
+    scores = n_correct * 2 - n_wrong * 0.66
+    keep = n_questions >= MIN_MOCK_QUESTIONS
+    return user[starts][keep], session[starts][keep], scores[keep], last_question[keep]
+
+def _mock_scores(user, session, question, when, correct, skipped):
+    """(user ids, best mock score) sorted by user id."""
+    session_user, _, scores, _ = session_scores(user, session, question, when, correct, skipped)
+    if not len(session_user):
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    # Best session per user: sort by (user, score) and take each user's last row
+    order = np.lexsort((scores, session_user))
+    session_user, scores = session_user[order], scores[order]
+    best = np.r_[session_user[1:] != session_user[:-1], True]
+    return session_user[best], scores[best]
+
+@timed('cohort_build')
+def build_snapshot(chunk_size=CHUNK_SIZE, progress=None):
+    """Returns {'columns': {metric: sorted float64 array}, 'meta': {...}}."""
+    started = time.perf_counter()
+    groups = _question_groups()
+    n_axes = len(RADAR_GROUPS)
+    top_user = max(UserAnswerLog.objects.aggregate(top=Max('user_id'))['top'] or 0,
+                   AnswerRollup.objects.aggregate(top=Max('user_id'))['top'] or 0)
+    # Row 0: all answers, rows 1..n_axes: answers on each radar axis
+    attempts = np.zeros((n_axes + 1, top_user + 1), dtype=np.int64)
+    corrects = np.zeros((n_axes + 1, top_user + 1), dtype=np.int64)
+    exam_parts, session_codes = [], {}
+
+    rows, last_id = 0, 0
+    total = UserAnswerLog.objects.count()
+    fields = ('id', 'user_id', 'question_id', 'is_correct', 'is_skipped', 'source_mode', 'session_id',
+              'attempted_at')
+    while True:
+        chunk = list(UserAnswerLog.objects.filter(id__gt=last_id).order_by('id').values_list(*fields)[:chunk_size])
+        if not chunk:
+            break
+        ids, users, questions, correct, skipped, modes, sessions, times = zip(*chunk)
+        users = np.asarray(users, dtype=np.int64)
+        questions = np.asarray(questions, dtype=np.int64)
+        correct = np.asarray(correct, dtype=bool)
+        axis = np.where(questions < len(groups), groups[np.minimum(questions, len(groups) - 1)], -1)
+
+        attempts[0] += np.bincount(users, minlength=top_user + 1)
+        corrects[0] += np.bincount(users, weights=correct, minlength=top_user + 1).astype(np.int64)
+        for a in range(n_axes):
+            on_axis = axis == a
+            attempts[a + 1] += np.bincount(users[on_axis], minlength=top_user + 1)
+            corrects[a + 1] += np.bincount(users[on_axis & correct], minlength=top_user + 1)
+
+        exam = np.array([m == 'exam' and bool(s) for m, s in zip(modes, sessions)], dtype=bool)
+        if exam.any():
+            idx = np.flatnonzero(exam)
+            codes = np.array([session_codes.setdefault(sessions[i], len(session_codes)) for i in idx],
+                             dtype=np.int64)
+            exam_parts.append((users[idx], codes, questions[idx],
+                               np.array([times[i].timestamp() for i in idx]),
+                               correct[idx], np.asarray(skipped, dtype=bool)[idx]))
+
+        rows += len(chunk)
+        last_id = ids[-1]
+        if progress:
+            progress(rows, total)
+
+    # Archived practice logs only survive as rollups; they still count towards accuracy / radar
+    for user_id, pattern, answered, correct in (AnswerRollup.objects.order_by().values('user_id', 'pattern')
+                                                .annotate(answered=Sum('answered'), correct=Sum('correct'))
+                                                .values_list('user_id', 'pattern', 'answered', 'correct')):
+        attempts[0, user_id] += answered
+        corrects[0, user_id] += correct
+        if pattern in AXIS_OF:
+            attempts[AXIS_OF[pattern] + 1, user_id] += answered
+            corrects[AXIS_OF[pattern] + 1, user_id] += correct
+
+    columns, user_values = {}, {}
+    acc = np.divide(corrects * 100.0, attempts, out=np.full(attempts.shape, np.nan), where=attempts > 0)
+    columns['accuracy'] = np.sort(acc[0][attempts[0] >= MIN_ANSWERS])
+    for a, name in enumerate(RADAR_GROUPS):
+        columns[name] = np.sort(acc[a + 1][attempts[a + 1] >= MIN_GROUP_ANSWERS])
+
+    if exam_parts:
+        mock_users, mock_best = _mock_scores(*(np.concatenate(part) for part in zip(*exam_parts)))
+    else:
+        mock_users, mock_best = np.zeros(0, dtype=np.int64), np.zeros(0)
+    columns['mock_score'] = np.sort(mock_best)
+    # Mock scores are not recomputed live, so keep each user's own value for lookups
+    user_values['mock_score'] = (mock_users, mock_best)
+
+    meta = {
+        'built_at': time.time(), 'build_seconds': time.perf_counter() - started, 'rows': rows,
+        'users': int(np.count_nonzero(attempts[0])),
+    }
+    meta['nbytes'] = int(sum(c.nbytes for c in columns.values()) + mock_users.nbytes + mock_best.nbytes)
+    return {'columns': columns, 'user_values': user_values, 'meta': meta}
+
+# --- 2. SNAPSHOT FILE ---
+def snapshot_name():
+    return settings.COHORT_SNAPSHOT_NAME
+
+def save_snapshot(snapshot, name=None):
+    """Replaces the stored file in one transaction, so readers see the old snapshot or the new one."""
+    name = name or snapshot_name()
+    arrays = {f'col_{name}': values for name, values in snapshot['columns'].items()}
+    for metric, (ids, values) in snapshot['user_values'].items():
+        arrays[f'uid_{metric}'], arrays[f'val_{metric}'] = ids, values
+    arrays['meta'] = np.array([snapshot['meta']['built_at'], snapshot['meta']['build_seconds'],
+                               snapshot['meta']['rows'], snapshot['meta']['users'], snapshot['meta']['nbytes']])
+    buffer = BytesIO()
+    np.savez(buffer, **arrays)
+    store = shared_storage()
+    with transaction.atomic():
+        store.delete(name)  # Storages that keep both would save under a new name
+        store.save(name, ContentFile(buffer.getvalue()))
+    return name
+
+def refresh_snapshot(chunk_size=CHUNK_SIZE, progress=None):
+    snapshot = build_snapshot(chunk_size=chunk_size, progress=progress)
+    save_snapshot(snapshot)
+    _loaded['checked_at'] = None  # This process reloads on next use
+    return snapshot['meta']
+
+def schedule_refresh(delay_seconds=0):
+    """Queues one `refresh_cohort` job (reuses a job that is still waiting)."""
+    pending = Job.objects.filter(kind='refresh_cohort', status='queued').first()
+    if pending:
+        return pending
+    return enqueue('refresh_cohort', run_after=timezone.now() + timedelta(seconds=delay_seconds),
+                   message="Refreshing cohort percentiles")
+
+def seed_refresh():
+    """Starts the refresh chain if nothing keeps it going (called when run_worker starts): a fresh
+    deploy has no snapshot yet, and a chain whose job failed for good has no next round queued."""
+    if Job.objects.filter(kind='refresh_cohort', status__in=['queued', 'running']).exists():
+        return None
+    if not settings.COHORT_REFRESH_SECONDS and shared_storage().exists(snapshot_name()):
+        return None  # Refreshed by hand only, and there is a snapshot
+    return schedule_refresh()
+
+class CohortSnapshot:
+    def __init__(self, columns, user_values, meta):
+        self.columns, self.user_values, self.meta = columns, user_values, meta
+
+    @classmethod
+    def from_npz(cls, data):
+        columns = {key[4:]: data[key] for key in data.files if key.startswith('col_')}
+        user_values = {key[4:]: (data[key], data[f'val_{key[4:]}']) for key in data.files if key.startswith('uid_')}
+        built_at, build_seconds, rows, users, nbytes = data['meta'].tolist()
+        return cls(columns, user_values, {'built_at': built_at, 'build_seconds': build_seconds, 'rows': int(rows),
+                                          'users': int(users), 'nbytes': int(nbytes)})
+
+    def percentile(self, metric, value):
+        """Share of the cohort below `value` (ties count half), 0-100; None without a cohort."""
+        column = self.columns.get(metric)
+        if value is None or column is None or not len(column):
+            return None
+        below = np.searchsorted(column, value, side='left')
+        upto = np.searchsorted(column, value, side='right')
+        return round(float((below + upto) / 2 / len(column) * 100), 1)
+
+    def user_value(self, metric, user_id):
+        ids, values = self.user_values.get(metric, ((), ()))
+        pos = np.searchsorted(ids, user_id) if len(ids) else 0
+        if len(ids) and pos < len(ids) and ids[pos] == user_id:
+            return float(values[pos])
+        return None
+
+    def cohort_size(self, metric):
+        return len(self.columns.get(metric, ()))
+
+_loaded = {'snapshot': None, 'modified': None, 'checked_at': None}
+_loaded_lock = threading.Lock()
+
+def get_snapshot():
+    """The last refreshed snapshot (reloaded when the stored file changes), or None before the first refresh."""
+    with _loaded_lock:
+        checked_at = _loaded['checked_at']
+        if checked_at is not None and time.monotonic() - checked_at < settings.COHORT_CHECK_SECONDS:
+            return _loaded['snapshot']
+        store, name = shared_storage(), snapshot_name()
+        try:
+            modified = store.get_modified_time(name)
+            if _loaded['snapshot'] is None or _loaded['modified'] != modified:
+                with store.open(name) as fh, np.load(BytesIO(fh.read())) as data:
+                    _loaded['snapshot'], _loaded['modified'] = CohortSnapshot.from_npz(data), modified
+        except FileNotFoundError:
+            _loaded['snapshot'], _loaded['modified'] = None, None
+        _loaded['checked_at'] = time.monotonic()
+        return _loaded['snapshot']
+
+# --- 3. DASHBOARD ---
+@timed('cohort_percentile')
+def user_percentiles(user_id, accuracy, radar):
+    """Percentiles of the user's live accuracy / radar scores and snapshot mock score."""
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return None
+    mock_score = snapshot.user_value('mock_score', user_id)
+    return {
+        'accuracy': snapshot.percentile('accuracy', accuracy),
+        'radar': {axis: snapshot.percentile(axis, score) for axis, score in radar.items()},
+        'mock_score': snapshot.percentile('mock_score', mock_score),
+        'best_mock_score': round(mock_score, 2) if mock_score is not None else None,
+        'cohort_size': snapshot.cohort_size('accuracy'),
+        'updated_at': datetime.fromtimestamp(snapshot.meta['built_at'], tz=dt_timezone.utc).isoformat(),
+    }
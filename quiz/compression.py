@@ -0,0 +1,162 @@
+# quiz/compression.py
+# Response compression for the JSON API (CompressionMiddleware, right inside MetricsMiddleware).
+#   - negotiates br (the `brotli` package, in requirements.txt) or gzip from Accept-Encoding,
+#     only for bodies >= COMPRESSION_MIN_BYTES of a compressible type that aren't encoded already
+#   - compressed bodies are kept in a per-process LRU keyed by (encoding, digest of the body), up to
+#     COMPRESSION_CACHE_MB: a repeat of the same body (a subject bank, a re-opened exam analysis)
+#     costs one blake2b pass instead of a recompression
+#   - BREACH: a response that carries a secret (the CSRF token was used to render it, or it sets a
+#     cookie) is never cached and only gzipped, with Django's random-length padding
+#     (compress_string(max_random_bytes=...)), so its compressed size doesn't leak the secret byte
+#     by byte; br has no padding, so br-only clients get it uncompressed
+#   - per route: quiz_http_compression_bytes_total{stage=in|out} (ratio = out / in),
+#     quiz_http_compression_cpu_seconds_total and quiz_http_compression_cache_total{result};
+#     the time also shows up as a `compress` span / Server-Timing entry
+import gzip
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import brotli
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from .metrics import MetricsMiddleware, registry, span
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+def _brotli(body):
+    return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+
+def _gzip(body):
+    # mtime=0: the same body always gives the same bytes (cacheable, stable ETags downstream)
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+ENCODERS = {'br': _brotli, 'gzip': _gzip}
+PREFERENCE = ('br', 'gzip')  # On equal q-values
+PADDED_ENCODINGS = ('gzip',)
+MAX_RANDOM_BYTES = 100  # Same as django.middleware.gzip.GZipMiddleware
+
+def negotiate(accept_encoding, encodings=PREFERENCE):
+    """The encoding (out of `encodings`) to use for this Accept-Encoding header, or None."""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        match = re.match(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?', part)
+        if not match:
+            continue
+        try:
+            accepted[match.group(1).lower()] = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        if encoding not in ENCODERS:
+            continue
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+# --- 1. COMPRESSED-BODY CACHE ---
+class CompressedCache:
+    """LRU of (encoding, body digest) -> compressed bytes, bounded by total size."""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+_cache = None
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = CompressedCache(settings.COMPRESSION_CACHE_MB * 1024 * 1024)
+    return _cache
+
+def compress(body, encoding, route='-', padded=False):
+    """Compressed `body` (from the cache when the same body was compressed before). `padded`: a
+    gzip body with random padding, different every time and never cached (BREACH)."""
+    key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+    cache = get_cache() if settings.COMPRESSION_CACHE_MB and not padded else None
+    compressed = cache.get(key) if cache else None
+    registry.incr('quiz_http_compression_cache_total', route=route,
+                  result='bypass' if padded else 'hit' if compressed else 'miss')
+    if compressed is None:
+        cpu = time.thread_time()
+        compressed = compress_string(body, max_random_bytes=MAX_RANDOM_BYTES) if padded else ENCODERS[encoding](body)
+        registry.incr('quiz_http_compression_cpu_seconds_total', time.thread_time() - cpu,
+                      route=route, encoding=encoding)
+        if cache:
+            cache.put(key, compressed)
+    return compressed
+
+# --- 2. MIDDLEWARE ---
+class CompressionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # Vary on every compressible response, compressed or not, so shared caches keep both
+        if response.streaming or not self._compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.COMPRESSION_MIN_BYTES:
+            return response
+        secret = self._carries_secret(request, response)
+        encoding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''),
+                             PADDED_ENCODINGS if secret else PREFERENCE)
+        if encoding is None:
+            return response
+
+        route = MetricsMiddleware._route(request)
+        body = response.content
+        with span('compress'):
+            compressed = compress(body, encoding, route, padded=secret)
+        if len(compressed) >= len(body):
+            return response
+        registry.incr('quiz_http_compression_bytes_total', len(body), route=route, encoding=encoding, stage='in')
+        registry.incr('quiz_http_compression_bytes_total', len(compressed), route=route, encoding=encoding,
+                      stage='out')
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        if response.has_header('ETag') and not response['ETag'].startswith('W/'):
+            response['ETag'] = 'W/' + response['ETag']  # Different bytes than the identity body
+        return response
+
+    @staticmethod
+    def _carries_secret(request, response):
+        """The body was rendered with the CSRF token, or the response sets a cookie (session, csrftoken)."""
+        return bool(request.META.get('CSRF_COOKIE_NEEDS_UPDATE') or response.cookies)
+
+    @staticmethod
+    def _compressible(response):
+        if response.has_header('Content-Encoding') or response.status_code < 200 or response.status_code in (204, 304):
+            return False
+        content_type = response.get('Content-Type', '').lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
@@ -0,0 +1,215 @@
+# quiz/concepts.py
+# Auto-linking of KnowledgeConcept terms inside question / option text.
+#   - ConceptAutomaton: Aho-Corasick over every concept term (case-insensitive, whole words),
+#     so one linear pass over a text finds every term in it
+#   - the automaton is cached per process and rebuilt when the concept table changes
+#     (count / last updated_at, one cheap aggregate per build check)
+#   - spans are stored in Question.concept_spans / Option.concept_spans at write time and
+#     refer to the `plain_text` the serializers emit next to `text` (the same text without its
+#     hand-placed [[wiki]] links), so the API does no matching per request
+#   - reannotate_all(): streaming re-annotation of the whole bank after concept edits
+#     (the `annotate_concepts` job / command; queued by concept_changed on term changes)
+#   - lookup_concepts(): batch term -> concept lookups (`/api/concepts/?terms=`) from a casefolded
+#     per-process dictionary, reloaded when the concept table's version moves (any process's edits)
+import threading
+from collections import deque
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .jobs import enqueue
+from .metrics import timed
+from .models import Job, KnowledgeConcept, Option, Question, strip_markup
+
+REANNOTATE_DELAY = timedelta(seconds=30)  # Several concept edits in a row -> one job
+
+# --- 1. AUTOMATON ---
+def _fold(text):
+    """Lower-cases char by char so offsets in the folded text match the original."""
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+class ConceptAutomaton:
+    def __init__(self, terms):
+        """`terms`: [(concept_id, term), ...]"""
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]          # [(term_length, concept_id, term), ...] ending at this node
+        self.term_count = 0
+        for concept_id, term in terms:
+            folded = _fold(term.strip())
+            if folded:
+                self._add(folded, (len(folded), concept_id, term.strip()))
+                self.term_count += 1
+        self._link()
+
+    def _add(self, word, output):
+        node = 0
+        for char in word:
+            nxt = self.goto[node].get(char)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][char] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            node = nxt
+        self.out[node].append(output)
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                target = self.goto[state].get(char, 0)
+                self.fail[child] = target if target != child else 0
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def find(self, text):
+        """Non-overlapping whole-word matches, leftmost-longest: [{'start', 'end', 'concept', 'term'}]"""
+        if not text or not self.term_count:
+            return []
+        folded = _fold(text)
+        goto, fail, out = self.goto, self.fail, self.out
+        matches = []
+        node = 0
+        for index, char in enumerate(folded):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, concept_id, term in out[node]:
+                start, end = index - length + 1, index + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    matches.append((start, end, concept_id, term))
+
+        matches.sort(key=lambda m: (m[0], -(m[1] - m[0])))
+        spans, last_end = [], 0
+        for start, end, concept_id, term in matches:
+            if start >= last_end:
+                spans.append({'start': start, 'end': end, 'concept': concept_id, 'term': term})
+                last_end = end
+        return spans
+
+def concepts_version():
+    stats = KnowledgeConcept.objects.aggregate(n=Count('id'), last=Max('updated_at'), top=Max('id'))
+    return (stats['n'], stats['top'], stats['last'])
+
+_cache = {'version': None, 'automaton': None}
+_cache_lock = threading.Lock()
+
+def get_automaton():
+    version = concepts_version()
+    with _cache_lock:
+        if _cache['automaton'] is None or _cache['version'] != version:
+            terms = KnowledgeConcept.objects.order_by('id').values_list('id', 'term')
+            _cache['automaton'] = ConceptAutomaton(terms)
+            _cache['version'] = version
+        return _cache['automaton']
+
+# --- 2. ANNOTATING QUESTIONS ---
+def option_plain_text(option):
+    # Must match OptionSerializer.get_plain_text
+    return strip_markup(option.text_content) or ""
+
+def annotate_options(options, automaton):
+    """Sets concept_spans on the options and bulk_updates the ones that changed. Returns how many."""
+    changed = []
+    for option in options:
+        spans = automaton.find(option_plain_text(option))
+        if spans != option.concept_spans:
+            option.concept_spans = spans
+            changed.append(option)
+    if changed:
+        Option.objects.bulk_update(changed, ['concept_spans'], batch_size=500)
+    return len(changed)
+
+@timed('concept_annotate')
+def annotate_questions(questions_with_options, automaton=None):
+    """
+    Sets concept_spans on [(question, options), ...] and writes the rows that changed with
+    bulk_update. Returns the number of rows written. (Question.save annotates itself and then
+    only its options.)
+    """
+    automaton = automaton or get_automaton()
+    changed, options = [], []
+    for question, question_options in questions_with_options:
+        spans = automaton.find(question.plain_text)
+        if spans != question.concept_spans:
+            question.concept_spans = spans
+            changed.append(question)
+        options.extend(question_options)
+    if changed:
+        Question.objects.bulk_update(changed, ['concept_spans'], batch_size=500)
+    return len(changed) + annotate_options(options, automaton)
+
+def reannotate_all(chunk_size=500, progress=None):
+    """Streams the bank in id order (keyset chunks); only rows whose spans changed are written."""
+    automaton = get_automaton()
+    total = Question.objects.count()
+    done, written, last_id = 0, 0, 0
+    while True:
+        chunk = list(Question.objects.filter(id__gt=last_id).order_by('id')
+                     .only('id', 'text', 'concept_spans').prefetch_related('options')[:chunk_size])
+        if not chunk:
+            break
+        written += annotate_questions([(q, list(q.options.all())) for q in chunk], automaton=automaton)
+        done += len(chunk)
+        last_id = chunk[-1].id
+        if progress:
+            progress(done, total, written)
+    return {'questions': done, 'rows_written': written, 'terms': automaton.term_count}
+
+def schedule_reannotation():
+    """Queues one `annotate_concepts` job (reuses a job that is still waiting)."""
+    pending = Job.objects.filter(kind='annotate_concepts', status='queued').first()
+    if pending:
+        return pending
+    return enqueue('annotate_concepts', run_after=timezone.now() + REANNOTATE_DELAY,
+                   message="Re-linking concept terms in all questions")
+
+# --- 3. TERM DICTIONARY (batch lookups) ---
+_terms = {'map': None, 'version': None}
+_terms_lock = threading.Lock()
+
+def _serialize(concept):
+    from .serializers import KnowledgeConceptSerializer  # serializers import models only
+    return KnowledgeConceptSerializer(concept).data
+
+def concept_dictionary():
+    """{casefolded term: serialized concept}, reloaded when the concept table changes in any process
+    (the same count / max id / last updated_at check as get_automaton)."""
+    version = concepts_version()
+    with _terms_lock:
+        if _terms['map'] is None or _terms['version'] != version:
+            _terms['map'] = {c.term.casefold(): _serialize(c) for c in KnowledgeConcept.objects.all()}
+            _terms['version'] = version
+        return _terms['map']
+
+def invalidate_concept_caches(**kwargs):
+    """post_save / post_delete receiver for KnowledgeConcept (connected in QuizConfig.ready)."""
+    with _terms_lock:
+        _terms['map'] = None
+    with _cache_lock:
+        _cache['automaton'] = None
+
+def concept_changed(sender, instance, created=True, **kwargs):
+    """post_save / post_delete receiver for KnowledgeConcept (connected in QuizConfig.ready): any
+    save, from the admin, an import or the shell, that adds, renames or deletes a term re-links the
+    whole bank in ONE background job. Bulk writes send no signals: call schedule_reannotation()."""
+    invalidate_concept_caches()
+    if created or instance.term != getattr(instance, '_loaded_term', None):
+        transaction.on_commit(schedule_reannotation)
+    instance._loaded_term = instance.term
+
+@timed('concept_lookup')
+def lookup_concepts(terms):
+    """{requested term: serialized concept} for the terms that exist."""
+    # The dictionary is current, so a miss is a miss: no SQL fallback (SQLite's UPPER / LIKE only
+    # fold ASCII, casefold() folds every script)
+    dictionary = concept_dictionary()
+    return {term: dictionary[term.casefold()] for term in terms if term.casefold() in dictionary}
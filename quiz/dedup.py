@@ -0,0 +1,163 @@
+# quiz/dedup.py
+# Near-duplicate detection for questions (same PYQ typed in twice with small wording changes).
+#   - signature(): MinHash of word 3-shingles over clean_text + option texts
+#   - LSH: the signature is cut into BANDS bands; each band is hashed to one LSHBucket key.
+#     Two questions share a key with high probability only if they are similar, so a lookup
+#     is one indexed `key IN (...)` query instead of a comparison against every question.
+#   - candidates are then verified on the full signatures (estimated Jaccard)
+#
+# Maintained by index_questions(), called wherever retag_questions() is (Question.save,
+# QuestionResource, BulkQuestionImporter). `manage.py find_duplicates` reports clusters.
+import hashlib
+import re
+import zlib
+
+import numpy as np
+from django.db.models import Count
+
+from .metrics import timed
+from .models import Question, QuestionSignature, LSHBucket, strip_keyword_tags
+
+NUM_PERM = 64
+BANDS, ROWS = 16, 4            # BANDS * ROWS == NUM_PERM; S-curve midpoint ~ (1/16)^(1/4) = 0.5
+SHINGLE_SIZE = 3
+DUPLICATE_THRESHOLD = 0.7      # Estimated Jaccard; a one-word edit of a 35-word PYQ is ~0.85
+MERSENNE = np.uint64((1 << 61) - 1)
+WORD_RE = re.compile(r'\w+')
+PARAM_BATCH = 900              # Stay under SQLite's bound-parameter limit in IN (...) lookups
+
+# Fixed permutations: signatures stored in the DB must stay comparable across processes.
+_perm_rng = np.random.RandomState(20240601)
+PERM_A = _perm_rng.randint(1, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+PERM_B = _perm_rng.randint(0, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+
+# --- 1. SIGNATURES ---
+def shingles(text, option_texts=()):
+    parts = [strip_keyword_tags(text or '')] + [strip_keyword_tags(t or '') for t in option_texts]
+    words = WORD_RE.findall(" ".join(parts).lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def signature(text, option_texts=()):
+    """MinHash signature (NUM_PERM uint32s). crc32, not hash(): it must be stable between runs."""
+    items = shingles(text, option_texts)
+    if not items:
+        return np.full(NUM_PERM, 0xFFFFFFFF, dtype=np.uint32)
+    hashed = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in items), dtype=np.uint64, count=len(items))
+    permuted = (np.outer(hashed, PERM_A) + PERM_B) % MERSENNE & np.uint64(0xFFFFFFFF)
+    return permuted.min(axis=0).astype(np.uint32)
+
+def question_signature(question, options):
+    return signature(question.text, [opt.text_content for opt in options])
+
+def band_keys(sig):
+    """One signed 64-bit key per band (band number is mixed in, so keys never collide across bands)."""
+    keys = []
+    for band in range(BANDS):
+        chunk = sig[band * ROWS:(band + 1) * ROWS].tobytes()
+        digest = hashlib.blake2b(bytes([band]) + chunk, digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'big', signed=True))
+    return keys
+
+def similarity(sig, others):
+    """Estimated Jaccard of `sig` against each row of `others` (n x NUM_PERM)."""
+    return (np.asarray(others) == sig).mean(axis=1)
+
+def _load_signatures(question_ids):
+    question_ids, sigs = sorted(question_ids), {}
+    for i in range(0, len(question_ids), PARAM_BATCH):
+        rows = QuestionSignature.objects.filter(question_id__in=question_ids[i:i + PARAM_BATCH])
+        for qid, blob in rows.values_list('question_id', 'minhash'):
+            sigs[qid] = np.frombuffer(bytes(blob), dtype=np.uint32)
+    return sigs
+
+# --- 2. INDEX MAINTENANCE ---
+@timed('dedup_index')
+def index_questions(questions_with_options):
+    """(Re)indexes [(question, options), ...] with one delete + one bulk insert per table."""
+    sigs = {question.pk: question_signature(question, options) for question, options in questions_with_options}
+    QuestionSignature.objects.filter(question_id__in=sigs).delete()
+    LSHBucket.objects.filter(question_id__in=sigs).delete()
+    QuestionSignature.objects.bulk_create(
+        [QuestionSignature(question_id=qid, minhash=sig.tobytes()) for qid, sig in sigs.items()], batch_size=1000)
+    LSHBucket.objects.bulk_create(
+        [LSHBucket(question_id=qid, key=key) for qid, sig in sigs.items() for key in band_keys(sig)], batch_size=1000)
+    return sigs
+
+# --- 3. LOOKUPS ---
+def find_similar_many(sigs, exclude_ids=(), threshold=DUPLICATE_THRESHOLD):
+    """
+    {token: [(question_id, similarity), ...]} for {token: signature}, best first.
+    One bucket query (batched) + one signature query for the whole set.
+    """
+    keys = {token: band_keys(sig) for token, sig in sigs.items()}
+    all_keys = sorted({k for ks in keys.values() for k in ks})
+    by_key = {}
+    for i in range(0, len(all_keys), PARAM_BATCH):
+        rows = LSHBucket.objects.filter(key__in=all_keys[i:i + PARAM_BATCH]).values_list('key', 'question_id')
+        for key, qid in rows:
+            by_key.setdefault(key, set()).add(qid)
+
+    exclude_ids = set(exclude_ids)
+    candidates = {token: set().union(*(by_key.get(k, ()) for k in ks)) - exclude_ids for token, ks in keys.items()}
+    stored = _load_signatures(set().union(*candidates.values())) if candidates else {}
+
+    results = {}
+    for token, ids in candidates.items():
+        ids = [qid for qid in ids if qid in stored]
+        if not ids:
+            continue
+        scores = similarity(sigs[token], [stored[qid] for qid in ids])
+        found = sorted(((qid, float(score)) for qid, score in zip(ids, scores) if score >= threshold),
+                       key=lambda item: -item[1])
+        if found:
+            results[token] = found
+    return results
+
+def find_similar(sig, exclude_ids=(), threshold=DUPLICATE_THRESHOLD):
+    """[(question_id, similarity)] of indexed questions near `sig`, best first."""
+    return find_similar_many({0: sig}, exclude_ids, threshold).get(0, [])
+
+def near_duplicates_of(question, options=None, threshold=DUPLICATE_THRESHOLD):
+    if options is None:
+        options = list(question.options.all())
+    return find_similar(question_signature(question, options), exclude_ids=[question.pk], threshold=threshold)
+
+def duplicate_clusters(threshold=DUPLICATE_THRESHOLD):
+    """Groups of question ids that are pairwise-linked near duplicates (via shared LSH buckets)."""
+    shared = LSHBucket.objects.values('key').annotate(n=Count('id')).filter(n__gt=1).values_list('key', flat=True)
+    buckets = {}
+    for key, qid in LSHBucket.objects.filter(key__in=shared).values_list('key', 'question_id').iterator(chunk_size=5000):
+        buckets.setdefault(key, []).append(qid)
+
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    sigs = _load_signatures({qid for members in buckets.values() for qid in members})
+    checked = set()
+    for members in buckets.values():
+        members = sorted(set(members))
+        for i, a in enumerate(members[:-1]):
+            rest = [b for b in members[i + 1:] if (a, b) not in checked]
+            if not rest:
+                continue
+            checked.update((a, b) for b in rest)
+            scores = similarity(sigs[a], [sigs[b] for b in rest])
+            for b, score in zip(rest, scores):
+                if score >= threshold:
+                    parent[find(b)] = find(a)
+
+    clusters = {}
+    for qid in parent:
+        clusters.setdefault(find(qid), []).append(qid)
+    return sorted((sorted(c) for c in clusters.values() if len(c) > 1), key=len, reverse=True)
+
+def unindexed_questions():
+    return Question.objects.filter(signature__isnull=True)
@@ -0,0 +1,276 @@
+# quiz/exports.py
+# Streaming downloads of a user's library, notes and attempt history (/api/user/export/<kind>.<fmt>).
+#   - rows come from .iterator(chunk_size=EXPORT_CHUNK_ROWS) (server-side cursors on Postgres) and
+#     from archived blocks one at a time; question / option details are looked up per chunk, so a
+#     download holds one chunk in memory however long the history is
+#   - formats: csv (UTF-8 BOM so Excel reads Hindi / symbols), ndjson, html (printable: table
+#     headers repeat on every page; the browser's "Save as PDF" makes the PDF)
+#   - the output is byte-for-byte the same for the same data (html: and the same day, it prints the
+#     export date), so a digest of the data's version is a strong ETag: the user's counts, max ids and
+#     last note edit plus the bank's last question edit (Question.updated_at; option saves re-save the
+#     question), and the date for html. A single Range (with or without If-Range) is answered 206 by
+#     regenerating the stream and skipping to the offset; the total length comes from the length
+#     cache (filled by every finished download) or one counting pass
+import csv
+import hashlib
+import json
+import re
+from datetime import datetime, timezone as dt_timezone
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.html import escape
+
+from .archive import FLAG_CORRECT, FLAG_SKIPPED, iter_archive_arrays
+from .models import AnswerArchive, Option, Question, UserAnswerLog, UserQuestionNote
+
+EXPORT_VERSION = 1  # Bump when columns / formatting change: old ETags must not match
+BUFFER_BYTES = 64 * 1024
+LENGTH_CACHE_SECONDS = 86400
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'html': 'text/html; charset=utf-8',
+}
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+def _time(value):
+    return timezone.localtime(value).isoformat(timespec='seconds') if value else ''
+
+def _chunks(iterable, size=None):
+    iterator = iter(iterable)
+    size = size or settings.EXPORT_CHUNK_ROWS
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+def _result(is_correct, is_skipped):
+    return 'skipped' if is_skipped else ('correct' if is_correct else 'wrong')
+
+# --- 1. ROWS (one chunk in memory at a time) ---
+HISTORY_COLUMNS = ['attempted_at', 'question_id', 'exam_name', 'year', 'subject', 'source_mode', 'session_id',
+                   'result', 'selected_option', 'confidence_score', 'time_taken_seconds']
+
+def history_rows(user):
+    """Archived (older practice) answers block by block, then the live log by id."""
+    for _, block in iter_archive_arrays([user.id]):
+        questions = Question.objects.only('id', 'exam_name', 'year', 'subject').in_bulk(set(block['question'].tolist()))
+        labels = dict(Option.objects.filter(id__in=set(block['option'].tolist()) - {-1})
+                      .values_list('id', 'option_label'))
+        for i, log_id in enumerate(block['id'].tolist()):
+            question = questions.get(int(block['question'][i]))
+            flags = int(block['flags'][i])
+            yield {
+                'attempted_at': _time(datetime.fromtimestamp(float(block['attempted_at'][i]), tz=dt_timezone.utc)),
+                'question_id': int(block['question'][i]),
+                'exam_name': question.exam_name if question else '', 'year': question.year if question else '',
+                'subject': question.subject if question else '', 'source_mode': 'practice',
+                'session_id': block['extras'].get(str(log_id), {}).get('session_id') or '',
+                'result': _result(flags & FLAG_CORRECT, flags & FLAG_SKIPPED),
+                'selected_option': labels.get(int(block['option'][i]), ''),
+                'confidence_score': int(block['confidence'][i]), 'time_taken_seconds': int(block['time_taken'][i]),
+            }
+    live = (UserAnswerLog.objects.filter(user=user).order_by('id')
+            .values_list('attempted_at', 'question_id', 'question__exam_name', 'question__year', 'question__subject',
+                         'source_mode', 'session_id', 'is_correct', 'is_skipped', 'selected_option__option_label',
+                         'confidence_score', 'time_taken_seconds'))
+    for (attempted_at, question_id, exam_name, year, subject, source_mode, session_id, is_correct, is_skipped,
+         label, confidence, time_taken) in live.iterator(chunk_size=settings.EXPORT_CHUNK_ROWS):
+        yield {
+            'attempted_at': _time(attempted_at), 'question_id': question_id, 'exam_name': exam_name, 'year': year,
+            'subject': subject, 'source_mode': source_mode, 'session_id': session_id or '',
+            'result': _result(is_correct, is_skipped), 'selected_option': label or '',
+            'confidence_score': confidence, 'time_taken_seconds': time_taken,
+        }
+
+NOTES_COLUMNS = ['question_id', 'exam_name', 'year', 'subject', 'question', 'note', 'created_at', 'updated_at']
+
+def notes_rows(user):
+    notes = UserQuestionNote.objects.filter(user=user).select_related('question').order_by('id')
+    for note in notes.iterator(chunk_size=settings.EXPORT_CHUNK_ROWS):
+        question = note.question
+        yield {
+            'question_id': question.id, 'exam_name': question.exam_name, 'year': question.year,
+            'subject': question.subject, 'question': question.plain_text, 'note': note.note_text,
+            'created_at': _time(note.created_at), 'updated_at': _time(note.updated_at),
+        }
+
+LIBRARY_COLUMNS = ['question_id', 'exam_name', 'year', 'subject', 'question', 'options', 'answer', 'explanation',
+                   'your_result', 'bookmarked_at', 'note']
+
+def _active_bookmarks(user):
+    return UserAnswerLog.objects.filter(user=user, is_bookmarked=True, is_cleared_from_library=False)
+
+def library_rows(user):
+    """Same items as user_library_api (latest active bookmark per question), newest first."""
+    latest = _active_bookmarks(user).order_by().values('question_id').annotate(latest_id=Max('id')).values('latest_id')
+    logs = (UserAnswerLog.objects.filter(id__in=latest).select_related('question').order_by('-id')
+            .only('question_id', 'is_correct', 'is_skipped', 'attempted_at', 'question__text', 'question__exam_name',
+                  'question__year', 'question__subject'))
+    for chunk in _chunks(logs.iterator(chunk_size=settings.EXPORT_CHUNK_ROWS)):
+        question_ids = [log.question_id for log in chunk]
+        notes = dict(UserQuestionNote.objects.filter(user=user, question_id__in=question_ids)
+                     .values_list('question_id', 'note_text'))
+        options = {}  # question -> [(label, text, is_correct, explanation)] by label
+        for row in (Option.objects.filter(question_id__in=question_ids).order_by('question_id', 'option_label')
+                    .values_list('question_id', 'option_label', 'text_content', 'is_correct', 'explanation_text')):
+            options.setdefault(row[0], []).append(row[1:])
+        for log in chunk:
+            question, choices = log.question, options.get(log.question_id, [])
+            correct = [choice for choice in choices if choice[2]]
+            yield {
+                'question_id': question.id, 'exam_name': question.exam_name, 'year': question.year,
+                'subject': question.subject, 'question': question.plain_text,
+                'options': '\n'.join(f"({label}) {text}" for label, text, _, _ in choices),
+                'answer': ', '.join(choice[0] for choice in correct),
+                'explanation': '\n'.join(choice[3] or '' for choice in correct).strip(),
+                'your_result': _result(log.is_correct, log.is_skipped), 'bookmarked_at': _time(log.attempted_at),
+                'note': notes.get(log.question_id, ''),
+            }
+
+def _version(*aggregates):
+    return [str(value) for aggregate in aggregates for value in aggregate.values()]
+
+def bank_version():
+    # Question / option text, exam, year and explanations appear in every export
+    return _version(Question.objects.aggregate(edited=Max('updated_at')))
+
+def history_version(user):
+    return _version(UserAnswerLog.objects.filter(user=user).aggregate(n=Count('id'), last=Max('id')),
+                    AnswerArchive.objects.filter(user=user).aggregate(n=Count('id'), rows=Sum('count'), last=Max('id'))
+                    ) + bank_version()
+
+def notes_version(user):
+    return _version(UserQuestionNote.objects.filter(user=user).aggregate(n=Count('id'), last=Max('id'),
+                                                                          edited=Max('updated_at'))) + bank_version()
+
+def library_version(user):
+    return _version(_active_bookmarks(user).aggregate(n=Count('id'), last=Max('id'))) + notes_version(user)
+
+# kind -> (title, columns, rows(user), version(user))
+EXPORTS = {
+    'history': ('Attempt history', HISTORY_COLUMNS, history_rows, history_version),
+    'notes': ('Notebook', NOTES_COLUMNS, notes_rows, notes_version),
+    'library': ('Library', LIBRARY_COLUMNS, library_rows, library_version),
+}
+
+# --- 2. ENCODERS (str pieces) ---
+class _Line:
+    """csv.writer target that hands back the line it was given."""
+    def write(self, value):
+        return value
+
+def encode_csv(title, columns, rows):
+    writer = csv.writer(_Line())
+    yield '﻿' + writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([row[column] for column in columns])
+
+def encode_ndjson(title, columns, rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+HTML_HEAD = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title><style>
+body {{ font: 12px/1.4 system-ui, sans-serif; margin: 24px; }}
+table {{ border-collapse: collapse; width: 100%; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 6px; text-align: left; vertical-align: top; white-space: pre-wrap; }}
+th {{ background: #f3f3f3; }}
+thead {{ display: table-header-group; }}
+tr {{ page-break-inside: avoid; }}
+@media print {{ body {{ margin: 0; }} }}
+</style></head><body>
+<h1>{title}</h1><p>{user} &middot; exported {when}</p>
+<table><thead><tr>{header}</tr></thead><tbody>
+"""
+
+def encode_html(title, columns, rows, user='', day=None):
+    day = day or timezone.localdate()
+    yield HTML_HEAD.format(title=escape(title), user=escape(user), when=escape(day.isoformat()),
+                           header=''.join(f'<th>{escape(column)}</th>' for column in columns))
+    for row in rows:
+        yield '<tr>' + ''.join(f'<td>{escape(row[column])}</td>' for column in columns) + '</tr>\n'
+    yield '</tbody></table></body></html>\n'
+
+# --- 3. RESPONSE (ETag, Range) ---
+def _buffered(pieces):
+    """UTF-8 bytes in ~BUFFER_BYTES chunks instead of one tiny write per row."""
+    buffer, size = [], 0
+    for piece in pieces:
+        data = piece.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= BUFFER_BYTES:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+def _remember_length(chunks, key):
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+        yield chunk
+    cache.set(key, total, LENGTH_CACHE_SECONDS)  # Only reached when the whole body was produced
+
+def _slice(chunks, start, stop):
+    position = 0
+    for chunk in chunks:
+        end = position + len(chunk)
+        if end > start:
+            yield chunk[max(0, start - position):stop - position]
+        position = end
+        if position >= stop:
+            break
+
+def _range(request, etag):
+    """(first, last) inclusive for a single-range request that still matches this ETag, else None."""
+    header = request.META.get('HTTP_RANGE', '')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    match = RANGE.match(header.strip())
+    if not match or not any(match.groups()) or (if_range and if_range != etag):
+        return None  # No range, several ranges, or the data changed since: send it all
+    return match.groups()
+
+def export_response(request, user, kind, fmt):
+    title, columns, rows, version = EXPORTS[kind]
+    day = timezone.localdate()
+    dated = [day.isoformat()] if fmt == 'html' else []  # The html body prints the date; csv / ndjson don't
+    etag = '"{}"'.format(hashlib.blake2b(
+        '|'.join([str(EXPORT_VERSION), str(user.pk), kind, fmt, *version(user), *dated]).encode(),
+        digest_size=16).hexdigest())
+    headers = {'ETag': etag, 'Accept-Ranges': 'bytes', 'Cache-Control': 'private, no-cache',
+               'Content-Disposition': f'attachment; filename="civilspyq-{kind}-{day:%Y%m%d}.{fmt}"'}
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        return HttpResponse(status=304, headers=headers)
+
+    encode = {'csv': encode_csv, 'ndjson': encode_ndjson, 'html': encode_html}[fmt]
+    extra = {'user': user.get_username(), 'day': day} if fmt == 'html' else {}
+
+    def body():
+        return _buffered(encode(title, columns, rows(user), **extra))
+
+    length_key = f'export-length:{etag}'
+    wanted = _range(request, etag)
+    if wanted is None:
+        return StreamingHttpResponse(_remember_length(body(), length_key), content_type=FORMATS[fmt],
+                                     headers=headers)
+
+    total = cache.get(length_key)
+    if total is None:
+        total = sum(len(chunk) for chunk in body())  # Counting pass: CPU, not memory
+        cache.set(length_key, total, LENGTH_CACHE_SECONDS)
+    first, last = wanted
+    if first:
+        first, last = int(first), min(int(last), total - 1) if last else total - 1
+    else:
+        first, last = max(0, total - int(last)), total - 1  # bytes=-N: the last N bytes
+    if first > last or first >= total:
+        return HttpResponse(status=416, headers={**headers, 'Content-Range': f'bytes */{total}'})
+    response = StreamingHttpResponse(_slice(body(), first, last + 1), status=206, content_type=FORMATS[fmt],
+                                     headers={**headers, 'Content-Range': f'bytes {first}-{last}/{total}'})
+    response['Content-Length'] = str(last - first + 1)
+    return response
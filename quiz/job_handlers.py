@@ -0,0 +1,108 @@
+# quiz/job_handlers.py
+# Runners for background jobs (see quiz/jobs.py). Each handler gets the Job row,
+# reports progress on it and returns a small JSON-able result dict.
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+
+from .blobs import shared_storage
+from .bulk_import import BulkQuestionImporter, read_rows
+from .calibration import calibrate
+from .cohort import refresh_snapshot, schedule_refresh
+from .concepts import reannotate_all
+from .jobs import job_handler
+from .media import fetch_pending, schedule_fetch
+from .models import CachedMedia, TaggingJob
+from .tagging import TaggingEngine
+
+@job_handler('generate_tags')
+def run_generate_tags(job):
+    # The TaggingJob keeps its own resume index, so a retried Job continues where it stopped.
+    tagging_job = TaggingJob.objects.get(pk=job.payload['tagging_job_id'])
+    job.report_progress(tagging_job.next_index, tagging_job.total, "Tagging questions")
+
+    def progress(tj):
+        job.report_progress(tj.next_index, tj.total,
+                            f"{tj.tagged} tagged, {tj.cached} cached, {tj.skipped} unchanged, {tj.failed} failed")
+
+    TaggingEngine(model_name=tagging_job.model_name, progress=progress).run(tagging_job)
+    return {'tagging_job': tagging_job.pk, 'tagged': tagging_job.tagged, 'cached': tagging_job.cached,
+            'skipped': tagging_job.skipped, 'failed': tagging_job.failed}
+
+@job_handler('analyze_keywords')
+def run_analyze_keywords(job):
+    job.report_progress(0, 1, "Scanning all questions")
+    out = StringIO()
+    call_command('analyze_keywords', stdout=out)
+    job.report_progress(1, 1, "Finished")
+    return {'output': out.getvalue()[-1000:]}
+
+@job_handler('import_questions')
+def run_import_questions(job):
+    # The admin saves the file into the shared storage (quiz/blobs.py) under payload['upload']
+    store, upload = shared_storage(), job.payload['upload']
+
+    def progress(report):
+        job.report_progress(report.rows, None,
+                            f"{report.created} created, {report.updated} updated, {len(report.errors)} errors "
+                            f"({report.rows_per_sec:,.0f} rows/sec)")
+
+    importer = BulkQuestionImporter(chunk_size=job.payload.get('chunk_size', 500), progress=progress,
+                                    skip_near_duplicates=job.payload.get('skip_near_duplicates', False))
+    succeeded = False
+    try:
+        with store.open(upload) as fh:
+            report = importer.run(read_rows(upload, fh))
+        succeeded = True
+    finally:
+        # Failed attempts with retries left need the file again; after the last one nothing will read it
+        if job.payload.get('delete_after', True) and (succeeded or job.attempts >= job.max_attempts):
+            store.delete(upload)
+    job.report_progress(report.rows, report.rows)
+    return {**report.as_dict(), 'error_rows': [{'row': row, 'error': msg} for row, msg in report.errors[:200]],
+            'near_duplicate_rows': [{'row': row, 'question_id': qid, 'similarity': score}
+                                    for row, qid, score in report.duplicates[:200]]}
+
+@job_handler('annotate_concepts')
+def run_annotate_concepts(job):
+    def progress(done, total, written):
+        job.report_progress(done, total, f"{done}/{total} questions, {written} rows re-linked")
+
+    return reannotate_all(chunk_size=job.payload.get('chunk_size', 500), progress=progress)
+
+@job_handler('refresh_cohort')
+def run_refresh_cohort(job):
+    def progress(rows, total):
+        job.report_progress(rows, total, f"{rows}/{total} answer logs scanned")
+
+    succeeded = False
+    try:
+        meta = refresh_snapshot(progress=progress)
+        succeeded = True
+    finally:
+        # This job is 'running', so a fresh one is queued for the next round: after a success or the
+        # last attempt (earlier failed attempts are retried as this same job), so the chain never ends.
+        if settings.COHORT_REFRESH_SECONDS and (succeeded or job.attempts >= job.max_attempts):
+            schedule_refresh(delay_seconds=settings.COHORT_REFRESH_SECONDS)
+    return meta
+
+@job_handler('calibrate_questions')
+def run_calibrate_questions(job):
+    def progress(rows, total):
+        job.report_progress(rows, total, f"{rows}/{total} answer logs read")
+
+    run = calibrate(full=job.payload.get('full', False), progress=progress)
+    return {'run': run.pk, 'mode': run.mode, 'answers': run.answers, 'questions': run.questions,
+            'iterations': run.iterations, 'last_log_id': run.last_log_id}
+
+@job_handler('fetch_media')
+def run_fetch_media(job):
+    def progress(done, total, result):
+        job.report_progress(done, total, f"{result['fetched']} cached, {result['failed']} failed")
+
+    result = fetch_pending(limit=job.payload.get('limit'), progress=progress)
+    if CachedMedia.objects.filter(status='pending').exists():
+        # Failures below MAX_ATTEMPTS went back to pending; try them again later.
+        schedule_fetch(delay_seconds=300)
+    return result
@@ -0,0 +1,122 @@
+# quiz/jobs.py
+# Lightweight database-backed job queue. Admin actions call `enqueue(...)` and
+# return immediately; `manage.py run_worker` claims and runs the jobs.
+#
+# Claiming uses SELECT ... FOR UPDATE SKIP LOCKED where the database supports it
+# (Postgres). SQLite has no row locks, so there we claim with a conditional
+# UPDATE ... WHERE status='queued' and treat "1 row updated" as ownership.
+import importlib
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Job
+
+HANDLERS = {}
+HANDLER_MODULES = ['quiz.job_handlers']
+STALE_AFTER = timedelta(minutes=30)   # a 'running' job with no progress report for this long lost its worker
+RETRY_BASE_SECONDS = 30
+
+def job_handler(kind):
+    """Registers `fn(job)` as the runner for jobs of this kind."""
+    def decorator(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+def load_handlers():
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+    return HANDLERS
+
+def enqueue(kind, payload=None, priority=0, max_attempts=3, run_after=None, message=''):
+    return Job.objects.create(
+        kind=kind, payload=payload or {}, priority=priority, max_attempts=max_attempts,
+        run_after=run_after or timezone.now(), message=message,
+    )
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+# --- 1. CLAIMING ---
+def claim_next(worker, kinds=None):
+    now = timezone.now()
+    qs = Job.objects.filter(status='queued', run_after__lte=now).order_by('-priority', 'id')
+    if kinds:
+        qs = qs.filter(kind__in=kinds)
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = qs.select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            job.status, job.locked_by, job.locked_at = 'running', worker, now
+            job.attempts += 1
+            job.save(update_fields=['status', 'locked_by', 'locked_at', 'attempts'])
+            return job
+
+    # SQLite-safe fallback: whoever flips queued -> running first owns the job.
+    for job_id in qs.values_list('id', flat=True)[:10]:
+        won = Job.objects.filter(pk=job_id, status='queued').update(
+            status='running', locked_by=worker, locked_at=now,
+        )
+        if won:
+            job = Job.objects.get(pk=job_id)
+            job.attempts += 1
+            job.save(update_fields=['attempts'])
+            return job
+    return None
+
+def requeue_stale(stale_after=STALE_AFTER):
+    """Jobs whose worker died mid-run go back to the queue (handlers are resumable).
+    Job.report_progress() refreshes locked_at, so long jobs that keep reporting stay claimed."""
+    cutoff = timezone.now() - stale_after
+    return Job.objects.filter(status='running', locked_at__lt=cutoff).update(
+        status='queued', locked_by='', locked_at=None, message='Requeued after worker timeout',
+    )
+
+# --- 2. RUNNING ---
+def run_job(job):
+    handler = load_handlers().get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind '{job.kind}'")
+        result = handler(job)
+    except Exception:
+        job.error = traceback.format_exc()[-4000:]
+        if job.attempts < job.max_attempts:
+            # Exponential backoff: 30s, 60s, 120s...
+            job.status = 'queued'
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+            job.message = f"Attempt {job.attempts} failed, retrying"
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+            job.message = f"Failed after {job.attempts} attempts"
+        job.locked_by, job.locked_at = '', None
+        job.save(update_fields=['error', 'status', 'run_after', 'message', 'finished_at', 'locked_by', 'locked_at'])
+        return False
+
+    job.status = 'done'
+    job.result = result or {}
+    job.error = ''
+    job.finished_at = timezone.now()
+    job.locked_by, job.locked_at = '', None
+    job.save(update_fields=['status', 'result', 'error', 'finished_at', 'locked_by', 'locked_at'])
+    return True
+
+def run_pending(worker=None, kinds=None, limit=None):
+    """Drains the queue in this process (used by `run_worker --once`)."""
+    worker = worker or worker_name()
+    ran = 0
+    while limit is None or ran < limit:
+        job = claim_next(worker, kinds)
+        if job is None:
+            break
+        run_job(job)
+        ran += 1
+    return ran
@@ -0,0 +1,348 @@
+# quiz/leaderboard.py
+# Weekly accuracy and best-mock-score leaderboards, global and per exam, without ranking
+# UserAnswerLog aggregates per request.
+#   - boards are sorted sets (member = user id), updated in place:
+#       accuracy:<week>[:<exam>]   every answer (save_user_answer), counters + accuracy score
+#       mock:<exam|all>            best score, on session close (POST to ExamAnalysisAPI)
+#   - two interchangeable stores with the same small interface:
+#       RedisStore  - ZADD / ZREVRANK / ZREVRANGE when LEADERBOARD_REDIS_URL is set (needs `redis`)
+#       LocalStore  - per-process sorted lists (bisect), the stand-in: own writes apply at once,
+#                     deltas are flushed to LeaderboardEntry and boards reloaded from it every
+#                     LEADERBOARD_SYNC_SECONDS, so processes converge
+#   - "my rank" is one bisect (local) / ZREVRANK (Redis): O(log n); top-k is a slice
+#   - rebuild_leaderboards() recomputes everything from the logs (`manage.py rebuild_leaderboards`)
+import bisect
+import math
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Q
+from django.db.models.functions import ExtractIsoYear, ExtractWeek
+from django.utils import timezone
+
+from .cohort import session_scores
+from .metrics import timed
+from .models import LeaderboardEntry, Question, UserAnswerLog
+
+MIN_WEEKLY_ANSWERS = 20    # Fewer answers in the week -> counted, but not ranked
+MAX_TOP = 100
+REDIS_WEEK_TTL = 6 * 7 * 86400  # Weekly Redis keys expire after six weeks
+CHUNK_SIZE = 50000
+
+# --- 1. BOARD NAMES + SCORES ---
+def week_label(when):
+    year, week, _ = timezone.localtime(when).isocalendar()
+    return f"{year}-W{week:02d}"
+
+def accuracy_board(week, exam_name=None):
+    return f"accuracy:{week}:{exam_name}" if exam_name else f"accuracy:{week}"
+
+def mock_board(exam_name=None):
+    return f"mock:{exam_name or 'all'}"
+
+def accuracy_score(correct, answered):
+    """Accuracy % to 2 decimals, ties broken by answer count (kept below the 0.01 step)."""
+    return math.floor(correct * 10000 / answered) / 100 + min(answered, 99999) / 1e7
+
+def display_score(board, score):
+    return math.floor(score * 100) / 100 if board.startswith('accuracy:') else round(score, 2)
+
+# --- 2. STORES ---
+class SortedBoard:
+    def __init__(self):
+        self.scores = {}   # member -> score
+        self.keys = []     # sorted [(-score, member)]: rank = position
+        self.counts = {}   # member -> [correct, answered] (accuracy boards)
+
+    def set(self, member, score):
+        old = self.scores.get(member)
+        if old is not None:
+            del self.keys[bisect.bisect_left(self.keys, (-old, member))]
+        self.scores[member] = score
+        bisect.insort(self.keys, (-score, member))
+
+    def rank(self, member):
+        score = self.scores.get(member)
+        if score is None:
+            return None
+        return bisect.bisect_left(self.keys, (-score, member)), score
+
+    def top(self, k):
+        return [(member, -neg) for neg, member in self.keys[:k]]
+
+    def __len__(self):
+        return len(self.keys)
+
+class LocalStore:
+    def __init__(self, sync_seconds):
+        self.sync_seconds = sync_seconds
+        self.lock = threading.RLock()
+        self.boards, self.loaded_at = {}, {}
+        self.pending_counts = {}  # (board, member) -> [d_correct, d_answered]
+        self.pending_best = {}    # (board, member) -> score
+        self.last_flush = time.monotonic()
+
+    def _board(self, name):
+        stale = time.monotonic() - self.loaded_at.get(name, -math.inf) > self.sync_seconds
+        if name not in self.boards or stale:
+            self.flush()  # Our deltas first, then everyone's
+            board = SortedBoard()
+            rows = LeaderboardEntry.objects.filter(board=name).values_list('user_id', 'score', 'correct', 'answered')
+            for member, score, correct, answered in rows:
+                if name.startswith('accuracy:'):
+                    board.counts[member] = [correct, answered]
+                    if answered >= MIN_WEEKLY_ANSWERS:
+                        board.set(member, accuracy_score(correct, answered))
+                else:
+                    board.set(member, score)
+            self.boards[name], self.loaded_at[name] = board, time.monotonic()
+        return self.boards[name]
+
+    def _maybe_flush(self):
+        if time.monotonic() - self.last_flush >= self.sync_seconds:
+            self.flush()
+
+    def increment(self, name, member, d_correct, d_answered):
+        with self.lock:
+            board = self._board(name)
+            counts = board.counts.setdefault(member, [0, 0])
+            counts[0] += d_correct
+            counts[1] += d_answered
+            if counts[1] >= MIN_WEEKLY_ANSWERS:
+                board.set(member, accuracy_score(*counts))
+            pending = self.pending_counts.setdefault((name, member), [0, 0])
+            pending[0] += d_correct
+            pending[1] += d_answered
+            self._maybe_flush()
+
+    def best(self, name, member, score):
+        with self.lock:
+            board = self._board(name)
+            if board.scores.get(member, -math.inf) < score:
+                board.set(member, score)
+                self.pending_best[(name, member)] = score
+            self._maybe_flush()
+
+    def rank(self, name, member):
+        with self.lock:
+            return self._board(name).rank(member)
+
+    def top(self, name, k):
+        with self.lock:
+            return self._board(name).top(k)
+
+    def size(self, name):
+        with self.lock:
+            return len(self._board(name))
+
+    @timed('leaderboard_flush')
+    def flush(self):
+        with self.lock:
+            counts, best = self.pending_counts, self.pending_best
+            self.pending_counts, self.pending_best = {}, {}
+            self.last_flush = time.monotonic()
+            if not counts and not best:
+                return
+            with transaction.atomic():
+                for (name, member), (d_correct, d_answered) in counts.items():
+                    _add_counts(name, member, d_correct, d_answered)
+                for (name, member), score in best.items():
+                    _raise_best(name, member, score)
+
+    def replace(self, name, entries):
+        """entries: [(member, score, correct, answered)] - already written to LeaderboardEntry."""
+        with self.lock:
+            self.boards.pop(name, None)
+            self.pending_counts = {k: v for k, v in self.pending_counts.items() if k[0] != name}
+            self.pending_best = {k: v for k, v in self.pending_best.items() if k[0] != name}
+
+def _add_counts(name, member, d_correct, d_answered, _retry=True):
+    entry = LeaderboardEntry.objects.filter(board=name, user_id=member)
+    updated = entry.update(
+        correct=F('correct') + d_correct, answered=F('answered') + d_answered,
+        score=ExpressionWrapper((F('correct') + d_correct) * 100.0 / (F('answered') + d_answered),
+                                output_field=FloatField()),
+        updated_at=timezone.now())
+    if not updated:
+        try:
+            with transaction.atomic():
+                LeaderboardEntry.objects.create(board=name, user_id=member, correct=d_correct, answered=d_answered,
+                                                score=d_correct * 100.0 / max(d_answered, 1))
+        except IntegrityError:
+            # Another process created the row since our UPDATE; add to it instead.
+            if not _retry:
+                raise
+            _add_counts(name, member, d_correct, d_answered, _retry=False)
+
+def _raise_best(name, member, score):
+    if LeaderboardEntry.objects.filter(board=name, user_id=member, score__lt=score).update(
+            score=score, updated_at=timezone.now()):
+        return
+    if not LeaderboardEntry.objects.filter(board=name, user_id=member).exists():
+        try:
+            with transaction.atomic():
+                LeaderboardEntry.objects.create(board=name, user_id=member, score=score)
+        except IntegrityError:
+            LeaderboardEntry.objects.filter(board=name, user_id=member, score__lt=score).update(score=score)
+
+class RedisStore:
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("LEADERBOARD_REDIS_URL is set but the `redis` package is not installed "
+                                       "(pip install redis) - or unset it to use the in-process store")
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = 'lb:'
+
+    def increment(self, name, member, d_correct, d_answered):
+        key = self.prefix + name
+        pipe = self.redis.pipeline()
+        pipe.hincrby(f"{key}:correct", member, d_correct)
+        pipe.hincrby(f"{key}:answered", member, d_answered)
+        correct, answered = pipe.execute()
+        pipe = self.redis.pipeline()
+        if answered >= MIN_WEEKLY_ANSWERS:
+            pipe.zadd(key, {member: accuracy_score(correct, answered)})
+        for k in (key, f"{key}:correct", f"{key}:answered"):
+            pipe.expire(k, REDIS_WEEK_TTL)
+        pipe.execute()
+
+    def best(self, name, member, score):
+        self.redis.zadd(self.prefix + name, {member: score}, gt=True)
+
+    def rank(self, name, member):
+        pipe = self.redis.pipeline()
+        pipe.zrevrank(self.prefix + name, member)
+        pipe.zscore(self.prefix + name, member)
+        rank, score = pipe.execute()
+        return None if rank is None else (rank, score)
+
+    def top(self, name, k):
+        return [(int(member), score) for member, score in
+                self.redis.zrevrange(self.prefix + name, 0, k - 1, withscores=True)]
+
+    def size(self, name):
+        return self.redis.zcard(self.prefix + name)
+
+    def flush(self):
+        pass  # Redis persists on its own
+
+    def replace(self, name, entries):
+        key = self.prefix + name
+        pipe = self.redis.pipeline()
+        pipe.delete(key, f"{key}:correct", f"{key}:answered")
+        ranked = {member: score for member, score, correct, answered in entries
+                  if not name.startswith('accuracy:') or answered >= MIN_WEEKLY_ANSWERS}
+        if ranked:
+            pipe.zadd(key, ranked)
+        if name.startswith('accuracy:') and entries:
+            pipe.hset(f"{key}:correct", mapping={m: c for m, s, c, a in entries})
+            pipe.hset(f"{key}:answered", mapping={m: a for m, s, c, a in entries})
+            for k in (key, f"{key}:correct", f"{key}:answered"):
+                pipe.expire(k, REDIS_WEEK_TTL)
+        pipe.execute()
+
+_store = {'store': None}
+_store_lock = threading.Lock()
+
+def get_store():
+    with _store_lock:
+        if _store['store'] is None:
+            url = getattr(settings, 'LEADERBOARD_REDIS_URL', None)
+            _store['store'] = RedisStore(url) if url else LocalStore(settings.LEADERBOARD_SYNC_SECONDS)
+        return _store['store']
+
+# --- 3. UPDATES + QUERIES ---
+@timed('leaderboard_update')
+def record_answer(user_id, exam_name, is_correct, answered_at):
+    """Every answer counts (skips as wrong), like the dashboard accuracy."""
+    store, week = get_store(), week_label(answered_at)
+    for name in (accuracy_board(week), accuracy_board(week, exam_name)):
+        store.increment(name, user_id, int(bool(is_correct)), 1)
+
+@timed('leaderboard_update')
+def record_mock(user_id, exam_name, score):
+    """Idempotent (best score wins), so closing a session twice is harmless."""
+    store = get_store()
+    for name in (mock_board(), mock_board(exam_name)):
+        store.best(name, user_id, score)
+
+def top(name, k=10):
+    """[(user_id, score)] best first."""
+    return get_store().top(name, min(k, MAX_TOP))
+
+def rank(name, user_id):
+    """{'rank' (1-based), 'score', 'total', 'percentile'} or None if the user is not ranked."""
+    store = get_store()
+    found = store.rank(name, user_id)
+    if found is None:
+        return None
+    position, score = found
+    total = store.size(name)
+    return {'rank': position + 1, 'score': display_score(name, score), 'total': total,
+            'percentile': round(100.0 * (total - position - 1) / total, 1) if total else None}
+
+# --- 4. REBUILD (from the logs) ---
+def _accuracy_entries(weeks):
+    since = timezone.localtime() - timedelta(weeks=weeks - 1)
+    since = since.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=since.weekday())
+    rows = (UserAnswerLog.objects.filter(attempted_at__gte=since).order_by()
+            .annotate(iso_year=ExtractIsoYear('attempted_at'), iso_week=ExtractWeek('attempted_at'))
+            .values('iso_year', 'iso_week', 'user_id', 'question__exam_name')
+            .annotate(correct=Count('id', filter=Q(is_correct=True)), answered=Count('id')))
+    boards = {}
+    for row in rows:
+        week = f"{row['iso_year']}-W{row['iso_week']:02d}"
+        for name in (accuracy_board(week), accuracy_board(week, row['question__exam_name'])):
+            counts = boards.setdefault(name, {}).setdefault(row['user_id'], [0, 0])
+            counts[0] += row['correct']
+            counts[1] += row['answered']
+    return since, {name: [(member, accuracy_score(c, a), c, a) for member, (c, a) in members.items()]
+                   for name, members in boards.items()}
+
+def _mock_entries(chunk_size=CHUNK_SIZE):
+    exams = dict(Question.objects.order_by().values_list('id', 'exam_name'))
+    parts, session_codes, last_id = [], {}, 0
+    exam_logs = UserAnswerLog.objects.filter(source_mode='exam', session_id__isnull=False).exclude(session_id='')
+    while True:
+        chunk = list(exam_logs.filter(id__gt=last_id).order_by('id').values_list(
+            'id', 'user_id', 'session_id', 'question_id', 'attempted_at', 'is_correct', 'is_skipped')[:chunk_size])
+        if not chunk:
+            break
+        ids, users, sessions, questions, times, correct, skipped = zip(*chunk)
+        parts.append((np.asarray(users, dtype=np.int64),
+                      np.array([session_codes.setdefault(s, len(session_codes)) for s in sessions], dtype=np.int64),
+                      np.asarray(questions, dtype=np.int64), np.array([t.timestamp() for t in times]),
+                      np.asarray(correct, dtype=bool), np.asarray(skipped, dtype=bool)))
+        last_id = ids[-1]
+    if not parts:
+        return {}
+    users, _, scores, last_question = session_scores(*(np.concatenate(col) for col in zip(*parts)))
+    best = {}
+    for member, score, qid in zip(users.tolist(), scores.tolist(), last_question.tolist()):
+        # Same exam as ExamAnalysisAPI's context: the session's most recently answered question
+        for name in (mock_board(), mock_board(exams.get(qid))):
+            if best.setdefault(name, {}).get(member, -math.inf) < score:
+                best[name][member] = score
+    return {name: [(member, score, 0, 0) for member, score in members.items()] for name, members in best.items()}
+
+@timed('leaderboard_rebuild')
+def rebuild_leaderboards(weeks=4):
+    """Recomputes the last `weeks` weekly boards and every mock board; drops older weekly boards."""
+    since, boards = _accuracy_entries(weeks)
+    boards.update(_mock_entries())
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(
+            [LeaderboardEntry(board=name, user_id=member, score=(c * 100.0 / a if a else score), correct=c, answered=a)
+             for name, entries in boards.items() for member, score, c, a in entries], batch_size=1000)
+    store = get_store()
+    for name, entries in boards.items():
+        store.replace(name, entries)
+    return {'boards': len(boards), 'entries': sum(len(entries) for entries in boards.values()), 'since': since}
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from quiz.models import Question, KeywordAnalysis
+from quiz.trends import rebuild_keyword_trends
 import re
 
 class Command(BaseCommand):
@@ -53,4 +54,8 @@ class Command(BaseCommand):
                     )
                     count += 1
 
+        # Rows above were created directly, so the trend cube is rebuilt in one pass.
+        cells = rebuild_keyword_trends()
+        self.stdout.write(f"Rebuilt keyword trend cube ({cells} cells).")
+
         self.stdout.write(self.style.SUCCESS(f"Successfully analyzed {count} keyword occurrences!"))
\ No newline at end of file
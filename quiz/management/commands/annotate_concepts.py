@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from quiz.concepts import reannotate_all, schedule_reannotation
+
+class Command(BaseCommand):
+    help = 'Re-links KnowledgeConcept terms in every question/option (stored concept_spans)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--background', action='store_true', help='Queue it for run_worker instead')
+
+    def handle(self, *args, **options):
+        if options['background']:
+            job = schedule_reannotation()
+            self.stdout.write(self.style.SUCCESS(f"Queued as Job #{job.pk}."))
+            return
+
+        def progress(done, total, written):
+            self.stdout.write(f"  {done}/{total} questions, {written} rows re-linked")
+
+        result = reannotate_all(chunk_size=options['chunk_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {result['questions']} questions against {result['terms']} terms; "
+            f"{result['rows_written']} rows updated."))
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from quiz.archive import archivable, archive_logs
+
+class Command(BaseCommand):
+    help = 'Moves old practice-mode answer logs into rollups + compressed per-user archive blocks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=None,
+                            help=f'Default: ARCHIVE_AFTER_DAYS ({settings.ARCHIVE_AFTER_DAYS})')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Logs per transaction')
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='Only these user ids')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+
+    def handle(self, *args, **options):
+        candidates = archivable(options['older_than_days'])
+        if options['user_ids']:
+            candidates = candidates.filter(user_id__in=options['user_ids'])
+        if options['dry_run']:
+            self.stdout.write(f"{candidates.count()} logs of {candidates.values('user_id').distinct().count()} "
+                              f"users would be archived.")
+            return
+
+        def progress(result, total_users):
+            self.stdout.write(f"  {result['users']}/{total_users} users, {result['logs']} logs archived")
+
+        result = archive_logs(options['older_than_days'], chunk_size=options['chunk_size'],
+                              user_ids=options['user_ids'], progress=progress)
+        per_log = result['bytes'] / result['logs'] if result['logs'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {result['logs']} logs of {result['users']} users into {result['blocks']} blocks "
+            f"({result['bytes'] / 1024:,.1f} KiB, {per_log:.1f} bytes/log)."))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+from quiz.srs import backfill_review_states
+
+class Command(BaseCommand):
+    help = 'Rebuilds the spaced-repetition review queue (ReviewState) from existing answer logs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', nargs='+', type=int, default=None, help='Only rebuild these user ids')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written = backfill_review_states(user_ids=options['users'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} review states in {time.perf_counter() - start:.2f}s."))
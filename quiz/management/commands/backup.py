@@ -0,0 +1,39 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from quiz.backup import DEFAULT_APPS, backup_models, read_manifest, write_backup
+
+class Command(BaseCommand):
+    help = 'Streams the database to a compressed NDJSON backup (full, or incremental since an earlier backup)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Output file, e.g. backups/2025-06-01.ndjson.gz')
+        parser.add_argument('--apps', nargs='+', default=list(DEFAULT_APPS))
+        parser.add_argument('--since', default=None,
+                            help='Earlier backup file; only rows added/changed after it are written')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--compresslevel', type=int, default=6)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        since_watermarks = None
+        if options['since']:
+            try:
+                since_watermarks = read_manifest(options['since'])['watermarks']
+            except FileNotFoundError:
+                raise CommandError(f"No manifest for {options['since']} (expected {options['since']}.manifest.json)")
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        kind = 'incremental' if since_watermarks is not None else 'full'
+        self.stdout.write(f"Writing {kind} backup to {path}...")
+        trailer = write_backup(
+            path, backup_models(options['apps']), using=options['database'],
+            chunk_size=options['chunk_size'], since_watermarks=since_watermarks,
+            compresslevel=options['compresslevel'], log=self.stdout.write,
+        )
+        total = sum(trailer['counts'].values())
+        size_kb = os.path.getsize(path) / 1024
+        self.stdout.write(self.style.SUCCESS(f"Backed up {total} rows ({size_kb:.1f} KB)."))
@@ -0,0 +1,77 @@
+import json
+import time
+
+from django.contrib import admin
+from django.contrib.admin import ModelAdmin
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from quiz.admin_perf import CURSOR_VAR
+from quiz.models import CustomUser, KeywordAnalysis, Question, UserAnswerLog
+
+class Command(BaseCommand):
+    help = ('Times admin changelists (render included) with the performance layer (quiz/admin_perf.py) '
+            'against the same admins without it: first page, a deep page, a filter, a search')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--depth', type=int, default=20000, help='Rows skipped for the deep-page case')
+        parser.add_argument('--search', default='constitution', help='Question search term')
+        parser.add_argument('--repeat', type=int, default=5, help='Best of N per case')
+        parser.add_argument('--json', dest='json_out', default=None, help='Write results to this file')
+
+    def handle(self, *args, **options):
+        if not UserAnswerLog.objects.exists():
+            raise CommandError("No answer logs to page through")
+        # Never saved: a superuser passes every permission check without a session
+        user = CustomUser(username='bench-admin', is_staff=True, is_superuser=True, is_active=True)
+        depth = min(options['depth'], UserAnswerLog.objects.count() - 1)
+        deep_pk = UserAnswerLog.objects.order_by('-pk').values_list('pk', flat=True)[depth - 1] if depth else 0
+        per_page = admin.site._registry[UserAnswerLog].list_per_page
+        cases = [
+            # (name, model, params before, params after)
+            ('logs: first page', UserAnswerLog, {}, {}),
+            (f'logs: row {depth:,}', UserAnswerLog, {'p': depth // per_page + 1}, {CURSOR_VAR: deep_pk}),
+            ('logs: is_correct filter', UserAnswerLog, {'is_correct__exact': '1'}, {'is_correct__exact': '1'}),
+            ('keywords: first page', KeywordAnalysis, {}, {}),
+            ('questions: search', Question, {'q': options['search']}, {'q': options['search']}),
+        ]
+        results = []
+        self.stdout.write(f"{'changelist':<28} {'before ms':>10} {'queries':>8} {'after ms':>10} {'queries':>8} "
+                          f"{'speedup':>8}")
+        for name, model, before_params, after_params in cases:
+            registered = admin.site._registry[model]
+            before = self.run_case(self.baseline(registered), before_params, user, options['repeat'])
+            after = self.run_case(registered, after_params, user, options['repeat'])
+            results.append({'case': name, 'before': before, 'after': after})
+            self.stdout.write(f"{name:<28} {before['ms']:>10.1f} {before['queries']:>8} {after['ms']:>10.1f} "
+                              f"{after['queries']:>8} {before['ms'] / max(after['ms'], 1e-6):>7.1f}x")
+        if options['json_out']:
+            with open(options['json_out'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['json_out']}"))
+
+    @staticmethod
+    def baseline(registered):
+        """The registered admin with Django's defaults back: exact counts, OFFSET pages, no joins, icontains."""
+        cls = type(f'Baseline{type(registered).__name__}', (type(registered),), {
+            'paginator': Paginator, 'show_full_result_count': True, 'list_select_related': False,
+            'sortable_by': None, 'get_changelist': ModelAdmin.get_changelist,
+            'get_search_results': ModelAdmin.get_search_results,
+        })
+        return cls(registered.model, registered.admin_site)
+
+    @staticmethod
+    def run_case(model_admin, params, user, repeat):
+        factory = RequestFactory()
+        best, queries = float('inf'), 0
+        for _ in range(repeat):
+            request = factory.get('/admin/', params)
+            request.user = user
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                model_admin.changelist_view(request).render()
+                elapsed = (time.perf_counter() - start) * 1000
+            best, queries = min(best, elapsed), len(captured.captured_queries)
+        return {'ms': best, 'queries': queries}
@@ -0,0 +1,74 @@
+import json
+import timeit
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from quiz.benchmarks import BENCHMARKS
+
+class Command(BaseCommand):
+    help = 'Microbenchmarks the pure-Python hot functions (ops/sec + allocations) on fixed synthetic inputs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10, 100, 1000, 10000])
+        parser.add_argument('--only', nargs='+', default=None, help='Benchmark names to run (default: all)')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--min-time', type=float, default=0.2, help='Seconds per timing round')
+        parser.add_argument('--json', dest='json_out', default=None, help='Write results to this file')
+        parser.add_argument('--compare', default=None, help='Earlier --json file to compare against')
+
+    def handle(self, *args, **options):
+        names = options['only'] or list(BENCHMARKS)
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f"Unknown benchmark(s): {', '.join(unknown)}. Choose from: {', '.join(BENCHMARKS)}")
+
+        baseline = {}
+        if options['compare']:
+            with open(options['compare']) as fh:
+                baseline = {(r['name'], r['size']): r for r in json.load(fh)}
+
+        results = []
+        self.stdout.write(f"{'benchmark':<45} {'size':>7} {'ops/sec':>12} {'us/op':>11} {'peak KiB':>10} {'blocks':>8}")
+        for name in names:
+            for size in options['sizes']:
+                result = self.run_one(name, size, options['repeat'], options['min_time'])
+                results.append(result)
+
+                line = (f"{name:<45} {size:>7} {result['ops_per_sec']:>12,.1f} {result['us_per_op']:>11,.2f} "
+                        f"{result['peak_bytes'] / 1024:>10,.1f} {result['alloc_blocks']:>8}")
+                before = baseline.get((name, size))
+                if before:
+                    line += f"  ({result['ops_per_sec'] / before['ops_per_sec']:.2f}x vs baseline)"
+                self.stdout.write(line)
+
+        if options['json_out']:
+            with open(options['json_out'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['json_out']}"))
+
+    def run_one(self, name, size, repeat, min_time):
+        fn = BENCHMARKS[name](size)
+        fn()  # warm-up (regex caches, attribute lookups)
+
+        # 1. Throughput: pick a loop count that fills `min_time`, keep the best round.
+        timer = timeit.Timer(fn)
+        number, elapsed = timer.autorange()
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+        best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+        # 2. Allocations for a single call (peak traced bytes + blocks still alive afterwards).
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        kept = fn()
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+        del kept
+
+        return {
+            'name': name, 'size': size,
+            'ops_per_sec': 1.0 / best, 'us_per_op': best * 1e6,
+            'peak_bytes': peak, 'alloc_blocks': blocks,
+        }
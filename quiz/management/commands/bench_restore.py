@@ -0,0 +1,95 @@
+import gzip
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from quiz.backup import FORMAT, VERSION
+from quiz.models import CustomUser, Question, UserAnswerLog
+
+class Command(BaseCommand):
+    help = 'Benchmarks `restore` on a synthetic backup with N answer logs, inside a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Answer logs in the synthetic backup')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--questions', type=int, default=5000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--txn-rows', type=int, default=200000)
+
+    def handle(self, *args, **options):
+        fd, path = tempfile.mkstemp(suffix='.ndjson.gz')
+        os.close(fd)
+        try:
+            start = time.perf_counter()
+            self.write_synthetic(path, options)
+            self.stdout.write(f"Generated {options['rows']:,} logs in {time.perf_counter() - start:.1f}s "
+                              f"({os.path.getsize(path) / 1024 / 1024:.1f} MB compressed)")
+
+            # Never touch the real database: restore into a fresh test database.
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                start = time.perf_counter()
+                call_command('restore', path, batch_size=options['batch_size'],
+                             txn_rows=options['txn_rows'], stdout=open(os.devnull, 'w'))
+                elapsed = time.perf_counter() - start
+                restored = UserAnswerLog.objects.count()
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            os.remove(path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Restored {restored:,} answer logs in {elapsed:.1f}s ({restored / elapsed:,.0f} rows/sec) "
+            f"on {connection.vendor}"))
+
+    def write_synthetic(self, path, options):
+        rng = random.Random(42)
+        start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        dumps = json.JSONEncoder(separators=(',', ':')).encode
+
+        def header(model):
+            return dumps({'model': model._meta.label_lower,
+                          'fields': [f.attname for f in model._meta.concrete_fields]}) + '\n'
+
+        def row(model, values):
+            # Column order follows the current schema; unspecified columns take their defaults.
+            return dumps([self.jsonable(values[f.attname] if f.attname in values else f.get_default())
+                          for f in model._meta.concrete_fields]) + '\n'
+
+        with gzip.open(path, 'wt', encoding='utf-8', compresslevel=1) as fh:
+            fh.write(dumps({'format': FORMAT, 'version': VERSION, 'incremental': False}) + '\n')
+
+            fh.write(header(CustomUser))
+            for uid in range(1, options['users'] + 1):
+                fh.write(row(CustomUser, {'id': uid, 'username': f'bench{uid}', 'password': '!', 'date_joined': start}))
+
+            fh.write(header(Question))
+            patterns = [code for code, _ in Question.PATTERN_CHOICES]
+            subjects = [code for code, _ in Question.SUBJECT_CHOICES]
+            for qid in range(1, options['questions'] + 1):
+                fh.write(row(Question, {'id': qid, 'subject': rng.choice(subjects), 'pattern': rng.choice(patterns),
+                                        'year': 2013 + qid % 12, 'text': f'Synthetic question {qid}'}))
+
+            fh.write(header(UserAnswerLog))
+            for lid in range(1, options['rows'] + 1):
+                skipped = rng.random() < 0.1
+                fh.write(row(UserAnswerLog, {
+                    'id': lid, 'user_id': rng.randint(1, options['users']),
+                    'question_id': rng.randint(1, options['questions']), 'selected_option_id': None,
+                    'is_correct': (not skipped) and rng.random() < 0.55, 'is_skipped': skipped,
+                    'time_taken_seconds': rng.randint(3, 200), 'confidence_score': rng.choice([25, 50, 75, 100]),
+                    'source_mode': rng.choice(['exam', 'practice']),
+                    'attempted_at': start + timedelta(seconds=lid * 7), 'session_id': None,
+                }))
+            fh.write(dumps({'end': True}) + '\n')
+
+    @staticmethod
+    def jsonable(value):
+        return value.isoformat() if isinstance(value, datetime) else value
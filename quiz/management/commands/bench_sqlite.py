@@ -0,0 +1,129 @@
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test.utils import override_settings
+from django.utils import timezone
+from quiz.models import CustomUser, Question, UserAnswerLog
+from quiz.sqlite_mode import serialized_write
+from quiz.srs import record_answer
+
+# mode -> (SQLITE_CONCURRENT, SQLITE_WRITE_QUEUE)
+MODES = {'default': (False, False), 'wal': (True, False), 'wal+queue': (True, True)}
+
+class Command(BaseCommand):
+    help = ('Mixed read/write throughput of the answer-logging path on SQLite, with N threads, '
+            'in a throwaway test database: rollback journal vs WAL pragmas vs WAL + serialized writer')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--seconds', type=float, default=5.0, help='Per mode')
+        parser.add_argument('--write-ratio', type=float, default=0.3, help='Share of operations that are answers')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--questions', type=int, default=2000)
+        parser.add_argument('--seed-logs', type=int, default=50000)
+        parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError(f"Only meaningful on SQLite (this database is {connection.vendor})")
+
+        # Never touch the real database; a file (not :memory:) so journal modes apply.
+        fd, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        old_name = connection.settings_dict['NAME']
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = path
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.seed(options)
+            self.stdout.write(f"{'mode':<10} {'ops/sec':>9} {'reads/s':>9} {'writes/s':>9} {'errors':>7} "
+                              f"{'read p95 ms':>12} {'write p50 ms':>13} {'write p95 ms':>13}")
+            for mode in options['modes']:
+                result = self.run_mode(mode, options)
+                self.stdout.write(
+                    f"{mode:<10} {result['ops'] / result['seconds']:>9,.0f} {result['reads'] / result['seconds']:>9,.0f} "
+                    f"{result['writes'] / result['seconds']:>9,.0f} {result['errors']:>7} "
+                    f"{result['read_p95']:>12.1f} {result['write_p50']:>13.1f} {result['write_p95']:>13.1f}")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            for suffix in ('-wal', '-shm', '.write-lock'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    def seed(self, options):
+        rng = random.Random(42)
+        CustomUser.objects.bulk_create([CustomUser(username=f'bench{i}', password='!')
+                                        for i in range(options['users'])])
+        Question.objects.bulk_create([Question(subject='History', pattern='elim_classical', text=f'Q{i}')
+                                      for i in range(options['questions'])])
+        self.user_ids = list(CustomUser.objects.values_list('id', flat=True))
+        self.question_ids = list(Question.objects.values_list('id', flat=True))
+        UserAnswerLog.objects.bulk_create(
+            [UserAnswerLog(user_id=rng.choice(self.user_ids), question_id=rng.choice(self.question_ids),
+                           is_correct=rng.random() < 0.6) for _ in range(options['seed_logs'])],
+            batch_size=5000)
+
+    def run_mode(self, mode, options):
+        concurrent, write_queue = MODES[mode]
+        with override_settings(SQLITE_CONCURRENT=concurrent, SQLITE_WRITE_QUEUE=write_queue):
+            connection.close()
+            if not concurrent:
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode=DELETE')  # WAL is sticky in the file
+            connection.close()
+
+            stats = {'reads': 0, 'writes': 0, 'errors': 0, 'read_ms': [], 'write_ms': []}
+            lock = threading.Lock()
+            deadline = time.perf_counter() + options['seconds']
+            threads = [threading.Thread(target=self.worker, args=(i, deadline, options['write_ratio'], stats, lock))
+                       for i in range(options['threads'])]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            seconds = time.perf_counter() - started
+
+        def pct(values, q):
+            return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else 0.0
+        return {'seconds': seconds, 'ops': stats['reads'] + stats['writes'], 'reads': stats['reads'],
+                'writes': stats['writes'], 'errors': stats['errors'], 'read_p95': pct(stats['read_ms'], 95),
+                'write_p50': pct(stats['write_ms'], 50), 'write_p95': pct(stats['write_ms'], 95)}
+
+    def worker(self, index, deadline, write_ratio, stats, lock):
+        rng = random.Random(index)
+        try:
+            while time.perf_counter() < deadline:
+                user_id = rng.choice(self.user_ids)
+                is_write = rng.random() < write_ratio
+                start = time.perf_counter()
+                try:
+                    if is_write:
+                        self.answer(user_id, rng.choice(self.question_ids), rng.random() < 0.6)
+                    else:
+                        # The dashboard's first reads
+                        list(UserAnswerLog.objects.filter(user_id=user_id).order_by('-attempted_at')[:100])
+                        UserAnswerLog.objects.filter(user_id=user_id, is_correct=True).count()
+                except OperationalError:  # "database is locked"
+                    with lock:
+                        stats['errors'] += 1
+                    continue
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    stats['writes' if is_write else 'reads'] += 1
+                    stats['write_ms' if is_write else 'read_ms'].append(elapsed)
+        finally:
+            connection.close()
+
+    def answer(self, user_id, question_id, is_correct):
+        """The save_user_answer write: log row + revision-queue update."""
+        def write():
+            log = UserAnswerLog.objects.create(user_id=user_id, question_id=question_id, is_correct=is_correct,
+                                               confidence_score=40)
+            record_answer(user_id, question_id, is_correct, False, 40, log.attempted_at or timezone.now())
+        serialized_write(write)
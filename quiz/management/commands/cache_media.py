@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from quiz.jobs import enqueue
+from quiz.media import fetch_pending, referenced_urls, register_urls
+from quiz.models import CachedMedia
+
+class Command(BaseCommand):
+    help = ('Downloads every referenced question / option / concept image into the shared media cache '
+            '(content-addressed originals + resized WebP variants)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Fetch at most this many images')
+        parser.add_argument('--retry-failed', action='store_true', help='Try the permanently failed ones again')
+        parser.add_argument('--background', action='store_true', help='Queue the fetch for run_worker instead')
+
+    def handle(self, *args, **options):
+        new = register_urls(referenced_urls())
+        self.stdout.write(f"{new} new image URLs registered, "
+                          f"{CachedMedia.objects.filter(status='pending').count()} pending.")
+        if options['background']:
+            if options['retry_failed']:
+                CachedMedia.objects.filter(status='failed').update(status='pending', attempts=0)
+            job = enqueue('fetch_media', {'limit': options['limit']}, message="Caching question / concept images")
+            self.stdout.write(self.style.SUCCESS(f"Queued as Job #{job.pk}."))
+            return
+
+        def progress(done, total, result):
+            if done % 50 == 0 or done == total:
+                self.stdout.write(f"  {done}/{total} ({result['fetched']} cached, {result['failed']} failed)")
+
+        result = fetch_pending(limit=options['limit'], retry_failed=options['retry_failed'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['fetched']} cached, {result['failed']} failed. "
+            f"{CachedMedia.objects.filter(status='ready').count()} ready, "
+            f"{CachedMedia.objects.filter(status='failed').count()} given up on."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from quiz.calibration import calibrate, watermark
+from quiz.jobs import enqueue
+
+class Command(BaseCommand):
+    help = 'Fits per-question difficulty / discrimination (2PL IRT) from the answer logs into QuestionStats'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Refit from every log instead of only the logs after the last run')
+        parser.add_argument('--chunk-size', type=int, default=50000)
+        parser.add_argument('--background', action='store_true', help='Queue it for run_worker instead')
+
+    def handle(self, *args, **options):
+        if options['background']:
+            job = enqueue('calibrate_questions', {'full': options['full']}, message="Calibrating question difficulty")
+            self.stdout.write(self.style.SUCCESS(f"Queued as Job #{job.pk}."))
+            return
+
+        self.stdout.write(f"Watermark: log #{watermark()}{' (ignored, --full)' if options['full'] else ''}")
+
+        def progress(rows, total):
+            self.stdout.write(f"  {rows}/{total} answer logs")
+
+        run = calibrate(full=options['full'], chunk_size=options['chunk_size'], progress=progress)
+        ll = f"{run.log_likelihood:.4f}" if run.log_likelihood is not None else "-"
+        self.stdout.write(self.style.SUCCESS(
+            f"{run.mode.title()} fit: {run.answers} answers, {run.questions} questions, {run.users} users, "
+            f"{run.iterations} iterations, mean log-likelihood {ll}, {run.seconds:.2f}s. "
+            f"Watermark now log #{run.last_log_id}."))
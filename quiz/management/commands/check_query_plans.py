@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from quiz.models import CustomUser
+from quiz.query_plans import VIEW_CHECKS, check_query_plans
+
+class Command(BaseCommand):
+    help = 'EXPLAINs every query the API views run and fails if one full-scans a hot table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default=None, help='Username to run the views as (default: latest exam taker)')
+        parser.add_argument('--session', default=None, help='Exam session id for the analysis view')
+        parser.add_argument('--only', nargs='+', default=None, help='View checks to run (default: all)')
+        parser.add_argument('--verbose', action='store_true', help='Print every query with its plan')
+        parser.add_argument('--json', dest='json_out', default=None, help='Write the plans to this file')
+
+    def handle(self, *args, **options):
+        names = [name for name, *_ in VIEW_CHECKS]
+        unknown = [name for name in options['only'] or [] if name not in names]
+        if unknown:
+            raise CommandError(f"Unknown check(s): {', '.join(unknown)}. Choose from: {', '.join(names)}")
+        user = None
+        if options['user']:
+            user = CustomUser.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user named {options['user']!r}")
+
+        results = check_query_plans(user, options['session'], options['only'])
+        for name in options['only'] or names:
+            rows = [r for r in results if r['view'] == name]
+            failed = [r for r in rows if r['failed']]
+            sorted_ = sum(bool(r['sorts']) for r in rows)
+            status = self.style.ERROR('FULL SCAN') if failed else self.style.SUCCESS('ok')
+            self.stdout.write(f"{name:<22} {len(rows):>3} queries  {sorted_:>2} with temp sorts  {status}")
+            for row in rows if options['verbose'] else failed:
+                self.stdout.write(f"    {row['sql'][:300]}")
+                for line in row['plan']:
+                    self.stdout.write(f"      {line}")
+
+        if options['json_out']:
+            with open(options['json_out'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} plans to {options['json_out']}"))
+
+        failed = sorted({(r['view'], t) for r in results for t in r['full_scans']})
+        if failed:
+            raise CommandError('Full scans: ' + ', '.join(f"{view} -> {table}" for view, table in failed))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from quiz.dedup import DUPLICATE_THRESHOLD, duplicate_clusters, index_questions, unindexed_questions
+from quiz.models import Question
+
+class Command(BaseCommand):
+    help = 'Reports clusters of near-duplicate questions (MinHash/LSH index; --reindex builds it first)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reindex', action='store_true', help='Index questions that have no signature yet')
+        parser.add_argument('--all', action='store_true', help='With --reindex: rebuild every signature')
+        parser.add_argument('--threshold', type=float, default=DUPLICATE_THRESHOLD, help='Min estimated Jaccard (0-1)')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--limit', type=int, default=50, help='Clusters to print')
+
+    def handle(self, *args, **options):
+        if options['reindex']:
+            qs = Question.objects.all() if options['all'] else unindexed_questions()
+            ids = list(qs.order_by('id').values_list('id', flat=True))
+            for i in range(0, len(ids), options['chunk_size']):
+                chunk = Question.objects.filter(id__in=ids[i:i + options['chunk_size']]).prefetch_related('options')
+                index_questions([(q, list(q.options.all())) for q in chunk])
+            self.stdout.write(f"Indexed {len(ids)} questions.")
+
+        clusters = duplicate_clusters(threshold=options['threshold'])
+        texts = dict(Question.objects.filter(id__in=[qid for c in clusters[:options['limit']] for qid in c])
+                     .values_list('id', 'text'))
+        for number, cluster in enumerate(clusters[:options['limit']], start=1):
+            self.stdout.write(self.style.WARNING(f"Cluster {number} ({len(cluster)} questions):"))
+            for qid in cluster:
+                self.stdout.write(f"  Q{qid}: {texts.get(qid, '')[:90]}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(clusters)} duplicate clusters, {sum(len(c) for c in clusters)} questions involved."))
@@ -0,0 +1,48 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+from quiz.bulk_import import DEFAULT_CHUNK_SIZE, BulkQuestionImporter, RowError, read_rows
+
+class Command(BaseCommand):
+    help = 'Bulk-imports PYQs from CSV/Excel (same columns as the admin import) in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='.csv, .xlsx (needs openpyxl) or any tablib format')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Validate and write inside a rolled-back transaction')
+        parser.add_argument('--errors-csv', default=None, help='Write per-row errors to this CSV')
+        parser.add_argument('--skip-near-duplicates', action='store_true',
+                            help='Do not create questions that are near duplicates of existing ones')
+
+    def handle(self, *args, **options):
+        def progress(report):
+            self.stdout.write(f"  {report.rows} rows ({report.rows_per_sec:,.0f} rows/sec), "
+                              f"{report.created} created, {report.updated} updated, {len(report.errors)} errors")
+
+        importer = BulkQuestionImporter(chunk_size=options['chunk_size'], dry_run=options['dry_run'], progress=progress,
+                                        skip_near_duplicates=options['skip_near_duplicates'])
+        try:
+            report = importer.run(read_rows(options['path']))
+        except (RowError, FileNotFoundError) as e:
+            raise CommandError(str(e))
+
+        for row_number, message in report.errors[:20]:
+            self.stdout.write(self.style.WARNING(f"  Row {row_number}: {message}"))
+        if len(report.errors) > 20:
+            self.stdout.write(self.style.WARNING(f"  ... and {len(report.errors) - 20} more"))
+        if options['errors_csv'] and report.errors:
+            with open(options['errors_csv'], 'w', newline='') as fh:
+                writer = csv.writer(fh)
+                writer.writerow(['row', 'error'])
+                writer.writerows(report.errors)
+
+        for row_number, qid, score in report.duplicates[:20]:
+            self.stdout.write(self.style.WARNING(f"  Row {row_number}: near duplicate of Q{qid} ({score:.0%} similar)"))
+        if len(report.duplicates) > 20:
+            self.stdout.write(self.style.WARNING(f"  ... and {len(report.duplicates) - 20} more near duplicates"))
+
+        prefix = "[DRY RUN] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Imported {report.rows} rows in {report.elapsed:.1f}s ({report.rows_per_sec:,.0f} rows/sec): "
+            f"{report.created} created, {report.updated} updated, {len(report.errors)} errors, "
+            f"{len(report.duplicates)} near duplicates{' (skipped)' if options['skip_near_duplicates'] else ''}."))
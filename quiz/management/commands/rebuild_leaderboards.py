@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from quiz.leaderboard import get_store, rebuild_leaderboards
+
+class Command(BaseCommand):
+    help = 'Recomputes the weekly accuracy and mock score leaderboards from UserAnswerLog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, default=4, help='Weekly boards to rebuild (older ones are dropped)')
+
+    def handle(self, *args, **options):
+        result = rebuild_leaderboards(weeks=options['weeks'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {result['boards']} boards ({result['entries']} entries) into "
+            f"{type(get_store()).__name__}; weekly boards from {result['since']:%Y-%m-%d}."))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections, router
+from quiz.models import LibrarySearchEntry
+from quiz.search import backend, rebuild
+
+class Command(BaseCommand):
+    help = ("Rebuilds the library search entries (notes + active bookmarks) behind /api/user/library/search/; "
+            "the FTS5 / tsvector index follows them")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', nargs='+', type=int, default=None, help='Only rebuild these user ids')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        kind = backend(connections[router.db_for_write(LibrarySearchEntry)])
+        self.stdout.write(f"Index: {kind or 'none (icontains fallback)'}")
+        start = time.perf_counter()
+
+        def progress(done, total):
+            self.stdout.write(f"  {done}/{total} entries")
+
+        written = rebuild(user_ids=options['users'], chunk_size=options['chunk_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} entries in {time.perf_counter() - start:.2f}s."))
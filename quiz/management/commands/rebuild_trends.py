@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from quiz.trends import rebuild_keyword_trends, rebuild_term_index
+
+class Command(BaseCommand):
+    help = 'Rebuilds the keyword trend cube and the question term index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--skip-terms', action='store_true', help='Only rebuild the keyword cube')
+
+    def handle(self, *args, **options):
+        cells = rebuild_keyword_trends()
+        self.stdout.write(f"Keyword trend cube: {cells} cells.")
+        if not options['skip_terms']:
+            def progress(done, total):
+                self.stdout.write(f"  {done}/{total} questions indexed")
+            indexed = rebuild_term_index(chunk_size=options['chunk_size'], progress=progress)
+            self.stdout.write(f"Term index: {indexed} questions.")
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from quiz.cohort import refresh_snapshot, schedule_refresh, snapshot_name
+
+class Command(BaseCommand):
+    help = 'Rebuilds the cohort percentile snapshot (sorted per-user accuracy / radar / mock score columns)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=50000)
+        parser.add_argument('--background', action='store_true',
+                            help='Queue it for run_worker instead (it then re-queues itself every '
+                                 'COHORT_REFRESH_SECONDS)')
+
+    def handle(self, *args, **options):
+        if options['background']:
+            job = schedule_refresh()
+            self.stdout.write(self.style.SUCCESS(f"Queued as Job #{job.pk}."))
+            return
+
+        def progress(rows, total):
+            self.stdout.write(f"  {rows}/{total} answer logs")
+
+        meta = refresh_snapshot(chunk_size=options['chunk_size'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot of {meta['users']} users from {meta['rows']} logs in {meta['build_seconds']:.2f}s, "
+            f"{meta['nbytes'] / 1024:,.1f} KiB of columns -> {snapshot_name()}"))
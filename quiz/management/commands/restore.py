@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from quiz.backup import Restorer, backup_models, open_backup_lines
+
+class Command(BaseCommand):
+    help = 'Restores a backup written by `manage.py backup` using bulk_create in dependency order'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='Full backup first, then any incremental files in order')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--txn-rows', type=int, default=200000, help='Rows per committed transaction')
+        parser.add_argument('--flush', action='store_true', help='Delete existing rows of the backed-up apps first')
+        parser.add_argument('--upsert', action='store_true', help='Update rows that already exist (implied for incremental files)')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if options['flush']:
+            self.flush(using)
+
+        start = time.perf_counter()
+        total = 0
+        for path in options['paths']:
+            self.stdout.write(f"Restoring {path}...")
+            restorer = Restorer(using=using, batch_size=options['batch_size'], txn_rows=options['txn_rows'],
+                                upsert=options['upsert'], log=self.stdout.write)
+            fh, lines = open_backup_lines(path)
+            try:
+                counts = restorer.restore(lines)
+            except ValueError as e:
+                raise CommandError(f"{path}: {e}")
+            finally:
+                fh.close()
+            total += sum(counts.values())
+
+        elapsed = time.perf_counter() - start
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f"Restored {total} rows in {elapsed:.1f}s ({rate:,.0f} rows/sec)."))
+
+    def flush(self, using):
+        # Children before parents so FK constraints hold.
+        connection = connections[using]
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            for model in reversed(backup_models()):
+                cursor.execute(f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)}")
+        self.stdout.write("Flushed existing rows.")
@@ -0,0 +1,76 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from quiz.cohort import seed_refresh
+from quiz.jobs import claim_next, load_handlers, requeue_stale, run_job, run_pending, worker_name
+
+REQUEUE_EVERY_SECONDS = 60  # Re-check for jobs orphaned by a dead worker (jobs.STALE_AFTER) this often
+
+def worker_loop(kinds, poll_seconds):
+    stop = {'flag': False}
+
+    def request_stop(signum, frame):
+        stop['flag'] = True  # finish the current job, then exit
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    name = worker_name()
+    next_requeue = time.monotonic() + REQUEUE_EVERY_SECONDS
+    while not stop['flag']:
+        close_old_connections()
+        if time.monotonic() >= next_requeue:
+            # A worker that dies mid-run must not strand its job until the next restart
+            requeue_stale()
+            next_requeue = time.monotonic() + REQUEUE_EVERY_SECONDS
+        job = claim_next(name, kinds)
+        if job is None:
+            time.sleep(poll_seconds)
+            continue
+        run_job(job)
+
+class Command(BaseCommand):
+    help = 'Runs background jobs (generate_tags, analyze_keywords, import_questions...) from the Job table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--kinds', nargs='+', default=None, help='Only run these job kinds')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue in this process and exit')
+
+    def handle(self, *args, **options):
+        load_handlers()
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s).")
+        seeded = seed_refresh()
+        if seeded:
+            self.stdout.write(f"Queued the cohort percentile refresh as Job #{seeded.pk}.")
+
+        if options['once']:
+            ran = run_pending(kinds=options['kinds'])
+            self.stdout.write(self.style.SUCCESS(f"Ran {ran} job(s)."))
+            return
+
+        # Children must not inherit the parent's DB connection. Fork keeps the
+        # already-configured Django app registry in the children.
+        connections.close_all()
+        ctx = multiprocessing.get_context('fork')
+        procs = [
+            ctx.Process(target=worker_loop, args=(options['kinds'], options['poll']), daemon=False)
+            for _ in range(options['processes'])
+        ]
+        for proc in procs:
+            proc.start()
+        self.stdout.write(self.style.SUCCESS(f"Started {len(procs)} worker process(es)."))
+
+        def forward(signum, frame):
+            for proc in procs:
+                if proc.is_alive():
+                    proc.terminate()
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for proc in procs:
+            proc.join()
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from quiz.models import Question, TaggingJob
+from quiz.tagging import DEFAULT_MODEL, TaggingEngine
+
+class Command(BaseCommand):
+    help = 'Generates LLM tags for questions (cached, concurrent, resumable via --resume JOB_ID)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--untagged', action='store_true', help='Only questions with empty tags')
+        parser.add_argument('--ids', nargs='+', type=int, default=None)
+        parser.add_argument('--resume', type=int, default=None, help='Continue an interrupted TaggingJob')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--per-minute', type=int, default=30, help='Max LLM calls per minute')
+        parser.add_argument('--model', default=DEFAULT_MODEL)
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            try:
+                job = TaggingJob.objects.get(pk=options['resume'])
+            except TaggingJob.DoesNotExist:
+                raise CommandError(f"TaggingJob #{options['resume']} not found")
+            self.stdout.write(f"Resuming job #{job.pk} at {job.next_index}/{job.total}")
+        else:
+            qs = Question.objects.order_by('id')
+            if options['ids']:
+                qs = qs.filter(id__in=options['ids'])
+            if options['untagged']:
+                qs = qs.filter(tags__isnull=True) | qs.filter(tags='')
+            job = TaggingEngine.create_job(qs.values_list('id', flat=True), model_name=options['model'])
+            self.stdout.write(f"Created job #{job.pk} for {job.total} questions")
+
+        def progress(job):
+            self.stdout.write(f"  {job.next_index}/{job.total}: {job.tagged} tagged, {job.cached} cached, "
+                              f"{job.skipped} unchanged, {job.failed} failed")
+
+        engine = TaggingEngine(model_name=job.model_name, concurrency=options['concurrency'],
+                               per_minute=options['per_minute'], progress=progress)
+        try:
+            engine.run(job)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Job #{job.pk} done."))
@@ -0,0 +1,216 @@
+# quiz/mastery.py
+# Per-(user, question) mastery records (QuestionMastery) for longitudinal growth reports.
+#   - record_answer(): incremental, called by save_user_answer. One UPDATE with F() expressions
+#     (attempts, correct count, streak, first-correct date, result before this session);
+#     an INSERT only for the first answer to a question
+#   - backfill_mastery(): rebuilds the table from UserAnswerLog + archived blocks, vectorized
+#     with numpy reduceat over (user, question) runs, like srs.backfill_review_states()
+#   - session_growth(): ExamAnalysisAPI's growth_report from ONE indexed query on
+#     (user, question__in=<session questions>): every question is compared with its latest
+#     answer before the session, whichever earlier session (or practice) that was. Only questions
+#     answered again since (a re-opened old session) fall back to their logs. has_history keeps
+#     its meaning (an earlier comparable session exists, decided by the view); `compared` counts
+#     the questions that had an earlier answer
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.db import IntegrityError, transaction
+from django.db.models import BooleanField, Case, DateTimeField, F, Value, When
+from django.db.models.functions import Coalesce
+
+from .archive import FLAG_CORRECT, FLAG_SKIPPED, decode_block, iter_archive_arrays
+from .metrics import timed
+from .models import AnswerArchive, QuestionMastery, UserAnswerLog
+
+MASTERY_STREAK = 3  # Correct answers in a row that count as mastered
+
+# --- 1. INCREMENTAL UPDATE (one logged answer) ---
+@timed('mastery_update')
+def record_answer(user_id, question_id, is_correct, is_skipped, session_id, answered_at, _retry=True):
+    correct = bool(is_correct) and not is_skipped
+    # Answers without a session are each their own; within one session the prior result is kept
+    prior = F('last_is_correct')
+    if session_id:
+        prior = Case(When(last_session_id=session_id, then=F('prior_is_correct')),
+                     default=F('last_is_correct'), output_field=BooleanField())
+    changes = {
+        'attempts': F('attempts') + 1, 'correct_count': F('correct_count') + int(correct),
+        'streak': F('streak') + 1 if correct else 0, 'last_is_correct': correct,
+        'last_session_id': session_id, 'prior_is_correct': prior, 'last_attempted_at': answered_at,
+    }
+    if correct:
+        changes['first_correct_at'] = Coalesce('first_correct_at', Value(answered_at, output_field=DateTimeField()))
+    if QuestionMastery.objects.filter(user_id=user_id, question_id=question_id).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            QuestionMastery.objects.create(
+                user_id=user_id, question_id=question_id, attempts=1, correct_count=int(correct),
+                streak=int(correct), last_is_correct=correct, last_session_id=session_id,
+                first_attempted_at=answered_at, first_correct_at=answered_at if correct else None,
+                last_attempted_at=answered_at)
+    except IntegrityError:
+        # Two first answers for the pair raced on the unique row; the retry updates it.
+        if not _retry:
+            raise
+        record_answer(user_id, question_id, is_correct, is_skipped, session_id, answered_at, _retry=False)
+
+# --- 2. VECTORIZED BACKFILL ---
+def load_mastery_arrays(user_ids=None, chunk_size=20000):
+    """Columns of every answer (live + archived); sessions as int codes (-1 = none) + the code -> id list."""
+    codes, names = {}, []
+
+    def code(session_id):
+        if not session_id:
+            return -1
+        if session_id not in codes:
+            codes[session_id] = len(names)
+            names.append(session_id)
+        return codes[session_id]
+
+    logs = UserAnswerLog.objects.order_by()  # Sorted in numpy below
+    if user_ids:
+        logs = logs.filter(user_id__in=user_ids)
+    users, questions, times, correct, sessions = [], [], [], [], []
+    for u, q, t, c, s, sid in (logs.values_list('user_id', 'question_id', 'attempted_at', 'is_correct',
+                                                'is_skipped', 'session_id').iterator(chunk_size=chunk_size)):
+        users.append(u); questions.append(q); times.append(t.timestamp())
+        correct.append(c and not s); sessions.append(code(sid))
+    parts = [{
+        'user': np.array(users, dtype=np.int64), 'question': np.array(questions, dtype=np.int64),
+        'time': np.array(times, dtype=np.float64), 'correct': np.array(correct, dtype=bool),
+        'session': np.array(sessions, dtype=np.int64),
+    }]
+    for user_id, block in iter_archive_arrays(user_ids):
+        extras = block['extras']
+        parts.append({
+            'user': np.full(len(block['id']), user_id, dtype=np.int64), 'question': block['question'],
+            'time': block['attempted_at'],
+            'correct': ((block['flags'] & FLAG_CORRECT) != 0) & ((block['flags'] & FLAG_SKIPPED) == 0),
+            'session': np.array([code(extras.get(str(i), {}).get('session_id')) for i in block['id'].tolist()],
+                                dtype=np.int64),
+        })
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}, names
+
+def compute_mastery(logs):
+    """One entry per (user, question) pair: the QuestionMastery columns as arrays."""
+    n = len(logs['user'])
+    if n == 0:
+        return None
+    order = np.lexsort((logs['time'], logs['question'], logs['user']))
+    user, question, when = logs['user'][order], logs['question'][order], logs['time'][order]
+    correct, session = logs['correct'][order], logs['session'][order]
+    idx = np.arange(n)
+    session = np.where(session < 0, -2 - idx, session)  # No session: a session of its own
+
+    new_pair = np.ones(n, dtype=bool)
+    new_pair[1:] = (user[1:] != user[:-1]) | (question[1:] != question[:-1])
+    starts = np.flatnonzero(new_pair)
+    counts = np.diff(np.append(starts, n))
+    last = starts + counts - 1
+
+    last_wrong = np.maximum.reduceat(np.where(correct, -1, idx), starts)
+    # Latest answer of the pair from another session than its last answer's
+    other = np.maximum.reduceat(np.where(session != np.repeat(session[last], counts), idx, -1), starts)
+    has_prior = other >= starts
+    return {
+        'user': user[starts], 'question': question[starts], 'attempts': counts,
+        'correct_count': np.add.reduceat(correct.astype(np.int64), starts),
+        'streak': last - np.maximum(last_wrong, starts - 1),
+        'last_is_correct': correct[last], 'last_session': session[last],
+        'has_prior': has_prior, 'prior_is_correct': correct[np.where(has_prior, other, 0)],
+        'first_attempted_at': when[starts], 'last_attempted_at': when[last],
+        'first_correct_at': np.minimum.reduceat(np.where(correct, when, np.inf), starts),
+    }
+
+@timed('mastery_backfill')
+def backfill_mastery(user_ids=None, batch_size=2000):
+    """Rebuilds QuestionMastery (for all users, or `user_ids`) from the answer logs. Returns rows written."""
+    logs, session_names = load_mastery_arrays(user_ids)
+    rows = compute_mastery(logs)
+
+    def utc(ts):
+        return datetime.fromtimestamp(ts, tz=dt_timezone.utc)
+
+    objs = []
+    if rows is not None:
+        objs = [
+            QuestionMastery(user_id=int(u), question_id=int(q), attempts=int(a), correct_count=int(c),
+                            streak=int(s), last_is_correct=bool(lc),
+                            last_session_id=session_names[ls] if ls >= 0 else None,
+                            prior_is_correct=bool(pc) if hp else None, first_attempted_at=utc(fa),
+                            first_correct_at=utc(fc) if fc != np.inf else None, last_attempted_at=utc(la))
+            for u, q, a, c, s, lc, ls, hp, pc, fa, fc, la in zip(
+                rows['user'].tolist(), rows['question'].tolist(), rows['attempts'].tolist(),
+                rows['correct_count'].tolist(), rows['streak'].tolist(), rows['last_is_correct'].tolist(),
+                rows['last_session'].tolist(), rows['has_prior'].tolist(), rows['prior_is_correct'].tolist(),
+                rows['first_attempted_at'].tolist(), rows['first_correct_at'].tolist(),
+                rows['last_attempted_at'].tolist())
+        ]
+    with transaction.atomic():
+        existing = QuestionMastery.objects.all()
+        if user_ids:
+            existing = existing.filter(user_id__in=user_ids)
+        existing.delete()
+        QuestionMastery.objects.bulk_create(objs, batch_size=batch_size)
+    return len(objs)
+
+# --- 3. GROWTH REPORT ---
+def _priors_from_logs(user_id, session_id, first_at):
+    """Latest result before first_at[question] per question, from live + archived logs."""
+    latest = {}  # question -> (timestamp, correct)
+
+    def seen(qid, ts, correct):
+        if ts < first_at[qid].timestamp() and ts >= latest.get(qid, (-1.0, None))[0]:
+            latest[qid] = (ts, correct)
+
+    until = max(first_at.values())
+    for qid, when, is_correct, is_skipped in (UserAnswerLog.objects
+                                              .filter(user_id=user_id, question_id__in=first_at, attempted_at__lt=until)
+                                              .exclude(session_id=session_id).order_by()
+                                              .values_list('question_id', 'attempted_at', 'is_correct', 'is_skipped')):
+        seen(qid, when.timestamp(), is_correct and not is_skipped)
+    blocks = AnswerArchive.objects.filter(user_id=user_id, first_at__lt=until).order_by('first_at')
+    for data in blocks.values_list('data', flat=True).iterator(chunk_size=20):
+        block = decode_block(data)
+        correct = ((block['flags'] & FLAG_CORRECT) != 0) & ((block['flags'] & FLAG_SKIPPED) == 0)
+        for i in np.flatnonzero(np.isin(block['question'], list(first_at))).tolist():
+            seen(int(block['question'][i]), float(block['attempted_at'][i]), bool(correct[i]))
+    return {qid: correct for qid, (_, correct) in latest.items()}
+
+@timed('session_growth')
+def session_growth(user_id, session_id, session_logs, has_history):
+    """growth_report for a session: each question's final answer in it vs the answer before it.
+    `has_history` (an earlier comparable session exists) is passed through for the client."""
+    if not has_history:
+        return {"has_history": False}
+    answers, first_at = {}, {}
+    for log in sorted(session_logs, key=lambda log: log.attempted_at):
+        answers[log.question_id] = log.is_correct and not log.is_skipped
+        first_at.setdefault(log.question_id, log.attempted_at)
+
+    mastery = {m.question_id: m for m in QuestionMastery.objects.filter(user_id=user_id, question_id__in=answers)}
+    priors = {qid: m.prior_is_correct for qid, m in mastery.items() if m.last_session_id == session_id}
+    # Re-opened after answering some of these again elsewhere: the stored prior is newer than the session
+    stale = {qid: first_at[qid] for qid in mastery if qid not in priors}
+    if stale:
+        priors.update(_priors_from_logs(user_id, session_id, stale))
+
+    counts = {'retention_fix': 0, 'false_positive': 0, 'stable_correct': 0, 'persistent_error': 0, 'compared': 0}
+    for qid, curr_correct in answers.items():
+        prev_correct = priors.get(qid)
+        if prev_correct is None:
+            continue
+        counts['compared'] += 1
+        if not prev_correct and curr_correct: counts['retention_fix'] += 1
+        elif prev_correct and not curr_correct: counts['false_positive'] += 1
+        elif prev_correct and curr_correct: counts['stable_correct'] += 1
+        else: counts['persistent_error'] += 1
+
+    return {
+        "has_history": True,
+        **counts,
+        # Across ALL attempts so far, not just this session and the one before
+        "persistent_errors": sorted(qid for qid, m in mastery.items() if m.attempts >= 2 and m.correct_count == 0),
+        "mastered": sum(1 for m in mastery.values() if m.streak >= MASTERY_STREAK),
+    }
@@ -0,0 +1,184 @@
+# quiz/media.py
+# Cache for the images questions, options and concepts point at (mostly Google Drive links).
+#   - register_urls(): every referenced image URL gets a CachedMedia row (post_save receivers +
+#     `manage.py cache_media` for bulk imports); the 'fetch_media' job downloads the pending ones
+#   - fetch_one(): downloads once (MEDIA_FETCH_TIMEOUT, MEDIA_MAX_BYTES, image/* only) and stores, in
+#     the shared storage (quiz/blobs.py) because the worker fetches and the web process serves
+#       originals/<sh>/<sha256>.<ext>            content-addressed original
+#       variants/<sh>/<sha256>_<width>.webp      resized WebP per MEDIA_VARIANT_WIDTHS narrower than
+#                                                the original (needs Pillow; without it originals only)
+#   - cached_image(): source URL -> {'url', 'variants'} from a per-process map reloaded every
+#     MEDIA_MAP_SECONDS; serializers emit these, and unfetched URLs pass through unchanged
+#   - media_file() serves originals/ and variants/ (nothing else in the shared storage) with a one-year
+#     immutable Cache-Control (names never change)
+import hashlib
+import mimetypes
+import threading
+import time
+import urllib.request
+from datetime import timedelta
+from io import BytesIO
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.http import FileResponse, Http404
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+
+from .blobs import shared_storage
+from .jobs import enqueue
+from .metrics import span
+from .models import CachedMedia, Job, KnowledgeConcept, Option, Question
+
+MAX_ATTEMPTS = 3
+IMMUTABLE = 'public, max-age=31536000, immutable'
+EXTENSIONS = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/gif': 'gif', 'image/webp': 'webp',
+              'image/svg+xml': 'svg'}
+# (model, field) pairs that hold image URLs
+IMAGE_FIELDS = [(Question, 'question_image_url'), (Option, 'image_url'), (KnowledgeConcept, 'image_url')]
+SERVED_PREFIXES = ('originals/', 'variants/')
+
+def media_url(path):
+    return urljoin(settings.MEDIA_CACHE_URL, filepath_to_uri(path))
+
+# --- 1. REGISTRATION ---
+def register_urls(urls):
+    """Adds a pending row per new http(s) URL. Returns how many were new."""
+    urls = {u for u in urls if u and u.startswith(('http://', 'https://'))}
+    if not urls:
+        return 0
+    known = set(CachedMedia.objects.filter(source_url__in=urls).values_list('source_url', flat=True))
+    CachedMedia.objects.bulk_create([CachedMedia(source_url=u) for u in urls - known], ignore_conflicts=True)
+    return len(urls - known)
+
+def referenced_urls():
+    for model, field in IMAGE_FIELDS:
+        yield from (model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''}).order_by()
+                    .values_list(field, flat=True).distinct().iterator())
+
+def register_instance_media(sender, instance, **kwargs):
+    """post_save receiver for the IMAGE_FIELDS models: queue a fetch for a new image URL."""
+    field = next(f for model, f in IMAGE_FIELDS if model is sender)
+    if register_urls([getattr(instance, field)]):
+        transaction.on_commit(schedule_fetch)
+
+def schedule_fetch(delay_seconds=0):
+    """Queues one `fetch_media` job (reuses a job that is still waiting)."""
+    pending = Job.objects.filter(kind='fetch_media', status='queued').first()
+    if pending:
+        return pending
+    return enqueue('fetch_media', run_after=timezone.now() + timedelta(seconds=delay_seconds),
+                   message="Caching question / concept images")
+
+# --- 2. FETCH + VARIANTS ---
+def download(url):
+    request = urllib.request.Request(url, headers={'User-Agent': 'CivilsPYQ-media-cache/1.0'})
+    with urllib.request.urlopen(request, timeout=settings.MEDIA_FETCH_TIMEOUT) as response:
+        content_type = response.headers.get_content_type()
+        data = response.read(settings.MEDIA_MAX_BYTES + 1)
+    if not content_type.startswith('image/'):
+        raise ValueError(f"Not an image: {content_type}")  # Drive answers an HTML page for private files
+    if len(data) > settings.MEDIA_MAX_BYTES:
+        raise ValueError(f"Larger than MEDIA_MAX_BYTES ({settings.MEDIA_MAX_BYTES})")
+    return data, content_type
+
+def make_variants(data, digest, store):
+    """{width: path} of resized WebP copies, plus the original's (width, height); ({}, None) without Pillow."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return {}, None
+    with Image.open(BytesIO(data)) as image:
+        image.load()
+        size = image.size
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if image.mode in ('LA', 'P', 'PA') else 'RGB')
+        variants = {}
+        for width in settings.MEDIA_VARIANT_WIDTHS:
+            if width >= size[0]:
+                continue
+            path = f"variants/{digest[:2]}/{digest}_{width}.webp"
+            if not store.exists(path):
+                resized = image.resize((width, max(1, round(size[1] * width / size[0]))), Image.LANCZOS)
+                out = BytesIO()
+                resized.save(out, 'WEBP', quality=settings.MEDIA_WEBP_QUALITY, method=4)
+                store.save(path, ContentFile(out.getvalue()))
+            variants[str(width)] = path
+    return variants, size
+
+def fetch_one(media, store=None):
+    store = store or shared_storage()
+    media.attempts += 1
+    try:
+        with span('media_fetch'):
+            data, content_type = download(media.source_url)
+        digest = hashlib.sha256(data).hexdigest()
+        ext = EXTENSIONS.get(content_type) or (mimetypes.guess_extension(content_type) or '.bin').lstrip('.')
+        original = f"originals/{digest[:2]}/{digest}.{ext}"
+        if not store.exists(original):
+            store.save(original, ContentFile(data))
+        variants, size = ({}, None) if content_type == 'image/svg+xml' else make_variants(data, digest, store)
+    except Exception as exc:
+        media.error = f"{type(exc).__name__}: {exc}"[:1000]
+        media.status = 'failed' if media.attempts >= MAX_ATTEMPTS else 'pending'
+        media.save(update_fields=['attempts', 'error', 'status', 'updated_at'])
+        return False
+    media.status, media.error, media.fetched_at = 'ready', '', timezone.now()
+    media.sha256, media.content_type, media.size = digest, content_type, len(data)
+    media.original, media.variants = original, variants
+    media.width, media.height = size or (None, None)
+    media.save()
+    return True
+
+def fetch_pending(limit=None, retry_failed=False, progress=None):
+    """Fetches pending rows (and failed ones with retry_failed). Returns {'fetched', 'failed'}."""
+    if retry_failed:
+        CachedMedia.objects.filter(status='failed').update(status='pending', attempts=0)
+    ids = list(CachedMedia.objects.filter(status='pending').order_by('id').values_list('id', flat=True)[:limit])
+    store = shared_storage()
+    result = {'fetched': 0, 'failed': 0}
+    for i, media in enumerate(CachedMedia.objects.filter(id__in=ids).order_by('id').iterator(), 1):
+        result['fetched' if fetch_one(media, store) else 'failed'] += 1
+        if progress:
+            progress(i, len(ids), result)
+    return result
+
+# --- 3. READ SIDE ---
+_map = {'loaded_at': 0.0, 'images': {}}
+_map_lock = threading.Lock()
+
+def _load_map():
+    images = {}
+    for url, original, variants in (CachedMedia.objects.filter(status='ready')
+                                    .values_list('source_url', 'original', 'variants').iterator()):
+        images[url] = {'url': media_url(original),
+                       'variants': {width: media_url(path) for width, path in variants.items()}}
+    return images
+
+def cached_image(url, request=None):
+    """{'url', 'variants'} for an image URL: local copies once fetched, else the URL as given."""
+    if not url:
+        return {'url': url, 'variants': {}}
+    with _map_lock:
+        if time.monotonic() - _map['loaded_at'] > settings.MEDIA_MAP_SECONDS:
+            _map['images'], _map['loaded_at'] = _load_map(), time.monotonic()
+        image = _map['images'].get(url)
+    if image is None:
+        return {'url': url, 'variants': {}}
+    if request is not None:
+        return {'url': request.build_absolute_uri(image['url']),
+                'variants': {w: request.build_absolute_uri(u) for w, u in image['variants'].items()}}
+    return image
+
+def media_file(request, path):
+    if not path.startswith(SERVED_PREFIXES) or '..' in path.split('/'):
+        raise Http404  # Uploads and snapshots share the storage
+    try:
+        response = FileResponse(shared_storage().open(path), content_type=mimetypes.guess_type(path)[0])
+    except (FileNotFoundError, SuspiciousFileOperation):
+        raise Http404
+    response['Cache-Control'] = IMMUTABLE
+    return response
@@ -0,0 +1,259 @@
+# quiz/metrics.py
+# In-process request metrics: per-route counts, latency/size histograms, SQL
+# count/time, named spans around hot code, `Server-Timing` headers and a
+# Prometheus-text `/metrics` endpoint.
+#
+# The registry lives in process memory, so with several gunicorn workers each
+# scrape sees one worker (Prometheus sums them up fine when scraped per-pod).
+import cProfile
+import functools
+import os
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024)
+
+_current_request = ContextVar('quiz_request_timings', default=None)
+
+# --- 1. REGISTRY ---
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot = +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, upper in enumerate(self.buckets):
+            if value <= upper:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = {}      # (route, method, status) -> count
+        self.latency = {}       # route -> Histogram (seconds)
+        self.sizes = {}         # route -> Histogram (bytes)
+        self.sql_count = {}     # (route, alias) -> queries
+        self.sql_time = {}      # (route, alias) -> seconds
+        self.spans = {}         # span name -> Histogram (seconds)
+        self.counters = {}      # (name, labels tuple) -> value, for ad-hoc counters
+
+    def record_request(self, route, method, status, duration, size, sql):
+        with self.lock:
+            key = (route, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault(route, Histogram(LATENCY_BUCKETS)).observe(duration)
+            if size is not None:
+                self.sizes.setdefault(route, Histogram(SIZE_BUCKETS)).observe(size)
+            for alias, (count, seconds) in sql.items():
+                self.sql_count[(route, alias)] = self.sql_count.get((route, alias), 0) + count
+                self.sql_time[(route, alias)] = self.sql_time.get((route, alias), 0.0) + seconds
+
+    def record_span(self, name, duration):
+        with self.lock:
+            self.spans.setdefault(name, Histogram(LATENCY_BUCKETS)).observe(duration)
+
+    def incr(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+registry = MetricsRegistry()
+
+# --- 2. SPANS (named timers inside hot code) ---
+class RequestTimings:
+    def __init__(self):
+        self.spans = {}   # name -> [total seconds, calls]
+        self.sql = {}     # alias -> [queries, seconds]
+
+    def add_span(self, name, duration):
+        entry = self.spans.setdefault(name, [0.0, 0])
+        entry[0] += duration
+        entry[1] += 1
+
+@contextmanager
+def span(name):
+    """Times a block: `with span('session_stats'): ...`. Also usable as a decorator via `timed`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        registry.record_span(name, duration)
+        timings = _current_request.get()
+        if timings is not None:
+            timings.add_span(name, duration)
+
+def timed(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# --- 3. MIDDLEWARE ---
+class MetricsMiddleware:
+    """
+    Records per-route request count, latency, SQL count/time and response size,
+    and adds a `Server-Timing` header (METRICS_SERVER_TIMING). Optionally dumps a cProfile for a sample
+    of slow requests (METRICS_PROFILE_SAMPLE_RATE / METRICS_PROFILE_SLOW_MS).
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'METRICS_PROFILE_SAMPLE_RATE', 0.0)
+        self.slow_seconds = getattr(settings, 'METRICS_PROFILE_SLOW_MS', 1000) / 1000.0
+        self.profile_dir = getattr(settings, 'METRICS_PROFILE_DIR', None)
+        self.server_timing = getattr(settings, 'METRICS_SERVER_TIMING', False)
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _current_request.set(timings)
+        profiler = None
+        if self.sample_rate and self.profile_dir and random.random() < self.sample_rate:
+            profiler = cProfile.Profile()
+
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(self._sql_wrapper(timings, alias)))
+                if profiler:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler:
+                        profiler.disable()
+        finally:
+            _current_request.reset(token)
+        duration = time.perf_counter() - start
+
+        route = self._route(request)
+        size = None if response.streaming else len(response.content)
+        sql = {alias: tuple(values) for alias, values in timings.sql.items()}
+        registry.record_request(route, request.method, response.status_code, duration, size, sql)
+
+        if self.server_timing:
+            response['Server-Timing'] = self._server_timing(timings, duration)
+        if profiler and duration >= self.slow_seconds:
+            self._dump_profile(profiler, route, duration)
+        return response
+
+    @staticmethod
+    def _sql_wrapper(timings, alias):
+        def wrapper(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                entry = timings.sql.setdefault(alias, [0, 0.0])
+                entry[0] += 1
+                entry[1] += time.perf_counter() - start
+        return wrapper
+
+    @staticmethod
+    def _route(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unmatched'
+        return '/' + match.route if match.route else match.view_name
+
+    @staticmethod
+    def _server_timing(timings, duration):
+        parts = [f'total;dur={duration * 1000:.1f}']
+        for alias, (count, seconds) in timings.sql.items():
+            name = 'db' if alias == 'default' else f'db-{alias}'
+            parts.append(f'{name};dur={seconds * 1000:.1f};desc="{count} queries"')
+        for name, (seconds, calls) in timings.spans.items():
+            parts.append(f'{name};dur={seconds * 1000:.1f};desc="{calls}x"')
+        return ', '.join(parts)
+
+    def _dump_profile(self, profiler, route, duration):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        safe_route = ''.join(c if c.isalnum() else '_' for c in route).strip('_') or 'root'
+        filename = f"{int(time.time())}_{safe_route}_{int(duration * 1000)}ms.prof"
+        profiler.dump_stats(os.path.join(self.profile_dir, filename))
+
+# --- 4. PROMETHEUS TEXT ENDPOINT ---
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels.items()) + '}'
+
+def _histogram_lines(name, labels, hist):
+    lines = []
+    cumulative = 0
+    for upper, count in zip(hist.buckets, hist.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{_labels(**labels, le=upper)} {cumulative}')
+    lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {hist.count}')
+    lines.append(f'{name}_sum{_labels(**labels)} {hist.total}')
+    lines.append(f'{name}_count{_labels(**labels)} {hist.count}')
+    return lines
+
+def render_prometheus():
+    with registry.lock:
+        out = ['# HELP quiz_http_requests_total Requests handled, by route/method/status.',
+               '# TYPE quiz_http_requests_total counter']
+        for (route, method, status_code), count in sorted(registry.requests.items()):
+            out.append(f'quiz_http_requests_total{_labels(route=route, method=method, status=status_code)} {count}')
+
+        out += ['# HELP quiz_http_request_duration_seconds Request latency.',
+                '# TYPE quiz_http_request_duration_seconds histogram']
+        for route, hist in sorted(registry.latency.items()):
+            out += _histogram_lines('quiz_http_request_duration_seconds', {'route': route}, hist)
+
+        out += ['# HELP quiz_http_response_size_bytes Response body size (non-streaming).',
+                '# TYPE quiz_http_response_size_bytes histogram']
+        for route, hist in sorted(registry.sizes.items()):
+            out += _histogram_lines('quiz_http_response_size_bytes', {'route': route}, hist)
+
+        out += ['# HELP quiz_db_queries_total SQL queries executed, by route and database alias.',
+                '# TYPE quiz_db_queries_total counter']
+        for (route, alias), count in sorted(registry.sql_count.items()):
+            out.append(f'quiz_db_queries_total{_labels(route=route, alias=alias)} {count}')
+        out += ['# HELP quiz_db_query_seconds_total Time spent in SQL, by route and database alias.',
+                '# TYPE quiz_db_query_seconds_total counter']
+        for (route, alias), seconds in sorted(registry.sql_time.items()):
+            out.append(f'quiz_db_query_seconds_total{_labels(route=route, alias=alias)} {seconds}')
+
+        out += ['# HELP quiz_span_duration_seconds Named spans inside hot code.',
+                '# TYPE quiz_span_duration_seconds histogram']
+        for name, hist in sorted(registry.spans.items()):
+            out += _histogram_lines('quiz_span_duration_seconds', {'span': name}, hist)
+
+        seen = set()
+        for (name, labels), value in sorted(registry.counters.items()):
+            if name not in seen:
+                out.append(f'# TYPE {name} counter')
+                seen.add(name)
+            out.append(f'{name}{_labels(**dict(labels))} {value}')
+    return '\n'.join(out) + '\n'
+
+def metrics_view(request):
+    # Bearer token required outside DEBUG, so the scrape endpoint is never public in production.
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token and not settings.DEBUG:
+        return HttpResponse('Metrics disabled: set METRICS_TOKEN', status=404, content_type='text/plain')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0005_near_duplicate_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgeconcept',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='option',
+            name='concept_spans',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='concept_spans',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
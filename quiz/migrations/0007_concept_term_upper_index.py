@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:11
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0006_concept_spans'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='knowledgeconcept',
+            index=models.Index(django.db.models.functions.text.Upper('term'), name='quiz_concept_term_upper_idx'),
+        ),
+    ]
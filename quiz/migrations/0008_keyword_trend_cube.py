@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0007_concept_term_upper_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KeywordTrend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword_norm', models.CharField(max_length=100)),
+                ('exam_name', models.CharField(max_length=100)),
+                ('year', models.IntegerField()),
+                ('true_count', models.IntegerField(default=0)),
+                ('false_count', models.IntegerField(default=0)),
+                ('question_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('keyword_norm', 'exam_name', 'year')},
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('exam_name', models.CharField(max_length=50)),
+                ('year', models.IntegerField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='quiz.question')),
+            ],
+            options={
+                'unique_together': {('term', 'question')},
+            },
+        ),
+    ]
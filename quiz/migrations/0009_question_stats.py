@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:16
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0008_keyword_trend_cube'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalibrationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(choices=[('full', 'Full'), ('incremental', 'Incremental')], max_length=20)),
+                ('last_log_id', models.BigIntegerField(default=0)),
+                ('answers', models.PositiveIntegerField(default=0)),
+                ('questions', models.PositiveIntegerField(default=0)),
+                ('users', models.PositiveIntegerField(default=0)),
+                ('iterations', models.PositiveIntegerField(default=0)),
+                ('log_likelihood', models.FloatField(blank=True, null=True)),
+                ('seconds', models.FloatField(default=0.0)),
+                ('finished_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='quiz.question')),
+                ('difficulty', models.FloatField(default=0.0)),
+                ('difficulty_info', models.FloatField(default=0.0)),
+                ('discrimination', models.FloatField(default=1.0)),
+                ('discrimination_info', models.FloatField(default=0.0)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('correct_count', models.PositiveIntegerField(default=0)),
+                ('fitted_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserAbility',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ability', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('ability', models.FloatField(default=0.0)),
+                ('ability_info', models.FloatField(default=0.0)),
+                ('answers', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
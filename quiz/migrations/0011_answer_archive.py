@@ -0,0 +1,51 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0010_leaderboard_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('subject', models.CharField(max_length=50)),
+                ('pattern', models.CharField(max_length=50)),
+                ('answered', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('skipped', models.PositiveIntegerField(default=0)),
+                ('skipped_seconds', models.PositiveIntegerField(default=0)),
+                ('guesses', models.PositiveIntegerField(default=0)),
+                ('guesses_correct', models.PositiveIntegerField(default=0)),
+                ('confident_errors', models.PositiveIntegerField(default=0)),
+                ('doubts', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'day', 'subject', 'pattern')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AnswerArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_at', models.DateTimeField()),
+                ('last_at', models.DateTimeField()),
+                ('count', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_archives', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'first_at'], name='quiz_answer_user_id_35f1e3_idx')],
+            },
+        ),
+    ]
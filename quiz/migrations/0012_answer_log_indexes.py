@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:34
+
+from django.db import migrations, models
+
+
+def analyze(apps, schema_editor):
+    # Planner statistics for the new indexes: without them SQLite can't tell the partial
+    # bookmark index from the full (user, question) one.
+    schema_editor.execute('ANALYZE')
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0011_answer_archive'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='useranswerlog',
+            name='quiz_useran_user_id_a8f87d_idx',
+        ),
+        migrations.AddIndex(
+            model_name='keywordanalysis',
+            index=models.Index(fields=['keyword', 'year', 'is_true_usage'], name='quiz_keywor_keyword_b3c979_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useranswerlog',
+            index=models.Index(fields=['user', 'session_id', 'attempted_at'], name='quiz_useran_user_id_d7f7d7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useranswerlog',
+            index=models.Index(fields=['user', 'attempted_at'], name='quiz_useran_user_id_e7a86d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useranswerlog',
+            index=models.Index(condition=models.Q(('is_bookmarked', True), ('is_cleared_from_library', False)), fields=['user', 'question'], name='quiz_log_active_bookmark_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useranswerlog',
+            index=models.Index(fields=['user', 'question'], name='quiz_useran_user_id_2d1d04_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useranswerlog',
+            index=models.Index(fields=['user', 'source_mode', 'session_id'], name='quiz_useran_user_id_f5c0a0_idx'),
+        ),
+        migrations.RunPython(analyze, migrations.RunPython.noop),
+    ]
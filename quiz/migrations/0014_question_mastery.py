@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0013_cached_media'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionMastery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('correct_count', models.PositiveIntegerField(default=0)),
+                ('streak', models.PositiveIntegerField(default=0)),
+                ('last_is_correct', models.BooleanField(default=False)),
+                ('last_session_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('prior_is_correct', models.BooleanField(blank=True, null=True)),
+                ('first_attempted_at', models.DateTimeField()),
+                ('first_correct_at', models.DateTimeField(blank=True, null=True)),
+                ('last_attempted_at', models.DateTimeField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz.question')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mastery', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'correct_count', 'attempts'], name='quiz_questi_user_id_ee4bc2_idx')],
+                'unique_together': {('user', 'question')},
+            },
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.30 on 2026-10-19 07:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db import OperationalError, transaction
+
+# Kept in step with quiz/search.py (FTS_TABLE, the tsvector column and its weights)
+SQLITE_INDEX = [
+    "CREATE VIRTUAL TABLE quiz_librarysearch_fts USING fts5("
+    "owner, note_text, question_text, tokenize='porter unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER quiz_librarysearch_ai AFTER INSERT ON quiz_librarysearchentry BEGIN "
+    "INSERT INTO quiz_librarysearch_fts(rowid, owner, note_text, question_text) "
+    "VALUES (new.id, 'u' || new.user_id, new.note_text, new.question_text); END",
+    "CREATE TRIGGER quiz_librarysearch_ad AFTER DELETE ON quiz_librarysearchentry BEGIN "
+    "DELETE FROM quiz_librarysearch_fts WHERE rowid = old.id; END",
+    "CREATE TRIGGER quiz_librarysearch_au AFTER UPDATE ON quiz_librarysearchentry BEGIN "
+    "DELETE FROM quiz_librarysearch_fts WHERE rowid = old.id; "
+    "INSERT INTO quiz_librarysearch_fts(rowid, owner, note_text, question_text) "
+    "VALUES (new.id, 'u' || new.user_id, new.note_text, new.question_text); END",
+]
+POSTGRES_INDEX = [
+    "ALTER TABLE quiz_librarysearchentry ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', note_text), 'A') || "
+    "setweight(to_tsvector('english', question_text), 'B')) STORED",
+    "CREATE INDEX quiz_librarysearch_gin ON quiz_librarysearchentry USING GIN (search_vector)",
+]
+
+def install_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_INDEX, 'postgresql': POSTGRES_INDEX}.get(schema_editor.connection.vendor)
+    if not statements:
+        return  # Other backends: quiz/search.py falls back to LIKE
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            for sql in statements:
+                schema_editor.execute(sql)
+    except OperationalError:
+        pass  # SQLite built without FTS5: same fallback
+
+def remove_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS quiz_librarysearch_fts')  # Triggers go with their table
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS quiz_librarysearch_gin')
+        schema_editor.execute('ALTER TABLE quiz_librarysearchentry DROP COLUMN IF EXISTS search_vector')
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0014_question_mastery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LibrarySearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('note_text', models.TextField(blank=True)),
+                ('question_text', models.TextField(blank=True)),
+                ('is_bookmarked', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='quiz.question')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='library_search', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'question')},
+            },
+        ),
+        migrations.RunPython(install_index, remove_index),
+    ]
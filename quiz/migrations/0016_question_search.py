@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:12
+
+from django.db import migrations
+from django.db import OperationalError, transaction
+
+# Kept in step with quiz/admin_perf.py (QUESTION_FTS_TABLE and the tsvector expression). The FTS5
+# table is external-content: it stores only the index, the text stays in quiz_question.
+SQLITE_INDEX = [
+    "CREATE VIRTUAL TABLE quiz_question_fts USING fts5("
+    "text, tags, content='quiz_question', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER quiz_question_fts_ai AFTER INSERT ON quiz_question BEGIN "
+    "INSERT INTO quiz_question_fts(rowid, text, tags) VALUES (new.id, new.text, new.tags); END",
+    "CREATE TRIGGER quiz_question_fts_ad AFTER DELETE ON quiz_question BEGIN "
+    "INSERT INTO quiz_question_fts(quiz_question_fts, rowid, text, tags) "
+    "VALUES ('delete', old.id, old.text, old.tags); END",
+    "CREATE TRIGGER quiz_question_fts_au AFTER UPDATE OF text, tags ON quiz_question BEGIN "
+    "INSERT INTO quiz_question_fts(quiz_question_fts, rowid, text, tags) "
+    "VALUES ('delete', old.id, old.text, old.tags); "
+    "INSERT INTO quiz_question_fts(rowid, text, tags) VALUES (new.id, new.text, new.tags); END",
+    "INSERT INTO quiz_question_fts(quiz_question_fts) VALUES ('rebuild')",
+]
+POSTGRES_INDEX = [
+    "CREATE INDEX quiz_question_search_gin ON quiz_question USING GIN "
+    "(to_tsvector('simple', text || ' ' || coalesce(tags, '')))",
+]
+
+def install_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_INDEX, 'postgresql': POSTGRES_INDEX}.get(schema_editor.connection.vendor)
+    if not statements:
+        return  # Other backends: QuestionAdmin keeps the icontains search
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            for sql in statements:
+                schema_editor.execute(sql)
+    except OperationalError:
+        pass  # SQLite built without FTS5: same fallback
+
+def remove_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for trigger in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS quiz_question_fts_{trigger}')  # On quiz_question
+        schema_editor.execute('DROP TABLE IF EXISTS quiz_question_fts')
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS quiz_question_search_gin')
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0015_library_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_index, remove_index),
+    ]
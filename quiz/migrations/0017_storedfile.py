@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:12
+
+from django.db import migrations, models
+
+def refetch_cached_media(apps, schema_editor):
+    # Cached images used to be written to the worker's local MEDIA_CACHE_ROOT; fetch them again
+    # into the shared storage
+    apps.get_model('quiz', 'CachedMedia').objects.filter(status='ready').update(status='pending', attempts=0)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0016_question_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(refetch_cached_media, migrations.RunPython.noop),
+    ]
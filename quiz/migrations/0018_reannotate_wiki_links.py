@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:05
+
+from django.db import migrations
+from django.utils import timezone
+
+def queue_reannotation(apps, schema_editor):
+    # Question.clean_text / option texts are now served without [[wiki]] links, so the stored
+    # concept_spans of texts that contain them point at the wrong offsets: one annotate_concepts
+    # job (quiz/concepts.py) recomputes them
+    Question = apps.get_model('quiz', 'Question')
+    Option = apps.get_model('quiz', 'Option')
+    Job = apps.get_model('quiz', 'Job')
+    linked = (Question.objects.filter(text__contains='[[').exists()
+              or Option.objects.filter(text_content__contains='[[').exists())
+    if linked and not Job.objects.filter(kind='annotate_concepts', status='queued').exists():
+        Job.objects.create(kind='annotate_concepts', run_after=timezone.now(),
+                           message="Re-linking concept terms in all questions")
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0017_storedfile'),
+    ]
+
+    operations = [
+        migrations.RunPython(queue_reannotation, migrations.RunPython.noop),
+    ]
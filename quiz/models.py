@@ -2,8 +2,12 @@ from django.db import models
 from django.conf import settings 
 from django.apps import apps
 from django.contrib.auth.models import AbstractUser
+from django.db import transaction
+from django.db.models.functions import Upper
+from django.utils import timezone
 import re 
 import uuid
+from .metrics import timed
 # --- HELPER: CONVERT DRIVE LINKS ---
 def clean_drive_url(url):
     """
@@ -38,24 +42,152 @@ class CustomUser(AbstractUser):
         help_text="Specific permissions for this user.", verbose_name="user permissions",
     )
 
-# --- HELPER FUNCTION FOR TAGGING ---
+# --- HELPER FUNCTIONS FOR TAGGING ---
+KEYWORD_TAG_RE = re.compile(r'\{\{[TF]:(.*?)\}\}')
+TRUE_TAG_RE = re.compile(r'\{\{T:(.*?)\}\}')
+FALSE_TAG_RE = re.compile(r'\{\{F:(.*?)\}\}')
+
+WIKI_LINK_RE = re.compile(r'\[\[(.*?)\]\]')
+
+def strip_wiki_links(text):
+    """Turns hand-placed '[[Word]]' links back into plain 'Word'."""
+    if not text:
+        return text
+    return WIKI_LINK_RE.sub(r'\1', text)
+
+def strip_keyword_tags(text):
+    """Turns '{{T:Word}}' / '{{F:Word}}' markup back into plain 'Word'."""
+    if not text:
+        return text
+    return KEYWORD_TAG_RE.sub(r'\1', text)
+
+def strip_markup(text):
+    """Keyword tags and wiki links both reduced to the plain word (the API's `plain_text`)."""
+    return strip_wiki_links(strip_keyword_tags(text))
+
+def extract_manual_tags(text_field_value):
+    """Returns [(word, is_true_usage), ...] - all True tags first, then False tags."""
+    if not text_field_value:
+        return []
+    return ([(word, True) for word in TRUE_TAG_RE.findall(text_field_value)] +
+            [(word, False) for word in FALSE_TAG_RE.findall(text_field_value)])
+
+@timed('manual_tags')
 def process_manual_tags(instance, text_field_value, exam_name, year):
-    true_matches = re.findall(r'\{\{T:(.*?)\}\}', text_field_value)
-    false_matches = re.findall(r'\{\{F:(.*?)\}\}', text_field_value)
     KeywordAnalysis = apps.get_model('quiz', 'KeywordAnalysis')
+    question = instance if isinstance(instance, Question) else instance.question
 
-    for word in true_matches:
-        KeywordAnalysis.objects.create(
-            question=instance if isinstance(instance, Question) else instance.question,
-            keyword=word, is_true_usage=True, year=year, exam_name=exam_name
-        )
-    for word in false_matches:
+    for word, is_true in extract_manual_tags(text_field_value):
         KeywordAnalysis.objects.create(
-            question=instance if isinstance(instance, Question) else instance.question,
-            keyword=word, is_true_usage=False, year=year, exam_name=exam_name
+            question=question,
+            keyword=word, is_true_usage=is_true, year=year, exam_name=exam_name
         )
     return text_field_value
 
+def build_keyword_rows(question, options):
+    """Unsaved KeywordAnalysis rows for a question + its options (question text first, like save())."""
+    KeywordAnalysis = apps.get_model('quiz', 'KeywordAnalysis')
+    rows = []
+    for text in [question.text] + [opt.text_content for opt in options]:
+        for word, is_true in extract_manual_tags(text):
+            rows.append(KeywordAnalysis(
+                question=question, keyword=word, is_true_usage=is_true,
+                year=question.year, exam_name=question.exam_name
+            ))
+    return rows
+
+@timed('keyword_retag')
+def retag_questions(questions_with_options):
+    """
+    Rebuilds KeywordAnalysis for many questions with ONE delete + ONE bulk insert.
+    Takes [(question, options), ...] so callers can pass options they already hold.
+    Also keeps the keyword trend cube and the question term index in step.
+    """
+    KeywordAnalysis = apps.get_model('quiz', 'KeywordAnalysis')
+    questions = [q for q, _ in questions_with_options]
+    rows = []
+    for question, options in questions_with_options:
+        rows.extend(build_keyword_rows(question, options))
+    old_rows = list(KeywordAnalysis.objects.filter(question__in=questions)
+                    .values_list('keyword', 'exam_name', 'year', 'is_true_usage', 'question_id'))
+    KeywordAnalysis.objects.filter(question__in=questions).delete()
+    KeywordAnalysis.objects.bulk_create(rows, batch_size=1000)
+    apply_trend_deltas(old_rows, [(r.keyword, r.exam_name, r.year, r.is_true_usage, r.question.pk) for r in rows])
+    index_question_terms(questions)
+    return rows
+
+# --- HELPERS: KEYWORD TREND CUBE + TERM INDEX (KeywordTrendAPI) ---
+TERM_RE = re.compile(r'\w+')
+STOP_TERMS = frozenset(
+    "a an and are as at be by for from has in is it its of on or that the this to was were which with".split()
+)
+
+def normalize_term(text):
+    return " ".join(TERM_RE.findall((text or '').casefold()))
+
+def question_terms(question):
+    """Distinct normalized words of a question's text and tags (what the old icontains fallback searched)."""
+    text = strip_markup(question.text or '') + " " + (question.tags or '')
+    return {t for t in TERM_RE.findall(text.casefold()) if t not in STOP_TERMS}
+
+def _trend_cells(rows):
+    """{(keyword_norm, exam, year): [true, false, {question ids}]}"""
+    cells = {}
+    for keyword, exam_name, year, is_true, question_id in rows:
+        cell = cells.setdefault((normalize_term(keyword), exam_name, year), [0, 0, set()])
+        cell[0 if is_true else 1] += 1
+        cell[2].add(question_id)
+    return cells
+
+def apply_trend_deltas(old_rows, new_rows):
+    """Moves the affected (keyword, exam, year) cells by (new - old); untouched cells are not read."""
+    KeywordTrend = apps.get_model('quiz', 'KeywordTrend')
+    old, new = _trend_cells(old_rows), _trend_cells(new_rows)
+    deltas = {}
+    for key in old.keys() | new.keys():
+        o, n = old.get(key, [0, 0, set()]), new.get(key, [0, 0, set()])
+        delta = (n[0] - o[0], n[1] - o[1], len(n[2]) - len(o[2]))
+        if any(delta):
+            deltas[key] = delta
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        existing = {
+            (c.keyword_norm, c.exam_name, c.year): c
+            for c in KeywordTrend.objects.select_for_update().filter(keyword_norm__in={k for k, _, _ in deltas})
+        }
+        to_update, to_create = [], []
+        for key, (dt, df, dq) in deltas.items():
+            cell = existing.get(key)
+            if cell is None:
+                to_create.append(KeywordTrend(keyword_norm=key[0], exam_name=key[1], year=key[2],
+                                              true_count=dt, false_count=df, question_count=dq))
+            else:
+                cell.true_count += dt
+                cell.false_count += df
+                cell.question_count += dq
+                to_update.append(cell)
+        KeywordTrend.objects.bulk_update(to_update, ['true_count', 'false_count', 'question_count'], batch_size=500)
+        KeywordTrend.objects.bulk_create(to_create, batch_size=500)
+        KeywordTrend.objects.filter(pk__in=[c.pk for c in to_update if c.question_count <= 0]).delete()
+
+def remove_question_trends(sender, instance, **kwargs):
+    """pre_delete receiver for Question: its KeywordAnalysis rows cascade away without retag_questions."""
+    KeywordAnalysis = apps.get_model('quiz', 'KeywordAnalysis')
+    old_rows = KeywordAnalysis.objects.filter(question=instance).values_list(
+        'keyword', 'exam_name', 'year', 'is_true_usage', 'question_id')
+    apply_trend_deltas(list(old_rows), [])
+
+def index_question_terms(questions):
+    QuestionTerm = apps.get_model('quiz', 'QuestionTerm')
+    QuestionTerm.objects.filter(question__in=questions).delete()
+    QuestionTerm.objects.bulk_create(
+        [QuestionTerm(term=term[:100], question=q, exam_name=q.exam_name, year=q.year)
+         for q in questions for term in question_terms(q)],
+        batch_size=1000, ignore_conflicts=True,
+    )
+
 # --- 1. CORE TABLES (Concept, Question, Option, KeywordAnalysis) ---
 class KnowledgeConcept(models.Model):
     term = models.CharField(max_length=200, unique=True)
@@ -63,6 +195,20 @@ class KnowledgeConcept(models.Model):
     detailed_explanation = models.TextField(blank=True)
     image_url = models.URLField(blank=True, null=True)
     video_url = models.URLField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Concept automaton rebuilds when this moves
+
+    class Meta:
+        indexes = [
+            models.Index(Upper('term'), name='quiz_concept_term_upper_idx'), # Case-insensitive lookups
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # The term as loaded: concepts.concept_changed re-links the bank only when it moves
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_term = instance.__dict__.get('term')
+        return instance
+
     def save(self, *args, **kwargs):
         self.image_url = clean_drive_url(self.image_url)
         super().save(*args, **kwargs)
@@ -105,23 +251,37 @@ class Question(models.Model):
         default='one_liner',
         help_text="The structural pattern of the question."
     )
+    # [{'start', 'end', 'concept', 'term'}] over plain_text, filled at save time (quiz/concepts.py)
+    concept_spans = models.JSONField(default=list, blank=True, editable=False)
+    # Export ETags move when this does (quiz/exports.py); Option.save re-saves its question, bulk writers set it
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     @property
     def clean_text(self):
         """Returns text without [IMAGE] tags for the App"""
         if self.text:
-            
-            clean = re.sub(r'\{\{[TF]:(.*?)\}\}', r'\1', self.text)
-            return clean.strip()
+            return strip_keyword_tags(self.text).strip()
         return ""
 
-    def save(self, *args, **kwargs):
+    @property
+    def plain_text(self):
+        """clean_text without the [[wiki]] links either: what concept_spans point into."""
+        if self.text:
+            return strip_markup(self.text).strip()
+        return ""
+
+    def save(self, *args, reindex=True, **kwargs):
+        """reindex=False: the caller replaces the options and runs the tag / dedup / concept passes itself."""
+        from . import concepts, dedup  # Both import these models
         self.question_image_url = clean_drive_url(self.question_image_url)
+        if not reindex:
+            return super().save(*args, **kwargs)
+        automaton = concepts.get_automaton()
+        self.concept_spans = automaton.find(self.plain_text)  # Saved with the row; options below
         super().save(*args, **kwargs)
-        KeywordAnalysis = apps.get_model('quiz', 'KeywordAnalysis')
-        KeywordAnalysis.objects.filter(question=self).delete()
-        process_manual_tags(self, self.text, self.exam_name, self.year)
-        for opt in self.options.all():
-            process_manual_tags(opt, opt.text_content, self.exam_name, self.year)
+        options = list(self.options.all())
+        retag_questions([(self, options)])
+        dedup.index_questions([(self, options)])
+        concepts.annotate_options(options, automaton)
 
     def __str__(self): return f"{self.exam_name} ({self.year}) - {self.text[:50]}..."
 
@@ -135,6 +295,7 @@ class Option(models.Model):
     video_url = models.URLField(blank=True, null=True)
     mnemonic_text = models.TextField(blank=True, null=True)
     mnemonic_color = models.CharField(max_length=7, default="#FFF9C4")
+    concept_spans = models.JSONField(default=list, blank=True, editable=False)  # Over the served plain_text
 
     def save(self, *args, **kwargs):
         self.image_url = clean_drive_url(self.image_url)
@@ -148,6 +309,13 @@ class KeywordAnalysis(models.Model):
     is_true_usage = models.BooleanField() 
     year = models.IntegerField()
     exam_name = models.CharField(max_length=100)
+
+    class Meta:
+        indexes = [
+            # keyword= / keyword+year lookups; also covers the per-keyword true/false counts
+            models.Index(fields=['keyword', 'year', 'is_true_usage']),
+        ]
+
     def __str__(self): return f"{self.keyword} ({'Safe' if self.is_true_usage else 'Trap'})"
 
 class TopicMedia(models.Model):
@@ -188,7 +356,13 @@ class UserAnswerLog(models.Model):
     class Meta:
         ordering = ['-attempted_at']
         indexes = [
-            models.Index(fields=['user', 'session_id']), # Optimization for analysis lookups
+            models.Index(fields=['user', 'session_id', 'attempted_at']), # Analysis lookups, already in Meta.ordering
+            models.Index(fields=['user', 'attempted_at']), # Dashboard / history, serves Meta.ordering
+            # Library: only active bookmarks (SQLite can't seek on bare boolean columns, but matches the condition)
+            models.Index(fields=['user', 'question'], condition=models.Q(is_bookmarked=True, is_cleared_from_library=False),
+                         name='quiz_log_active_bookmark_idx'),
+            models.Index(fields=['user', 'question']), # Note check, bookmark removal, adaptive "seen"
+            models.Index(fields=['user', 'source_mode', 'session_id']), # Past exam sessions
         ]
 
     def __str__(self):
@@ -212,3 +386,337 @@ class UserQuestionNote(models.Model):
         return f"Note: {self.user.username} - Q{self.question.id}"
     
 
+# --- 4. AI TAGGING (Cache + Resumable Jobs) ---
+
+class TagCache(models.Model):
+    # sha256 of (model + prompt version + question text) -> tags the LLM gave for it
+    content_hash = models.CharField(max_length=64, unique=True)
+    tags = models.CharField(max_length=255)
+    model_name = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self): return f"{self.content_hash[:12]}... -> {self.tags}"
+
+class TaggingJob(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'), ('running', 'Running'),
+        ('done', 'Done'), ('failed', 'Failed'),
+    ]
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    question_ids = models.JSONField(default=list)
+    next_index = models.PositiveIntegerField(default=0)  # Resume point into question_ids
+    tagged = models.PositiveIntegerField(default=0)
+    cached = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    model_name = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def total(self):
+        return len(self.question_ids)
+
+    def __str__(self): return f"Tagging job #{self.pk} ({self.status}, {self.next_index}/{self.total})"
+
+# --- 5. BACKGROUND JOBS (quiz/jobs.py + `manage.py run_worker`) ---
+
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'), ('running', 'Running'),
+        ('done', 'Done'), ('failed', 'Failed'),
+    ]
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    priority = models.IntegerField(default=0)  # Higher runs first
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+
+    # --- Progress (shown in the admin) ---
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(default=0)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after']), # Worker claim query
+        ]
+
+    @property
+    def percent(self):
+        if self.status == 'done':
+            return 100
+        return int(self.progress_done * 100 / self.progress_total) if self.progress_total else 0
+
+    def report_progress(self, done, total=None, message=None):
+        """Cheap UPDATE (no full save) so handlers can call it often. Doubles as the worker's heartbeat:
+        it moves locked_at, so requeue_stale() only takes jobs that stopped reporting."""
+        self.progress_done, self.locked_at = done, timezone.now()
+        fields = {'progress_done': done, 'locked_at': self.locked_at}
+        if total is not None:
+            self.progress_total = fields['progress_total'] = total
+        if message is not None:
+            self.message = fields['message'] = message[:255]
+        Job.objects.filter(pk=self.pk).update(**fields)
+
+    def __str__(self): return f"Job #{self.pk} {self.kind} ({self.status})"
+
+# --- 6. SPACED REPETITION (quiz/srs.py) ---
+
+class ReviewState(models.Model):
+    # One row per (user, question) that needs revision: created by a wrong, skipped or
+    # low-confidence answer, then rescheduled (SM-2) by every later answer.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='review_states')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    interval_days = models.FloatField(default=0)
+    ease = models.FloatField(default=2.5)
+    repetitions = models.PositiveIntegerField(default=0)  # Successful reviews in a row
+    lapses = models.PositiveIntegerField(default=0)
+    last_quality = models.PositiveSmallIntegerField(default=0)  # 0-5, see srs.answer_quality
+    last_answered_at = models.DateTimeField()
+    due_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'question')
+        indexes = [
+            models.Index(fields=['user', 'due_at']), # "What to revise today"
+        ]
+
+    def __str__(self): return f"{self.user_id} - Q{self.question_id} due {self.due_at:%Y-%m-%d}"
+
+# --- 7. NEAR-DUPLICATE INDEX (quiz/dedup.py) ---
+
+class QuestionSignature(models.Model):
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    minhash = models.BinaryField()  # NUM_PERM x uint32
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self): return f"MinHash Q{self.question_id}"
+
+class LSHBucket(models.Model):
+    # One row per (question, band): questions sharing any key are duplicate candidates.
+    key = models.BigIntegerField(db_index=True)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='lsh_buckets')
+
+    def __str__(self): return f"{self.key} -> Q{self.question_id}"
+
+# --- 8. KEYWORD TREND CUBE (KeywordTrendAPI; kept in step by retag_questions) ---
+
+class KeywordTrend(models.Model):
+    keyword_norm = models.CharField(max_length=100)  # normalize_term(KeywordAnalysis.keyword)
+    exam_name = models.CharField(max_length=100)
+    year = models.IntegerField()
+    true_count = models.IntegerField(default=0)
+    false_count = models.IntegerField(default=0)
+    question_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('keyword_norm', 'exam_name', 'year')
+
+    def __str__(self): return f"{self.keyword_norm} {self.exam_name} {self.year}: {self.true_count}/{self.false_count}"
+
+class QuestionTerm(models.Model):
+    # Normalized word -> question, for the "no tagged keyword" fallback (replaces icontains scans)
+    term = models.CharField(max_length=100)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='terms')
+    exam_name = models.CharField(max_length=50)
+    year = models.IntegerField()
+
+    class Meta:
+        unique_together = ('term', 'question')
+
+    def __str__(self): return f"{self.term} -> Q{self.question_id}"
+
+# --- 9. ITEM CALIBRATION (quiz/calibration.py, `manage.py calibrate_questions`) ---
+
+class QuestionStats(models.Model):
+    # 2PL IRT fit: P(correct) = sigmoid(discrimination * (ability - difficulty)), in logits.
+    # *_info = posterior precision, the prior weight of the current value in incremental refits.
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    difficulty = models.FloatField(default=0.0)
+    difficulty_info = models.FloatField(default=0.0)
+    discrimination = models.FloatField(default=1.0)
+    discrimination_info = models.FloatField(default=0.0)
+    attempts = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0)
+    fitted_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self): return f"Q{self.question_id}: b={self.difficulty:.2f} a={self.discrimination:.2f}"
+
+class UserAbility(models.Model):
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name='ability')
+    ability = models.FloatField(default=0.0)
+    ability_info = models.FloatField(default=0.0)
+    answers = models.PositiveIntegerField(default=0)
+
+    def __str__(self): return f"{self.user_id}: theta={self.ability:.2f}"
+
+class CalibrationRun(models.Model):
+    # The newest run's last_log_id is the watermark: incremental refits read logs above it.
+    mode = models.CharField(max_length=20, choices=[('full', 'Full'), ('incremental', 'Incremental')])
+    last_log_id = models.BigIntegerField(default=0)
+    answers = models.PositiveIntegerField(default=0)
+    questions = models.PositiveIntegerField(default=0)
+    users = models.PositiveIntegerField(default=0)
+    iterations = models.PositiveIntegerField(default=0)
+    log_likelihood = models.FloatField(null=True, blank=True)  # Mean per answer
+    seconds = models.FloatField(default=0.0)
+    finished_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+
+    def __str__(self): return f"{self.mode} calibration up to log #{self.last_log_id}"
+
+# --- 10. LEADERBOARDS (quiz/leaderboard.py) ---
+
+class LeaderboardEntry(models.Model):
+    # Persisted copy of the in-process sorted sets: each process flushes its deltas here and
+    # reloads from here (skipped entirely when LEADERBOARD_REDIS_URL is set).
+    board = models.CharField(max_length=150)  # e.g. "accuracy:2026-W42", "accuracy:2026-W42:UPSC CSE", "mock:all"
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    score = models.FloatField(default=0.0)
+    correct = models.PositiveIntegerField(default=0)
+    answered = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('board', 'user')
+        indexes = [
+            models.Index(fields=['board', '-score']),
+        ]
+
+    def __str__(self): return f"{self.board}: {self.user_id} = {self.score:.2f}"
+
+# --- 11. ANSWER LOG ARCHIVE (quiz/archive.py, `manage.py archive_logs`) ---
+
+class AnswerRollup(models.Model):
+    # Archived practice answers folded per (user, local day, subject, pattern): enough for every
+    # all-time dashboard metric without the rows themselves.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='answer_rollups')
+    day = models.DateField()
+    subject = models.CharField(max_length=50)
+    pattern = models.CharField(max_length=50)
+    answered = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    skipped_seconds = models.PositiveIntegerField(default=0)
+    guesses = models.PositiveIntegerField(default=0)           # confidence < 50, not skipped
+    guesses_correct = models.PositiveIntegerField(default=0)
+    confident_errors = models.PositiveIntegerField(default=0)  # confidence > 70, wrong
+    doubts = models.PositiveIntegerField(default=0)            # bookmarked, correct
+
+    class Meta:
+        unique_together = ('user', 'day', 'subject', 'pattern')
+
+    def __str__(self): return f"{self.user_id} {self.day} {self.subject}/{self.pattern}: {self.correct}/{self.answered}"
+
+class AnswerArchive(models.Model):
+    # One compressed block of a user's archived UserAnswerLog rows (np.savez_compressed columns).
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='answer_archives')
+    first_at = models.DateTimeField()
+    last_at = models.DateTimeField()
+    count = models.PositiveIntegerField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'first_at']),
+        ]
+
+    def __str__(self): return f"{self.user_id}: {self.count} logs {self.first_at:%Y-%m-%d}..{self.last_at:%Y-%m-%d}"
+
+# --- 12. MEDIA CACHE (quiz/media.py, `manage.py cache_media`) ---
+
+class CachedMedia(models.Model):
+    # One referenced image URL (question / option / concept), fetched once in the background.
+    # Files are content-addressed (sha256), so two URLs with the same bytes share them.
+    STATUS_CHOICES = [('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')]
+    source_url = models.URLField(max_length=1000, unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    sha256 = models.CharField(max_length=64, blank=True)
+    content_type = models.CharField(max_length=50, blank=True)
+    size = models.PositiveIntegerField(default=0)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    original = models.CharField(max_length=200, blank=True)  # Name in the shared storage (quiz/blobs.py)
+    variants = models.JSONField(default=dict, blank=True)    # {"320": "variants/ab/<sha>_320.webp", ...}
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    fetched_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'attempts']), # Fetch queue
+        ]
+
+    def __str__(self): return f"{self.status}: {self.source_url[:80]}"
+
+# --- 13. QUESTION MASTERY (quiz/mastery.py, `manage.py backfill_mastery`) ---
+
+class QuestionMastery(models.Model):
+    # One row per (user, question) ever answered, updated by every logged answer: growth reports
+    # and persistent-error lists read these instead of replaying past sessions.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='mastery')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    attempts = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0)
+    streak = models.PositiveIntegerField(default=0)  # Correct answers in a row, up to the last one
+    last_is_correct = models.BooleanField(default=False)
+    last_session_id = models.CharField(max_length=100, blank=True, null=True)
+    # Result of the latest answer BEFORE last_session_id's session (null = first seen in it)
+    prior_is_correct = models.BooleanField(null=True, blank=True)
+    first_attempted_at = models.DateTimeField()
+    first_correct_at = models.DateTimeField(null=True, blank=True)
+    last_attempted_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'question')
+        indexes = [
+            models.Index(fields=['user', 'correct_count', 'attempts']), # Persistent errors
+        ]
+
+    def __str__(self): return f"{self.user_id} - Q{self.question_id}: {self.correct_count}/{self.attempts}"
+
+# --- 14. LIBRARY SEARCH (quiz/search.py, `manage.py rebuild_library_search`) ---
+
+class LibrarySearchEntry(models.Model):
+    # One row per (user, question) in the user's library (active bookmark and/or note): the text
+    # the library search matches. Migration 0015 indexes it outside the ORM: an FTS5 table kept in
+    # step by triggers on SQLite, a generated tsvector column + GIN index on Postgres.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='library_search')
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    note_text = models.TextField(blank=True)
+    question_text = models.TextField(blank=True)  # Question.plain_text
+    is_bookmarked = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'question')
+
+    def __str__(self): return f"{self.user_id} - Q{self.question_id}{' (note)' if self.note_text else ''}"
+
+# --- 15. SHARED FILES (quiz/blobs.py) ---
+
+class StoredFile(models.Model):
+    # One file of the default shared storage (blobs.DatabaseStorage): cached images, bulk-import
+    # uploads, the cohort snapshot. In the database so the web and worker processes see the same files.
+    name = models.CharField(max_length=255, unique=True)  # e.g. "variants/ab/<sha>_320.webp"
+    data = models.BinaryField()
+    size = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self): return f"{self.name} ({self.size} bytes)"
@@ -0,0 +1,147 @@
+# quiz/query_plans.py
+# Query-plan regression checks (`manage.py check_query_plans`).
+#   - every entry in VIEW_CHECKS calls one API view in-process (APIRequestFactory, forced auth)
+#     inside a transaction that is rolled back, capturing the SQL it runs
+#   - each captured SELECT / UPDATE / DELETE is EXPLAINed on the live connection:
+#       SQLite:   EXPLAIN QUERY PLAN, a bare "SCAN <table>" or an AUTOMATIC index is a full scan
+#       Postgres: EXPLAIN with enable_seqscan = off, so a "Seq Scan" means no index can serve it
+#   - a full scan of a HOT_TABLES table fails the check; index scans and temp sorts are reported
+#   - plans depend on the table sizes the planner sees (on a near-empty table a scan IS the best
+#     plan), so the regression gate is QueryPlanTests in quiz/tests.py: seeded rows + ANALYZE;
+#     the command reports on whatever database it is pointed at
+import re
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .models import CustomUser, KeywordAnalysis, UserAnswerLog
+
+# Tables that grow with users / content; small lookup tables (question, option, ...) may be scanned
+HOT_TABLES = {
+    'quiz_useranswerlog', 'quiz_keywordanalysis', 'quiz_reviewstate', 'quiz_userquestionnote',
+    'quiz_keywordtrend', 'quiz_questionterm', 'quiz_leaderboardentry', 'quiz_answerrollup',
+    'quiz_answerarchive', 'quiz_questionstats', 'quiz_userability', 'quiz_questionmastery',
+    'quiz_librarysearchentry',
+}
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE')
+
+def _sample_context(user=None, session_id=None):
+    """The user / session / question / keyword the checks request, picked from the data."""
+    logs = UserAnswerLog.objects.order_by('-id')
+    if user is None:
+        latest = logs.filter(source_mode='exam').exclude(session_id=None).first() or logs.first()
+        user = latest.user if latest else CustomUser.objects.order_by('id').first()
+    if user is None:
+        raise ValueError("No users to run the views as")
+    if session_id is None:
+        session_id = (logs.filter(user=user, source_mode='exam').exclude(session_id=None)
+                      .values_list('session_id', flat=True).first()) or 'none'
+    question_id = logs.filter(user=user).values_list('question_id', flat=True).first() or 0
+    keyword = (KeywordAnalysis.objects.values('keyword').annotate(n=Count('id')).order_by('-n')
+               .values_list('keyword', flat=True).first()) or 'Only'
+    return {'user': user, 'session_id': session_id, 'question_id': question_id, 'keyword': keyword}
+
+# (name, method, path, params builder, hot tables this view may scan on purpose)
+VIEW_CHECKS = [
+    ('dashboard', 'get', '/api/user/dashboard/', lambda c: {}, ()),
+    ('history', 'get', '/api/user/history/', lambda c: {'history': 'full'}, ()),
+    ('library', 'get', '/api/user/library/', lambda c: {}, ()),
+    ('library_remove', 'post', '/api/user/library/remove/', lambda c: {'question_id': c['question_id']}, ()),
+    ('note', 'get', '/api/user/note/', lambda c: {'question_id': c['question_id']}, ()),
+    ('library_search', 'get', '/api/user/library/search/', lambda c: {'q': c['keyword']}, ()),
+    ('export_library', 'get', '/api/user/export/library.csv', lambda c: {}, ()),
+    ('export_notes', 'get', '/api/user/export/notes.csv', lambda c: {}, ()),
+    ('export_history', 'get', '/api/user/export/history.ndjson', lambda c: {}, ()),
+    ('review_queue', 'get', '/api/user/review/', lambda c: {}, ()),
+    ('exam_analysis', 'get', '/api/exam/analysis/{session_id}/', lambda c: {}, ()),
+    ('mock_adaptive', 'get', '/api/exam/mock/', lambda c: {'mode': 'adaptive'}, ()),
+    ('leaderboard', 'get', '/api/leaderboard/', lambda c: {}, ()),
+    ('leaderboard_me', 'get', '/api/leaderboard/me/', lambda c: {}, ()),
+    ('questions_by_keyword', 'get', '/api/questions/', lambda c: {'keyword': c['keyword']}, ()),
+    ('keyword_trend', 'get', '/api/analysis/trend/', lambda c: {'words': f"{c['keyword']},Only"}, ()),
+    # Whole-table aggregate: the best plan is a covering index scan, never a search
+    ('keyword_analysis', 'get', '/api/analysis/keywords/', lambda c: {}, ()),
+    # ORDER BY RANDOM() reads every row by definition
+    ('game', 'get', '/api/game/start/', lambda c: {}, ('quiz_keywordanalysis',)),
+]
+
+# --- 1. CAPTURE ---
+def capture_view_queries(method, path, params, user):
+    """Runs one view and returns the distinct SQL it executed; all writes are rolled back."""
+    factory = APIRequestFactory()
+    request = getattr(factory, method)(path, params, **({'format': 'json'} if method == 'post' else {}))
+    force_authenticate(request, user=user)
+    match = resolve(path)
+    with transaction.atomic():
+        with CaptureQueriesContext(connection) as captured:
+            response = match.func(request, *match.args, **match.kwargs)
+            if response.streaming:
+                for _ in response.streaming_content:  # Exports query while the body is produced
+                    pass
+            else:
+                response.render()  # Lazy querysets in the data run here
+        transaction.set_rollback(True)
+    return list(dict.fromkeys(q['sql'] for q in captured.captured_queries
+                              if q['sql'].lstrip().upper().startswith(EXPLAINED)))
+
+# --- 2. EXPLAIN ---
+def explain(sql):
+    """The plan as a list of lines, in the backend's own wording."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('EXPLAIN ' + sql)
+        return [row[0] for row in cursor.fetchall()]
+
+def _aliases(sql):
+    """{alias or table: table} for every FROM / JOIN in the statement."""
+    aliases = {}
+    for table, alias in re.findall(r'(?:FROM|JOIN|UPDATE)\s+"?(\w+)"?(?:\s+(?:AS\s+)?"?(\w+)"?)?', sql, re.I):
+        aliases[table] = table
+        if alias and alias.upper() not in ('WHERE', 'INNER', 'LEFT', 'ON', 'SET', 'GROUP', 'ORDER', 'LIMIT'):
+            aliases[alias] = table
+    return aliases
+
+def full_scans(sql, plan):
+    """Tables the plan reads end to end (without an index)."""
+    scans = []
+    if connection.vendor == 'sqlite':
+        aliases = _aliases(sql)
+        for line in plan:
+            match = re.match(r'(SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS (\w+))?(.*)', line)
+            if not match:
+                continue
+            kind, name, alias, rest = match.groups()
+            table = aliases.get(alias or name, name)
+            if (kind == 'SCAN' and 'USING' not in rest) or 'AUTOMATIC' in rest:
+                scans.append(table)
+    else:
+        for line in plan:
+            match = re.search(r'Seq Scan on (\w+)', line)
+            if match:
+                scans.append(match.group(1))
+    return scans
+
+def sorts(plan):
+    return [line.strip() for line in plan if 'TEMP B-TREE' in line or re.search(r'\bSort\b', line)]
+
+# --- 3. CHECK ---
+def check_query_plans(user=None, session_id=None, only=None):
+    """[{'view', 'sql', 'plan', 'full_scans', 'sorts', 'failed'}] for every captured query."""
+    context = _sample_context(user, session_id)
+    results = []
+    for name, method, path, params, allowed in VIEW_CHECKS:
+        if only and name not in only:
+            continue
+        for sql in capture_view_queries(method, path.format(**context), params(context), context['user']):
+            plan = explain(sql)
+            hot = [t for t in full_scans(sql, plan) if t in HOT_TABLES and t not in allowed]
+            results.append({'view': name, 'sql': sql, 'plan': plan, 'full_scans': hot,
+                            'sorts': sorts(plan), 'failed': bool(hot)})
+    return results
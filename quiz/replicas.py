@@ -0,0 +1,114 @@
+# quiz/replicas.py
+# Optional read replica (DATABASE_REPLICA_URL -> DATABASES['replica']).
+#   - ReplicaRouter: reads go to the replica only inside replica_reads() (the read-only analytics
+#     views); writes, reads anywhere else, reads inside a primary transaction and the models in
+#     PRIMARY_ONLY always use 'default'
+#   - read-your-writes: ReplicaPinMiddleware pins a user to the primary for REPLICA_PIN_SECONDS
+#     after any successful POST/PUT/PATCH/DELETE of theirs (pin_user() for writes elsewhere).
+#     The pin lives in the cache (shared between processes when CACHES is) and in process memory.
+#   - quiz_db_routed_requests_total{alias, reason} counts the decisions; per-alias query counts and
+#     SQL time come from MetricsMiddleware as before
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .metrics import registry
+
+REPLICA = 'replica'
+# Read-modify-write state kept in process memory / claimed by workers: never read it stale
+PRIMARY_ONLY = {'quiz.leaderboardentry', 'quiz.job'}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_alias = ContextVar('quiz_replica_read_alias', default=None)
+_local_pins = {}
+_pins_lock = threading.Lock()
+
+def replica_enabled():
+    return REPLICA in settings.DATABASES
+
+# --- 1. PINNING (read-your-writes) ---
+def _pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+def pin_user(user_id, seconds=None):
+    seconds = settings.REPLICA_PIN_SECONDS if seconds is None else seconds
+    if not replica_enabled() or not seconds:
+        return
+    with _pins_lock:
+        _local_pins[user_id] = time.monotonic() + seconds
+    cache.set(_pin_key(user_id), 1, timeout=seconds)
+
+def is_pinned(user_id):
+    with _pins_lock:
+        until = _local_pins.get(user_id)
+        if until is not None and until < time.monotonic():
+            del _local_pins[user_id]
+            until = None
+    return until is not None or cache.get(_pin_key(user_id)) is not None
+
+class ReplicaPinMiddleware:
+    """Pins the request's user after a successful unsafe request (DRF sets request.user by then)."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_user(user.pk)
+        return response
+
+# --- 2. ROUTING ---
+@contextmanager
+def replica_reads(user_id=None):
+    """Reads in this block may use the replica, unless `user_id` wrote within the pin window."""
+    if not replica_enabled():
+        alias, reason = DEFAULT_DB_ALIAS, 'no_replica'
+    elif user_id is not None and is_pinned(user_id):
+        alias, reason = DEFAULT_DB_ALIAS, 'pinned'
+    else:
+        alias, reason = REPLICA, 'replica'
+    registry.incr('quiz_db_routed_requests_total', alias=alias, reason=reason)
+    token = _read_alias.set(alias)
+    try:
+        yield alias
+    finally:
+        _read_alias.reset(token)
+
+def use_replica(view):
+    """View decorator (innermost, so DRF has authenticated request.user): replica_reads for that user.
+
+    Only queries the view runs itself are routed: evaluate QuerySets (list()) before returning them
+    in a Response, which renders after the block has exited.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        request = next(a for a in args if hasattr(a, 'user'))  # (request, ...) or (self, request, ...)
+        with replica_reads(request.user.pk if request.user.is_authenticated else None):
+            return view(*args, **kwargs)
+    return wrapper
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias != REPLICA or model._meta.label_lower in PRIMARY_ONLY:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS  # Reads inside a write transaction see that transaction
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # Same data on both aliases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS  # The replica follows the primary's schema by replication
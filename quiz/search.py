@@ -0,0 +1,191 @@
+# quiz/search.py
+# Full-text search over a user's library: note text + text of the questions they bookmarked.
+#   - LibrarySearchEntry holds one row per (user, question) with an active bookmark or a note.
+#     refresh_entries() recomputes rows from the notes / logs; receivers call it on note
+#     save / delete and bookmarked answers, remove_bookmark_api after clearing a bookmark
+#   - the index lives outside the ORM (migration 0015):
+#       SQLite    FTS5 table quiz_librarysearch_fts (porter stemming), filled by triggers; the
+#                 owner column ('u<id>') keeps every MATCH inside one user's rows
+#       Postgres  generated tsvector column search_vector (note weight A, question B) + GIN index
+#     anything else (or SQLite without FTS5) falls back to icontains, newest first
+#   - search_library(): ranked (bm25 / ts_rank_cd), highlighted, limit/offset pages; the last
+#     word is a prefix so results show up while typing
+import re
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils.html import escape
+
+from .metrics import timed
+from .models import LibrarySearchEntry, Question, UserAnswerLog, UserQuestionNote
+
+FTS_TABLE = 'quiz_librarysearch_fts'
+MAX_TERMS = 8
+HIGHLIGHT = ('<mark>', '</mark>')
+MARKS = ('\x02', '\x03')  # What the backends put around hits; the text is HTML-escaped before swapping
+WORD = re.compile(r'\w+')
+
+_backends = {}  # alias -> 'fts5' | 'tsvector' | None
+
+# --- 1. MAINTENANCE ---
+def refresh_entries(user_id, question_ids, create=True):
+    """Brings the entries for these questions in line with the user's notes and bookmarks."""
+    question_ids = {int(qid) for qid in question_ids}
+    notes = dict(UserQuestionNote.objects.filter(user_id=user_id, question_id__in=question_ids)
+                 .values_list('question_id', 'note_text'))
+    bookmarked = set(UserAnswerLog.objects.filter(user_id=user_id, question_id__in=question_ids, is_bookmarked=True,
+                                                  is_cleared_from_library=False)
+                     .order_by().values_list('question_id', flat=True))
+    keep = {qid for qid in question_ids if notes.get(qid) or qid in bookmarked}
+    LibrarySearchEntry.objects.filter(user_id=user_id, question_id__in=question_ids - keep).delete()
+
+    existing = {e.question_id: e for e in LibrarySearchEntry.objects.filter(user_id=user_id, question_id__in=keep)}
+    missing = keep - set(existing) if create else set()
+    texts = {q.pk: q.plain_text for q in Question.objects.filter(id__in=missing)}
+    for qid in keep:
+        entry = existing.get(qid)
+        if entry is None:
+            if qid in texts:
+                LibrarySearchEntry.objects.create(user_id=user_id, question_id=qid, note_text=notes.get(qid, ''),
+                                                  question_text=texts[qid], is_bookmarked=qid in bookmarked)
+        elif (entry.note_text, entry.is_bookmarked) != (notes.get(qid, ''), qid in bookmarked):
+            entry.note_text, entry.is_bookmarked = notes.get(qid, ''), qid in bookmarked
+            entry.save(update_fields=['note_text', 'is_bookmarked', 'updated_at'])
+
+def note_saved(sender, instance, **kwargs):
+    refresh_entries(instance.user_id, [instance.question_id])
+
+def note_deleted(sender, instance, **kwargs):
+    # Never creates: this also runs while a user (and their entries) are being cascade-deleted
+    refresh_entries(instance.user_id, [instance.question_id], create=False)
+
+def answer_logged(sender, instance, created, **kwargs):
+    if created and instance.is_bookmarked and not instance.is_cleared_from_library:
+        refresh_entries(instance.user_id, [instance.question_id])
+
+def question_saved(sender, instance, created, **kwargs):
+    if not created:
+        LibrarySearchEntry.objects.filter(question=instance).update(question_text=instance.plain_text)
+
+def questions_saved(questions):
+    """question_saved for bulk writes (bulk_update sends no post_save): one UPDATE per question whose text moved."""
+    texts = {q.pk: q.plain_text for q in questions}
+    stored = (LibrarySearchEntry.objects.filter(question_id__in=texts).order_by()
+              .values_list('question_id', 'question_text').distinct())
+    for qid in {qid for qid, text in stored if text != texts[qid]}:
+        LibrarySearchEntry.objects.filter(question_id=qid).update(question_text=texts[qid])
+
+@timed('library_search_rebuild')
+def rebuild(user_ids=None, chunk_size=2000, progress=None):
+    """Recreates the entries from the notes and active bookmarks (triggers redo the FTS5 rows). Returns the count."""
+    with transaction.atomic():
+        existing = LibrarySearchEntry.objects.all()
+        if user_ids:
+            existing = existing.filter(user_id__in=user_ids)
+        existing.delete()
+        notes = UserQuestionNote.objects.exclude(note_text='')
+        bookmarks = UserAnswerLog.objects.filter(is_bookmarked=True, is_cleared_from_library=False)
+        if user_ids:
+            notes, bookmarks = notes.filter(user_id__in=user_ids), bookmarks.filter(user_id__in=user_ids)
+        pairs = {}
+        for user_id, question_id, note_text in notes.values_list('user_id', 'question_id', 'note_text').iterator():
+            pairs[user_id, question_id] = [note_text, False]
+        for user_id, question_id in bookmarks.order_by().values_list('user_id', 'question_id').distinct().iterator():
+            pairs.setdefault((user_id, question_id), ['', False])[1] = True
+        texts = {q.pk: q.plain_text for q in Question.objects.filter(id__in={qid for _, qid in pairs}).only('id', 'text')}
+        keys = sorted(pairs)
+        for start in range(0, len(keys), chunk_size):
+            LibrarySearchEntry.objects.bulk_create([
+                LibrarySearchEntry(user_id=u, question_id=q, note_text=pairs[u, q][0], question_text=texts[q],
+                                   is_bookmarked=pairs[u, q][1])
+                for u, q in keys[start:start + chunk_size] if q in texts])
+            if progress:
+                progress(min(start + chunk_size, len(keys)), len(keys))
+    return len(keys)
+
+# --- 2. QUERY ---
+def backend(connection):
+    """'fts5' / 'tsvector' when migration 0015 could build the index on this database, else None."""
+    if connection.alias not in _backends:
+        found = None
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                found = 'fts5' if cursor.fetchone() else None
+            elif connection.vendor == 'postgresql':
+                cursor.execute("SELECT 1 FROM information_schema.columns WHERE table_name = %s AND column_name = %s",
+                               [LibrarySearchEntry._meta.db_table, 'search_vector'])
+                found = 'tsvector' if cursor.fetchone() else None
+        _backends[connection.alias] = found
+    return _backends[connection.alias]
+
+def terms(query):
+    return [w.lower() for w in WORD.findall(query)][:MAX_TERMS]
+
+def _fts5(cursor, user_id, words, limit, offset):
+    # Quoted words can't be FTS5 syntax; the owner filter comes first so MATCH stays per user
+    match = f'owner:"u{int(user_id)}" AND {{note_text question_text}}: (' + ' '.join(
+        f'"{w}"' for w in words[:-1]) + f' "{words[-1]}"*)'
+    # snippet(-1) would pick the owner column (it always matches): the note's, else the question's
+    note, question = (f"snippet({FTS_TABLE}, {column}, %s, %s, '…', 16)" for column in (1, 2))
+    cursor.execute(
+        f"SELECT rowid, bm25({FTS_TABLE}, 0.0, 2.0, 1.0) AS rank, "
+        f"CASE WHEN instr({note}, %s) THEN {note} ELSE {question} END "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s OFFSET %s",
+        [*MARKS, MARKS[0], *MARKS, *MARKS, match, limit, offset])
+    return [(entry_id, -rank, snippet) for entry_id, rank, snippet in cursor.fetchall()]
+
+def _tsvector(cursor, user_id, words, limit, offset):
+    tsquery = ' & '.join(words[:-1] + [words[-1] + ':*'])
+    cursor.execute(
+        "SELECT id, ts_rank_cd(search_vector, q) AS rank, ts_headline('english', "
+        "CASE WHEN note_text <> '' THEN note_text || ' … ' ELSE '' END || question_text, q, %s) "
+        f"FROM {LibrarySearchEntry._meta.db_table}, to_tsquery('english', %s) q "
+        "WHERE user_id = %s AND search_vector @@ q ORDER BY rank DESC, id LIMIT %s OFFSET %s",
+        [f'StartSel={MARKS[0]}, StopSel={MARKS[1]}, MaxWords=24, MinWords=8', tsquery, user_id,
+         limit, offset])
+    return cursor.fetchall()
+
+def _fallback(alias, user_id, words, limit, offset):
+    entries = LibrarySearchEntry.objects.using(alias).filter(user_id=user_id)
+    for word in words:
+        entries = entries.filter(Q(note_text__icontains=word) | Q(question_text__icontains=word))
+    rows = []
+    for entry_id, note_text, question_text in (entries.order_by('-updated_at', '-id')
+                                               .values_list('id', 'note_text', 'question_text')[offset:offset + limit]):
+        # Like the FTS5 snippet: the note's when it has a hit, else the question's
+        note_hit = any(word in note_text.lower() for word in words)
+        rows.append((entry_id, 0.0, _highlight(note_text if note_hit else question_text, words)))
+    return rows
+
+def _highlight(text, words, width=120):
+    """Snippet around the first hit with MARKS around the hits (fallback backend only)."""
+    lowered = text.lower()
+    hit = min((i for i in (lowered.find(w) for w in words) if i >= 0), default=0)
+    start = max(0, hit - width // 3)
+    snippet = re.sub('(' + '|'.join(map(re.escape, words)) + ')', rf'{MARKS[0]}\1{MARKS[1]}',
+                     text[start:start + width], flags=re.I)
+    return ('…' if start else '') + snippet + ('…' if start + width < len(text) else '')
+
+def render_snippet(snippet):
+    return escape(snippet or '').replace(MARKS[0], HIGHLIGHT[0]).replace(MARKS[1], HIGHLIGHT[1])
+
+@timed('library_search')
+def search_library(user_id, query, limit=20, offset=0):
+    """[{'entry', 'rank', 'snippet'}] best first, plus whether there is another page."""
+    words = terms(query)
+    if not words:
+        return [], False
+    alias = router.db_for_read(LibrarySearchEntry)
+    connection = connections[alias]
+    kind = backend(connection)
+    if kind is None:
+        rows = _fallback(alias, user_id, words, limit + 1, offset)
+    else:
+        with connection.cursor() as cursor:
+            rows = (_fts5 if kind == 'fts5' else _tsvector)(cursor, user_id, words, limit + 1, offset)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    entries = LibrarySearchEntry.objects.using(alias).select_related('question').in_bulk([r[0] for r in rows])
+    return [{'entry': entries[entry_id], 'rank': rank, 'snippet': render_snippet(snippet)}
+            for entry_id, rank, snippet in rows if entry_id in entries], has_more
@@ -1,45 +1,90 @@
 from rest_framework import serializers
 
-from .models import Question, Option, KnowledgeConcept, KeywordAnalysis
-import re
+from .models import Question, Option, KnowledgeConcept, KeywordAnalysis, QuestionStats, strip_keyword_tags, strip_markup
+from .metrics import span
+from .calibration import MIN_ATTEMPTS
+from .media import cached_image
+
+# 0. List serializer that reports its time as a named span (Server-Timing / /metrics)
+class TimedListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        with span(f"serialize_{self.child.__class__.__name__}"):
+            return super().to_representation(data)
+
+# 0b. Image URL fields: the media cache copy once fetched (quiz/media.py), else the stored URL.
+#     `<field>_variants` is {width: url} of the resized WebP copies (empty until cached / without Pillow).
+class CachedImageMixin:
+    image_fields = ()
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        request = self.context.get('request')
+        for field in self.image_fields:
+            if field in data:
+                image = cached_image(data[field], request)
+                data[field], data[f'{field}_variants'] = image['url'], image['variants']
+        return data
 
 # 1. Serializer for the Wiki Concepts
-class KnowledgeConceptSerializer(serializers.ModelSerializer):
+class KnowledgeConceptSerializer(CachedImageMixin, serializers.ModelSerializer):
+    image_fields = ('image_url',)
+
     class Meta:
         model = KnowledgeConcept
         fields = '__all__'
 
 # 2. Serializer for Options (With Cleaning)
-class OptionSerializer(serializers.ModelSerializer):
+class OptionSerializer(CachedImageMixin, serializers.ModelSerializer):
+    image_fields = ('image_url',)
     text_content = serializers.SerializerMethodField()
+    plain_text = serializers.SerializerMethodField()
 
     class Meta:
         model = Option
         fields = ['id', 'option_label', 'text_content', 'is_correct', 
-                  'explanation_text', 'image_url', 'video_url', 'mnemonic_text']
+                  'explanation_text', 'image_url', 'video_url', 'mnemonic_text', 'plain_text', 'concept_spans']
+        list_serializer_class = TimedListSerializer
 
     def get_text_content(self, obj):
         # Remove {{T:Word}} and {{F:Word}} patterns, keeping just "Word"
         # Example: "{{F:All}} types" becomes "All types"
-        clean = re.sub(r'\{\{[TF]:(.*?)\}\}', r'\1', obj.text_content)
-        return clean
+        return strip_keyword_tags(obj.text_content)
+
+    def get_plain_text(self, obj):
+        # Also without [[Word]] links: "{{F:All}} [[Vedas]]" becomes "All Vedas" (concept_spans index this)
+        return strip_markup(obj.text_content)
 
 # 3. Serializer for Questions (With Cleaning)
-class QuestionSerializer(serializers.ModelSerializer):
+class QuestionSerializer(CachedImageMixin, serializers.ModelSerializer):
+    image_fields = ('question_image_url',)
     text = serializers.CharField(source='clean_text', read_only=True)
+    plain_text = serializers.CharField(read_only=True)
     options = OptionSerializer(many=True, read_only=True)
-   
+    difficulty = serializers.SerializerMethodField()
 
     class Meta:
         model = Question
-        fields = ['id', 'exam_name', 'year', 'subject', 'pattern', 'text', 'tags', 'question_image_url', 'options']
+        # plain_text: `text` without its hand-placed [[wiki]] links
+        # concept_spans: precomputed KnowledgeConcept links over `plain_text` (quiz/concepts.py)
+        # difficulty: IRT difficulty in logits (quiz/calibration.py), null until calibrated
+        fields = ['id', 'exam_name', 'year', 'subject', 'pattern', 'text', 'tags', 'question_image_url', 'options',
+                  'plain_text', 'concept_spans', 'difficulty']
+        list_serializer_class = TimedListSerializer
 
+    def get_difficulty(self, obj):
+        # Views select_related('stats'); a missing row means "never calibrated", not an error
+        try:
+            stats = obj.stats
+        except QuestionStats.DoesNotExist:
+            return None
+        return round(stats.difficulty, 2) if stats.attempts >= MIN_ATTEMPTS else None
     
 # 4. Serializer for Graph Data
 class KeywordAnalysisSerializer(serializers.ModelSerializer):
     class Meta:
         model = KeywordAnalysis
         fields = '__all__'
+        list_serializer_class = TimedListSerializer
 # --- 5. AUTH SERIALIZERS ---
 from django.contrib.auth import authenticate
 
@@ -0,0 +1,124 @@
+# quiz/sqlite_mode.py
+# Concurrency mode for SQLite deployments (no DATABASE_URL -> db.sqlite3), on with SQLITE_CONCURRENT.
+#   - configure_connection(): connection_created receiver; every new SQLite connection gets WAL
+#     journaling (readers never wait for the writer), busy_timeout, synchronous=NORMAL and the
+#     mmap / page cache sizes from settings
+#   - serialized_write(fn): hands a write to ONE writer thread per process. It takes an flock on
+#     <db>.write-lock, so the web processes also write one at a time, and commits whatever is
+#     queued in one transaction (a savepoint per write, so one failure doesn't sink the rest).
+#     This avoids SQLite's "database is locked" on DEFERRED transactions that read and then write,
+#     which busy_timeout cannot retry.
+#   - anywhere else (Postgres, an in-memory database, already inside a transaction,
+#     SQLITE_WRITE_QUEUE off) serialized_write() just calls fn
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .metrics import span
+
+try:
+    import fcntl
+except ImportError:  # Windows: the writer thread still serializes writes within the process
+    fcntl = None
+
+WRITE_BATCH = 64  # Most writes committed together
+
+# --- 1. PRAGMAS ---
+def _is_memory(name):
+    return str(name) in ('', ':memory:') or 'mode=memory' in str(name)
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not settings.SQLITE_CONCURRENT:
+        return
+    with connection.cursor() as cursor:
+        if not _is_memory(connection.settings_dict['NAME']):
+            cursor.execute('PRAGMA journal_mode=WAL')  # Persistent, stored in the database file
+        cursor.execute(f'PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}')
+        cursor.execute('PRAGMA synchronous=NORMAL')  # WAL stays consistent; only fsyncs at checkpoints
+        cursor.execute(f'PRAGMA mmap_size={int(settings.SQLITE_MMAP_MB) * 1024 * 1024}')
+        cursor.execute(f'PRAGMA cache_size=-{int(settings.SQLITE_CACHE_MB) * 1024}')  # Negative = KiB
+
+# --- 2. SERIALIZED WRITER ---
+@contextmanager
+def _file_lock(path):
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+class SerializedWriter:
+    """One daemon thread draining a queue of (future, fn, args, kwargs)."""
+    def __init__(self, lock_path, batch=WRITE_BATCH):
+        self.lock_path, self.batch = lock_path, batch
+        self.queue = queue.Queue()
+        self.pid = os.getpid()
+        self.thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self.queue.put((future, fn, args, kwargs))
+        return future.result()
+
+    def _run(self):
+        while True:
+            items = [self.queue.get()]
+            while len(items) < self.batch:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit(items)
+
+    def _commit(self, items):
+        outcomes = []
+        try:
+            with _file_lock(self.lock_path), transaction.atomic():
+                for future, fn, args, kwargs in items:
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((future, True, fn(*args, **kwargs)))
+                    except Exception as exc:
+                        outcomes.append((future, False, exc))
+        except Exception as exc:  # The commit itself failed: none of the writes happened
+            outcomes = [(future, False, exc) for future, *_ in items]
+        finally:
+            connection.close_if_unusable_or_obsolete()
+        # Callers resume only after the commit, so their next read sees the write
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None or _writer.pid != os.getpid():  # Threads don't survive a fork
+            _writer = SerializedWriter(str(connection.settings_dict['NAME']) + '.write-lock')
+        return _writer
+
+def queue_enabled():
+    return (connection.vendor == 'sqlite' and settings.SQLITE_CONCURRENT and settings.SQLITE_WRITE_QUEUE
+            and not _is_memory(connection.settings_dict['NAME']))
+
+def serialized_write(fn, *args, **kwargs):
+    """fn(*args, **kwargs) on the writer thread, in its own (batched) transaction; returns its result."""
+    if not queue_enabled() or connection.in_atomic_block:
+        # An outer transaction must keep its writes, and would hold the lock the writer waits for
+        return fn(*args, **kwargs)
+    with span('serialized_write'):
+        return get_writer().submit(fn, *args, **kwargs)
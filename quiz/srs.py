@@ -0,0 +1,169 @@
+# quiz/srs.py
+# Spaced-repetition ("what to revise today") scheduling on top of UserAnswerLog.
+#   - answer_quality(): maps an answer to an SM-2 grade 0-5 (wrong / skipped / confidence)
+#   - schedule(): one SM-2 step, written with numpy so the SAME code updates one
+#     ReviewState per logged answer and whole arrays of them in the backfill
+#   - record_answer(): incremental update, called by save_user_answer
+#   - backfill_review_states(): rebuilds ReviewState from existing logs, vectorized across
+#     (user, question) pairs: loops over "k-th answer of every pair", not over log rows
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.db import IntegrityError, transaction
+
+from .archive import FLAG_CORRECT, FLAG_SKIPPED, iter_archive_arrays
+from .metrics import timed
+from .models import ReviewState, UserAnswerLog
+
+ENTRY_QUALITY = 3        # Grades <= this put a question into the review queue
+LOW_CONFIDENCE = 50      # Correct but below this -> grade 3 (lucky guess)
+HIGH_CONFIDENCE = 80     # Correct and at least this -> grade 5
+SURE_BUT_WRONG = 70      # Wrong with at least this confidence -> grade 0
+MIN_EASE = 1.3
+MAX_INTERVAL_DAYS = 365
+DAY_SECONDS = 86400.0
+
+# --- 1. GRADING + SM-2 STEP (scalars or arrays) ---
+def answer_quality(is_correct, is_skipped, confidence):
+    is_correct, is_skipped, confidence = np.asarray(is_correct), np.asarray(is_skipped), np.asarray(confidence)
+    return np.select(
+        [is_skipped, ~is_correct & (confidence >= SURE_BUT_WRONG), ~is_correct,
+         confidence < LOW_CONFIDENCE, confidence < HIGH_CONFIDENCE],
+        [1, 0, 1, 3, 4],
+        default=5,
+    )
+
+def schedule(repetitions, interval_days, ease, lapses, quality):
+    """Returns (repetitions, interval_days, ease, lapses) after one answer of grade `quality`."""
+    quality = np.asarray(quality)
+    failed = quality < 3
+    repetitions = np.where(failed, 0, np.asarray(repetitions) + 1)
+    interval_days = np.where(failed | (repetitions == 1), 1.0,
+                             np.where(repetitions == 2, 6.0, np.round(np.asarray(interval_days) * ease)))
+    interval_days = np.minimum(interval_days, MAX_INTERVAL_DAYS)
+    miss = 5 - quality
+    ease = np.maximum(MIN_EASE, np.asarray(ease) + 0.1 - miss * (0.08 + miss * 0.02))
+    lapses = np.asarray(lapses) + failed
+    return repetitions, interval_days, ease, lapses
+
+# --- 2. INCREMENTAL UPDATE (one logged answer) ---
+@timed('srs_update')
+def record_answer(user_id, question_id, is_correct, is_skipped, confidence, answered_at, _retry=True):
+    quality = int(answer_quality(is_correct, is_skipped, confidence))
+    try:
+        with transaction.atomic():
+            state = ReviewState.objects.select_for_update().filter(user_id=user_id, question_id=question_id).first()
+            if state is None:
+                if quality > ENTRY_QUALITY:
+                    return None  # Known well on the first go: nothing to revise
+                state = ReviewState(user_id=user_id, question_id=question_id)
+            reps, interval, ease, lapses = schedule(state.repetitions, state.interval_days, state.ease,
+                                                    state.lapses, quality)
+            state.repetitions, state.interval_days = int(reps), float(interval)
+            state.ease, state.lapses = float(ease), int(lapses)
+            state.last_quality = quality
+            state.last_answered_at = answered_at
+            state.due_at = datetime.fromtimestamp(answered_at.timestamp() + state.interval_days * DAY_SECONDS,
+                                                  tz=dt_timezone.utc)
+            state.save()
+            return state
+    except IntegrityError:
+        # Two answers for a brand-new pair raced on the unique row; the retry updates it.
+        if not _retry:
+            raise
+        return record_answer(user_id, question_id, is_correct, is_skipped, confidence, answered_at, _retry=False)
+
+# --- 3. VECTORIZED BACKFILL ---
+def load_log_arrays(user_ids=None, chunk_size=20000):
+    logs = UserAnswerLog.objects.order_by()  # Sorted in numpy below, no ORDER BY needed
+    if user_ids:
+        logs = logs.filter(user_id__in=user_ids)
+    rows = logs.values_list('user_id', 'question_id', 'attempted_at', 'is_correct', 'is_skipped', 'confidence_score')
+    users, questions, times, correct, skipped, confidence = [], [], [], [], [], []
+    for u, q, t, c, s, conf in rows.iterator(chunk_size=chunk_size):
+        users.append(u); questions.append(q); times.append(t.timestamp())
+        correct.append(c); skipped.append(s); confidence.append(conf)
+    logs = {
+        'user': np.array(users, dtype=np.int64), 'question': np.array(questions, dtype=np.int64),
+        'time': np.array(times, dtype=np.float64), 'correct': np.array(correct, dtype=bool),
+        'skipped': np.array(skipped, dtype=bool), 'confidence': np.array(confidence, dtype=np.int64),
+    }
+    # Archived practice logs are part of the history too
+    parts = [logs]
+    for user_id, block in iter_archive_arrays(user_ids):
+        parts.append({
+            'user': np.full(len(block['id']), user_id, dtype=np.int64), 'question': block['question'],
+            'time': block['attempted_at'], 'correct': (block['flags'] & FLAG_CORRECT).astype(bool),
+            'skipped': (block['flags'] & FLAG_SKIPPED).astype(bool), 'confidence': block['confidence'].astype(np.int64),
+        })
+    return {key: np.concatenate([part[key] for part in parts]) for key in logs}
+
+def compute_review_states(logs):
+    """Replays every (user, question) history through schedule(); returns arrays for the pairs in the queue."""
+    if len(logs['user']) == 0:
+        return None
+    order = np.lexsort((logs['time'], logs['question'], logs['user']))
+    user, question, when = logs['user'][order], logs['question'][order], logs['time'][order]
+    quality = answer_quality(logs['correct'][order], logs['skipped'][order], logs['confidence'][order])
+
+    new_pair = np.ones(len(user), dtype=bool)
+    new_pair[1:] = (user[1:] != user[:-1]) | (question[1:] != question[:-1])
+    starts = np.flatnonzero(new_pair)
+    counts = np.diff(np.append(starts, len(user)))
+
+    # Longest histories first, so "pairs with a k-th answer" is always a prefix.
+    by_len = np.argsort(-counts, kind='stable')
+    starts, counts = starts[by_len], counts[by_len]
+    n = len(starts)
+    active = np.zeros(n, dtype=bool)
+    reps, lapses = np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+    interval, ease = np.zeros(n), np.full(n, 2.5)
+    last_q, last_t = np.zeros(n, dtype=np.int64), np.zeros(n)
+
+    for k in range(int(counts[0])):
+        m = int(np.count_nonzero(counts > k))
+        rows = starts[:m] + k
+        q = quality[rows]
+        active[:m] |= q <= ENTRY_QUALITY
+        live = np.flatnonzero(active[:m])
+        if not len(live):
+            continue
+        ql = q[live]
+        reps[live], interval[live], ease[live], lapses[live] = schedule(
+            reps[live], interval[live], ease[live], lapses[live], ql)
+        last_q[live], last_t[live] = ql, when[rows[live]]
+
+    keep = np.flatnonzero(active)
+    return {
+        'user': user[starts[keep]], 'question': question[starts[keep]],
+        'repetitions': reps[keep], 'interval_days': interval[keep], 'ease': ease[keep],
+        'lapses': lapses[keep], 'last_quality': last_q[keep],
+        'last_answered_at': last_t[keep], 'due_at': last_t[keep] + interval[keep] * DAY_SECONDS,
+    }
+
+@timed('srs_backfill')
+def backfill_review_states(user_ids=None, batch_size=2000):
+    """Rebuilds ReviewState (for all users, or `user_ids`) from UserAnswerLog. Returns rows written."""
+    states = compute_review_states(load_log_arrays(user_ids))
+
+    def utc(ts):
+        return datetime.fromtimestamp(ts, tz=dt_timezone.utc)
+
+    objs = []
+    if states is not None:
+        objs = [
+            ReviewState(user_id=int(u), question_id=int(q), repetitions=int(r), interval_days=float(i),
+                        ease=float(e), lapses=int(l), last_quality=int(lq),
+                        last_answered_at=utc(la), due_at=utc(d))
+            for u, q, r, i, e, l, lq, la, d in zip(
+                states['user'], states['question'], states['repetitions'], states['interval_days'],
+                states['ease'], states['lapses'], states['last_quality'],
+                states['last_answered_at'].tolist(), states['due_at'].tolist())
+        ]
+    with transaction.atomic():
+        existing = ReviewState.objects.all()
+        if user_ids:
+            existing = existing.filter(user_id__in=user_ids)
+        existing.delete()
+        ReviewState.objects.bulk_create(objs, batch_size=batch_size)
+    return len(objs)
@@ -0,0 +1,167 @@
+# quiz/tagging.py
+# LLM tag generation for the `generate_tags` admin action / `tag_questions` command.
+#   - bounded thread pool + token-bucket rate limiter around the Groq chat API
+#   - content-hash -> tags cache (TagCache), so unchanged questions are skipped
+#   - tags written with bulk_update (no Question.save() -> no keyword re-indexing)
+#   - progress stored on a TaggingJob row after every window, so runs can resume
+#
+# GROQ_BASE_URL points the client at any OpenAI-compatible server (e.g. a local fake).
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from .models import Question, TagCache, TaggingJob, index_question_terms
+
+load_dotenv()
+
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+PROMPT_VERSION = 1  # bump when the prompt changes so old cache entries stop matching
+PROMPT = ("Read the UPSC-style question: '{text}'. Generate 5 relevant comma-separated tags, inferring context "
+          "like historical dynasties, periods, or topics (e.g., for a temple question, include 'Chola Dynasty' "
+          "if relevant). Output ONLY the tags, no explanations.")
+MAX_STORED_ERRORS = 200
+
+def get_client():
+    from groq import Groq
+    api_key = os.getenv('GROQ_API_KEY')
+    if not api_key:
+        return None
+    base_url = os.getenv('GROQ_BASE_URL')
+    return Groq(api_key=api_key, base_url=base_url) if base_url else Groq(api_key=api_key)
+
+def content_hash(text, model_name=DEFAULT_MODEL):
+    return hashlib.sha256(f"{model_name}\x00{PROMPT_VERSION}\x00{text}".encode('utf-8')).hexdigest()
+
+# --- 1. RATE LIMITER ---
+class RateLimiter:
+    """Token bucket shared by the worker threads: at most `per_minute` calls, small bursts allowed."""
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1, per_minute // 10)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+# --- 2. ENGINE ---
+class TaggingEngine:
+    def __init__(self, client=None, model_name=DEFAULT_MODEL, concurrency=4, per_minute=30,
+                 window=50, max_retries=3, progress=None):
+        self.client = client if client is not None else get_client()
+        self.model_name = model_name
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(per_minute)
+        self.window = window
+        self.max_retries = max_retries
+        self.progress = progress  # callable(job) after every window
+
+    @staticmethod
+    def create_job(question_ids, model_name=DEFAULT_MODEL):
+        return TaggingJob.objects.create(question_ids=list(question_ids), model_name=model_name)
+
+    def ask(self, text):
+        """One LLM call with exponential backoff (rate-limit / network errors)."""
+        delay = 2.0
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model_name,
+                    messages=[{"role": "user", "content": PROMPT.format(text=text)}],
+                    max_tokens=50,
+                )
+                content = response.choices[0].message.content
+                return content.strip()[:255] if content else None
+            except Exception:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(delay)
+                delay *= 2
+
+    def run(self, job):
+        if self.client is None:
+            raise RuntimeError("GROQ_API_KEY missing.")
+        job.status = 'running'
+        job.save(update_fields=['status', 'updated_at'])
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                while job.next_index < job.total:
+                    window_ids = job.question_ids[job.next_index:job.next_index + self.window]
+                    self._run_window(job, window_ids, pool)
+                    job.next_index += len(window_ids)
+                    job.save()
+                    if self.progress:
+                        self.progress(job)
+        except BaseException:
+            # Progress up to the last finished window is kept; resume picks up from there.
+            job.status = 'failed'
+            job.save(update_fields=['status', 'updated_at'])
+            raise
+
+        job.status = 'done'
+        job.save(update_fields=['status', 'updated_at'])
+        return job
+
+    def _run_window(self, job, window_ids, pool):
+        questions = list(Question.objects.filter(id__in=window_ids).only('id', 'text', 'tags', 'exam_name', 'year'))
+        hashes = {q.id: content_hash(q.text, self.model_name) for q in questions}
+        cache = dict(TagCache.objects.filter(content_hash__in=set(hashes.values())).values_list('content_hash', 'tags'))
+
+        # Identical texts share one LLM call.
+        missing = {}
+        for q in questions:
+            if hashes[q.id] not in cache:
+                missing.setdefault(hashes[q.id], q.text)
+        futures = {digest: pool.submit(self.ask, text) for digest, text in missing.items()}
+
+        new_cache = []
+        for digest, future in futures.items():
+            try:
+                tags = future.result()
+            except Exception as e:
+                self._error(job, digest, hashes, e)
+                continue
+            if tags:
+                cache[digest] = tags
+                new_cache.append(TagCache(content_hash=digest, tags=tags, model_name=self.model_name))
+
+        to_update = []
+        for q in questions:
+            tags = cache.get(hashes[q.id])
+            if tags is None:
+                continue
+            if q.tags == tags:
+                job.skipped += 1  # unchanged question, nothing to write
+                continue
+            if hashes[q.id] in missing:
+                job.tagged += 1
+            else:
+                job.cached += 1
+            q.tags = tags
+            to_update.append(q)
+
+        TagCache.objects.bulk_create(new_cache, ignore_conflicts=True)
+        Question.objects.bulk_update(to_update, ['tags'], batch_size=500)
+        index_question_terms(to_update)  # bulk_update skips Question.save() (retag_questions), so the term index too
+
+    def _error(self, job, digest, hashes, exc):
+        failed_ids = [qid for qid, h in hashes.items() if h == digest]
+        job.failed += len(failed_ids)
+        if len(job.errors) < MAX_STORED_ERRORS:
+            job.errors.append({'question_ids': failed_ids, 'error': f"{type(exc).__name__}: {exc}"[:300]})
@@ -1,3 +1,1292 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import random
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import brotli
+import numpy as np
+import tablib
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import connection, connections, transaction
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import adaptive, calibration, cohort, concepts, leaderboard, media, search, sqlite_mode, srs
+from .admin import UserAnswerLogAdmin
+from .admin_perf import EstimatedCountPaginator, estimated_rows
+from .admin_resource import QuestionResource
+from .archive import archive_logs
+from .backup import Restorer, backup_models, open_backup_lines, write_backup
+from .blobs import shared_storage
+from .bulk_import import BulkQuestionImporter
+from .compression import CompressionMiddleware
+from .calibration import calibrate
+from .jobs import claim_next, enqueue, requeue_stale, run_pending
+from .leaderboard import rebuild_leaderboards
+from .management.commands import run_worker
+from .mastery import _priors_from_logs, backfill_mastery, session_growth
+from .models import (AnswerArchive, CachedMedia, CustomUser, KeywordAnalysis, Job, KnowledgeConcept, LeaderboardEntry,
+                     LibrarySearchEntry, Option, Question, QuestionStats, QuestionTerm, ReviewState, StoredFile,
+                     TagCache, UserAbility, UserAnswerLog, UserQuestionNote)
+from .query_plans import check_query_plans
+from .replicas import REPLICA, ReplicaRouter, _local_pins, replica_reads
+from .search import rebuild as rebuild_library_search, search_library
+from .serializers import QuestionSerializer
+from .srs import backfill_review_states
+from .tagging import TaggingEngine, get_client
+from .trends import rebuild_keyword_trends, rebuild_term_index
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+def make_question(**fields):
+    return Question.objects.create(**{'subject': 'Polity', 'pattern': 'one_liner',
+                                      'text': 'Consider the following statements', **fields})
+
+class StubServer:
+    """http.server on a free local port answering {path: (status, content_type, body) or fn(request body) ->
+    that tuple}; counts requests."""
+
+    def __init__(self, routes):
+        self.routes, self.hits = routes, []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.hits.append(self.path)
+                route = stub.routes.get(self.path, (404, 'text/plain', b'missing'))
+                request_body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                status, content_type, body = route(request_body) if callable(route) else route
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_POST = do_GET
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_port}{path}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+# --- METRICS (quiz/metrics.py) ---
+class MetricsTests(TestCase):
+    def test_scrape_needs_the_token_outside_debug(self):
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+            with override_settings(DEBUG=True):
+                self.assertEqual(self.client.get('/metrics').status_code, 200)
+        with override_settings(METRICS_TOKEN='s3cret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'quiz_http_requests_total', response.content)
+
+    def test_server_timing_is_opt_in(self):
+        # The middleware reads the setting when it is built, i.e. on a client's first request
+        self.assertNotIn('Server-Timing', Client().get('/api/questions/'))
+        with override_settings(METRICS_SERVER_TIMING=True):
+            self.assertIn('Server-Timing', Client().get('/api/questions/'))
+
+# --- LEADERBOARDS (quiz/leaderboard.py) ---
+class SortedBoardTests(TestCase):
+    def test_rank_follows_score_updates_and_breaks_ties_by_member(self):
+        board = leaderboard.SortedBoard()
+        for member, score in ((1, 10.0), (2, 20.0), (3, 20.0)):
+            board.set(member, score)
+        self.assertEqual([board.rank(m) for m in (2, 3, 1)], [(0, 20.0), (1, 20.0), (2, 10.0)])
+        board.set(1, 30.0)  # Moves, not duplicated
+        self.assertEqual(board.top(2), [(1, 30.0), (2, 20.0)])
+        self.assertEqual((len(board), board.rank(4)), (3, None))
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        leaderboard._store['store'] = None  # A fresh process
+        self.addCleanup(leaderboard._store.update, store=None)
+        self.users = [CustomUser.objects.create_user(username=f'ranked{i}', password='x') for i in range(3)]
+        self.questions = [make_question(exam_name='UPSC CSE') for _ in range(cohort.MIN_MOCK_QUESTIONS)]
+
+    def test_local_store_flushes_deltas_and_other_processes_reload_them(self):
+        board = leaderboard.accuracy_board('2026-W42')
+        writer, reader = leaderboard.LocalStore(3600), leaderboard.LocalStore(3600)
+        writer.increment(board, 1, 15, 20)
+        writer.increment(board, 2, 18, 20)
+        writer.increment(board, 3, 5, 10)  # Below MIN_WEEKLY_ANSWERS: counted, not ranked
+        self.assertEqual(writer.rank(board, 2)[0], 0)
+        self.assertEqual((writer.size(board), writer.rank(board, 3)), (2, None))
+        self.assertEqual(reader.size(board), 0)  # Nothing flushed yet
+
+        writer.flush()
+        self.assertEqual(dict(LeaderboardEntry.objects.filter(board=board).values_list('user_id', 'answered')),
+                         {1: 20, 2: 20, 3: 10})
+        fresh = leaderboard.LocalStore(0)  # Reloads on every read
+        self.assertEqual(fresh.top(board, 10), writer.top(board, 10))
+
+        writer.increment(board, 3, 10, 10)  # Now 15/20: ranked, between 2 and 1
+        writer.flush()
+        self.assertEqual([member for member, _ in fresh.top(board, 10)], [2, 1, 3])
+        self.assertEqual(reader.size(board), 0)  # Keeps its copy until LEADERBOARD_SYNC_SECONDS pass
+
+    def answer_exam(self, user, session_id, correct):
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        for i, question in enumerate(self.questions):
+            response = self.client.post('/api/user/answer-log/', {
+                'question_id': question.pk, 'is_correct': str(i < correct).lower(), 'source_mode': 'exam',
+                'session_id': session_id, 'time_taken_seconds': 30})
+            self.assertEqual(response.status_code, 201)
+
+    def test_analysis_is_read_only_and_closing_the_session_ranks_it(self):
+        user = self.users[0]
+        self.answer_exam(user, 'mock-1', correct=8)
+        self.assertEqual(self.client.get('/api/exam/analysis/mock-1/').status_code, 200)
+        self.assertIsNone(leaderboard.rank(leaderboard.mock_board(), user.id))
+
+        closed = self.client.post('/api/exam/analysis/mock-1/').json()
+        self.assertEqual((closed['score'], closed['ranked'], closed['me']['rank']), (16 - 2 * 0.66, True, 1))
+        self.assertEqual(self.client.post('/api/exam/analysis/nope/').status_code, 404)
+
+    def test_rebuild_from_the_logs_matches_the_live_boards(self):
+        for user, scores in zip(self.users, ((8, 5), (9, 3), (4, 6))):
+            for session, correct in enumerate(scores):
+                self.answer_exam(user, f'{user.username}-{session}', correct)
+                self.client.post(f'/api/exam/analysis/{user.username}-{session}/')
+        boards = [leaderboard.accuracy_board(leaderboard.week_label(timezone.now())),
+                  leaderboard.accuracy_board(leaderboard.week_label(timezone.now()), 'UPSC CSE'),
+                  leaderboard.mock_board(), leaderboard.mock_board('UPSC CSE')]
+
+        def standings():
+            return {name: [(member, leaderboard.display_score(name, score))
+                           for member, score in leaderboard.top(name, 10)] for name in boards}
+        live = standings()
+        self.assertEqual([member for member, _ in live[leaderboard.mock_board()]],
+                         [self.users[1].id, self.users[0].id, self.users[2].id])
+        leaderboard.get_store().flush()
+        result = leaderboard.rebuild_leaderboards()
+        self.assertEqual(result['boards'], 4)
+        self.assertEqual(standings(), live)
+        leaderboard._store['store'] = None  # Another process, from LeaderboardEntry alone
+        self.assertEqual(standings(), live)
+
+# --- BULK IMPORT (quiz/bulk_import.py, quiz/admin_resource.py) ---
+class BulkImportTests(TestCase):
+    ROW = {'text': 'Which Article abolishes untouchability?', 'subject': 'Polity', 'year': '2020',
+           'opt_a_text': 'Article 17', 'opt_b_text': 'Article 14', 'correct_option': 'A'}
+
+    def test_updates_reach_the_post_save_consumers(self):
+        BulkQuestionImporter().run([self.ROW])
+        question = Question.objects.get(text=self.ROW['text'])
+        user = CustomUser.objects.create_user(username='aspirant', password='x')
+        LibrarySearchEntry.objects.create(user=user, question=question, note_text='Art 17',
+                                          question_text='stale text')
+        adaptive.get_bank()
+        with self.captureOnCommitCallbacks(execute=True):
+            report = BulkQuestionImporter().run([{**self.ROW, 'subject': 'History'}])
+        self.assertEqual(report.updated, 1)
+        self.assertIsNone(adaptive._bank['bank'])  # Reloaded on the next paper, not after BANK_TTL
+        self.assertEqual(LibrarySearchEntry.objects.get(user=user).question_text, question.plain_text)
+
+    def test_admin_rows_are_reindexed_once_with_their_new_options(self):
+        dataset = tablib.Dataset(headers=list(self.ROW))
+        dataset.append(list(self.ROW.values()))
+        with mock.patch('quiz.models.retag_questions') as on_save, \
+                mock.patch('quiz.admin_resource.retag_questions') as after_options:
+            result = QuestionResource().import_data(dataset, raise_errors=True)
+        self.assertFalse(result.has_errors())
+        on_save.assert_not_called()
+        [[[(question, options)]], _] = after_options.call_args
+        self.assertEqual([o.text_content for o in options], ['Article 17', 'Article 14'])
+        self.assertEqual(question.options.count(), 2)
+
+# --- BACKUP / RESTORE (quiz/backup.py) ---
+class BackupTests(TestCase):
+    def backup(self, path, since=None):
+        return write_backup(path, backup_models(), since_watermarks=since)
+
+    def restore(self, path):
+        fh, lines = open_backup_lines(path)
+        with fh:
+            restorer = Restorer(upsert=True)
+            restorer.restore(lines)
+        return restorer
+
+    def test_incremental_after_archiving_does_not_restore_archived_logs_twice(self):
+        user = CustomUser.objects.create_user(username='aspirant', password='x')
+        question = make_question()
+        UserAnswerLog.objects.bulk_create(UserAnswerLog(user=user, question=question, is_correct=i % 2 == 0)
+                                          for i in range(6))
+        UserAnswerLog.objects.update(attempted_at=timezone.now() - timedelta(days=400))
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        full = self.backup(os.path.join(folder, 'full.ndjson.gz'))
+
+        self.assertEqual(archive_logs(older_than_days=30)['logs'], 6)
+        UserAnswerLog.objects.create(user=user, question=question, is_correct=True)
+        incremental = self.backup(os.path.join(folder, 'inc.ndjson.gz'), since=full['watermarks'])
+        self.assertEqual(incremental['deleted'], {'quiz.useranswerlog': 6})
+
+        UserAnswerLog.objects.all().delete()  # Disaster: the logs are gone, restore both files
+        AnswerArchive.objects.all().delete()
+        self.restore(os.path.join(folder, 'full.ndjson.gz'))
+        self.assertEqual(UserAnswerLog.objects.count(), 6)
+        restorer = self.restore(os.path.join(folder, 'inc.ndjson.gz'))
+        self.assertEqual(restorer.deleted, {'quiz.useranswerlog': 6})
+        self.assertEqual(UserAnswerLog.objects.count(), 1)  # Only the live one...
+        self.assertEqual(AnswerArchive.objects.get().count, 6)  # ...the archived ones once, in their block
+
+# --- SQLITE WRITE QUEUE (quiz/sqlite_mode.py) ---
+# TransactionTestCase: the writer thread has its own connection, which only sees committed rows.
+class SerializedWriterTests(TransactionTestCase):
+    def setUp(self):
+        lock_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, lock_dir)
+        self.lock_path = os.path.join(lock_dir, 'db.sqlite3.write-lock')
+        self.writer = sqlite_mode.SerializedWriter(self.lock_path)
+
+    def submit_from_threads(self, fns):
+        results = [None] * len(fns)
+
+        def call(i):
+            try:
+                results[i] = self.writer.submit(fns[i])
+            except Exception as exc:
+                results[i] = exc
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(len(fns))]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def test_writes_run_on_the_writer_thread_and_are_committed_on_return(self):
+        def write():
+            return threading.current_thread().name, make_question(text='Queued').pk
+
+        thread_name, pk = self.writer.submit(write)
+        self.assertEqual(thread_name, 'sqlite-writer')
+        self.assertTrue(Question.objects.filter(pk=pk).exists())  # Visible to the caller's connection
+        self.assertTrue(os.path.exists(self.lock_path))
+
+    def test_queued_writes_share_a_transaction_but_fail_alone(self):
+        release = threading.Event()
+
+        def blocker():
+            release.wait(5)
+            return make_question(text='First').pk
+
+        def failing():
+            make_question(text='Rolled back')
+            raise ValueError('bad row')
+
+        batches = []
+        commit = self.writer._commit
+        with mock.patch.object(self.writer, '_commit', side_effect=lambda items: (batches.append(len(items)),
+                                                                                 commit(items))):
+            first, _ = self.submit_from_threads([blocker])
+            while self.writer.queue.qsize() or not batches:  # The writer is inside blocker()
+                time.sleep(0.01)
+            threads, results = self.submit_from_threads([
+                lambda: make_question(text='Second').pk, failing, lambda: make_question(text='Third').pk])
+            while self.writer.queue.qsize() < 3:
+                time.sleep(0.01)
+            release.set()
+            for thread in first + threads:
+                thread.join(5)
+        self.assertEqual(batches, [1, 3])
+        self.assertIsInstance(results[1], ValueError)  # Raised in the caller
+        self.assertEqual(set(Question.objects.values_list('text', flat=True)), {'First', 'Second', 'Third'})
+
+    def test_queue_is_bypassed_where_it_cannot_help(self):
+        def where():
+            return threading.current_thread()
+
+        self.assertFalse(sqlite_mode.queue_enabled())  # The test database is in memory
+        self.assertIs(sqlite_mode.serialized_write(where), threading.current_thread())
+        with mock.patch.object(sqlite_mode, 'queue_enabled', return_value=True), \
+                mock.patch.object(sqlite_mode, 'get_writer', return_value=self.writer):
+            self.assertEqual(sqlite_mode.serialized_write(where).name, 'sqlite-writer')
+            with transaction.atomic():  # Its writes must stay in the outer transaction
+                self.assertIs(sqlite_mode.serialized_write(where), threading.current_thread())
+
+    def test_a_forked_process_gets_its_own_writer(self):
+        self.addCleanup(setattr, sqlite_mode, '_writer', sqlite_mode._writer)
+        writer = sqlite_mode.get_writer()
+        self.assertIs(sqlite_mode.get_writer(), writer)
+        writer.pid = -1  # As seen from a child: the parent's thread didn't come along
+        self.assertIsNot(sqlite_mode.get_writer(), writer)
+
+# --- READ REPLICA (quiz/replicas.py) ---
+# 'replica' is a test mirror of 'default' (backend/settings.py): a second connection to the same
+# test database, configured when DATABASE_REPLICA_MIRROR=true or DATABASE_REPLICA_URL is set.
+# TransactionTestCase, because TestCase's open transaction keeps reads on 'default'.
+@skipUnless(REPLICA in settings.DATABASES, "Needs DATABASE_REPLICA_MIRROR=true (or DATABASE_REPLICA_URL)")
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {'default', REPLICA} & set(settings.DATABASES)  # The runner sets up (and checks) these
+
+    def setUp(self):
+        cache.clear()
+        _local_pins.clear()  # Earlier tests' writes pinned the same user ids in this process
+        self.user = CustomUser.objects.create_user(username='reader', password='x')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        self.question = make_question()
+        KeywordAnalysis.objects.create(question=self.question, keyword='only', is_true_usage=False, year=2020,
+                                       exam_name='UPSC CSE')
+
+    def get(self, path):
+        """(response, {alias: [SQL reading quiz_ tables]}); the test client has rendered the body by then."""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = self.client.get(path)
+        return response, {alias: [q['sql'] for q in captured.captured_queries if 'FROM "quiz_' in q['sql']]
+                          for alias, captured in (('default', primary), (REPLICA, replica))}
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Question), 'default')  # Outside replica_reads()
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Question), REPLICA)
+            self.assertEqual(router.db_for_read(Job), 'default')  # PRIMARY_ONLY
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Question), 'default')
+        self.assertEqual(router.db_for_write(Question), 'default')
+
+    def test_analytics_views_read_from_replica(self):
+        for path in ('/api/analysis/keywords/', '/api/user/dashboard/', '/api/user/history/?history=full'):
+            with self.subTest(path=path):
+                response, queries = self.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(queries['default'], [])
+                if path.startswith('/api/analysis/'):
+                    self.assertTrue(any('quiz_keywordanalysis' in sql for sql in queries[REPLICA]))
+                    self.assertEqual(response.json()[0]['keyword'], 'only')
+
+    @override_settings(REPLICA_PIN_SECONDS=1)
+    def test_pinned_to_primary_after_a_write_until_the_pin_expires(self):
+        UserAnswerLog.objects.create(user=self.user, question=self.question, is_correct=True, is_bookmarked=True)
+        response = self.client.post('/api/user/note/', {'question_id': self.question.pk, 'note_text': 'remember'},
+                                    format='json')
+        self.assertEqual(response.status_code, 201)
+
+        response, queries = self.get('/api/user/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries[REPLICA], [])  # Read-your-writes
+        self.assertTrue(queries['default'])
+
+        time.sleep(1.1)
+        response, queries = self.get('/api/user/dashboard/')
+        self.assertEqual(queries['default'], [])
+        self.assertTrue(queries[REPLICA])
+
+    def test_failed_write_does_not_pin(self):
+        response = self.client.post('/api/user/note/', {'question_id': self.question.pk, 'note_text': 'x'},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)  # No bookmark
+        _, queries = self.get('/api/user/dashboard/')
+        self.assertEqual(queries['default'], [])
+
+# --- QUERY PLANS (quiz/query_plans.py) ---
+# A plan depends on the table sizes the planner sees, so the check runs against a seeded data set
+# (a few hundred rows per user across many users) after ANALYZE, never against whatever is on disk.
+class QueryPlanTests(TestCase):
+    USERS, QUESTIONS, LOGS_PER_USER = 60, 400, 150
+
+    @classmethod
+    def setUpTestData(cls):
+        users = CustomUser.objects.bulk_create(CustomUser(username=f'aspirant{i}') for i in range(cls.USERS))
+        questions = Question.objects.bulk_create(
+            Question(subject=('Polity', 'History', 'Economy')[i % 3], pattern='one_liner', year=2000 + i % 25,
+                     text=f'Consider the following statements about topic {i}', tags=f'topic{i % 40}')
+            for i in range(cls.QUESTIONS))
+        options = Option.objects.bulk_create(
+            Option(question=q, option_label=label, text_content=f'Only statement {label}', is_correct=label == 'a')
+            for q in questions for label in 'abcd')
+        KeywordAnalysis.objects.bulk_create(
+            KeywordAnalysis(question=q, keyword=word, is_true_usage=i % 2 == 0, year=q.year, exam_name=q.exam_name)
+            for i, q in enumerate(questions) for word in ('Only', 'All', 'Both', f'term{i % 50}'))
+
+        rng = random.Random(42)
+        old = timezone.now() - timedelta(days=settings.ARCHIVE_AFTER_DAYS + 30)
+        logs = []
+        for user in users:
+            for n, i in enumerate(rng.sample(range(cls.QUESTIONS), cls.LOGS_PER_USER)):
+                exam = n < 50
+                logs.append(UserAnswerLog(
+                    user=user, question=questions[i], selected_option=options[i * 4],
+                    is_correct=rng.random() < 0.6, time_taken_seconds=rng.randint(5, 90),
+                    is_bookmarked=n % 10 == 0, source_mode='exam' if exam else 'practice',
+                    session_id=f'exam-{user.pk}-{n // 25}' if exam else None))
+        UserAnswerLog.objects.bulk_create(logs)
+        UserAnswerLog.objects.filter(source_mode='practice', is_bookmarked=False, id__in=[
+            log.id for log in logs[::3]]).update(attempted_at=old)
+        UserQuestionNote.objects.bulk_create(
+            UserQuestionNote(user=log.user, question=log.question, note_text=f'Remember {log.question_id}')
+            for log in logs if log.is_bookmarked)
+
+        # The derived tables, filled the way their commands fill them
+        archive_logs()
+        rebuild_keyword_trends()
+        rebuild_term_index()
+        backfill_review_states()
+        backfill_mastery()
+        calibrate(full=True)
+        rebuild_leaderboards()
+        rebuild_library_search()
+        cls.user, cls.session_id = users[0], f'exam-{users[0].pk}-0'
+
+    def assertNoFullScans(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        results = check_query_plans(self.user, self.session_id)
+        self.assertTrue(results)
+        failed = [f"{r['view']} -> {', '.join(r['full_scans'])}\n  {r['sql']}\n    " + '\n    '.join(r['plan'])
+                  for r in results if r['failed']]
+        self.assertEqual(failed, [], '\n'.join(failed))
+
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite query plans')
+    def test_no_full_scans_sqlite(self):
+        self.assertNoFullScans()
+
+    @skipUnless(connection.vendor == 'postgresql', 'Postgres query plans')
+    def test_no_full_scans_postgres(self):
+        self.assertNoFullScans()
+
+# --- MEDIA CACHE (quiz/media.py) ---
+# Images are fetched from a stub server into the shared storage (StoredFile rows, the default backend),
+# as the worker would, and read back through the serializers' URLs and the /media/ view, as the web would.
+@override_settings(MEDIA_VARIANT_WIDTHS=[320, 640, 1280], MEDIA_MAP_SECONDS=0)
+class MediaCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        png = BytesIO()
+        if Image:
+            Image.new('RGB', (1000, 500), (200, 30, 30)).save(png, 'PNG')
+        else:
+            png.write(b'\x89PNG\r\n\x1a\n')  # Stored as is: no variants without Pillow
+        cls.png = png.getvalue()
+        cls.stub = StubServer({'/diagram.png': (200, 'image/png', cls.png),
+                               '/private': (200, 'text/html', b'<html>Sign in</html>')})
+        cls.addClassCleanup(cls.stub.close)
+
+    def fetch(self, path):
+        url = self.stub.url(path)
+        media.register_urls([url])
+        media.fetch_pending()
+        return CachedMedia.objects.get(source_url=url)
+
+    def test_original_and_variants_in_shared_storage(self):
+        row = self.fetch('/diagram.png')
+        self.assertEqual((row.status, row.content_type, row.size), ('ready', 'image/png', len(self.png)))
+        store = shared_storage()
+        self.assertEqual(store.open(row.original).read(), self.png)
+        if Image is None:
+            self.assertEqual(row.variants, {})
+            return
+        self.assertEqual((row.width, row.height), (1000, 500))
+        self.assertEqual(sorted(row.variants), ['320', '640'])  # Not wider than the original
+        for width, path in row.variants.items():
+            with Image.open(store.open(path)) as variant:
+                self.assertEqual((variant.format, variant.size), ('WEBP', (int(width), int(width) // 2)))
+        self.assertEqual(StoredFile.objects.count(), 3)
+
+        # Same bytes under another URL: no new files
+        self.stub.routes['/copy.png'] = self.stub.routes['/diagram.png']
+        self.assertEqual(self.fetch('/copy.png').variants, row.variants)
+        self.assertEqual(StoredFile.objects.count(), 3)
+
+    def test_serialized_urls_point_at_the_cached_files(self):
+        row = self.fetch('/diagram.png')
+        question = make_question(question_image_url=row.source_url)
+        data = QuestionSerializer(question, context={'request': RequestFactory().get('/')}).data
+        self.assertEqual(data['question_image_url'], f"http://testserver/media/{row.original}")
+        self.assertEqual(data['question_image_url_variants'],
+                         {w: f"http://testserver/media/{p}" for w, p in row.variants.items()})
+        self.assertEqual(media.cached_image('https://drive.example/not-fetched.png'),
+                         {'url': 'https://drive.example/not-fetched.png', 'variants': {}})
+
+    def test_served_with_immutable_cache_headers(self):
+        row = self.fetch('/diagram.png')
+        for path in [row.original, *row.variants.values()]:
+            with self.subTest(path=path):
+                response = self.client.get(media.media_url(path))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Cache-Control'], media.IMMUTABLE)
+                self.assertEqual(response['Content-Type'], 'image/webp' if path.endswith('.webp') else 'image/png')
+                self.assertEqual(b''.join(response.streaming_content), shared_storage().open(path).read())
+        self.assertEqual(self.client.get('/media/originals/00/missing.png').status_code, 404)
+
+    def test_only_media_is_served_from_the_shared_storage(self):
+        shared_storage().save('job_uploads/questions.csv', ContentFile(b'private'))
+        self.assertEqual(self.client.get('/media/job_uploads/questions.csv').status_code, 404)
+        self.assertEqual(self.client.get('/media/variants/../job_uploads/questions.csv').status_code, 404)
+
+    def test_non_image_is_retried_then_given_up(self):
+        url = self.stub.url('/private')
+        media.register_urls([url])
+        for attempt, status in ((1, 'pending'), (2, 'pending'), (3, 'failed')):
+            self.assertEqual(media.fetch_pending(), {'fetched': 0, 'failed': 1})
+            row = CachedMedia.objects.get(source_url=url)
+            self.assertEqual((row.attempts, row.status), (attempt, status))
+        self.assertIn('Not an image: text/html', row.error)
+        self.assertEqual(media.fetch_pending(), {'fetched': 0, 'failed': 0})
+        self.assertEqual(self.stub.hits.count('/private'), 3)
+        self.assertEqual(media.cached_image(url)['url'], url)
+
+# --- BACKGROUND JOBS (quiz/jobs.py, quiz/job_handlers.py) ---
+class JobTests(TestCase):
+    def test_progress_reports_keep_a_long_job_claimed(self):
+        job = enqueue('analyze_keywords')
+        job = claim_next('worker-1')
+        started = timezone.now() - timedelta(hours=2)
+        Job.objects.filter(pk=job.pk).update(locked_at=started)  # Claimed two hours ago, still reporting
+        job.report_progress(10, 100, "Still going")
+        self.assertEqual(requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.progress_done), ('running', 'worker-1', 10))
+        self.assertGreater(job.locked_at, started)
+
+        Job.objects.filter(pk=job.pk).update(locked_at=started)  # Stopped reporting: its worker is gone
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, 'queued')
+
+    def test_admin_upload_is_imported_from_the_shared_storage(self):
+        admin = CustomUser.objects.create_superuser(username='admin', password='x')
+        self.client.force_login(admin)
+        upload = SimpleUploadedFile('pyqs.csv', (
+            'text,subject,year,opt_a_text,opt_b_text,correct_option\n'
+            'Which article abolishes untouchability?,Polity,2019,Article 17,Article 14,A\n'
+            ',Polity,2019,,,\n').encode())
+        response = self.client.post(reverse('admin:quiz_question_bulk_import'), {'file': upload, 'chunk_size': 50})
+        job = Job.objects.get(kind='import_questions')
+        self.assertRedirects(response, reverse('admin:quiz_job_change', args=[job.pk]),
+                             fetch_redirect_response=False)
+        name = job.payload['upload']
+        self.assertTrue(name.startswith('job_uploads/') and name.endswith('_pyqs.csv'))
+        self.assertTrue(shared_storage().exists(name))
+
+        self.assertEqual(run_pending(kinds=['import_questions']), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done', job.error)
+        self.assertEqual((job.result['created'], len(job.result['error_rows'])), (1, 1))
+        question = Question.objects.get(text='Which article abolishes untouchability?')
+        self.assertEqual([(o.option_label, o.is_correct) for o in question.options.order_by('option_label')],
+                         [('A', True), ('B', False)])
+        self.assertFalse(shared_storage().exists(name))
+
+    def test_failed_import_keeps_its_upload_for_retries_only(self):
+        name = shared_storage().save('job_uploads/broken.csv', ContentFile(b'text,subject\nQ,Polity\n'))
+        job = enqueue('import_questions', {'upload': name}, max_attempts=2)
+        with mock.patch.object(BulkQuestionImporter, 'run', side_effect=RuntimeError('database went away')):
+            run_pending(kinds=['import_questions'])
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'queued')
+            self.assertTrue(shared_storage().exists(name))  # The retry reads it again
+
+            Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+            run_pending(kinds=['import_questions'])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_worker_loop_requeues_stale_jobs_while_it_runs(self):
+        handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGTERM, signal.SIGINT)}
+        self.addCleanup(lambda: [signal.signal(sig, handler) for sig, handler in handlers.items()])
+        polls = iter(range(3))
+
+        def idle(seconds):
+            if next(polls) == 2:
+                os.kill(os.getpid(), signal.SIGTERM)  # Stops the loop like a deploy would
+
+        with mock.patch.object(run_worker, 'REQUEUE_EVERY_SECONDS', 0), \
+                mock.patch.object(run_worker, 'requeue_stale') as requeue, \
+                mock.patch.object(run_worker, 'claim_next', return_value=None), \
+                mock.patch.object(run_worker.time, 'sleep', side_effect=idle):
+            run_worker.worker_loop(None, poll_seconds=1)
+        self.assertEqual(requeue.call_count, 3)  # Every pass, not just at startup
+
+# --- ADAPTIVE MOCKS (quiz/adaptive.py) ---
+class AdaptivePaperTests(TestCase):
+    PATTERNS = ['zero_g_statement', 'elim_classical', 'assertion_2', 'one_liner', 'fifty_fifty']
+    DAY = 86400.0
+
+    def bank(self, patterns=PATTERNS, n=40):
+        return adaptive.QuestionBank(range(1, n + 1), ['History', 'Polity'] * (n // 2),
+                                     [patterns[i % len(patterns)] for i in range(n)])
+
+    def profile(self, bank, answers, now):
+        """answers: [(question id, attempts, correct, days ago)]"""
+        qids, attempts, correct, days = zip(*answers)
+        pos, found = bank.positions(qids)
+        self.assertTrue(found.all())
+        return {'pos': pos, 'attempts': np.array(attempts, dtype=float), 'correct': np.array(correct, dtype=float),
+                'last': now - np.array(days, dtype=float) * self.DAY}
+
+    def test_blueprint_counts_fill_the_paper(self):
+        self.assertEqual(adaptive.blueprint_counts(20), [6, 6, 4, 4])
+        self.assertEqual(adaptive.blueprint_counts(7), [3, 2, 1, 1])
+        self.assertEqual(adaptive.blueprint_group('fifty_fifty'), -1)
+
+    def test_papers_follow_the_blueprint_and_favour_weak_subjects(self):
+        bank, now = self.bank(n=80), 1.7e9  # 8 History + 8 Polity questions per pattern
+        # Odd ids are History (all missed), even ids Polity (all right), two months ago
+        profile = self.profile(bank, [(qid, 1, qid % 2 == 0, 60) for qid in range(1, 13)], now)
+        chosen = adaptive.select_paper(bank, profile, total=20, now=now, rng=np.random.default_rng(7))
+        self.assertEqual(len(set(chosen.tolist())), 20)
+        self.assertEqual(np.bincount(bank.group[chosen], minlength=4).tolist(), [6, 6, 4, 4])
+        history = int(np.sum(bank.subject_names[bank.subject[chosen]] == 'History'))
+        self.assertGreaterEqual(history, 18)  # The noise may let a Polity question or two through
+
+    def test_recent_answers_sink_and_old_misses_come_back(self):
+        bank, now = self.bank(), 1.7e9
+        profile = self.profile(bank, [(1, 1, 1, 0), (3, 1, 0, 365)], now)
+        with mock.patch.object(adaptive, 'NOISE', 0.0):
+            scores = adaptive.score_questions(bank, profile, now, np.random.default_rng(0))
+        peer = scores[bank.positions([11])[0][0]]  # Same subject and pattern as 1, never answered
+        self.assertAlmostEqual(scores[0], peer - adaptive.EXPOSURE_PENALTY)
+        self.assertAlmostEqual(scores[2], scores[bank.positions([13])[0][0]] + adaptive.WRONG_BONUS, places=3)
+
+    def test_short_groups_are_topped_up_from_any_pattern(self):
+        bank = self.bank(patterns=['zero_g_statement', 'elim_classical', 'one_liner', 'fifty_fifty'], n=24)
+        chosen = adaptive.select_paper(bank, adaptive.empty_profile(), total=20, rng=np.random.default_rng(1))
+        self.assertEqual(len(set(chosen.tolist())), 20)
+        self.assertEqual(int(np.sum(bank.group[chosen] == 2)), 0)  # No assertion questions exist
+        self.assertGreater(int(np.sum(bank.group[chosen] == -1)), 0)
+
+    def test_bank_is_cached_until_a_question_changes(self):
+        adaptive.invalidate_bank()
+        self.addCleanup(adaptive.invalidate_bank)
+        make_question(pattern='elim_classical')
+        self.assertEqual(len(adaptive.get_bank()), 1)
+        with self.assertNumQueries(0):
+            adaptive.get_bank()
+        make_question(pattern='assertion_2')  # post_save drops this process's copy
+        with self.assertNumQueries(1):
+            self.assertEqual(len(adaptive.get_bank()), 2)
+        with self.assertNumQueries(1):
+            adaptive.get_bank(max_age=0)  # Expired: other processes' edits show up after BANK_TTL
+
+    def test_user_profile_is_mapped_onto_the_bank(self):
+        user = CustomUser.objects.create_user(username='aspirant', password='x')
+        kept, dropped = make_question(), make_question()
+        for question, correct in ((kept, True), (kept, False), (dropped, False)):
+            UserAnswerLog.objects.create(user=user, question=question, is_correct=correct)
+        bank = adaptive.QuestionBank([kept.pk], ['Polity'], ['one_liner'])  # `dropped` left the bank
+        with self.assertNumQueries(1):
+            profile = adaptive.user_profile(user, bank)
+        self.assertEqual((profile['pos'].tolist(), profile['attempts'].tolist(), profile['correct'].tolist()),
+                         ([0], [2.0], [1.0]))
+
+# --- IRT CALIBRATION (quiz/calibration.py) ---
+class CalibrationTests(TestCase):
+    def simulate(self, rng, n_users, n_questions, difficulty, discrimination=1.0):
+        ability = rng.normal(size=n_users)
+        user, question = (idx.ravel() for idx in np.meshgrid(np.arange(n_users), np.arange(n_questions),
+                                                             indexing='ij'))
+        p = 1.0 / (1.0 + np.exp(-discrimination * (ability[user] - difficulty[question])))
+        return ability, user, question, (rng.random(len(p)) < p).astype(np.float64)
+
+    def test_fit_recovers_the_generating_parameters(self):
+        rng = np.random.default_rng(3)
+        difficulty = np.linspace(-2, 2, 20)
+        ability, user, question, y = self.simulate(rng, 400, 20, difficulty)
+        zeros_u, zeros_q = np.zeros(400), np.zeros(20)
+        theta, b, log_a, theta_info, b_info, _, iterations, ll = calibration.fit(
+            user, question, y, zeros_u, np.full(400, calibration.ABILITY_PRIOR), zeros_q.copy(),
+            np.full(20, calibration.DIFFICULTY_PRIOR), zeros_q.copy(), np.full(20, calibration.DISCRIMINATION_PRIOR))
+        self.assertLess(iterations, calibration.MAX_ITERATIONS)
+        # The ability prior fixes the scale, so only the ordering and the probabilities are comparable
+        self.assertGreater(np.corrcoef(b, difficulty)[0, 1], 0.95)
+        self.assertGreater(np.corrcoef(theta, ability)[0, 1], 0.85)
+        fitted = 1.0 / (1.0 + np.exp(-np.exp(log_a)[question] * (theta[user] - b[question])))
+        truth = 1.0 / (1.0 + np.exp(-(ability[user] - difficulty[question])))
+        self.assertLess(np.abs(fitted - truth).mean(), 0.1)
+        self.assertTrue((b_info > theta_info.mean()).all())  # 400 answers per question vs 20 per user
+        self.assertGreater(ll, np.log(0.5))  # Better than a coin
+
+    def answer(self, users, questions, difficulty, rng):
+        logs = []
+        for user in users:
+            ability = rng.normal()
+            for question, b in zip(questions, difficulty):
+                logs.append(UserAnswerLog(user=user, question=question,
+                                          is_correct=rng.random() < 1.0 / (1.0 + np.exp(b - ability))))
+        UserAnswerLog.objects.bulk_create(logs)
+
+    def test_incremental_runs_absorb_only_new_answers(self):
+        rng = np.random.default_rng(5)
+        users = CustomUser.objects.bulk_create(CustomUser(username=f'u{n}') for n in range(60))
+        easy, hard, later = make_question(text='Easy'), make_question(text='Hard'), make_question(text='Later')
+        self.answer(users[:40], [easy, hard], [-1.5, 1.5], rng)
+        UserAnswerLog.objects.create(user=users[0], question=easy, is_skipped=True)  # Not an observation
+
+        run = calibrate()
+        self.assertEqual((run.mode, run.answers, run.questions, run.users), ('full', 80, 2, 40))
+        self.assertEqual(run.last_log_id, UserAnswerLog.objects.latest('id').pk)
+        stats = QuestionStats.objects.in_bulk()
+        self.assertLess(stats[easy.pk].difficulty, 0)
+        self.assertGreater(stats[hard.pk].difficulty, 0)
+        self.assertEqual(stats[easy.pk].attempts, 40)
+
+        self.answer(users[40:], [hard, later], [1.5, 0.0], rng)
+        run = calibrate()
+        self.assertEqual((run.mode, run.answers, run.questions, run.users), ('incremental', 40, 2, 20))
+        after = QuestionStats.objects.in_bulk()
+        self.assertEqual((after[easy.pk].difficulty, after[easy.pk].fitted_at),
+                         (stats[easy.pk].difficulty, stats[easy.pk].fitted_at))  # No new answers: untouched
+        self.assertEqual((after[hard.pk].attempts, after[later.pk].attempts), (60, 20))
+        self.assertGreater(after[hard.pk].difficulty_info, stats[hard.pk].difficulty_info)
+        self.assertEqual(UserAbility.objects.count(), 60)
+
+        self.assertEqual(calibrate().answers, 0)  # Nothing above the watermark
+        full = calibrate(full=True)
+        self.assertEqual(full.answers, 120)
+        refit = QuestionStats.objects.in_bulk()
+        for question in (easy, hard, later):
+            with self.subTest(question=question.text):  # The Laplace prior stands in for the old answers
+                self.assertAlmostEqual(after[question.pk].difficulty, refit[question.pk].difficulty, delta=0.35)
+
+# --- SPACED REPETITION (quiz/srs.py) ---
+class SpacedRepetitionTests(TestCase):
+    def test_answers_map_to_sm2_grades(self):
+        # (correct, skipped, confidence) -> grade
+        cases = [((False, True, 90), 1), ((False, False, 90), 0), ((False, False, 40), 1),
+                 ((True, False, 30), 3), ((True, False, 60), 4), ((True, False, 80), 5)]
+        for args, grade in cases:
+            with self.subTest(args=args):
+                self.assertEqual(int(srs.answer_quality(*args)), grade)
+
+    def test_intervals_grow_by_ease_and_reset_on_a_lapse(self):
+        state, seen = (0, 0.0, 2.5, 0), []
+        for quality in (5, 5, 5, 4, 3, 1, 4):
+            state = tuple(x.item() for x in srs.schedule(*state, quality))
+            seen.append(state)
+        # ease: +0.1 at grade 5, unchanged at 4, -0.14 at 3, -0.54 at 1
+        self.assertEqual([(reps, interval, lapses) for reps, interval, _, lapses in seen],
+                         [(1, 1.0, 0), (2, 6.0, 0), (3, 16.0, 0), (4, 45.0, 0), (5, 126.0, 0), (0, 1.0, 1),
+                          (1, 1.0, 1)])
+        self.assertEqual([round(ease, 2) for _, _, ease, _ in seen], [2.6, 2.7, 2.8, 2.8, 2.66, 2.12, 2.12])
+
+    def test_ease_and_interval_are_bounded(self):
+        reps, interval, ease, lapses = srs.schedule(0, 0.0, srs.MIN_EASE, 0, 0)
+        self.assertEqual((int(reps), float(ease), int(lapses)), (0, srs.MIN_EASE, 1))
+        _, interval, _, _ = srs.schedule(5, 300.0, 2.5, 0, 5)
+        self.assertEqual(float(interval), srs.MAX_INTERVAL_DAYS)
+        # Arrays take the same path as scalars (the backfill)
+        reps, interval, _, _ = srs.schedule([0, 1, 2], [0.0, 1.0, 6.0], [2.5, 2.5, 2.5], [0, 0, 0], [4, 4, 1])
+        self.assertEqual((reps.tolist(), interval.tolist()), ([1, 2, 0], [1.0, 6.0, 1.0]))
+
+    def test_incremental_updates_match_the_backfill(self):
+        user = CustomUser.objects.create_user(username='aspirant', password='x')
+        known, revised = make_question(text='Known'), make_question(text='Revised')
+        start = timezone.now() - timedelta(days=30)
+        answers = [(known, True, 90), (revised, False, 40), (revised, True, 60), (revised, True, 90),
+                   (known, True, 85)]
+        for day, (question, correct, confidence) in enumerate(answers):
+            log = UserAnswerLog.objects.create(user=user, question=question, is_correct=correct,
+                                               confidence_score=confidence)
+            UserAnswerLog.objects.filter(pk=log.pk).update(attempted_at=start + timedelta(days=day))
+            srs.record_answer(user.pk, question.pk, correct, False, confidence, start + timedelta(days=day))
+
+        fields = ('question_id', 'repetitions', 'interval_days', 'ease', 'lapses', 'last_quality', 'due_at')
+        live = list(ReviewState.objects.values_list(*fields))
+        self.assertEqual([row[0] for row in live], [revised.pk])  # Known well on the first go: never queued
+        state = ReviewState.objects.get()
+        self.assertEqual((state.repetitions, state.interval_days, state.lapses, state.last_quality), (2, 6.0, 1, 5))
+        self.assertEqual(state.due_at, start + timedelta(days=3 + 6))
+
+        self.assertEqual(backfill_review_states(), 1)
+        self.assertEqual(list(ReviewState.objects.values_list(*fields)), live)
+
+# --- GROWTH REPORT (quiz/mastery.py) ---
+class SessionGrowthTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='aspirant', password='x')
+        self.q1, self.q2, self.q3, self.q4 = (make_question(text=f'Statement {n}') for n in range(4))
+        self.now = timezone.now()
+
+    def answer(self, question, correct, session_id, days_ago, source_mode='exam'):
+        log = UserAnswerLog.objects.create(user=self.user, question=question, is_correct=correct,
+                                           session_id=session_id, source_mode=source_mode)
+        UserAnswerLog.objects.filter(pk=log.pk).update(attempted_at=self.now - timedelta(days=days_ago))
+        return log
+
+    def growth(self, session_id, has_history=True):
+        logs = list(UserAnswerLog.objects.filter(session_id=session_id))
+        return session_growth(self.user.pk, session_id, logs, has_history=has_history)
+
+    def test_questions_compare_with_their_answer_before_the_session(self):
+        self.answer(self.q1, False, 'mock-1', days_ago=3)
+        self.answer(self.q2, True, 'mock-1', days_ago=3)
+        self.answer(self.q1, True, 'mock-2', days_ago=2)
+        self.answer(self.q2, False, 'mock-2', days_ago=2)
+        self.answer(self.q3, True, 'mock-2', days_ago=2)  # First time seen: not compared
+        self.answer(self.q4, False, 'mock-3', days_ago=1)
+        backfill_mastery()
+
+        report = self.growth('mock-2')
+        self.assertEqual({key: report[key] for key in ('has_history', 'retention_fix', 'false_positive',
+                                                        'stable_correct', 'persistent_error', 'compared')},
+                         {'has_history': True, 'retention_fix': 1, 'false_positive': 1, 'stable_correct': 0,
+                          'persistent_error': 0, 'compared': 2})
+        self.assertEqual(self.growth('mock-2', has_history=False), {'has_history': False})
+        # An earlier comparable session exists even when no question overlaps it
+        report = self.growth('mock-3')
+        self.assertEqual((report['has_history'], report['compared']), (True, 0))
+
+    def test_questions_answered_again_since_fall_back_to_the_logs(self):
+        self.answer(self.q1, False, None, days_ago=200, source_mode='practice')
+        self.answer(self.q2, True, 'mock-1', days_ago=3)
+        self.answer(self.q1, True, 'mock-2', days_ago=2)
+        self.answer(self.q2, True, 'mock-2', days_ago=2)
+        self.answer(self.q1, True, None, days_ago=1, source_mode='practice')  # Newer than mock-2's answers
+        self.answer(self.q2, False, 'mock-3', days_ago=1)
+        self.assertEqual(archive_logs()['logs'], 1)  # The oldest answer now only lives in a block
+        backfill_mastery()
+
+        first_at = {self.q1.pk: self.now - timedelta(days=2), self.q2.pk: self.now - timedelta(days=2)}
+        self.assertEqual(_priors_from_logs(self.user.pk, 'mock-2', first_at), {self.q1.pk: False, self.q2.pk: True})
+        report = self.growth('mock-2')
+        self.assertEqual((report['retention_fix'], report['stable_correct'], report['compared']), (1, 1, 2))
+
+# --- COHORT PERCENTILES (quiz/cohort.py) ---
+class CohortSnapshotTests(TestCase):
+    def answer(self, user, correct, count=cohort.MIN_ANSWERS):
+        question = make_question()
+        UserAnswerLog.objects.bulk_create(UserAnswerLog(user=user, question=question, is_correct=i < correct)
+                                          for i in range(count))
+
+    def forget(self):
+        """A fresh web process: nothing loaded yet."""
+        cohort._loaded.update(snapshot=None, modified=None, checked_at=None)
+
+    @override_settings(COHORT_CHECK_SECONDS=0)
+    def test_web_process_reads_the_snapshot_the_worker_saved(self):
+        self.addCleanup(self.forget)
+        self.forget()
+        self.assertIsNone(cohort.get_snapshot())
+        for i, correct in enumerate((5, 10, 15)):
+            self.answer(CustomUser.objects.create_user(username=f'cohort{i}'), correct)
+        cohort.save_snapshot(cohort.build_snapshot())  # The worker's refresh: no local state to reset here
+        self.assertTrue(shared_storage().exists(cohort.snapshot_name()))
+
+        snapshot = cohort.get_snapshot()
+        self.assertEqual(snapshot.cohort_size('accuracy'), 3)
+        self.assertEqual(snapshot.percentile('accuracy', 50.0), 50.0)
+
+        self.answer(CustomUser.objects.create_user(username='cohort3'), 20)
+        cohort.save_snapshot(cohort.build_snapshot())
+        self.assertEqual(cohort.get_snapshot().cohort_size('accuracy'), 4)
+        self.assertEqual(StoredFile.objects.filter(name=cohort.snapshot_name()).count(), 1)
+
+    @override_settings(COHORT_CHECK_SECONDS=3600)
+    def test_stored_file_is_checked_at_most_every_check_interval(self):
+        self.addCleanup(self.forget)
+        self.forget()
+        self.answer(CustomUser.objects.create_user(username='cohort0'), 10)
+        cohort.refresh_snapshot()
+        self.assertEqual(cohort.get_snapshot().cohort_size('accuracy'), 1)
+        with self.assertNumQueries(0):
+            cohort.get_snapshot()
+
+    @override_settings(COHORT_REFRESH_SECONDS=3600)
+    def test_refresh_chain_is_seeded_and_survives_a_failed_job(self):
+        seeded = cohort.seed_refresh()
+        self.assertEqual((seeded.kind, seeded.status), ('refresh_cohort', 'queued'))
+        self.assertIsNone(cohort.seed_refresh())  # Already queued
+
+        Job.objects.filter(pk=seeded.pk).update(max_attempts=1)
+        with mock.patch('quiz.job_handlers.refresh_snapshot', side_effect=RuntimeError('disk full')):
+            self.assertEqual(run_pending(kinds=['refresh_cohort'], limit=1), 1)
+        self.assertEqual(Job.objects.get(pk=seeded.pk).status, 'failed')
+        [following] = Job.objects.filter(kind='refresh_cohort', status='queued')
+        self.assertGreater(following.run_after, timezone.now() + timedelta(minutes=59))
+
+    @override_settings(COHORT_REFRESH_SECONDS=3600)
+    def test_failed_attempts_with_retries_left_queue_nothing_new(self):
+        job = cohort.schedule_refresh()
+        with mock.patch('quiz.job_handlers.refresh_snapshot', side_effect=RuntimeError('disk full')):
+            run_pending(kinds=['refresh_cohort'], limit=1)
+        self.assertEqual(list(Job.objects.filter(kind='refresh_cohort').values_list('pk', 'status')),
+                         [(job.pk, 'queued')])  # Retried as itself
+
+# --- LLM TAGGING (quiz/tagging.py) ---
+# The real Groq client talks to a fake OpenAI-compatible server (GROQ_BASE_URL) that answers
+# "tags of <question text>" slowly enough for calls to overlap, and fails on request.
+class TaggingEngineTests(TestCase):
+    CONCURRENCY = 4
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.lock, cls.in_flight, cls.max_in_flight, cls.prompts, cls.failing = threading.Lock(), 0, 0, [], set()
+        cls.stub = StubServer({'/openai/v1/chat/completions': cls.complete})
+        cls.addClassCleanup(cls.stub.close)
+
+    @classmethod
+    def complete(cls, request_body):
+        prompt = json.loads(request_body)['messages'][0]['content']
+        text = prompt.split("'")[1]
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            cls.prompts.append(text)
+        time.sleep(0.05)
+        with cls.lock:
+            cls.in_flight -= 1
+        if text in cls.failing:
+            return 400, 'application/json', json.dumps({'error': {'message': 'model overloaded'}}).encode()
+        return 200, 'application/json', json.dumps({
+            'id': 'chatcmpl-1', 'object': 'chat.completion', 'created': 0, 'model': 'fake',
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': f" {text.split()[-1]}, Polity \n"}}],
+        }).encode()
+
+    def setUp(self):
+        type(self).max_in_flight, type(self).prompts, type(self).failing = 0, [], set()
+        env = {'GROQ_API_KEY': 'test', 'GROQ_BASE_URL': self.stub.url('')}
+        with mock.patch.dict(os.environ, env):
+            self.client = get_client()
+        texts = [f'Which body reviews topic{i}' for i in range(12)]
+        self.questions = [make_question(text=text) for text in texts[:1] + texts]  # #0 and #1: same text
+
+    def engine(self, **options):
+        return TaggingEngine(client=self.client, concurrency=self.CONCURRENCY, per_minute=6000, window=4,
+                             max_retries=0, **options)
+
+    def run_job(self, questions=None, **options):
+        job = TaggingEngine.create_job([q.pk for q in questions or self.questions])
+        return self.engine(**options).run(job)
+
+    def test_calls_run_concurrently_and_identical_texts_share_one(self):
+        job = self.run_job()
+        self.assertEqual((job.status, job.tagged, job.cached, job.failed), ('done', 13, 0, 0))
+        self.assertEqual(len(self.prompts), 12)
+        self.assertEqual(sorted(self.prompts), sorted({q.text for q in self.questions}))
+        self.assertTrue(1 < self.max_in_flight <= self.CONCURRENCY, self.max_in_flight)
+        self.assertEqual(Question.objects.get(pk=self.questions[5].pk).tags, 'topic4, Polity')
+        self.assertTrue(QuestionTerm.objects.filter(question=self.questions[5], term='topic4').exists())
+
+    def test_second_run_is_served_from_the_cache(self):
+        self.run_job()
+        self.assertEqual(TagCache.objects.count(), 12)
+        Question.objects.update(tags=None)
+        self.prompts.clear()
+        job = self.run_job()
+        self.assertEqual((job.tagged, job.cached, job.skipped), (0, 13, 0))
+        self.assertEqual(self.prompts, [])
+        job = self.run_job()  # Tags already written
+        self.assertEqual((job.tagged, job.cached, job.skipped), (0, 0, 13))
+
+    def test_failed_calls_are_recorded_and_retried_later(self):
+        self.failing.add(self.questions[2].text)
+        job = self.run_job()
+        self.assertEqual((job.status, job.tagged, job.failed), ('done', 12, 1))
+        self.assertEqual(job.errors[0]['question_ids'], [self.questions[2].pk])
+        self.assertIn('model overloaded', job.errors[0]['error'])
+        self.assertIsNone(Question.objects.get(pk=self.questions[2].pk).tags)
+
+        self.failing.clear()
+        self.prompts.clear()
+        job = self.run_job()
+        self.assertEqual((job.tagged, job.skipped, job.failed), (1, 12, 0))
+        self.assertEqual(self.prompts, [self.questions[2].text])
+
+    def test_interrupted_run_resumes_after_the_last_finished_window(self):
+        def crash_after_two_windows(job):
+            if job.next_index == 8:
+                raise KeyboardInterrupt  # The worker stops mid-run
+
+        job = TaggingEngine.create_job([q.pk for q in self.questions])
+        with self.assertRaises(KeyboardInterrupt):
+            self.engine(progress=crash_after_two_windows).run(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.next_index, job.tagged), ('failed', 8, 8))
+        self.assertEqual(len(self.prompts), 7)
+        asked = list(self.prompts)
+
+        self.prompts.clear()
+        self.engine().run(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.next_index, job.tagged, job.failed), ('done', 13, 13, 0))
+        self.assertEqual(sorted(asked + self.prompts), sorted({q.text for q in self.questions}))
+        self.assertFalse(set(asked) & set(self.prompts))  # Nothing asked twice
+
+# --- CONCEPT LINKS (quiz/concepts.py) ---
+class ConceptSpanTests(TestCase):
+    def setUp(self):
+        for term in ('Sabha', 'Samiti', 'Rigveda'):
+            KnowledgeConcept.objects.create(term=term, definition=f'{term} definition')
+        self.question = make_question(text='The {{T:Rigveda}} mentions [[Sabha]] and [[Samiti]]')
+        Option.objects.create(question=self.question, option_label='A', text_content='Only [[Sabha]]', is_correct=True)
+
+    def assertSpansMatch(self, text, spans, terms):
+        self.assertEqual([text[span['start']:span['end']] for span in spans], terms)
+
+    def test_spans_point_into_the_served_plain_text(self):
+        data = QuestionSerializer(Question.objects.get(pk=self.question.pk)).data
+        self.assertEqual(data['text'], 'The Rigveda mentions [[Sabha]] and [[Samiti]]')  # Links kept for clients
+        self.assertEqual(data['plain_text'], 'The Rigveda mentions Sabha and Samiti')
+        self.assertSpansMatch(data['plain_text'], data['concept_spans'], ['Rigveda', 'Sabha', 'Samiti'])
+        option = data['options'][0]
+        self.assertEqual((option['text_content'], option['plain_text']), ('Only [[Sabha]]', 'Only Sabha'))
+        self.assertSpansMatch(option['plain_text'], option['concept_spans'], ['Sabha'])
+
+    def test_save_matches_each_text_once(self):
+        Option.objects.create(question=self.question, option_label='B', text_content='Only [[Samiti]]')
+        with mock.patch.object(concepts.ConceptAutomaton, 'find', autospec=True,
+                               side_effect=concepts.ConceptAutomaton.find) as find:
+            self.question.save()
+        self.assertEqual(sorted(call.args[1] for call in find.call_args_list),
+                         ['Only Sabha', 'Only Samiti', 'The Rigveda mentions Sabha and Samiti'])
+
+    def test_term_changes_outside_the_admin_queue_one_relink(self):
+        def relinks(change):
+            Job.objects.filter(kind='annotate_concepts').delete()
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            return Job.objects.filter(kind='annotate_concepts', status='queued').count()
+
+        concept = KnowledgeConcept.objects.get(term='Sabha')
+        self.assertEqual(relinks(lambda: KnowledgeConcept.objects.create(term='Vidatha', definition='x')), 1)
+        concept.definition = 'Assembly of elders'
+        self.assertEqual(relinks(concept.save), 0)  # Spans only depend on terms
+        concept.term = 'Sabhaa'
+        self.assertEqual(relinks(concept.save), 1)
+        self.assertEqual(relinks(concept.save), 0)
+        self.assertEqual(relinks(KnowledgeConcept.objects.get(term='Samiti').delete), 1)
+
+    def test_lookups_see_other_processes_edits_and_fold_any_script(self):
+        KnowledgeConcept.objects.create(term='Ōmuro Gosho', definition='x')
+        self.assertEqual(set(concepts.lookup_concepts(['sabha', 'ŌMURO GOSHO', 'Vidatha'])), {'sabha', 'ŌMURO GOSHO'})
+        # Another process renames one concept and deletes another: no signals reach this one
+        KnowledgeConcept.objects.filter(term='Sabha').update(term='Sabhā', updated_at=timezone.now())
+        KnowledgeConcept.objects.filter(term='Samiti')._raw_delete('default')
+        self.assertEqual(set(concepts.lookup_concepts(['Sabha', 'SABHĀ', 'Samiti'])), {'SABHĀ'})
+        self.assertEqual(self.client.get('/api/concept/Samiti/').status_code, 404)
+
+    def test_game_card_context_is_the_served_text(self):
+        response = self.client.get('/api/game/start/')
+        self.assertEqual(response.status_code, 200)
+        [card] = response.json()
+        self.assertEqual((card['keyword'], card['text']), ('Rigveda', 'The Rigveda mentions Sabha and Samiti'))
+        self.assertSpansMatch(card['context'], card['concept_spans'], ['Rigveda', 'Sabha', 'Samiti'])
+
+# --- RESPONSE COMPRESSION (quiz/compression.py) ---
+class CompressionTests(TestCase):
+    BODY = ('<tr><td>Question</td><td>Answer</td></tr>' * 100).encode()
+
+    def respond(self, view, accept='gzip, br'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(view)(request)
+
+    def page(self, content_type='text/html; charset=utf-8', csrf=False, cookie=False):
+        def view(request):
+            token = get_token(request) if csrf else ''
+            response = HttpResponse(self.BODY + token.encode(), content_type=content_type)
+            if cookie:
+                response.set_cookie('sessionid', 'secret')
+            return response
+        return view
+
+    def test_public_bodies_are_compressed_once_and_reused(self):
+        first, second = (self.respond(self.page('application/json')) for _ in range(2))
+        self.assertEqual(first['Content-Encoding'], 'br')  # Preferred on equal q-values
+        self.assertEqual(first.content, second.content)  # Served from the cache
+        self.assertEqual(brotli.decompress(first.content), self.BODY)
+        gzipped = self.respond(self.page('application/json'), accept='gzip;q=1.0, br;q=0.5')
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(gzipped.content), self.BODY)
+
+    def test_bodies_carrying_secrets_are_padded_and_never_cached(self):
+        for options in ({'csrf': True}, {'cookie': True}, {'content_type': 'application/json', 'cookie': True}):
+            with self.subTest(**options):
+                view = self.page(**options)
+                responses = [self.respond(view) for _ in range(5)]
+                self.assertEqual({r['Content-Encoding'] for r in responses}, {'gzip'})  # Never br: no padding there
+                self.assertTrue(all(gzip.decompress(r.content).startswith(self.BODY) for r in responses))
+                self.assertGreater(len({len(r.content) for r in responses}), 1)  # Random padding, not cached
+                self.assertIsNone(self.respond(view, accept='br').get('Content-Encoding'))
+
+# --- LIBRARY SEARCH (quiz/search.py) ---
+class LibrarySearchTests(TestCase):
+    def setUp(self):
+        # Ids 1 and 11: the owner filter must match 'u1' exactly, not as a prefix of 'u11'
+        self.user = CustomUser.objects.create(pk=1, username='aspirant')
+        self.other = CustomUser.objects.create(pk=11, username='rival')
+        self.rights = make_question(text='Which Article guarantees Fundamental Rights to <minorities>?')
+        self.federal = make_question(text='Consider the federal features of the Constitution')
+        UserQuestionNote.objects.create(user=self.user, question=self.rights, note_text='Part III, Articles 12-35')
+        UserQuestionNote.objects.create(user=self.user, question=self.federal,
+                                        note_text='Rights of states: fundamental')
+        UserQuestionNote.objects.create(user=self.other, question=self.rights, note_text='Fundamental rights: Part III')
+
+    def hits(self, query, user=None, **page):
+        found, has_more = search_library((user or self.user).pk, query, **page)
+        return [hit['entry'].question_id for hit in found], has_more
+
+    def test_fts5_index_is_used_and_kept_per_user(self):
+        self.assertEqual(search.backend(connection), 'fts5')
+        self.assertEqual(self.hits('fundamental rights')[0], [self.federal.pk, self.rights.pk])
+        self.assertEqual(self.hits('fundamental', user=self.other)[0], [self.rights.pk])
+        self.assertEqual(self.hits('states', user=self.other)[0], [])
+        self.assertEqual(self.hits('u11', user=self.other)[0], [])  # The owner column isn't searched
+        self.assertEqual(self.hits('states OR minorities')[0], [])  # Quoted: OR is a word, not an operator
+
+    def test_the_last_word_is_a_prefix(self):
+        self.assertEqual(self.hits('constitu')[0], [self.federal.pk])
+        self.assertEqual(self.hits('constitu federal')[0], [])  # Only while typing the last word
+        self.assertEqual(self.hits('federal constitu')[0], [self.federal.pk])
+
+    def test_snippets_are_escaped_and_highlighted(self):
+        [hit], _ = search_library(self.user.pk, 'minorities')
+        self.assertIn('<mark>minorities</mark>', hit['snippet'])
+        self.assertIn('&lt;', hit['snippet'])
+        [hit], _ = search_library(self.user.pk, 'articles')
+        self.assertIn('<mark>Articles</mark>', hit['snippet'])  # The note's snippet when the note matches
+
+    def test_pages_and_entries_follow_the_notes(self):
+        self.assertEqual(self.hits('fundamental', limit=1), ([self.federal.pk], True))
+        self.assertEqual(self.hits('fundamental', limit=1, offset=1), ([self.rights.pk], False))
+        UserQuestionNote.objects.filter(user=self.user, question=self.federal).get().delete()
+        self.assertEqual(self.hits('fundamental')[0], [self.rights.pk])  # Triggers dropped the FTS5 row
+
+    def test_fallback_without_an_index(self):
+        with mock.patch.dict(search._backends, {connection.alias: None}):
+            self.assertEqual(sorted(self.hits('fundamental rights')[0]), sorted([self.federal.pk, self.rights.pk]))
+            self.assertEqual(self.hits('states', user=self.other)[0], [])
+            self.assertEqual(self.hits('constitu')[0], [self.federal.pk])
+            [hit], _ = search_library(self.user.pk, 'minorities')
+            self.assertIn('<mark>minorities</mark>', hit['snippet'])
+
+    def test_api_returns_one_users_results(self):
+        client = APIClient()
+        client.force_authenticate(self.other)
+        response = client.get(reverse('library-search'), {'q': 'fundam'})
+        self.assertEqual([r['question_id'] for r in response.json()['results']], [self.rights.pk])
+
+# --- ADMIN CHANGELISTS (quiz/admin_perf.py) ---
+# Rendered pages: the manifest storage needs `collectstatic`, the plain one doesn't
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class AdminChangeListTests(TestCase):
+    def setUp(self):
+        self.client.force_login(CustomUser.objects.create_superuser(username='admin', password='x'))
+        user, question = CustomUser.objects.create(username='aspirant'), make_question()
+        self.logs = [UserAnswerLog.objects.create(user=user, question=question, is_correct=n % 2 == 0).pk
+                     for n in range(7)]
+        self.url = reverse('admin:quiz_useranswerlog_changelist')
+
+    def page(self, query=''):
+        with mock.patch.object(UserAnswerLogAdmin, 'list_per_page', 3):
+            response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, 200)
+        cl = response.context['cl']
+        return [log.pk for log in cl.result_list], cl
+
+    def test_cursor_links_walk_the_table_both_ways(self):
+        newest = self.logs[::-1]
+        first, cl = self.page()
+        self.assertEqual((first, cl.newer_url, cl.newest_url), (newest[:3], None, None))
+        self.assertEqual(cl.older_url, f'?cursor={newest[2]}')
+        second, cl = self.page(cl.older_url)
+        self.assertEqual((second, cl.newer_url, cl.newest_url), (newest[3:6], '?', '?'))  # Newer: the top
+        third, cl = self.page(cl.older_url)
+        self.assertEqual((third, cl.older_url), (newest[6:], None))
+        self.assertEqual(self.page(cl.newer_url)[0], second)  # Back up by exactly one page
+        # From any key, "Newer" lists the per_page rows just above it
+        self.assertEqual(self.page(self.page(f'?cursor={newest[3]}')[1].newer_url)[0], newest[1:4])
+
+    def test_filters_are_kept_and_a_new_filter_starts_at_the_top(self):
+        correct = [pk for n, pk in enumerate(self.logs) if n % 2 == 0][::-1]
+        first, cl = self.page('?is_correct__exact=1')
+        self.assertEqual(first, correct[:3])
+        self.assertEqual(cl.older_url, f'?cursor={correct[2]}&is_correct__exact=1')
+        self.assertEqual(self.page(cl.older_url)[0], correct[3:])
+        self.assertNotIn('cursor', cl.get_query_string({'is_correct__exact': 0}))
+
+    def test_a_bad_cursor_is_rejected(self):
+        response = self.client.get(self.url + '?cursor=abc')
+        self.assertRedirects(response, self.url + '?e=1', fetch_redirect_response=False)
+
+    def test_unfiltered_counts_use_the_planner_estimate(self):
+        logs = UserAnswerLog.objects.order_by('-pk')
+        self.assertEqual(EstimatedCountPaginator(logs, 3).count, 7)  # Never ANALYZEd: exact
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        UserAnswerLog.objects.create(user=CustomUser.objects.get(username='aspirant'), question=Question.objects.get())
+        with override_settings(ADMIN_ESTIMATE_OVER=5):
+            self.assertEqual(estimated_rows(UserAnswerLog), 7)
+            self.assertEqual(EstimatedCountPaginator(logs, 3).count, 7)  # Stale, but no COUNT(*)
+            self.assertEqual(EstimatedCountPaginator(logs.filter(is_correct=False), 3).count, 4)  # Filtered: exact
+            self.assertEqual(self.page()[1].result_count, 7)
+        with override_settings(ADMIN_ESTIMATE_OVER=100):
+            self.assertEqual(EstimatedCountPaginator(logs, 3).count, 8)  # A small table is counted
+
+# --- EXPORTS (quiz/exports.py) ---
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='aspirant', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.question = make_question(text='Who founded the Servants of India Society?')
+        Option.objects.create(question=self.question, option_label='A', text_content='Gokhale', is_correct=True)
+        UserQuestionNote.objects.create(user=self.user, question=self.question, note_text='Gokhale, 1905')
+
+    def etag(self, fmt='csv'):
+        response = self.client.get(f'/api/user/export/notes.{fmt}')
+        self.assertEqual(response.status_code, 200)
+        b''.join(response.streaming_content)
+        return response['ETag']
+
+    def test_unchanged_data_is_not_modified(self):
+        etag = self.etag()
+        response = self.client.get('/api/user/export/notes.csv', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_question_edits_change_the_etag(self):
+        etag = self.etag()
+        option = self.question.options.get()
+        option.explanation_text = 'Founded in Pune'
+        option.save()  # Re-saves its question
+        self.assertNotEqual(self.etag(), etag)
+
+        etag = self.etag()
+        BulkQuestionImporter().run([{'text': self.question.text, 'subject': 'History', 'year': '2019',
+                                     'opt_a_text': 'G. K. Gokhale', 'opt_b_text': 'Tilak', 'correct_option': 'A'}])
+        self.assertNotEqual(self.etag(), etag)
+
+    def test_only_the_dated_html_changes_with_the_day(self):
+        today = {fmt: self.etag(fmt) for fmt in ('csv', 'html')}
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(days=1)):
+            response = self.client.get('/api/user/export/notes.html')
+            body = b''.join(response.streaming_content).decode()
+            self.assertIn(f'exported {timezone.localdate().isoformat()}', body)
+            self.assertNotEqual(response['ETag'], today['html'])
+            self.assertEqual(self.etag('csv'), today['csv'])
@@ -0,0 +1,101 @@
+# quiz/trends.py
+# Read side of the keyword trend cube (KeywordTrend) and the question term index
+# (QuestionTerm), both kept in step by models.retag_questions. Answers
+# KeywordTrendAPI for many words with a fixed number of queries:
+#   1 cube query for all words
+#   1 term-index query per word that has no tagged keyword (the old icontains fallback)
+#   1 TopicMedia query for all words
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Lower, Upper
+
+from .metrics import timed
+from .models import KeywordAnalysis, KeywordTrend, Question, QuestionTerm, TopicMedia, STOP_TERMS, \
+    index_question_terms, normalize_term
+
+# --- 1. QUERIES ---
+@timed('keyword_trends')
+def keyword_trends(words, exam_name=None):
+    """{word: {'trend': [{'year', 'true_count', 'false_count', 'question_count'}], 'video_url', 'source'}}"""
+    norms = {word: normalize_term(word) for word in words}
+    results = {word: {'trend': [], 'video_url': None, 'source': None} for word in words}
+
+    cube = KeywordTrend.objects.filter(keyword_norm__in=set(norms.values()))
+    if exam_name:
+        cube = cube.filter(exam_name=exam_name)
+    by_norm = {}
+    for row in (cube.values('keyword_norm', 'year')
+                .annotate(true_count=Sum('true_count'), false_count=Sum('false_count'),
+                          question_count=Sum('question_count'))
+                .order_by('year')):
+        by_norm.setdefault(row.pop('keyword_norm'), []).append(row)
+
+    for word, norm in norms.items():
+        if norm in by_norm:
+            results[word].update(trend=by_norm[norm], source='keywords')
+        else:
+            results[word].update(trend=_term_trend(norm, exam_name), source='questions')
+
+    media = TopicMedia.objects.annotate(tag_upper=Upper('tag')).filter(tag_upper__in={w.upper() for w in words})
+    video_by_tag = {m.tag_upper: m.video_url for m in media}
+    for word in words:
+        results[word]['video_url'] = video_by_tag.get(word.upper())
+    return results
+
+def _term_trend(norm, exam_name=None):
+    """Questions containing every word of `norm` (tags or text), per year - same shape as the cube."""
+    terms = [t for t in norm.split() if t not in STOP_TERMS] or norm.split()
+    if not terms:
+        return []
+    qs = QuestionTerm.objects.filter(term__in=terms)
+    if exam_name:
+        qs = qs.filter(exam_name=exam_name)
+    if len(terms) == 1:
+        rows = qs.values('year').annotate(question_count=Count('id')).order_by('year')
+        per_year = {row['year']: row['question_count'] for row in rows}
+    else:
+        per_year = {}
+        matching = qs.values('question_id', 'year').annotate(n=Count('id')).filter(n=len(set(terms)))
+        for row in matching:
+            per_year[row['year']] = per_year.get(row['year'], 0) + 1
+    # Old fallback semantics: every matching question counts as a "true" usage.
+    return [{'year': year, 'true_count': n, 'false_count': 0, 'question_count': n}
+            for year, n in sorted(per_year.items())]
+
+# --- 2. FULL REBUILDS (after bulk edits that bypass retag_questions, e.g. analyze_keywords) ---
+def rebuild_keyword_trends():
+    cells = {}
+    rows = (KeywordAnalysis.objects.annotate(kw=Lower('keyword')).order_by()
+            .values('kw', 'exam_name', 'year')
+            .annotate(true_count=Count('id', filter=Q(is_true_usage=True)),
+                      false_count=Count('id', filter=Q(is_true_usage=False)),
+                      question_count=Count('question', distinct=True)))
+    for row in rows:
+        # Lower() groups by case; normalize_term also folds punctuation/spacing, so merge here.
+        key = (normalize_term(row['kw']), row['exam_name'], row['year'])
+        cell = cells.setdefault(key, [0, 0, 0])
+        cell[0] += row['true_count']
+        cell[1] += row['false_count']
+        cell[2] += row['question_count']
+    with transaction.atomic():
+        KeywordTrend.objects.all().delete()
+        KeywordTrend.objects.bulk_create(
+            [KeywordTrend(keyword_norm=k, exam_name=e, year=y, true_count=t, false_count=f, question_count=q)
+             for (k, e, y), (t, f, q) in cells.items()], batch_size=1000)
+    return len(cells)
+
+def rebuild_term_index(chunk_size=1000, progress=None):
+    done, last_id = 0, 0
+    total = Question.objects.count()
+    while True:
+        chunk = list(Question.objects.filter(id__gt=last_id).order_by('id')
+                     .only('id', 'text', 'tags', 'exam_name', 'year')[:chunk_size])
+        if not chunk:
+            break
+        with transaction.atomic():
+            index_question_terms(chunk)
+        done += len(chunk)
+        last_id = chunk[-1].id
+        if progress:
+            progress(done, total)
+    return done
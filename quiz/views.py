@@ -1,21 +1,33 @@
 import json
 import re
+from datetime import timedelta
 from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.db.models import Count, Q 
-from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model, authenticate 
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from .models import UserAnswerLog
-from django.db.models import Avg
 from django.db.models import Max
 from django.utils import timezone
 
-from .models import Question, KnowledgeConcept, KeywordAnalysis, TopicMedia, UserAnswerLog, Option, UserQuestionNote
-from .serializers import QuestionSerializer, KnowledgeConceptSerializer, KeywordAnalysisSerializer
+from .models import CustomUser, Question, KeywordAnalysis, UserAnswerLog, Option, UserQuestionNote, ReviewState, strip_markup
+from .serializers import QuestionSerializer, KeywordAnalysisSerializer
+from .analytics import calculate_session_stats, summarize_recent_behavior, coach_waterfall
+from .srs import record_answer
+from .adaptive import generate_adaptive_paper
+from .concepts import lookup_concepts
+from .trends import keyword_trends
+from .cohort import MIN_MOCK_QUESTIONS, RADAR_GROUPS, user_percentiles
+from . import leaderboard, mastery
+from .archive import daily_rollups, user_rollup
+from .sqlite_mode import serialized_write
+from .replicas import use_replica
+from .media import cached_image
+from .search import refresh_entries, search_library
+from .exports import EXPORTS, FORMATS, export_response
 # --- OFFICIAL UPSC CUTOFF DATABASE ---
 # Format: { 'Exam Name': { Year: Cutoff_Score } }
 CUTOFF_DB = {
@@ -81,9 +93,24 @@ def login_api(request):
 # --- 1. API to Fetch a Concept (Wiki Popups) ---
 class ConceptDetailView(APIView):
     def get(self, request, term):
-        concept = get_object_or_404(KnowledgeConcept, term__iexact=term)
-        serializer = KnowledgeConceptSerializer(concept)
-        return Response(serializer.data)
+        # Served from the per-process concept dictionary (quiz/concepts.py)
+        data = lookup_concepts([term]).get(term)
+        if data is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data)
+
+# --- 1b. BATCH CONCEPT LOOKUP (all wiki popups of a screen in one request) ---
+MAX_BATCH_TERMS = 200
+
+class ConceptBatchView(APIView):
+    def get(self, request):
+        terms = [t.strip() for t in request.query_params.get('terms', '').split(',') if t.strip()]
+        terms = list(dict.fromkeys(terms))[:MAX_BATCH_TERMS]
+        found = lookup_concepts(terms)
+        return Response({
+            'concepts': found,
+            'missing': [t for t in terms if t not in found],
+        })
 
 # --- 2. API to Fetch Questions (Quiz & Search) ---
 # quiz/views.py
@@ -94,7 +121,7 @@ class QuestionList(generics.ListAPIView):
     serializer_class = QuestionSerializer
 
     def get_queryset(self):
-        queryset = Question.objects.prefetch_related('options').all()
+        queryset = Question.objects.select_related('stats').prefetch_related('options').all()
         
         # 1. EXAM FILTER
         if self.request.query_params.get('exam'):
@@ -141,12 +168,14 @@ class QuestionList(generics.ListAPIView):
 
 # --- 3. API for the Truth Meter (Analysis Dashboard) ---
 class KeywordAnalysisAPI(APIView):
+    @use_replica
     def get(self, request):
-        data = KeywordAnalysis.objects.values('keyword').annotate(
+        # list(): a lazy QuerySet would run at render time, after use_replica has routed back to 'default'
+        data = list(KeywordAnalysis.objects.values('keyword').annotate(
             total_count=Count('id'),
             true_count=Count('id', filter=Q(is_true_usage=True)),
             false_count=Count('id', filter=Q(is_true_usage=False))
-        )
+        ))
         return Response(data)
 
 # --- 4. GAME MODE API ---
@@ -159,8 +188,6 @@ class GameModeView(APIView):
         game_cards = []
         
         for item in items:
-            context_text = ""
-            context_text = item.question.text
             statement_text = ""
             
             # --- LOGIC TO EXTRACT CONTEXT (Fixes empty context issue) ---
@@ -172,14 +199,12 @@ class GameModeView(APIView):
                         statement_text = line
                         break
                 if not statement_text: statement_text = item.question.text
-                context_text = item.question.text # <--- Set Context from Question
 
             # CASE B: Keyword is in an Option
             else:
                 for opt in item.question.options.all():
                     if f"{{{{T:{item.keyword}}}}}" in opt.text_content or f"{{{{F:{item.keyword}}}}}" in opt.text_content:
                         statement_text = opt.text_content
-                        context_text = item.question.text # <--- Set Context from Question
                         break
             
             # --- NEW: FETCH STATS FOR INSIGHT CARD ---
@@ -191,16 +216,15 @@ class GameModeView(APIView):
             )
 
             if statement_text:
-                clean_statement = re.sub(r'\{\{[TF]:(.*?)\}\}', r'\1', statement_text)
-                clean_context = re.sub(r'\{\{[TF]:(.*?)\}\}', r'\1', context_text)
-                # 2. FIX: Remove Wiki Tags [[Word]] -> Word
-                clean_statement = re.sub(r'\[\[(.*?)\]\]', r'\1', clean_statement)
-                clean_context = re.sub(r'\[\[(.*?)\]\]', r'\1', clean_context) 
-                
+                # The context is the question's plain_text (no tags / [[wiki]] links), which its
+                # precomputed concept_spans point into; only the one statement line is cleaned here
+                clean_statement = strip_markup(statement_text)
+
                 game_cards.append({
                     "id": item.id, 
                     "keyword": item.keyword, 
-                    "context": clean_context,   
+                    "context": item.question.plain_text,
+                    "concept_spans": item.question.concept_spans,
                     "text": clean_statement, 
                     "is_true": item.is_true_usage,
                     "subject": item.question.subject, 
@@ -253,22 +277,39 @@ def save_user_answer(request):
         source_mode = data.get('source_mode', 'practice') 
         session_id = data.get('session_id', None)
 
-        # 5. CREATE THE LOG ENTRY
-        UserAnswerLog.objects.create(
-            user=request.user,
-            question=question,
-            selected_option=selected_option,
-            
-            is_correct=is_correct_val,
-            is_skipped=is_skipped_val,
-            is_bookmarked=is_bookmarked_val,
-            
-            time_taken_seconds=int(data.get('time_taken_seconds', 0)),
-            confidence_score=confidence_val,
-            eliminated_options=eliminated_list,
-            source_mode=source_mode,  # <--- Saving the tag
-            session_id=session_id
-        )
+        time_taken_val = int(data.get('time_taken_seconds', 0))
+
+        def write():
+            # 5. CREATE THE LOG ENTRY
+            log = UserAnswerLog.objects.create(
+                user=request.user,
+                question=question,
+                selected_option=selected_option,
+                
+                is_correct=is_correct_val,
+                is_skipped=is_skipped_val,
+                is_bookmarked=is_bookmarked_val,
+                
+                time_taken_seconds=time_taken_val,
+                confidence_score=confidence_val,
+                eliminated_options=eliminated_list,
+                source_mode=source_mode,  # <--- Saving the tag
+                session_id=session_id
+            )
+
+            # 6. RESCHEDULE THE REVISION QUEUE (wrong / low-confidence answers enter it)
+            record_answer(request.user.id, question.id, is_correct_val, is_skipped_val,
+                          confidence_val, log.attempted_at)
+            # 7. PER-QUESTION MASTERY (growth reports)
+            mastery.record_answer(request.user.id, question.id, is_correct_val, is_skipped_val,
+                                  session_id, log.attempted_at)
+            return log
+
+        # SQLite: one writer thread per process (quiz/sqlite_mode.py); elsewhere a plain call
+        log = serialized_write(write)
+
+        # 8. WEEKLY ACCURACY LEADERBOARDS (global + this exam)
+        leaderboard.record_answer(request.user.id, question.exam_name, is_correct_val, log.attempted_at)
 
         return Response({"message": "Saved"}, status=status.HTTP_201_CREATED)
 
@@ -276,40 +317,27 @@ def save_user_answer(request):
         print(f"ERROR SAVING ANSWER: {e}") 
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 # --- 6. TREND GRAPH API ---
+MAX_TREND_WORDS = 10
+
 class KeywordTrendAPI(APIView):
+    # ?word=All (original response shape) or ?words=All,Only,Never (comparison chart, one call).
+    # Served from the precomputed KeywordTrend cube / QuestionTerm index (quiz/trends.py).
     def get(self, request):
         target_word = request.query_params.get('word')
+        target_words = request.query_params.get('words')
         target_exam = request.query_params.get('exam')
 
+        if target_words:
+            words = list(dict.fromkeys(w.strip() for w in target_words.split(',') if w.strip()))[:MAX_TREND_WORDS]
+            return Response({"results": keyword_trends(words, target_exam)})
+
         if not target_word:
             return Response({"error": "Please provide a 'word' parameter"}, status=400)
 
-        keyword_qs = KeywordAnalysis.objects.filter(keyword__iexact=target_word)
-        if target_exam: keyword_qs = keyword_qs.filter(exam_name=target_exam)
-
-        if keyword_qs.exists():
-            trend_data = keyword_qs.values('year').annotate(
-                true_count=Count('id', filter=Q(is_true_usage=True)),
-                false_count=Count('id', filter=Q(is_true_usage=False))
-            ).order_by('year')
-        else:
-            question_qs = Question.objects.filter(
-                Q(tags__icontains=target_word) | Q(text__icontains=target_word)
-            )
-            if target_exam: question_qs = question_qs.filter(exam_name=target_exam)
-            
-            trend_data = question_qs.values('year').annotate(
-                true_count=Count('id'), 
-                false_count=Count('id', filter=Q(pk__lt=0)) 
-            ).order_by('year')
-
-        video_url = None
-        topic_media = TopicMedia.objects.filter(tag__iexact=target_word).first()
-        if topic_media: video_url = topic_media.video_url
-
+        result = keyword_trends([target_word], target_exam)[target_word]
         return Response({
-            "trend": list(trend_data),
-            "video_url": video_url
+            "trend": [{k: row[k] for k in ('year', 'true_count', 'false_count')} for row in result['trend']],
+            "video_url": result['video_url']
         })
 # --- 7. NOTE TAKING API ---
 
@@ -337,12 +365,11 @@ def user_note_api(request):
     if request.method == 'POST':
         note_text = request.data.get('note_text', '').strip()
         if not note_text:
-            UserQuestionNote.objects.filter(user=request.user, question_id=question_id).delete()
+            serialized_write(UserQuestionNote.objects.filter(user=request.user, question_id=question_id).delete)
             return Response({"message": "Note deleted"}, status=200)
         
-        UserQuestionNote.objects.update_or_create(
-            user=request.user, question_id=question_id, defaults={'note_text': note_text}
-        )
+        serialized_write(UserQuestionNote.objects.update_or_create,
+                         user=request.user, question_id=question_id, defaults={'note_text': note_text})
         return Response({"message": "Note saved"}, status=201)
 
 
@@ -352,7 +379,7 @@ def user_note_api(request):
 # --- 6. DASHBOARD API (FIXED MODEL IMPORT) ---
 
 
-from django.db.models import Avg, Sum, Count
+from django.db.models import Sum, Count
 from .models import UserAnswerLog
 
 # quiz/views.py
@@ -361,6 +388,7 @@ from .models import UserAnswerLog
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@use_replica
 def user_dashboard_api(request):
     user = request.user
     # 1. FETCH LOGS (Optimized with select_related for performance)
@@ -368,9 +396,12 @@ def user_dashboard_api(request):
     
     # We use a slice for "Recent Behavior" analysis (Coach Logic needs recent trends)
     recent_logs = queryset[:100] 
+
+    # Archived practice logs (quiz/archive.py) still count towards every all-time number below
+    archived = user_rollup(user.id)
     
     # Handle New User Case
-    if not recent_logs:
+    if not recent_logs and not archived.rows:
          return Response({
             'username': user.username,
             'stats': {
@@ -379,43 +410,51 @@ def user_dashboard_api(request):
                 'radar_data': {'logic': 0, 'precision': 0, 'reasoning': 0, 'recall': 0},
                 'deep_metrics': {'era_gap': '-', 'sniper_efficiency': 0, 'rush_accuracy': 0},
                 # Legacy placeholders to prevent frontend errors
-                'wasted_time_mins': 0, 'guess_accuracy': 0, 'dangerous_errors': 0, 'unnecessary_doubts': 0
+                'wasted_time_mins': 0, 'guess_accuracy': 0, 'dangerous_errors': 0, 'unnecessary_doubts': 0,
+                'percentiles': None,
             }
         })
 
     # --- 1. BASIC STATS (PRESERVED) ---
-    accuracy_data = queryset.aggregate(avg_score=Avg('is_correct'))
-    accuracy = (accuracy_data['avg_score'] or 0.0) * 100
-    streak_count = queryset.dates('attempted_at', 'day').count()
+    archived_all = archived.totals()
+    accuracy_data = queryset.aggregate(total=Count('id'), correct=Count('id', filter=Q(is_correct=True)))
+    answered_total = accuracy_data['total'] + archived_all['answered']
+    accuracy = ((accuracy_data['correct'] + archived_all['correct']) / answered_total * 100) if answered_total else 0.0
+    streak_count = len(set(queryset.dates('attempted_at', 'day')) | archived.days)
 
     # --- 2. ADVANCED INSIGHTS (PRESERVED) ---
     # Insight A: "Time Wasted on Skips"
     skipped_logs = queryset.filter(is_skipped=True)
     wasted_time_seconds = skipped_logs.aggregate(total_time=Sum('time_taken_seconds'))['total_time'] or 0
+    wasted_time_seconds += archived_all['skipped_seconds']
     wasted_time_mins = round(wasted_time_seconds / 60, 1)
 
     # Insight B: "Guess Accuracy" (Luck vs Skill)
     low_confidence_logs = queryset.filter(confidence_score__lt=50, is_skipped=False)
-    total_guesses = low_confidence_logs.count()
-    correct_guesses = low_confidence_logs.filter(is_correct=True).count()
+    total_guesses = low_confidence_logs.count() + archived_all['guesses']
+    correct_guesses = low_confidence_logs.filter(is_correct=True).count() + archived_all['guesses_correct']
     guess_accuracy = round((correct_guesses / total_guesses) * 100, 1) if total_guesses > 0 else 0
 
     # Insight C: "Imposter Syndrome" (High Confidence Errors) - TOTAL COUNT
     dangerous_errors_total = queryset.filter(confidence_score__gt=70, is_correct=False).count()
+    dangerous_errors_total += archived_all['confident_errors']
 
     # Insight D: "Second Guessing" (Gut Check)
-    unnecessary_doubts = queryset.filter(is_bookmarked=True, is_correct=True).count()
+    unnecessary_doubts = queryset.filter(is_bookmarked=True, is_correct=True).count() + archived_all['doubts']
 
     # --- 3. WEAKEST SUBJECT (PRESERVED) ---
     weak_subject = "None"
     lowest_acc = 100.0
-    subjects = queryset.values_list('question__subject', flat=True).distinct()
+    # order_by(): the inherited -attempted_at would make DISTINCT return one row per log
+    subjects = list(queryset.order_by().values_list('question__subject', flat=True).distinct())
+    subjects += sorted(archived.subjects - set(subjects))
     
     for subj in subjects:
         if not subj: continue
         subj_answers = queryset.filter(question__subject=subj)
-        total = subj_answers.count()
-        correct = subj_answers.filter(is_correct=True).count()
+        subj_archived = archived.totals(subject=subj)
+        total = subj_answers.count() + subj_archived['answered']
+        correct = subj_answers.filter(is_correct=True).count() + subj_archived['correct']
         if total > 0:
             acc = (correct / total) * 100
             if acc < lowest_acc:
@@ -424,15 +463,20 @@ def user_dashboard_api(request):
 
     # --- 4. STRATEGY RADAR (EXISTING + REFINED) ---
     # We use the full queryset for the Radar to show "All Time" strengths
-    def get_acc(pattern_list):
-        logs = queryset.filter(question__pattern__in=pattern_list)
-        if not logs.exists(): return 0.0
-        return (logs.filter(is_correct=True).count() / logs.count()) * 100
+    answered_axes = set()
+
+    def get_acc(axis):
+        logs = queryset.filter(question__pattern__in=RADAR_GROUPS[axis])
+        axis_archived = archived.totals(patterns=RADAR_GROUPS[axis])
+        total = logs.count() + axis_archived['answered']
+        if not total: return 0.0
+        answered_axes.add(axis)
+        return ((logs.filter(is_correct=True).count() + axis_archived['correct']) / total) * 100
 
-    score_logic = get_acc(['elim_classical', 'elim_haphazard'])    # Logic
-    score_precision = get_acc(['zero_g_statement', 'zero_g_column_2', 'zero_g_column_3']) # Precision
-    score_reasoning = get_acc(['assertion_2', 'assertion_3'])      # Reasoning
-    score_recall = get_acc(['one_liner', 'fifty_fifty'])           # Recall
+    score_logic = get_acc('logic')          # elim_*
+    score_precision = get_acc('precision')  # zero_g_*
+    score_reasoning = get_acc('reasoning')  # assertion_*
+    score_recall = get_acc('recall')        # one_liner, fifty_fifty
 
     # --- 5. DEEP METRICS (New) ---
     # A. Era Gap
@@ -442,78 +486,22 @@ def user_dashboard_api(request):
         if gap_ratio < 0.5: era_gap_msg = "Dinosaur 🦕"
         elif gap_ratio > 1.2: era_gap_msg = "Modern 🚀"
 
-    # B. Sniper Efficiency (Using recent logs for current form)
-    recent_sniper_logs = [log for log in recent_logs if log.eliminated_options and len(log.eliminated_options) > 0]
-    sniper_total = len(recent_sniper_logs)
-    sniper_correct = len([log for log in recent_sniper_logs if log.is_correct])
-    sniper_efficiency = (sniper_correct / sniper_total * 100) if sniper_total > 0 else 0
-
-    # C. Rush Accuracy
-    recent_rushed = [log for log in recent_logs if log.time_taken_seconds < 15 and not log.is_skipped]
-    rushed_count = len(recent_rushed)
-    rushed_correct = len([log for log in recent_rushed if log.is_correct])
-    rush_accuracy = (rushed_correct / rushed_count * 100) if rushed_count > 0 else 100.0
-
+    # B. Sniper Efficiency & C. Rush Accuracy (Using recent logs for current form)
+    behavior = summarize_recent_behavior(recent_logs)
+    sniper_efficiency = behavior['sniper_efficiency']
+    rush_accuracy = behavior['rush_accuracy']
 
     # --- 6. THE AI COACH LOGIC (FULL MATRIX VERSION) 🤖 ---
     # This logic uses 'recent_logs' to diagnose current behavior.
-    
-    coach_title = "On Track 🎯"
-    coach_message = "Your performance is balanced. Keep practicing consistently."
-    
-    # -- Data Prep for Matrix --
-    total_recent = len(recent_logs)
-    skip_count = len([log for log in recent_logs if log.is_skipped])
-    skip_rate = (skip_count / total_recent) * 100 if total_recent > 0 else 0
-    
-    # Recent high confidence errors (Dunning-Kruger check)
-    recent_high_conf_errors = len([log for log in recent_logs if log.confidence_score > 80 and not log.is_correct])
-    # Recent low confidence correct (Imposter check)
-    recent_low_conf_correct = len([log for log in recent_logs if log.confidence_score < 40 and log.is_correct])
-    
-    # Avg Time on WRONG answers (Overthinker check)
-    wrong_logs = [log for log in recent_logs if not log.is_correct and not log.is_skipped]
-    avg_time_wrong = sum([log.time_taken_seconds for log in wrong_logs]) / len(wrong_logs) if wrong_logs else 0
+    coach_title, coach_message = coach_waterfall(behavior, score_logic, score_precision, score_reasoning)
 
-    # --- WATERFALL LOGIC ---
+    # --- 7. COHORT PERCENTILES (binary search in the refreshed snapshot, see quiz/cohort.py) ---
+    radar_scores = {'logic': score_logic, 'precision': score_precision,
+                    'reasoning': score_reasoning, 'recall': score_recall}
+    percentiles = user_percentiles(user.id, accuracy, {axis: (score if axis in answered_axes else None)
+                                                       for axis, score in radar_scores.items()})
 
-    # DIMENSION 1: MINDSET CHECK
-    if recent_high_conf_errors > 4:
-        coach_title = "Reality Check 🛑" 
-        coach_message = "You are marking answers as 'Sure' but getting them wrong. You have dangerous misconceptions. Stop guessing."
-    
-    elif recent_low_conf_correct > 5:
-        coach_title = "The Imposter 🎭"
-        coach_message = "Trust your gut! You marked 'Low Confidence' on many questions you actually got right."
-
-    elif skip_rate > 35:
-        coach_title = "Risk Averse 🛡️"
-        coach_message = "You are skipping too much (>35%). In UPSC, you need calculated risks. Attempt 5 '50-50' questions today."
-
-    # DIMENSION 2: STRATEGY CHECK
-    elif score_logic > 80 and score_precision < 40:
-        coach_title = "The Gamer 🎮"
-        coach_message = "Tactical genius, but factually weak. You fail when Elimination tricks don't work (Zero-G). Read textbooks."
-
-    elif score_precision > 70 and score_reasoning < 40:
-        coach_title = "Superficial Reader 📖"
-        coach_message = "You know facts but fail 'Assertion-Reasoning'. Ask 'Why?' not just 'What?' when reading."
-
-    # DIMENSION 3: TIME CHECK
-    elif rushed_count > 5 and rush_accuracy < 50:
-        coach_title = "The Speedster ⚡"
-        coach_message = f"Slow Down! You have {int(rush_accuracy)}% accuracy when answering under 15s. You are losing easy marks."
-
-    elif avg_time_wrong > 120:
-        coach_title = "The Overthinker ⏳"
-        coach_message = "Time Trap! You spend over 2 mins on wrong answers. If you don't know it in 60s, move on."
-
-    # DIMENSION 4: PROCESS CHECK
-    elif sniper_total > 5 and sniper_efficiency < 40:
-        coach_title = "The 50-50 Loser 📉"
-        coach_message = "The 'Final Mile' Problem: You successfully eliminate trash options, but choke on the final choice."
-
-    # --- 7. RETURN MERGED JSON ---
+    # --- 8. RETURN MERGED JSON ---
     return Response({
         'username': user.username,
         'stats': {
@@ -541,9 +529,43 @@ def user_dashboard_api(request):
                 'era_gap': era_gap_msg,
                 'sniper_efficiency': round(sniper_efficiency, 1),
                 'rush_accuracy': round(rush_accuracy, 1),
-            }
+            },
+            'percentiles': percentiles,
         }
     })
+#---LEADERBOARDS (quiz/leaderboard.py)----
+
+def _leaderboard_name(params):
+    """?board=accuracy|mock, &exam=<exam_name>, &week=2026-W42 (accuracy only, default this week)."""
+    exam_name = params.get('exam') or None
+    if params.get('board', 'accuracy') == 'mock':
+        return leaderboard.mock_board(exam_name)
+    return leaderboard.accuracy_board(params.get('week') or leaderboard.week_label(timezone.now()), exam_name)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def leaderboard_api(request):
+    name = _leaderboard_name(request.query_params)
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), leaderboard.MAX_TOP)
+    except ValueError:
+        limit = 10
+    entries = leaderboard.top(name, limit)
+    users = CustomUser.objects.in_bulk([member for member, _ in entries])
+    return Response({
+        'board': name,
+        'top': [{'rank': i + 1, 'username': users[member].username if member in users else None,
+                 'score': leaderboard.display_score(name, score)}
+                for i, (member, score) in enumerate(entries)],
+        'me': leaderboard.rank(name, request.user.id),
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def leaderboard_me_api(request):
+    name = _leaderboard_name(request.query_params)
+    return Response({'board': name, 'me': leaderboard.rank(name, request.user.id)})
+
 #---USER library API----
 
 @api_view(['GET'])
@@ -570,28 +592,66 @@ def user_library_api(request):
         .prefetch_related('question__options')\
         .order_by('-attempted_at')
     
-    # NEW: Has Note Filter (after fetching, since it's derived)
+    # NEW: Has Note Filter (after fetching, since it's derived); one query for every note
+    notes = dict(user.notes.filter(question_id__in=[item.question_id for item in library_items])
+                 .values_list('question_id', 'note_text'))
     if has_note_filter == 'true':
-        library_items = [item for item in library_items if user.notes.filter(question=item.question).exists()]
+        library_items = [item for item in library_items if item.question_id in notes]
     elif has_note_filter == 'false':
-        library_items = [item for item in library_items if not user.notes.filter(question=item.question).exists()]
+        library_items = [item for item in library_items if item.question_id not in notes]
     
     data = []
     for log in library_items:
-        has_note = user.notes.filter(question=log.question).exists()
-        options_data = [{'id': opt.id, 'text_content': opt.text_content, 'option_label': opt.option_label,
-                         'is_correct': opt.is_correct, 'explanation_text': opt.explanation_text,
-                         'image_url': opt.image_url, 'mnemonic_text': opt.mnemonic_text} for opt in log.question.options.all()]
+        has_note = log.question_id in notes
+        options_data = []
+        for opt in log.question.options.all():
+            image = cached_image(opt.image_url, request)  # Media cache copy once fetched
+            options_data.append({'id': opt.id, 'text_content': opt.text_content, 'option_label': opt.option_label,
+                                 'is_correct': opt.is_correct, 'explanation_text': opt.explanation_text,
+                                 'image_url': image['url'], 'image_url_variants': image['variants'],
+                                 'mnemonic_text': opt.mnemonic_text})
+        question_image = cached_image(log.question.question_image_url, request)
         
         data.append({
-            'log_id': log.id, 'question_id': log.question.id, 'text': log.question.text, 'question_image_url': log.question.question_image_url,
+            'log_id': log.id, 'question_id': log.question.id, 'text': log.question.text,
+            'question_image_url': question_image['url'], 'question_image_url_variants': question_image['variants'],
             'subject': log.question.subject, 'tags': log.question.tags, 'source_mode': log.source_mode,
-            'has_note': has_note, 'note_text': user.notes.filter(question=log.question).first().note_text if has_note else '',  # NEW: Include full text
+            'has_note': has_note, 'note_text': notes.get(log.question_id, ''),  # NEW: Include full text
             'options': options_data
         })
     
     return Response(data)
 
+# --- REVISION QUEUE (Spaced Repetition, see quiz/srs.py) ---
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def review_queue_api(request):
+    # Reads only ReviewState via the (user, due_at) index; no log scanning per request.
+    now = timezone.now()
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+    except ValueError:
+        limit = 20
+    subject_filter = request.query_params.get('subject')
+
+    states = ReviewState.objects.filter(user=request.user)
+    if subject_filter:
+        states = states.filter(question__subject=subject_filter)
+    due = states.filter(due_at__lte=now)
+
+    items = list(due.select_related('question__stats').prefetch_related('question__options').order_by('due_at')[:limit])
+    questions = QuestionSerializer([s.question for s in items], many=True).data
+    data = [
+        {**q, 'review': {'due_at': s.due_at, 'interval_days': s.interval_days, 'repetitions': s.repetitions,
+                         'lapses': s.lapses, 'last_answered_at': s.last_answered_at}}
+        for s, q in zip(items, questions)
+    ]
+    return Response({
+        'due_count': due.count(),
+        'upcoming_7d': states.filter(due_at__gt=now, due_at__lte=now + timedelta(days=7)).count(),
+        'items': data,
+    })
+
 # --- NEW: SAFE DELETE API ---
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -604,24 +664,61 @@ def remove_bookmark_api(request):
     # We find ALL logs for this question and mark them as cleared from library.
     # This keeps 'is_bookmarked=True' for history reports, but hides them from the active list.
     # 1. Hide from Library (Keep Exam History)
-    UserAnswerLog.objects.filter(
-        user=request.user, 
-        question_id=question_id
-    ).update(is_cleared_from_library=True)
-    # 2. DELETE THE NOTE
-    UserQuestionNote.objects.filter(user=request.user, question_id=question_id).delete()
+    def write():
+        UserAnswerLog.objects.filter(
+            user=request.user, 
+            question_id=question_id
+        ).update(is_cleared_from_library=True)
+        # 2. DELETE THE NOTE
+        UserQuestionNote.objects.filter(user=request.user, question_id=question_id).delete()
+        # 3. DROP IT FROM LIBRARY SEARCH (update() sends no signals)
+        refresh_entries(request.user.id, [question_id])
+    serialized_write(write)
     
     return Response({"message": "Bookmark and note removed"}, status=200)
+
+# ?q=<words>&limit=&offset=  Ranked full-text search over the user's notes + bookmarked questions
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@use_replica
+def library_search_api(request):
+    query = request.query_params.get('q', '').strip()
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        offset = max(int(request.query_params.get('offset', 0)), 0)
+    except ValueError:
+        limit, offset = 20, 0
+    hits, has_more = search_library(request.user.id, query, limit=limit, offset=offset)
+    results = [{
+        'question_id': hit['entry'].question_id, 'subject': hit['entry'].question.subject,
+        'text': hit['entry'].question_text, 'note_text': hit['entry'].note_text,
+        'has_note': bool(hit['entry'].note_text), 'is_bookmarked': hit['entry'].is_bookmarked,
+        'snippet': hit['snippet'], 'rank': round(hit['rank'], 4),
+    } for hit in hits]
+    return Response({'query': query, 'results': results, 'next_offset': offset + limit if has_more else None})
+
+# <kind>.<fmt>: library | notes | history as csv | ndjson | html, streamed (quiz/exports.py).
+# Not on the replica: the body is produced after the view returns, outside use_replica
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_export_api(request, kind, fmt):
+    if kind not in EXPORTS or fmt not in FORMATS:
+        return Response({"error": f"Exports: {', '.join(EXPORTS)} as {', '.join(FORMATS)}"}, status=404)
+    return export_response(request, request.user, kind, fmt)
+
     # --- 8. THE TIME MACHINE (History Graph API) ---
 class UserHistoryAPI(APIView):
     permission_classes = [IsAuthenticated]
 
+    @use_replica
     def get(self, request):
         user = request.user
         # Fetch last 30 days of logs
         logs = UserAnswerLog.objects.filter(user=user).order_by('attempted_at')
+        # ?history=full also counts archived practice logs (per-day rollups, quiz/archive.py)
+        archived_days = daily_rollups(user.id) if request.query_params.get('history') == 'full' else []
         
-        if not logs.exists():
+        if not archived_days and not logs.exists():
             return Response({"dates": [], "logic": [], "precision": []})
 
         # Python-side Aggregation (Safe for SQLite & Postgres)
@@ -629,8 +726,8 @@ class UserHistoryAPI(APIView):
         data_points = defaultdict(lambda: {'logic_correct': 0, 'logic_total': 0, 'prec_correct': 0, 'prec_total': 0})
 
         for log in logs:
-            # Group by Date (YYYY-MM-DD)
-            date_str = log.attempted_at.strftime("%d-%b") # e.g., "12-Oct"
+            # Group by local date (same days as the archived rollups); formatted only for output
+            day = timezone.localtime(log.attempted_at).date()
             
             # Check Pattern Type
             pat = log.question.pattern
@@ -638,18 +735,27 @@ class UserHistoryAPI(APIView):
             is_precision = pat.startswith('zero_g')
             
             if is_logic:
-                data_points[date_str]['logic_total'] += 1
-                if log.is_correct: data_points[date_str]['logic_correct'] += 1
+                data_points[day]['logic_total'] += 1
+                if log.is_correct: data_points[day]['logic_correct'] += 1
             elif is_precision:
-                data_points[date_str]['prec_total'] += 1
-                if log.is_correct: data_points[date_str]['prec_correct'] += 1
+                data_points[day]['prec_total'] += 1
+                if log.is_correct: data_points[day]['prec_correct'] += 1
+
+        for row in archived_days:
+            day = row['day']
+            if row['pattern'] in ['elim_classical', 'elim_haphazard']:
+                data_points[day]['logic_total'] += row['answered']
+                data_points[day]['logic_correct'] += row['correct']
+            elif row['pattern'].startswith('zero_g'):
+                data_points[day]['prec_total'] += row['answered']
+                data_points[day]['prec_correct'] += row['correct']
 
         # Format for Frontend Graph (Lists)
         dates = []
         logic_scores = []
         precision_scores = []
 
-        # Limit to last 7 data points (clean graph)
+        # Limit to last 7 data points (clean graph); date keys sort chronologically across years
         sorted_dates = sorted(data_points.keys())[-7:] 
 
         for d in sorted_dates:
@@ -664,7 +770,7 @@ class UserHistoryAPI(APIView):
             if stats['prec_total'] > 0:
                 p_score = (stats['prec_correct'] / stats['prec_total']) * 100
             
-            dates.append(d)
+            dates.append(d.strftime("%d-%b")) # e.g., "12-Oct"
             logic_scores.append(round(l_score, 1))
             precision_scores.append(round(p_score, 1))
 
@@ -679,20 +785,24 @@ class MockExamGeneratorAPI(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        # ADAPTIVE MODE: same mix, but weak subjects/patterns and unseen questions first
+        if request.query_params.get('mode') == 'adaptive':
+            return self._adaptive(request)
+
         # 1. Define the "Hostile Mix" (20 Questions Total)
         # We force the user to face their fears (Zero-G).
         
         # A. 6 Zero-G Questions (30%) - The Killer
-        zero_g_qs = list(Question.objects.filter(pattern__startswith='zero_g').order_by('?')[:6])
+        zero_g_qs = list(Question.objects.filter(pattern__startswith='zero_g').select_related('stats').order_by('?')[:6])
         
         # B. 6 Elimination Questions (30%) - The Comfort Zone
-        elim_qs = list(Question.objects.filter(pattern__startswith='elim').order_by('?')[:6])
+        elim_qs = list(Question.objects.filter(pattern__startswith='elim').select_related('stats').order_by('?')[:6])
         
         # C. 4 Reasoning Questions (20%) - The Link
-        reason_qs = list(Question.objects.filter(pattern__startswith='assertion').order_by('?')[:4])
+        reason_qs = list(Question.objects.filter(pattern__startswith='assertion').select_related('stats').order_by('?')[:4])
         
         # D. 4 One-Liners (20%) - The Speed Check
-        speed_qs = list(Question.objects.filter(pattern='one_liner').order_by('?')[:4])
+        speed_qs = list(Question.objects.filter(pattern='one_liner').select_related('stats').order_by('?')[:4])
         
         # Combine & Shuffle
         final_pool = zero_g_qs + elim_qs + reason_qs + speed_qs
@@ -702,117 +812,47 @@ class MockExamGeneratorAPI(APIView):
         # Serialize
         serializer = QuestionSerializer(final_pool, many=True)
         return Response(serializer.data)
+
+    def _adaptive(self, request):
+        try:
+            total = min(max(int(request.query_params.get('count', 20)), 1), 100)
+        except ValueError:
+            total = 20
+        question_ids = generate_adaptive_paper(request.user, total=total)
+        by_id = Question.objects.select_related('stats').prefetch_related('options').in_bulk(question_ids)
+        final_pool = [by_id[qid] for qid in question_ids if qid in by_id]
+        serializer = QuestionSerializer(final_pool, many=True)
+        return Response(serializer.data)
 # quiz/views.py (Add to bottom)
 
 class ExamAnalysisAPI(APIView):
     permission_classes = [IsAuthenticated]
 
     def _calculate_session_stats(self, logs):
-        # ... (Same Aggregation Logic as before) ...
-        unique_qs = {} 
-        for log in logs:
-            qid = log.question.id
-            if qid not in unique_qs:
-                unique_qs[qid] = { 'total_time': 0, 'latest_log': log, 'timestamp': log.attempted_at }
-            unique_qs[qid]['total_time'] += log.time_taken_seconds
-            if log.attempted_at >= unique_qs[qid]['timestamp']:
-                unique_qs[qid]['latest_log'] = log
-                unique_qs[qid]['timestamp'] = log.attempted_at
-        # Buckets: 0, 25, 50, 75, 100
-        conf_matrix = {
-            0:   {'correct': 0, 'wrong': 0},
-            25:  {'correct': 0, 'wrong': 0},
-            50:  {'correct': 0, 'wrong': 0},
-            75:  {'correct': 0, 'wrong': 0},
-            100: {'correct': 0, 'wrong': 0}
-        }
-
-        # Metrics
-        correct = 0; wrong = 0; skipped = 0; silly_mistakes = 0
-        quadrants = {"q1_sniper": [], "q2_optimal": [], "q3_rush": [], "q4_trap": []}
-        full_logs_out = []; heatmap_stats = {}
-
-        for qid, data in unique_qs.items():
-            log = data['latest_log']
-            t_time = data['total_time']
-            
-            if log.is_correct: correct += 1
-            elif log.is_skipped: skipped += 1
-            else: wrong += 1
-            
-            if not log.is_correct and not log.is_skipped:
-                if t_time < 15 or log.confidence_score > 80: silly_mistakes += 1
-            
-            # Quadrants
-            q_info = {"id": log.question.id, "text": log.question.text, "time": t_time, "is_correct": log.is_correct}
-            if log.is_correct:
-                if t_time < 40: quadrants['q1_sniper'].append(q_info)
-                else: quadrants['q2_optimal'].append(q_info)
-            elif not log.is_skipped:
-                if t_time < 20: quadrants['q3_rush'].append(q_info)
-                elif t_time > 60: quadrants['q4_trap'].append(q_info)
-                
-            # Heatmap
-            subj = log.question.subject
-            if subj not in heatmap_stats: heatmap_stats[subj] = {'total': 0, 'correct': 0}
-            heatmap_stats[subj]['total'] += 1
-            if log.is_correct: heatmap_stats[subj]['correct'] += 1
-            
-            # Full Logs
-            full_logs_out.append({
-                "question_id": log.question.id,
-                "time_taken": t_time,
-                "is_correct": log.is_correct,
-                "is_skipped": log.is_skipped,
-                "selected_option_id": log.selected_option_id 
-            })
-            if not log.is_skipped:
-                # Snap confidence to nearest bucket (0, 25, 50, 75, 100)
-                score = log.confidence_score
-                bucket = 0
-                if score >= 88: bucket = 100
-                elif score >= 63: bucket = 75
-                elif score >= 38: bucket = 50
-                elif score >= 13: bucket = 25
-                else: bucket = 0
-                
-                if log.is_correct:
-                    conf_matrix[bucket]['correct'] += 1
-                else:
-                    conf_matrix[bucket]['wrong'] += 1
-
-        actual_score = (correct * 2) - (wrong * 0.66)
-        lost_marks = silly_mistakes * 2.66
-        potential_score = actual_score + lost_marks
-        total_qs = len(unique_qs)
-        accuracy = (correct / total_qs * 100) if total_qs > 0 else 0
-
-        heatmap_list = []
-        for subj, stats in heatmap_stats.items():
-            acc = (stats['correct'] / stats['total']) * 100 if stats['total'] > 0 else 0
-            heatmap_list.append({'subject': subj, 'accuracy': round(acc, 1), 'total': stats['total']})
-        heatmap_list.sort(key=lambda x: x['accuracy'])
-
-        return {
-            "score_card": {
-                "actual_score": round(actual_score, 2),
-                "potential_score": round(potential_score, 2),
-                "lost_marks": round(lost_marks, 2),
-                "accuracy": round(accuracy, 1)
-            },
-            "quadrants": quadrants,
-            "heatmap": heatmap_list,
-            "full_logs": full_logs_out,
-            "total_qs": total_qs,
-            "confidence_matrix": conf_matrix
-            
-        }
+        return calculate_session_stats(logs)
 
+    def post(self, request, session_id):
+        """Session close (the app posts here when an exam is submitted): feeds the mock leaderboards.
+        Best score per user, so posting twice is harmless; rebuild_leaderboards covers unposted sessions."""
+        logs = (UserAnswerLog.objects.filter(user=request.user, session_id=session_id, source_mode='exam')
+                .select_related('question'))
+        if not logs.exists():
+            return Response({"error": "Session not found"}, status=404)
+        stats = self._calculate_session_stats(logs)
+        exam_name = logs.first().question.exam_name  # Most recent answer, like the analysis context
+        score = stats['score_card']['actual_score']
+        ranked = stats['total_qs'] >= MIN_MOCK_QUESTIONS
+        if ranked:
+            leaderboard.record_mock(request.user.id, exam_name, score)
+        return Response({'score': score, 'ranked': ranked,
+                         'me': leaderboard.rank(leaderboard.mock_board(exam_name), request.user.id)})
+
+    @use_replica
     def get(self, request, session_id):
         user = request.user
         
         # 1. Fetch Current Session [PRESERVED]
-        current_logs = UserAnswerLog.objects.filter(user=user, session_id=session_id).select_related('question')
+        current_logs = UserAnswerLog.objects.filter(user=user, session_id=session_id).select_related('question__stats')
         if not current_logs.exists():
             return Response({"error": "Session not found"}, status=404)
 
@@ -938,36 +978,9 @@ class ExamAnalysisAPI(APIView):
                 "total": h_stats['total_qs']
             })
 
-        # --- 3. GROWTH REPORT [PRESERVED] ---
-        growth_report = {"has_history": False}
-        if len(history_list) > 0:
-            last_sid = history_list[0]['session_id']
-            last_logs = UserAnswerLog.objects.filter(session_id=last_sid).select_related('question')
-            last_stats = self._calculate_session_stats(last_logs)
-            
-            curr_map = {log['question_id']: log['is_correct'] for log in current_stats['full_logs']}
-            prev_map = {log['question_id']: log['is_correct'] for log in last_stats['full_logs']}
-            
-            retention_fix = 0
-            false_positive = 0
-            stable_correct = 0
-            persistent_error = 0
-            
-            for qid, curr_correct in curr_map.items():
-                if qid in prev_map:
-                    prev_correct = prev_map[qid]
-                    if not prev_correct and curr_correct: retention_fix += 1
-                    elif prev_correct and not curr_correct: false_positive += 1
-                    elif prev_correct and curr_correct: stable_correct += 1
-                    elif not prev_correct and not curr_correct: persistent_error += 1
-            
-            growth_report = {
-                "has_history": True,
-                "retention_fix": retention_fix,
-                "false_positive": false_positive,
-                "stable_correct": stable_correct,
-                "persistent_error": persistent_error
-            }
+        # --- 3. GROWTH REPORT ---
+        # Each question vs its latest earlier answer in any session, from QuestionMastery (quiz/mastery.py)
+        growth_report = mastery.session_growth(user.id, session_id, current_logs, has_history=bool(history_list))
 
         return Response({
             "score_card": current_stats['score_card'],